@@ -2,7 +2,7 @@ Import-Module -Name ./scripts/LogUtils.psm1 -Function WriteLog
 
 try {
     WriteLog "Building Docker image 'aws-dlt/taurus-tester'..."
-    docker build -t aws-dlt/taurus-tester -f taurus-tester-image\Dockerfile taurus-tester-image
+    docker build -t aws-dlt/taurus-tester -f taurus-tester-image\Dockerfile .
     WriteLog "Docker image 'aws-dlt/taurus-tester' built successfully."
 
     WriteLog "Authenticating Docker with AWS ECR Public..."
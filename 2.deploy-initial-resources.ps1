@@ -13,6 +13,7 @@ $LambdaFolders = @{
     "task-status-checker" = "TaskStatusChecker"
     "task-runner"         = "TaskRunnerFunction"
     "api-services"        = "ApiServices"
+    "test-finalizer"      = "TestFinalizerFunction"
 }
 
 WriteLog "Starting deployment of SAM Lambdas..."
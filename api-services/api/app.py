@@ -1,14 +1,112 @@
 import os
+import io
+import copy
+import gzip
 import json
 import re
+import tempfile
+import uuid
 from datetime import datetime, timezone
 
 import boto3
+from botocore.exceptions import ClientError
+
+from capacity import claim_capacity_release, is_conditional_check_failure, release_capacity, release_test_reservation
+from comparison import DEFAULT_THRESHOLDS, IncomparableSummariesException, compare_summaries
+from ecs_tasks import list_running_test_task_arns, stop_tasks
+from jmx_optimizer import InvalidTestPlanException, optimize_plan
+from run_results import get_segment_key
+from runtime_profiles import DEFAULT_RUNTIME_PROFILE, RUNTIME_PROFILES, apply_runtime_profile
+from scheduler import (
+    MAX_PRIORITY,
+    dequeue_test,
+    enqueue_test,
+    get_max_tasks,
+    get_queue_key,
+    list_queued_tests,
+    reserve_capacity,
+    schedule_tests,
+)
+from sweep import InvalidSweepException, build_curve, expand_sweep, get_point_test_id, get_sweep_key
+from task_graph import TaskGraph
+from trends import InvalidTrendQueryException, build_trend, get_partitions, get_trend_query
+
+
+# Compressed scenarios are spooled in memory up to this size, then to /tmp.
+SCENARIO_SPOOL_MAX_BYTES = 8 * 1024 * 1024
+
+
+# Sweep points are written to S3 and the tests table concurrently.
+SWEEP_MAX_WORKERS = 16
+
+
+# The SLA guard runs every interval and evaluates the live metrics of the
+# window before it, CloudWatch aggregates them in periods of whole minutes.
+DEFAULT_SLA_CRITERIA = {"interval_seconds": 60, "window_seconds": 120, "grace_seconds": 120}
+SLA_THRESHOLDS = ("max_error_rate", "max_p99_ms", "min_throughput_rps")
+
+
+# Time tasks get past the hold-for and ramp-up to stop and upload their
+# results before the state machine stops them.
+DEFAULT_DEADLINE_GRACE_SECONDS = 900
+
+
+# Step Functions execution states after which the tasks of a test are gone.
+TERMINAL_EXECUTION_STATUSES = ("SUCCEEDED", "FAILED", "TIMED_OUT", "ABORTED")
+TERMINAL_TEST_STATUSES = ("COMPLETED", "FAILED", "ABORTED", "REJECTED", "SKIPPED")
 
 
 def lambda_handler(event, _):
+    # EventBridge invokes the function when an execution ends and on a schedule.
+    if event.get("source") in ("aws.states", "aws.events"):
+        return handle_scheduler_event(event)
+
     if event["resource"] == "/test":
-        handle_tests(event)
+        return {"statusCode": 200, "body": handle_tests(event)}
+    elif event["resource"] == "/test/{id}":
+        try:
+            return {"statusCode": 200, "body": handle_test(event)}
+        except UnknownTestException as e:
+            return {"statusCode": 404, "body": {"message": str(e)}}
+        except EndedTestException as e:
+            return {"statusCode": 409, "body": {"message": str(e)}}
+    elif event["resource"] == "/test/{id}/comparison":
+        try:
+            return {"statusCode": 200, "body": handle_comparison(event)}
+        except (UnknownTestException, UnknownBaselineException) as e:
+            return {"statusCode": 404, "body": {"message": str(e)}}
+        except ResultsNotReadyException as e:
+            return {"statusCode": 409, "body": {"message": str(e)}}
+        except (InvalidParameterException, IncomparableSummariesException) as e:
+            return {"statusCode": 400, "body": {"message": str(e)}}
+    elif event["resource"] == "/test/{id}/script":
+        try:
+            return {"statusCode": 200, "body": handle_script(event)}
+        except UnknownTestException as e:
+            return {"statusCode": 404, "body": {"message": str(e)}}
+        except InvalidTestPlanException as e:
+            return {"statusCode": 400, "body": {"message": str(e)}}
+    elif event["resource"] in ("/sweep", "/sweep/{id}"):
+        try:
+            return {"statusCode": 200, "body": handle_sweeps(event)}
+        except UnknownSweepException as e:
+            return {"statusCode": 404, "body": {"message": str(e)}}
+        except (InvalidParameterException, InvalidSweepException) as e:
+            return {"statusCode": 400, "body": {"message": str(e)}}
+    elif event["resource"] == "/trend/{name}":
+        try:
+            return {"statusCode": 200, "body": handle_trend(event)}
+        except InvalidTrendQueryException as e:
+            return {"statusCode": 400, "body": {"message": str(e)}}
+    elif event["resource"] == "/baseline/{name}":
+        try:
+            return {"statusCode": 200, "body": handle_baseline(event)}
+        except (UnknownTestException, UnknownBaselineException) as e:
+            return {"statusCode": 404, "body": {"message": str(e)}}
+        except ResultsNotReadyException as e:
+            return {"statusCode": 409, "body": {"message": str(e)}}
+        except InvalidParameterException as e:
+            return {"statusCode": 400, "body": {"message": str(e)}}
 
     return {
         "statusCode": 200,
@@ -28,54 +126,864 @@ def handle_tests(event):
 
         ddb = boto3.client("dynamodb", region_name=AWS_TESTS_REGION)
         test_task_config = event["test_task_config"]
-        merge_region_infra_config_details(ddb, AWS_TESTS_REGION, test_task_config)
-
-        test_scenario = event["test_scenario"]
 
-        test_name = event["test_name"]
-        user_defined_variables = event.get("variables", {})
-        test_scenario["scenarios"][test_name]["variables"] = user_defined_variables
-
-        test_scenario["reporting"] = [
-            {
-                "module": "final-stats",
-                "summary": True,
-                "percentiles": True,
-                "summary-labels": True,
-                "test-duration": True,
-                "dump-xml": "/tmp/artifacts/results.xml",
-            },
-        ]
-
-        s3_client = boto3.client("s3", region_name=AWS_TESTS_REGION)
-        write_scenario_to_s3(
-            s3_client,
-            test_scenario,
-            test_task_config,
-            test_id
-        )
+        test_scenario = prepare_test_scenario(event["test_scenario"], event["test_name"], event.get("variables", {}))
 
         hold_for = test_scenario["execution"][0]["hold-for"]
         test_duration = get_test_duration_seconds(hold_for)
 
+        s3_client = boto3.client("s3", region_name=AWS_TESTS_REGION)
         sfn = boto3.client("stepfunctions", region_name=AWS_TESTS_REGION)
         step_function_params = {
             "test_task_config": test_task_config,
             "test_id": test_id,
             "duration": test_duration,
+            "deadline_grace_seconds": get_deadline_grace_seconds(event, test_scenario),
+            # The finalizer appends the run to the trend of its test.
+            "test_name": event["test_name"],
         }
+        sla = get_sla_criteria(event)
+        if sla is not None:
+            step_function_params["sla"] = sla
+        test_description = event["test_description"]
+        execution_name = get_execution_name(test_id)
+        execution_arn = get_execution_arn(execution_name)
+        task_count = int(test_task_config["task_count"])
+        queue_key = get_queue_key(get_priority(event), datetime.now(timezone.utc).isoformat(), test_id)
+        runtime_profile = get_runtime_profile(event)
 
-        start_state_machine_execution(sfn, step_function_params)
+        # The region infra lookup, the queue lookup, the scenario upload and
+        # the test record are independent. A test is started right away when
+        # nothing is queued ahead of it and the region has capacity for it,
+        # otherwise it is queued for the scheduler.
+        graph = TaskGraph()
+        graph.add(
+            "merge_region_infra_config",
+            lambda: merge_region_infra_config_details(ddb, AWS_TESTS_REGION, test_task_config),
+        )
+        graph.add(
+            "peek_queue",
+            lambda: list_queued_tests(ddb, os.environ.get("TEST_QUEUE_TABLE"), AWS_TESTS_REGION, limit=1),
+        )
+        graph.add(
+            "write_scenario",
+            lambda: write_scenario_to_s3(
+                s3_client, test_scenario, test_task_config, test_id, runtime_profile=runtime_profile
+            ),
+            rollback=lambda: delete_scenario_from_s3(s3_client, test_id),
+        )
+        graph.add(
+            "upload_test_entry",
+            lambda: upload_test_entry_to_db(
+                ddb,
+                test_id,
+                test_description,
+                test_scenario,
+                test_task_config,
+                execution_arn=execution_arn,
+                queue_key=queue_key,
+            ),
+            rollback=lambda: delete_test_entry_from_db(ddb, test_id),
+        )
+        graph.add(
+            "admit",
+            lambda: admit_test(
+                ddb,
+                AWS_TESTS_REGION,
+                graph.results["merge_region_infra_config"],
+                graph.results["peek_queue"],
+                task_count,
+            ),
+            depends_on=["merge_region_infra_config", "peek_queue"],
+            rollback=lambda: graph.results["admit"]["reserved"]
+            and release_capacity(ddb, os.environ.get("REGION_INFRA_TABLE"), AWS_TESTS_REGION, task_count),
+        )
+        graph.add(
+            "start_or_enqueue",
+            lambda: start_or_enqueue_test(
+                ddb,
+                sfn,
+                AWS_TESTS_REGION,
+                queue_key,
+                test_id,
+                task_count,
+                {"name": execution_name, "input": json.dumps(step_function_params)},
+                graph.results["admit"],
+            ),
+            depends_on=["admit", "write_scenario", "upload_test_entry"],
+            rollback=lambda: cancel_started_or_queued_test(
+                ddb, sfn, AWS_TESTS_REGION, queue_key, test_id, execution_name, graph.results["start_or_enqueue"]
+            ),
+        )
+        graph.run()
 
-        test_description = event["test_description"]
-        upload_test_entry_to_db(ddb, test_id, test_description, test_scenario, test_task_config)
+        return {"test_id": test_id, "status": graph.results["start_or_enqueue"]}
+
+
+def prepare_test_scenario(test_scenario, test_name, variables):
+    test_scenario["scenarios"][test_name]["variables"] = variables
+    test_scenario["reporting"] = [
+        {
+            "module": "final-stats",
+            "summary": True,
+            "percentiles": True,
+            "summary-labels": True,
+            "test-duration": True,
+            "dump-xml": "/tmp/artifacts/results.xml",
+        },
+    ]
+    return test_scenario
+
+
+def get_priority(event):
+    try:
+        priority = int(event.get("priority", 0))
+    except (TypeError, ValueError):
+        raise InvalidParameterException(f"Priority must be an integer, got {event.get('priority')}")
+    if not 0 <= priority <= MAX_PRIORITY:
+        raise InvalidParameterException(f"Priority must be between 0 and {MAX_PRIORITY}, got {priority}")
+    return priority
+
+
+def get_deadline_grace_seconds(event, test_scenario):
+    """Returns how long the tasks may run past the hold-for before they are stopped."""
+    try:
+        grace = int(event.get("deadline_grace_seconds", DEFAULT_DEADLINE_GRACE_SECONDS))
+    except (TypeError, ValueError):
+        raise InvalidParameterException(
+            f"Deadline grace must be a number of seconds, got {event.get('deadline_grace_seconds')}"
+        )
+    if grace < 0:
+        raise InvalidParameterException(f"Deadline grace must not be negative, got {grace}")
+
+    ramp_up = test_scenario["execution"][0].get("ramp-up")
+    return grace + (get_test_duration_seconds(ramp_up) if ramp_up else 0)
+
+
+def get_sla_criteria(event):
+    """Returns the abort criteria of the test with the guard's defaults, None without an SLA."""
+    sla = event.get("sla")
+    if not sla:
+        return None
+    unknown = set(sla) - set(DEFAULT_SLA_CRITERIA) - set(SLA_THRESHOLDS)
+    if unknown:
+        raise InvalidParameterException(f"Unknown SLA criteria: {', '.join(sorted(unknown))}")
+
+    criteria = {}
+    for name, value in {**DEFAULT_SLA_CRITERIA, **{threshold: None for threshold in SLA_THRESHOLDS}, **sla}.items():
+        if value is None:
+            criteria[name] = None
+            continue
+        try:
+            criteria[name] = int(value) if name in DEFAULT_SLA_CRITERIA else float(value)
+        except (TypeError, ValueError):
+            raise InvalidParameterException(f"SLA {name} must be a number, got {value}")
+        if criteria[name] < 0:
+            raise InvalidParameterException(f"SLA {name} must not be negative, got {value}")
+
+    if all(criteria[threshold] is None for threshold in SLA_THRESHOLDS):
+        raise InvalidParameterException(f"SLA needs at least one of {', '.join(SLA_THRESHOLDS)}")
+    if criteria["interval_seconds"] < 1:
+        raise InvalidParameterException(f"SLA interval_seconds must be positive, got {criteria['interval_seconds']}")
+    if criteria["window_seconds"] < 60 or criteria["window_seconds"] % 60:
+        raise InvalidParameterException(
+            f"SLA window_seconds must be a multiple of 60, got {criteria['window_seconds']}"
+        )
+    return criteria
+
+
+def get_runtime_profile(event):
+    runtime_profile = event.get("runtime_profile", DEFAULT_RUNTIME_PROFILE)
+    if runtime_profile not in RUNTIME_PROFILES:
+        raise InvalidParameterException(
+            f"Unknown runtime profile {runtime_profile}, expected one of {', '.join(RUNTIME_PROFILES)}"
+        )
+    return runtime_profile
+
+
+def admit_test(dynamodb, region, region_record, queued_tests, task_count):
+    """Reserves capacity for a new test unless other tests are queued ahead of it."""
+    max_tasks = get_max_tasks(region_record)
+    if max_tasks is not None and task_count > max_tasks:
+        raise InvalidParameterException(f"Test needs {task_count} tasks, {region} runs at most {max_tasks}")
+    if queued_tests:
+        return {"admitted": False, "reserved": False}
+
+    REGION_INFRA_TABLE = os.environ.get("REGION_INFRA_TABLE")
+    admitted = reserve_capacity(dynamodb, REGION_INFRA_TABLE, region, task_count, max_tasks)
+    return {"admitted": admitted, "reserved": admitted and max_tasks is not None}
+
+
+def start_or_enqueue_test(dynamodb, sfn, region, queue_key, test_id, task_count, execution, admission):
+    if admission["admitted"]:
+        start_test(dynamodb, sfn, test_id, execution, admission["reserved"])
+        return "STARTED"
+
+    TEST_QUEUE_TABLE = os.environ.get("TEST_QUEUE_TABLE")
+    enqueue_test(dynamodb, TEST_QUEUE_TABLE, region, queue_key, test_id, task_count, execution)
+    return "QUEUED"
+
+
+def cancel_started_or_queued_test(dynamodb, sfn, region, queue_key, test_id, execution_name, status):
+    """Rolls back start_or_enqueue_test: stops the started execution or takes the test off the queue."""
+    if status == "QUEUED":
+        TEST_QUEUE_TABLE = os.environ.get("TEST_QUEUE_TABLE")
+        dequeue_test(dynamodb, TEST_QUEUE_TABLE, region, queue_key)
+        return
+
+    stop_started_test(dynamodb, sfn, test_id, execution_name)
+
+
+def stop_started_test(dynamodb, sfn, test_id, execution_name):
+    # Whoever reserved the capacity hands it back, the stopped execution must
+    # not hand it back a second time when it ends.
+    claim_capacity_release(dynamodb, os.environ.get("TESTS_TABLE"), test_id)
+    stop_state_machine_execution(sfn, get_execution_arn(execution_name))
+
+
+def start_test(dynamodb, sfn, test_id, execution, reserved):
+    step_function_params = json.loads(execution["input"])
+    if reserved:
+        # Handed back when the execution ends, see release_test_capacity.
+        step_function_params["test_task_config"]["reserved_tasks"] = int(
+            step_function_params["test_task_config"]["task_count"]
+        )
+    start_state_machine_execution(sfn, step_function_params, execution["name"])
+    try:
+        set_test_entry_status(dynamodb, test_id, "STARTED", "started_at")
+    except Exception:
+        stop_started_test(dynamodb, sfn, test_id, execution["name"])
+        raise
+
+
+def handle_scheduler_event(event):
+    AWS_TESTS_REGION = os.environ.get("AWS_TESTS_REGION", "us-east-1")
+    TEST_QUEUE_TABLE = os.environ.get("TEST_QUEUE_TABLE")
+    REGION_INFRA_TABLE = os.environ.get("REGION_INFRA_TABLE")
+
+    ddb = boto3.client("dynamodb", region_name=AWS_TESTS_REGION)
+    sfn = boto3.client("stepfunctions", region_name=AWS_TESTS_REGION)
+
+    if event.get("detail-type") == "Step Functions Execution Status Change":
+        release_test_capacity(ddb, AWS_TESTS_REGION, event["detail"])
+        # Queues the next point of a sweep, the schedule below can start it right away.
+        advance_sweep(ddb, AWS_TESTS_REGION, event["detail"])
+
+    started = schedule_tests(
+        ddb,
+        TEST_QUEUE_TABLE,
+        REGION_INFRA_TABLE,
+        AWS_TESTS_REGION,
+        get_region_record(ddb, AWS_TESTS_REGION),
+        start=lambda queued_test, reserved: start_test(
+            ddb, sfn, queued_test["test_id"], queued_test["execution"], reserved
+        ),
+        reject=lambda queued_test: set_test_entry_status(ddb, queued_test["test_id"], "REJECTED", "rejected_at"),
+    )
+    return {"started": started}
+
+
+def release_test_capacity(dynamodb, region, execution_detail):
+    if execution_detail.get("status") not in TERMINAL_EXECUTION_STATUSES:
+        return
+
+    execution_input = json.loads(execution_detail.get("input") or "{}")
+    reserved_tasks = execution_input.get("test_task_config", {}).get("reserved_tasks")
+
+    # Status change events can be delivered more than once, the flag on the
+    # test record makes sure the tasks are handed back only once.
+    release_test_reservation(
+        dynamodb,
+        os.environ.get("TESTS_TABLE"),
+        os.environ.get("REGION_INFRA_TABLE"),
+        region,
+        execution_input["test_id"],
+        reserved_tasks,
+    )
+
+
+def handle_test(event):
+    if event["httpMethod"] == "DELETE":
+        test_id = event["pathParameters"]["id"]
+
+        AWS_TESTS_REGION = os.environ.get("AWS_TESTS_REGION", "us-east-1")
+        if AWS_TESTS_REGION != "us-east-1":
+            raise InvalidRegionException(AWS_TESTS_REGION)
+
+        return abort_test(test_id, AWS_TESTS_REGION)
+
+
+def abort_test(test_id, region):
+    ddb = boto3.client("dynamodb", region_name=region)
+    sfn = boto3.client("stepfunctions", region_name=region)
+    ecs = boto3.client("ecs", region_name=region)
+
+    test_entry = get_test_entry_from_db(ddb, test_id)
+    status = test_entry.get("status", {}).get("S")
+    reason = f"Test {test_id} aborted"
+    test_task_config = {}
+
+    if status in TERMINAL_TEST_STATUSES:
+        raise EndedTestException(test_id, status)
+
+    if status == "QUEUED" and "queue_key" in test_entry:
+        TEST_QUEUE_TABLE = os.environ.get("TEST_QUEUE_TABLE")
+        if dequeue_test(ddb, TEST_QUEUE_TABLE, region, test_entry["queue_key"]["S"]):
+            return aborted_test_response(ddb, test_id, [], [])
+
+    # A pending sweep point has neither an execution nor tasks yet, aborting it keeps the sweep from queueing it.
+    if status == "PENDING" and "execution_arn" not in test_entry:
+        return aborted_test_response(ddb, test_id, [], [])
+
+    # The execution is stopped before listing tasks so it cannot launch new ones meanwhile.
+    graph = TaskGraph()
+    graph.add(
+        "stop_execution",
+        lambda: "execution_arn" in test_entry
+        and stop_state_machine_execution(sfn, test_entry["execution_arn"]["S"], cause=reason),
+    )
+    graph.add(
+        "merge_region_infra_config",
+        lambda: merge_region_infra_config_details(ddb, region, test_task_config),
+    )
+    graph.add(
+        "list_tasks",
+        lambda: list_running_test_task_arns(ecs, test_task_config["cluster"], test_id),
+        depends_on=["stop_execution", "merge_region_infra_config"],
+    )
+    graph.add(
+        "stop_tasks",
+        lambda: stop_tasks(ecs, test_task_config["cluster"], graph.results["list_tasks"], reason),
+        depends_on=["list_tasks"],
+    )
+    graph.run()
+
+    return aborted_test_response(ddb, test_id, graph.results["list_tasks"], graph.results["stop_tasks"])
+
+
+def aborted_test_response(dynamodb, test_id, task_arns, failed_task_arns):
+    # The test may have ended while it was being aborted, its entry then keeps the status it ended with.
+    status = "ABORTED"
+    if not mark_test_entry_aborted(dynamodb, test_id):
+        status = get_test_entry_from_db(dynamodb, test_id)["status"]["S"]
+
+    return {
+        "test_id": test_id,
+        "status": status,
+        "stopped_tasks": len(task_arns) - len(failed_task_arns),
+        "failed_tasks": failed_task_arns,
+    }
+
+
+def handle_comparison(event):
+    if event["httpMethod"] == "GET":
+        test_id = event["pathParameters"]["id"]
+
+        AWS_TESTS_REGION = os.environ.get("AWS_TESTS_REGION", "us-east-1")
+        if AWS_TESTS_REGION != "us-east-1":
+            raise InvalidRegionException(AWS_TESTS_REGION)
+
+        thresholds = get_comparison_thresholds(event.get("queryStringParameters") or {})
+        return compare_test_to_baseline(test_id, AWS_TESTS_REGION, thresholds)
+
+
+def handle_baseline(event):
+    test_name = event["pathParameters"]["name"]
+
+    AWS_TESTS_REGION = os.environ.get("AWS_TESTS_REGION", "us-east-1")
+    if AWS_TESTS_REGION != "us-east-1":
+        raise InvalidRegionException(AWS_TESTS_REGION)
+
+    ddb = boto3.client("dynamodb", region_name=AWS_TESTS_REGION)
+    if event["httpMethod"] == "PUT":
+        return pin_baseline(ddb, test_name, event["test_id"])
+    if event["httpMethod"] == "GET":
+        return {"test_name": test_name, "baseline_test_id": get_baseline_test_id(ddb, test_name)}
+
+
+def handle_trend(event):
+    if event["httpMethod"] == "GET":
+        test_name = event["pathParameters"]["name"]
+
+        AWS_TESTS_REGION = os.environ.get("AWS_TESTS_REGION", "us-east-1")
+        if AWS_TESTS_REGION != "us-east-1":
+            raise InvalidRegionException(AWS_TESTS_REGION)
+
+        query = get_trend_query(event.get("queryStringParameters") or {}, datetime.now(timezone.utc))
+        return get_trend(test_name, AWS_TESTS_REGION, query)
+
+
+def handle_script(event):
+    if event["httpMethod"] == "POST":
+        test_id = event["pathParameters"]["id"]
+
+        AWS_TESTS_REGION = os.environ.get("AWS_TESTS_REGION", "us-east-1")
+        if AWS_TESTS_REGION != "us-east-1":
+            raise InvalidRegionException(AWS_TESTS_REGION)
+
+        s3 = boto3.client("s3", region_name=AWS_TESTS_REGION)
+        return optimize_test_script(s3, test_id, event.get("mode", "report"))
+
+
+def optimize_test_script(s3, test_id, mode):
+    """Analyzes the uploaded JMX of a test, stores the report and the optimized plan next to it."""
+    TEST_SCENARIOS_BUCKET = os.environ.get("TEST_SCENARIOS_BUCKET")
+    script_key = get_script_key(test_id)
+    try:
+        script = s3.get_object(Bucket=TEST_SCENARIOS_BUCKET, Key=script_key)
+    except ClientError as e:
+        if e.response["Error"]["Code"] in ("NoSuchKey", "404"):
+            raise UnknownTestException(test_id, "Test script not found")
+        raise
+
+    optimized_plan, report = optimize_plan(script["Body"].read(), mode)
+    report.update({"test_id": test_id, "script": script_key, "optimized_script": None})
+
+    if optimized_plan is not None:
+        report["optimized_script"] = get_script_key(test_id, optimized=True)
+        # Tasks only run the optimized plan while it was made from the current script.
+        s3.put_object(
+            Body=optimized_plan,
+            Bucket=TEST_SCENARIOS_BUCKET,
+            Key=report["optimized_script"],
+            ContentType="application/xml",
+            Metadata={"source-etag": script["ETag"].strip('"')},
+        )
+    s3.put_object(
+        Body=json.dumps(report).encode(),
+        Bucket=TEST_SCENARIOS_BUCKET,
+        Key=get_script_report_key(test_id),
+        ContentType="application/json",
+    )
+    return report
+
+
+def handle_sweeps(event):
+    AWS_TESTS_REGION = os.environ.get("AWS_TESTS_REGION", "us-east-1")
+    if AWS_TESTS_REGION != "us-east-1":
+        raise InvalidRegionException(AWS_TESTS_REGION)
+
+    if event["httpMethod"] == "POST":
+        return submit_sweep(event, AWS_TESTS_REGION)
+    if event["httpMethod"] == "GET":
+        return get_sweep(event["pathParameters"]["id"], AWS_TESTS_REGION)
+
+
+def submit_sweep(event, region):
+    """Prepares every point of the sweep as a test and starts or queues the first one."""
+    ddb = boto3.client("dynamodb", region_name=region)
+    s3_client = boto3.client("s3", region_name=region)
+    sfn = boto3.client("stepfunctions", region_name=region)
+
+    sweep_id, test_name = event["sweep_id"], event["test_name"]
+    base_task_config = event["test_task_config"]
+    points = expand_sweep(event.get("matrix") or {}, base_task_config, event.get("variables", {}))
+    priority = get_priority(event)
+    runtime_profile = get_runtime_profile(event)
+    sla = get_sla_criteria(event)
+    duration = get_test_duration_seconds(event["test_scenario"]["execution"][0]["hold-for"])
+    deadline_grace_seconds = get_deadline_grace_seconds(event, event["test_scenario"])
+
+    # Every point runs on the same region infrastructure.
+    region_record = merge_region_infra_config_details(ddb, region, base_task_config)
+    max_tasks = get_max_tasks(region_record)
+    largest_task_count = max(point["task_count"] for point in points)
+    if max_tasks is not None and largest_task_count > max_tasks:
+        raise InvalidParameterException(f"Sweep needs {largest_task_count} tasks, {region} runs at most {max_tasks}")
+
+    created_at = datetime.now(timezone.utc).isoformat()
+    tests = []
+    for point in points:
+        test_id = get_point_test_id(sweep_id, point["index"])
+        test_task_config = {
+            **base_task_config,
+            "task_count": str(point["task_count"]),
+            "concurrency": str(point["concurrency"]),
+        }
+        execution_name = get_execution_name(test_id)
+        point.update({
+            "test_id": test_id,
+            "execution": {
+                "name": execution_name,
+                "input": json.dumps({
+                    "test_task_config": test_task_config,
+                    "test_id": test_id,
+                    "duration": duration,
+                    "deadline_grace_seconds": deadline_grace_seconds,
+                    "sweep_id": sweep_id,
+                    **({"sla": sla} if sla is not None else {}),
+                }),
+            },
+        })
+        tests.append({
+            "test_id": test_id,
+            "test_task_config": test_task_config,
+            "test_scenario": prepare_test_scenario(
+                copy.deepcopy(event["test_scenario"]), test_name, point["variables"]
+            ),
+            "execution_arn": get_execution_arn(execution_name),
+        })
+
+    first_point = points[0]
+    # Points keep the place in the queue their sweep was submitted at.
+    queue_key = get_queue_key(priority, created_at, first_point["test_id"])
+
+    graph = TaskGraph(max_workers=SWEEP_MAX_WORKERS)
+    prepared = ["admit", "upload_sweep_entry"]
+    for test in tests:
+        prepared += [f"write_scenario_{test['test_id']}", f"upload_test_entry_{test['test_id']}"]
+        graph.add(
+            f"write_scenario_{test['test_id']}",
+            lambda test=test: write_scenario_to_s3(
+                s3_client, test["test_scenario"], test["test_task_config"], test["test_id"],
+                runtime_profile=runtime_profile,
+            ),
+            rollback=lambda test=test: delete_scenario_from_s3(s3_client, test["test_id"]),
+        )
+        graph.add(
+            f"upload_test_entry_{test['test_id']}",
+            lambda test=test: upload_test_entry_to_db(
+                ddb,
+                test["test_id"],
+                event["test_description"],
+                test["test_scenario"],
+                test["test_task_config"],
+                execution_arn=test["execution_arn"],
+                queue_key=queue_key if test["test_id"] == first_point["test_id"] else None,
+                sweep_id=sweep_id,
+            ),
+            rollback=lambda test=test: delete_test_entry_from_db(ddb, test["test_id"]),
+        )
+    graph.add(
+        "upload_sweep_entry",
+        lambda: upload_sweep_entry_to_db(ddb, sweep_id, test_name, priority, points, created_at),
+        rollback=lambda: delete_test_entry_from_db(ddb, get_sweep_key(sweep_id)),
+    )
+    graph.add(
+        "peek_queue",
+        lambda: list_queued_tests(ddb, os.environ.get("TEST_QUEUE_TABLE"), region, limit=1),
+    )
+    graph.add(
+        "admit",
+        lambda: admit_test(ddb, region, region_record, graph.results["peek_queue"], first_point["task_count"]),
+        depends_on=["peek_queue"],
+        rollback=lambda: graph.results["admit"]["reserved"]
+        and release_capacity(ddb, os.environ.get("REGION_INFRA_TABLE"), region, first_point["task_count"]),
+    )
+    graph.add(
+        "start_or_enqueue",
+        lambda: start_or_enqueue_test(
+            ddb,
+            sfn,
+            region,
+            queue_key,
+            first_point["test_id"],
+            first_point["task_count"],
+            first_point["execution"],
+            graph.results["admit"],
+        ),
+        depends_on=prepared,
+        rollback=lambda: cancel_started_or_queued_test(
+            ddb, sfn, region, queue_key, first_point["test_id"], first_point["execution"]["name"],
+            graph.results["start_or_enqueue"],
+        ),
+    )
+    graph.run()
+
+    return {
+        "sweep_id": sweep_id,
+        "status": graph.results["start_or_enqueue"],
+        "points": [
+            {key: point[key] for key in ("test_id", "task_count", "concurrency", "variables")} for point in points
+        ],
+    }
+
+
+def advance_sweep(dynamodb, region, execution_detail):
+    """Queues the point after the one whose execution ended, or ends the sweep."""
+    status = execution_detail.get("status")
+    if status not in TERMINAL_EXECUTION_STATUSES:
+        return
+
+    execution_input = json.loads(execution_detail.get("input") or "{}")
+    sweep_id = execution_input.get("sweep_id")
+    if not sweep_id:
+        return
+
+    sweep_entry = get_sweep_entry_from_db(dynamodb, sweep_id)
+    points = json.loads(sweep_entry["points"]["S"])
+    index = next(index for index, point in enumerate(points) if point["test_id"] == execution_input["test_id"])
+    remaining = points[index + 1:]
+
+    if status != "SUCCEEDED" or not remaining:
+        sweep_status = "COMPLETED" if status == "SUCCEEDED" else "FAILED"
+        set_test_entry_status(dynamodb, get_sweep_key(sweep_id), sweep_status, "ended_at")
+        for point in remaining:
+            set_test_entry_status(dynamodb, point["test_id"], "SKIPPED", "skipped_at")
+        return
+
+    next_point = remaining[0]
+    queue_key = get_queue_key(
+        int(sweep_entry["priority"]["N"]), sweep_entry["created_at"]["S"], next_point["test_id"]
+    )
+    # Status change events can be delivered more than once, only the first one moves the point out of PENDING.
+    if not queue_test_entry(dynamodb, next_point["test_id"], queue_key):
+        return
+    TEST_QUEUE_TABLE = os.environ.get("TEST_QUEUE_TABLE")
+    enqueue_test(
+        dynamodb,
+        TEST_QUEUE_TABLE,
+        region,
+        queue_key,
+        next_point["test_id"],
+        next_point["task_count"],
+        next_point["execution"],
+    )
+
+
+def get_sweep(sweep_id, region):
+    """Returns the points of the sweep with their status and the curve of those with results."""
+    ddb = boto3.client("dynamodb", region_name=region)
+    s3 = boto3.client("s3", region_name=region)
+
+    sweep_entry = get_sweep_entry_from_db(ddb, sweep_id)
+    points = json.loads(sweep_entry["points"]["S"])
+
+    graph = TaskGraph(max_workers=SWEEP_MAX_WORKERS)
+    for point in points:
+        graph.add(point["test_id"], lambda point=point: get_test_entry_from_db(ddb, point["test_id"]))
+    entries = graph.run()
+
+    graph = TaskGraph(max_workers=SWEEP_MAX_WORKERS)
+    for point in points:
+        entry = entries[point["test_id"]]
+        point["status"] = entry.get("status", {}).get("S")
+        if "results_summary" in entry:
+            graph.add(point["test_id"], lambda key=entry["results_summary"]["S"]: load_results_summary(s3, key))
+    summaries = graph.run()
+
+    return {
+        "sweep_id": sweep_id,
+        "test_name": sweep_entry["test_name"]["S"],
+        "status": sweep_entry["status"]["S"],
+        "curve": build_curve(points, summaries),
+    }
+
+
+def get_trend(test_name, region, query):
+    """Reads the trend segments of the window concurrently and returns the downsampled series."""
+    s3 = boto3.client("s3", region_name=region)
+
+    graph = TaskGraph()
+    partitions = get_partitions(query["since"], query["until"])
+    for partition in partitions:
+        graph.add(partition, lambda key=get_segment_key(test_name, partition): load_trend_segment(s3, key))
+    graph.run()
+
+    segments = [graph.results[partition] for partition in partitions if graph.results[partition] is not None]
+    return build_trend(test_name, segments, query)
+
+
+def load_trend_segment(s3, key):
+    TEST_SCENARIOS_BUCKET = os.environ.get("TEST_SCENARIOS_BUCKET")
+    try:
+        return json.load(s3.get_object(Bucket=TEST_SCENARIOS_BUCKET, Key=key)["Body"])
+    except ClientError as error:
+        # No run of the test completed in that quarter.
+        if error.response["Error"]["Code"] == "NoSuchKey":
+            return None
+        raise
+
+
+def get_comparison_thresholds(params):
+    thresholds = {}
+    for name, value in params.items():
+        if name not in DEFAULT_THRESHOLDS:
+            raise InvalidParameterException(f"Unknown comparison threshold: {name}")
+        try:
+            thresholds[name] = float(value)
+        except ValueError:
+            raise InvalidParameterException(f"Comparison threshold {name} must be a number, got {value}")
+    return thresholds
+
+
+def compare_test_to_baseline(test_id, region, thresholds=None):
+    ddb = boto3.client("dynamodb", region_name=region)
+    s3 = boto3.client("s3", region_name=region)
+
+    test_entry = get_test_entry_from_db(ddb, test_id)
+    test_name = test_entry["test_name"]["S"]
+    baseline_test_id = get_baseline_test_id(ddb, test_name)
+    baseline_entry = get_test_entry_from_db(ddb, baseline_test_id)
+
+    summary_keys = {}
+    for entry_test_id, entry in ((test_id, test_entry), (baseline_test_id, baseline_entry)):
+        if "results_summary" not in entry:
+            raise ResultsNotReadyException(entry_test_id)
+        summary_keys[entry_test_id] = entry["results_summary"]["S"]
+
+    graph = TaskGraph()
+    graph.add("candidate", lambda: load_results_summary(s3, summary_keys[test_id]))
+    graph.add("baseline", lambda: load_results_summary(s3, summary_keys[baseline_test_id]))
+    graph.run()
+
+    return {
+        "test_id": test_id,
+        "test_name": test_name,
+        "baseline_test_id": baseline_test_id,
+        **compare_summaries(graph.results["baseline"], graph.results["candidate"], thresholds),
+    }
+
+
+def load_results_summary(s3, key):
+    TEST_SCENARIOS_BUCKET = os.environ.get("TEST_SCENARIOS_BUCKET")
+    return json.load(s3.get_object(Bucket=TEST_SCENARIOS_BUCKET, Key=key)["Body"])
+
+
+def get_baseline_key(test_name):
+    # Baselines share the tests table, keyed apart from the test ids.
+    return f"baseline#{test_name}"
+
+
+def get_baseline_test_id(dynamodb, test_name):
+    TESTS_TABLE = os.environ.get("TESTS_TABLE")
+    response = dynamodb.get_item(TableName=TESTS_TABLE, Key={"test_id": {"S": get_baseline_key(test_name)}})
+    if "Item" not in response:
+        raise UnknownBaselineException(test_name)
+    return response["Item"]["baseline_test_id"]["S"]
+
+
+def pin_baseline(dynamodb, test_name, test_id):
+    test_entry = get_test_entry_from_db(dynamodb, test_id)
+    if test_entry["test_name"]["S"] != test_name:
+        raise InvalidParameterException(f"Test {test_id} is not a run of {test_name}")
+    if "results_summary" not in test_entry:
+        raise ResultsNotReadyException(test_id)
+
+    TESTS_TABLE = os.environ.get("TESTS_TABLE")
+    pinned_at = datetime.now(timezone.utc).isoformat()
+    dynamodb.put_item(
+        TableName=TESTS_TABLE,
+        Item={
+            "test_id": {"S": get_baseline_key(test_name)},
+            "test_name": {"S": test_name},
+            "baseline_test_id": {"S": test_id},
+            "pinned_at": {"S": pinned_at},
+        },
+    )
+    return {"test_name": test_name, "baseline_test_id": test_id, "pinned_at": pinned_at}
+
+
+def upload_sweep_entry_to_db(dynamodb, sweep_id, test_name, priority, points, created_at):
+    TESTS_TABLE = os.environ.get("TESTS_TABLE")
+    dynamodb.put_item(
+        TableName=TESTS_TABLE,
+        Item={
+            "test_id": {"S": get_sweep_key(sweep_id)},
+            "sweep_id": {"S": sweep_id},
+            "test_name": {"S": test_name},
+            "status": {"S": "RUNNING"},
+            "priority": {"N": str(priority)},
+            "created_at": {"S": created_at},
+            "points": {"S": json.dumps(points)},
+        },
+    )
+
+
+def get_sweep_entry_from_db(dynamodb, sweep_id):
+    TESTS_TABLE = os.environ.get("TESTS_TABLE")
+    response = dynamodb.get_item(TableName=TESTS_TABLE, Key={"test_id": {"S": get_sweep_key(sweep_id)}})
+    if "Item" not in response:
+        raise UnknownSweepException(sweep_id)
+    return response["Item"]
+
+
+def queue_test_entry(dynamodb, test_id, queue_key):
+    """Marks a pending sweep point as queued, returns False if it was not pending anymore."""
+    TESTS_TABLE = os.environ.get("TESTS_TABLE")
+    try:
+        dynamodb.update_item(
+            TableName=TESTS_TABLE,
+            Key={"test_id": {"S": test_id}},
+            UpdateExpression="SET #status = :queued, queue_key = :queue_key",
+            ConditionExpression="#status = :pending",
+            ExpressionAttributeNames={"#status": "status"},
+            ExpressionAttributeValues={
+                ":queued": {"S": "QUEUED"},
+                ":pending": {"S": "PENDING"},
+                ":queue_key": {"S": queue_key},
+            },
+        )
+    except ClientError as e:
+        if is_conditional_check_failure(e):
+            return False
+        raise
+    return True
+
+
+def get_test_entry_from_db(dynamodb, test_id):
+    TESTS_TABLE = os.environ.get("TESTS_TABLE")
+    if TESTS_TABLE is None:
+        raise TableNotFoundInEnvironmentException()
+    response = dynamodb.get_item(TableName=TESTS_TABLE, Key={"test_id": {"S": test_id}})
+    if "Item" not in response:
+        raise UnknownTestException(test_id)
+    return response["Item"]
+
+
+def mark_test_entry_aborted(dynamodb, test_id):
+    """Marks the test aborted, returns False if it had ended already."""
+    TESTS_TABLE = os.environ.get("TESTS_TABLE")
+    terminal = {f":{status.lower()}": {"S": status} for status in TERMINAL_TEST_STATUSES}
+    try:
+        dynamodb.update_item(
+            TableName=TESTS_TABLE,
+            Key={"test_id": {"S": test_id}},
+            UpdateExpression="SET running = :running, #status = :status, aborted_at = :aborted_at",
+            ConditionExpression=f"attribute_not_exists(#status) OR NOT #status IN ({', '.join(terminal)})",
+            ExpressionAttributeNames={"#status": "status"},
+            ExpressionAttributeValues={
+                ":running": {"BOOL": False},
+                ":status": {"S": "ABORTED"},
+                ":aborted_at": {"S": datetime.now(timezone.utc).isoformat()},
+                **terminal,
+            },
+        )
+    except ClientError as e:
+        if is_conditional_check_failure(e):
+            return False
+        raise
+    return True
 
 
-def upload_test_entry_to_db(dynamodb, test_id, test_description, test_scenario, test_task_config):
+def set_test_entry_status(dynamodb, test_id, status, timestamp_attribute):
+    TESTS_TABLE = os.environ.get("TESTS_TABLE")
+    dynamodb.update_item(
+        TableName=TESTS_TABLE,
+        Key={"test_id": {"S": test_id}},
+        UpdateExpression=f"SET #status = :status, {timestamp_attribute} = :timestamp",
+        ExpressionAttributeNames={"#status": "status"},
+        ExpressionAttributeValues={
+            ":status": {"S": status},
+            ":timestamp": {"S": datetime.now(timezone.utc).isoformat()},
+        },
+    )
+
+
+def upload_test_entry_to_db(
+    dynamodb,
+    test_id,
+    test_description,
+    test_scenario,
+    test_task_config,
+    execution_arn=None,
+    queue_key=None,
+    sweep_id=None,
+):
     TESTS_TABLE = os.environ.get("TESTS_TABLE")
     if TESTS_TABLE is None:
         raise TableNotFoundInEnvironmentException()
-    dynamodb.put_item(TableName=TESTS_TABLE, Item={
+    item = {
         "test_id": {
             "S": test_id
         },
@@ -100,16 +1008,54 @@ def upload_test_entry_to_db(dynamodb, test_id, test_description, test_scenario,
         "running": {
             "BOOL": True
         }
-    })
+    }
+    if execution_arn is not None:
+        item["execution_arn"] = {"S": execution_arn}
+    if queue_key is not None:
+        item["status"] = {"S": "QUEUED"}
+        item["queue_key"] = {"S": queue_key}
+    if sweep_id is not None:
+        item["sweep_id"] = {"S": sweep_id}
+        # Points after the first are queued when the one before them ends.
+        item.setdefault("status", {"S": "PENDING"})
+    dynamodb.put_item(TableName=TESTS_TABLE, Item=item)
 
 
-def start_state_machine_execution(sfn, step_function_params):
-    prefix = "".join(reversed(datetime.now(timezone.utc).isoformat().replace("Z", "")))
+def delete_test_entry_from_db(dynamodb, test_id):
+    TESTS_TABLE = os.environ.get("TESTS_TABLE")
+    dynamodb.delete_item(TableName=TESTS_TABLE, Key={"test_id": {"S": test_id}})
+
+
+def start_state_machine_execution(sfn, step_function_params, execution_name=None):
     TAURUS_STATE_MACHINE_ARN = os.environ.get("TAURUS_STATE_MACHINE_ARN")
-    sfn.start_execution(
-        stateMachineArn=TAURUS_STATE_MACHINE_ARN,
-        input=json.dumps({**step_function_params, "prefix": prefix}),
-    )
+    params = {
+        "stateMachineArn": TAURUS_STATE_MACHINE_ARN,
+        "input": json.dumps(step_function_params),
+    }
+    if execution_name is not None:
+        params["name"] = execution_name
+    response = sfn.start_execution(**params)
+    return response["executionArn"]
+
+
+def get_execution_name(test_id):
+    # Execution names are limited to 80 characters out of [A-Za-z0-9-_].
+    safe_test_id = re.sub(r"[^A-Za-z0-9-_]", "-", test_id)[:47]
+    return f"{safe_test_id}-{uuid.uuid4().hex}"
+
+
+def get_execution_arn(execution_name):
+    TAURUS_STATE_MACHINE_ARN = os.environ.get("TAURUS_STATE_MACHINE_ARN", "")
+    return f"{TAURUS_STATE_MACHINE_ARN.replace(':stateMachine:', ':execution:')}:{execution_name}"
+
+
+def stop_state_machine_execution(sfn, execution_arn, cause="Test submission rolled back"):
+    try:
+        sfn.stop_execution(executionArn=execution_arn, cause=cause)
+    except ClientError as e:
+        # Nothing to stop, the execution was never started.
+        if e.response["Error"]["Code"] != "ExecutionDoesNotExist":
+            raise
 
 
 def get_test_duration_seconds(test_duration):
@@ -134,32 +1080,95 @@ def get_test_duration_seconds(test_duration):
         )
 
 
-def write_scenario_to_s3(s3, test_scenario, test_task_config, test_id):
+def write_scenario_to_s3(s3, test_scenario, test_task_config, test_id, runtime_profile=None):
     test_scenario["execution"][0]["task_count"] = int(test_task_config["task_count"])
     test_scenario["execution"][0]["concurrency"] = int(test_task_config["concurrency"])
+    if runtime_profile is not None:
+        # Sized to the task's CPU and memory by the tester container, see taurus-tester-image/runtime.py.
+        test_scenario = apply_runtime_profile(test_scenario, runtime_profile)
 
     TEST_SCENARIOS_BUCKET = os.environ.get("TEST_SCENARIOS_BUCKET")
-    AWS_TESTS_REGION = os.environ.get("AWS_TESTS_REGION", "us-east-1")
-    
+    SCENARIO_COMPRESSION = os.environ.get("SCENARIO_COMPRESSION")
+
+    if SCENARIO_COMPRESSION == "gzip":
+        with tempfile.SpooledTemporaryFile(max_size=SCENARIO_SPOOL_MAX_BYTES) as body:
+            write_compressed_scenario(body, test_scenario)
+            body.seek(0)
+            s3.upload_fileobj(
+                body,
+                TEST_SCENARIOS_BUCKET,
+                get_scenario_key(test_id),
+                ExtraArgs={"ContentType": "application/json", "ContentEncoding": "gzip"},
+            )
+        return
+
     s3.put_object(
         Body=json.dumps(test_scenario).encode(),
         Bucket=TEST_SCENARIOS_BUCKET,
-        Key=f"test-scenarios/{test_id}-{AWS_TESTS_REGION}.json",
+        Key=get_scenario_key(test_id),
     )
 
 
-def merge_region_infra_config_details(dynamodb, region: str, test_task_config):
+def write_compressed_scenario(fileobj, test_scenario):
+    # json.dump encodes chunk by chunk, so the whole document is never held as one string.
+    with gzip.GzipFile(fileobj=fileobj, mode="wb", mtime=0) as compressed:
+        with io.TextIOWrapper(compressed, encoding="utf-8") as text:
+            json.dump(test_scenario, text)
+
+
+def delete_scenario_from_s3(s3, test_id):
+    TEST_SCENARIOS_BUCKET = os.environ.get("TEST_SCENARIOS_BUCKET")
+    s3.delete_object(Bucket=TEST_SCENARIOS_BUCKET, Key=get_scenario_key(test_id))
+
+
+def get_scenario_key(test_id):
+    AWS_TESTS_REGION = os.environ.get("AWS_TESTS_REGION", "us-east-1")
+    return f"test-scenarios/{test_id}-{AWS_TESTS_REGION}.json"
+
+
+def get_script_key(test_id, optimized=False):
+    suffix = ".optimized.jmx" if optimized else ".jmx"
+    return f"public/test-scenarios/jmeter/{test_id}{suffix}"
+
+
+def get_script_report_key(test_id):
+    return f"public/test-scenarios/jmeter/{test_id}.jmx-report.json"
+
+
+def get_region_record(dynamodb, region: str):
     REGION_INFRA_TABLE = os.environ.get("REGION_INFRA_TABLE")
     response = dynamodb.get_item(
         TableName=REGION_INFRA_TABLE, Key={"region": {"S": region}}
     )
+    return response["Item"]
 
-    item = response["Item"]
 
-    test_task_config["subnet"] = item["subnet"]["S"]
+def merge_region_infra_config_details(dynamodb, region: str, test_task_config):
+    """Copies the region's infrastructure into the task config, returns the region record."""
+    item = get_region_record(dynamodb, region)
+
+    if "subnet" in item:
+        test_task_config["subnet"] = item["subnet"]["S"]
+    if "subnets" in item:
+        test_task_config["subnets"] = sorted(item["subnets"]["SS"])
+    # "private" when the subnets reach S3 and DynamoDB through the VPC's gateway endpoints.
+    if "network_mode" in item:
+        test_task_config["network_mode"] = item["network_mode"]["S"]
+    if "security_groups" in item:
+        test_task_config["security_groups"] = sorted(item["security_groups"]["SS"])
+    if "capacity_provider_strategy" in item:
+        test_task_config["capacity_provider_strategy"] = [
+            {
+                "capacityProvider": entry["M"]["capacity_provider"]["S"],
+                "weight": int(entry["M"].get("weight", {"N": "1"})["N"]),
+                "base": int(entry["M"].get("base", {"N": "0"})["N"]),
+            }
+            for entry in item["capacity_provider_strategy"]["L"]
+        ]
     test_task_config["cluster"] = item["cluster"]["S"]
     test_task_config["task_definition"] = item["task_definition"]["S"]
     test_task_config["container_name"] = item["task_container"]["S"]
+    return item
 
 
 class InvalidRegionException(Exception):
@@ -177,6 +1186,57 @@ class InvalidParameterException(Exception):
         super().__init__(message)
 
 
+class UnknownTestException(Exception):
+    def __init__(self, test_id, message="Test not found"):
+        self.test_id = test_id
+        self.message = f"{message}: {test_id}"
+        super().__init__(self.message)
+
+    def __str__(self):
+        return self.message
+
+
+class UnknownBaselineException(Exception):
+    def __init__(self, test_name, message="No baseline pinned for test"):
+        self.test_name = test_name
+        self.message = f"{message}: {test_name}"
+        super().__init__(self.message)
+
+    def __str__(self):
+        return self.message
+
+
+class UnknownSweepException(Exception):
+    def __init__(self, sweep_id, message="Sweep not found"):
+        self.sweep_id = sweep_id
+        self.message = f"{message}: {sweep_id}"
+        super().__init__(self.message)
+
+    def __str__(self):
+        return self.message
+
+
+class EndedTestException(Exception):
+    def __init__(self, test_id, status, message="Test has already ended"):
+        self.test_id = test_id
+        self.status = status
+        self.message = f"{message}: {test_id} is {status}"
+        super().__init__(self.message)
+
+    def __str__(self):
+        return self.message
+
+
+class ResultsNotReadyException(Exception):
+    def __init__(self, test_id, message="Results are not aggregated yet for test"):
+        self.test_id = test_id
+        self.message = f"{message}: {test_id}"
+        super().__init__(self.message)
+
+    def __str__(self):
+        return self.message
+
+
 class TableNotFoundInEnvironmentException(Exception):
     def __init__(self, message="not able to find TESTS_TABLE key in environment variables"):
         self.message = message
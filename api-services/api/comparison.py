@@ -0,0 +1,234 @@
+"""Compares the aggregated results of a run with a baseline run.
+
+Both summaries carry log-bucketed latency sketches, overall and per label,
+and a per-second timeline. The sketches of every label are laid out as the
+rows of one matrix over the union of their buckets so percentiles and the
+Mann-Whitney U test run for all labels at once.
+
+A label regresses when its gated percentile grew by more than the allowed
+percentage and the shift of its whole latency distribution is significant,
+or when its error rate grew by more than the allowed amount significantly.
+"""
+import math
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from run_results import get_requests_per_second
+
+OVERALL = "overall"
+PERCENTILES = (50, 90, 95, 99)
+
+DEFAULT_THRESHOLDS = {
+    # Percentile whose increase is gated.
+    "percentile": 95,
+    "max_latency_increase_percent": 10.0,
+    # Absolute increase of the error rate, 0.01 is one percentage point.
+    "max_error_rate_increase": 0.01,
+    "max_throughput_drop_percent": 10.0,
+    # One-sided significance level of every test.
+    "alpha": 0.05,
+    # Labels with fewer samples in either run are reported but not gated.
+    "min_rows": 30,
+}
+
+_erfc = np.vectorize(math.erfc, otypes=[float])
+
+
+def upper_tail(z: np.ndarray) -> np.ndarray:
+    """P(Z >= z) under the standard normal distribution."""
+    return 0.5 * _erfc(z / math.sqrt(2))
+
+
+def sketch_matrix(sketches: List[Dict[str, int]]):
+    """Returns the counts of the sketches as rows over their sorted common buckets."""
+    buckets = sorted({int(bucket) for sketch in sketches for bucket in sketch})
+    columns = {bucket: column for column, bucket in enumerate(buckets)}
+    counts = np.zeros((len(sketches), len(buckets)))
+    for row, sketch in enumerate(sketches):
+        for bucket, count in sketch.items():
+            counts[row, columns[int(bucket)]] = count
+    return counts, np.array(buckets)
+
+
+def sketch_percentiles(counts: np.ndarray, latencies: np.ndarray, percentiles=PERCENTILES) -> np.ndarray:
+    """Returns a (rows, percentiles) matrix of latencies, NaN for empty rows."""
+    cumulative = counts.cumsum(axis=1)
+    totals = cumulative[:, -1:] if counts.shape[1] else np.zeros((counts.shape[0], 1))
+    ranks = np.ceil(totals * np.array(percentiles) / 100)
+    positions = (cumulative[:, None, :] >= ranks[:, :, None]).argmax(axis=2)
+    values = latencies[positions] if len(latencies) else np.zeros(positions.shape)
+    return np.where(totals > 0, values, np.nan)
+
+
+def mann_whitney_greater(baseline: np.ndarray, candidate: np.ndarray) -> np.ndarray:
+    """One-sided p-values that the candidate's latencies are larger, row by row.
+
+    Samples sharing a bucket are ties; the normal approximation uses the tie
+    corrected variance of U.
+    """
+    n1, n2 = baseline.sum(axis=1), candidate.sum(axis=1)
+    n = n1 + n2
+    below = baseline.cumsum(axis=1) - baseline
+    u = (candidate * (below + baseline / 2)).sum(axis=1)
+
+    ties = baseline + candidate
+    tie_term = (ties ** 3 - ties).sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        variance = n1 * n2 / 12 * ((n + 1) - tie_term / (n * (n - 1)))
+        z = (u - n1 * n2 / 2) / np.sqrt(variance)
+    return np.where(variance > 0, upper_tail(np.nan_to_num(z)), np.nan)
+
+
+def proportion_increase(errors1: np.ndarray, rows1: np.ndarray, errors2: np.ndarray, rows2: np.ndarray) -> np.ndarray:
+    """One-sided p-values of a two-proportion z-test that the second rate is larger."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rate1, rate2 = errors1 / rows1, errors2 / rows2
+        pooled = (errors1 + errors2) / (rows1 + rows2)
+        standard_error = np.sqrt(pooled * (1 - pooled) * (1 / rows1 + 1 / rows2))
+        z = (rate2 - rate1) / standard_error
+    return np.where(standard_error > 0, upper_tail(np.nan_to_num(z)), np.nan)
+
+
+def throughput(timeline: List[Dict]) -> np.ndarray:
+    """Requests of every second the timeline spans, its mean is the run's throughput."""
+    return np.array(get_requests_per_second(timeline), dtype=float)
+
+
+def throughput_drop(baseline: np.ndarray, candidate: np.ndarray) -> Optional[float]:
+    """One-sided p-value of a Welch z-test that the candidate's mean rate is lower."""
+    if len(baseline) < 2 or len(candidate) < 2:
+        return None
+    standard_error = math.sqrt(baseline.var(ddof=1) / len(baseline) + candidate.var(ddof=1) / len(candidate))
+    if standard_error == 0:
+        return None
+    return float(upper_tail(np.array([(baseline.mean() - candidate.mean()) / standard_error]))[0])
+
+
+def to_number(value) -> Optional[float]:
+    value = float(value)
+    return None if math.isnan(value) else round(value, 6)
+
+
+def delta_percent(baseline, candidate) -> Optional[float]:
+    if baseline is None or candidate is None or baseline == 0:
+        return None
+    return round(100 * (candidate - baseline) / baseline, 2)
+
+
+def compare_summaries(baseline: Dict, candidate: Dict, thresholds: Optional[Dict] = None) -> Dict:
+    """Returns per-label deltas, their significance and a PASS/FAIL verdict."""
+    thresholds = {**DEFAULT_THRESHOLDS, **(thresholds or {})}
+    if baseline.get("latency_gamma") != candidate.get("latency_gamma"):
+        raise IncomparableSummariesException()
+
+    labels = sorted(set(baseline["labels"]) & set(candidate["labels"]))
+    names = [OVERALL] + labels
+    stats = [(baseline, candidate)] + [(baseline["labels"][name], candidate["labels"][name]) for name in labels]
+
+    counts, buckets = sketch_matrix(
+        [run["latency_buckets"] for run, _ in stats] + [run["latency_buckets"] for _, run in stats]
+    )
+    baseline_counts, candidate_counts = counts[:len(names)], counts[len(names):]
+    latencies = np.power(baseline["latency_gamma"], buckets.astype(float))
+
+    percentiles = sorted(set(PERCENTILES) | {int(thresholds["percentile"])})
+    gated = percentiles.index(int(thresholds["percentile"]))
+    baseline_percentiles = sketch_percentiles(baseline_counts, latencies, percentiles)
+    candidate_percentiles = sketch_percentiles(candidate_counts, latencies, percentiles)
+    latency_p_values = mann_whitney_greater(baseline_counts, candidate_counts)
+
+    baseline_rows = np.array([run["rows"] for run, _ in stats], dtype=float)
+    candidate_rows = np.array([run["rows"] for _, run in stats], dtype=float)
+    baseline_errors = np.array([run["errors"] for run, _ in stats], dtype=float)
+    candidate_errors = np.array([run["errors"] for _, run in stats], dtype=float)
+    error_p_values = proportion_increase(baseline_errors, baseline_rows, candidate_errors, candidate_rows)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        error_rate_deltas = candidate_errors / candidate_rows - baseline_errors / baseline_rows
+        baseline_gated, candidate_gated = baseline_percentiles[:, gated], candidate_percentiles[:, gated]
+        latency_increase = 100 * (candidate_gated - baseline_gated) / baseline_gated
+
+    gated_rows = np.minimum(baseline_rows, candidate_rows) >= thresholds["min_rows"]
+    latency_regressed = (
+        gated_rows
+        & (latency_increase > thresholds["max_latency_increase_percent"])
+        & (latency_p_values < thresholds["alpha"])
+    )
+    errors_regressed = (
+        gated_rows
+        & (error_rate_deltas > thresholds["max_error_rate_increase"])
+        & (error_p_values < thresholds["alpha"])
+    )
+
+    failures = []
+    results = []
+    for row, name in enumerate(names):
+        if latency_regressed[row]:
+            failures.append(
+                f"{name}: p{percentiles[gated]} latency +{latency_increase[row]:.1f}% "
+                f"(p={latency_p_values[row]:.4f})"
+            )
+        if errors_regressed[row]:
+            failures.append(
+                f"{name}: error rate +{100 * error_rate_deltas[row]:.2f} points (p={error_p_values[row]:.4f})"
+            )
+
+        results.append({
+            "rows": {"baseline": int(baseline_rows[row]), "candidate": int(candidate_rows[row])},
+            "latency_ms": {
+                f"p{percentile}": {
+                    "baseline": to_number(baseline_percentiles[row, column]),
+                    "candidate": to_number(candidate_percentiles[row, column]),
+                    "delta_percent": delta_percent(
+                        to_number(baseline_percentiles[row, column]), to_number(candidate_percentiles[row, column])
+                    ),
+                }
+                for column, percentile in enumerate(percentiles)
+            },
+            "latency_p_value": to_number(latency_p_values[row]),
+            "error_rate": {
+                "baseline": to_number(baseline_errors[row] / baseline_rows[row]) if baseline_rows[row] else None,
+                "candidate": to_number(candidate_errors[row] / candidate_rows[row]) if candidate_rows[row] else None,
+                "p_value": to_number(error_p_values[row]),
+            },
+            "gated": bool(gated_rows[row]),
+            "regressed": bool(latency_regressed[row] or errors_regressed[row]),
+        })
+
+    baseline_throughput, candidate_throughput = throughput(baseline["timeline"]), throughput(candidate["timeline"])
+    baseline_rps = float(baseline_throughput.mean()) if len(baseline_throughput) else None
+    candidate_rps = float(candidate_throughput.mean()) if len(candidate_throughput) else None
+    throughput_delta = delta_percent(baseline_rps, candidate_rps)
+    throughput_p_value = throughput_drop(baseline_throughput, candidate_throughput)
+    if (
+        throughput_delta is not None
+        and throughput_p_value is not None
+        and -throughput_delta > thresholds["max_throughput_drop_percent"]
+        and throughput_p_value < thresholds["alpha"]
+    ):
+        failures.append(f"throughput {throughput_delta:.1f}% (p={throughput_p_value:.4f})")
+
+    return {
+        "verdict": "FAIL" if failures else "PASS",
+        "failures": failures,
+        "thresholds": thresholds,
+        "overall": results[0],
+        "labels": dict(zip(labels, results[1:])),
+        "throughput": {
+            "baseline_rps": baseline_rps,
+            "candidate_rps": candidate_rps,
+            "delta_percent": throughput_delta,
+            "p_value": throughput_p_value,
+        },
+        "missing_labels": sorted(set(baseline["labels"]) - set(candidate["labels"])),
+        "new_labels": sorted(set(candidate["labels"]) - set(baseline["labels"])),
+    }
+
+
+class IncomparableSummariesException(Exception):
+    def __init__(self, message="Summaries were aggregated with different latency sketches"):
+        self.message = message
+        super().__init__(self.message)
+
+    def __str__(self):
+        return self.message
@@ -0,0 +1,112 @@
+"""Finds the elements of a JMeter test plan that throttle a load generator.
+
+Listeners that keep or render every sample, debug samplers and per-sample
+file writers are useful while a script is written in the JMeter GUI, but in a
+load test they cap a generator at a fraction of its capacity. Taurus records
+the results itself, so none of them are needed on the tasks.
+
+A test plan is a tree where every ``hashTree`` holds pairs of an element and
+the ``hashTree`` of its children. Findings can be reported only, disabled
+(JMeter then skips the element and its children) or stripped from the plan.
+"""
+import xml.etree.ElementTree as ET
+from typing import Dict, List, Optional, Tuple
+
+MODES = ("report", "disable", "strip")
+
+LISTENER = "listener"
+DEBUG = "debug"
+FILE_WRITER = "file_writer"
+
+# Elements by their tag, result collectors are told apart by their GUI class and file name below.
+ELEMENT_KINDS = {
+    "BeanShellListener": LISTENER,
+    "JSR223Listener": LISTENER,
+    "DebugSampler": DEBUG,
+    "DebugPostProcessor": DEBUG,
+    "ResultSaver": FILE_WRITER,
+}
+RESULT_COLLECTOR = "ResultCollector"
+
+REASONS = {
+    LISTENER: "processes every sample on the generator",
+    DEBUG: "adds a sample or dumps all variables on every iteration",
+    FILE_WRITER: "writes every sample to the task's disk",
+}
+
+
+def classify(element: ET.Element) -> Optional[str]:
+    if element.tag == RESULT_COLLECTOR:
+        filename = element.find("stringProp[@name='filename']")
+        if filename is not None and (filename.text or "").strip():
+            return FILE_WRITER
+        return LISTENER
+    return ELEMENT_KINDS.get(element.tag)
+
+
+def parse_plan(content: bytes) -> ET.Element:
+    parser = ET.XMLParser(target=ET.TreeBuilder(insert_comments=True))
+    try:
+        return ET.fromstring(content, parser=parser)
+    except ET.ParseError as e:
+        raise InvalidTestPlanException(f"Test plan is not valid XML: {e}")
+
+
+def optimize_plan(content: bytes, mode: str = "report") -> Tuple[Optional[bytes], Dict]:
+    """Returns the optimized plan, None in report mode or when nothing changed, and a report."""
+    if mode not in MODES:
+        raise InvalidTestPlanException(f"Unknown optimization mode {mode}, expected one of {', '.join(MODES)}")
+
+    root = parse_plan(content)
+    top = root.find("hashTree")
+    if root.tag != "jmeterTestPlan" or top is None:
+        raise InvalidTestPlanException("Test plan has no jmeterTestPlan root with a hashTree")
+
+    findings = []
+    visit(top, [], mode, findings)
+
+    changed = any(finding["action"] != "none" for finding in findings)
+    counts = {}
+    for finding in findings:
+        counts[finding["kind"]] = counts.get(finding["kind"], 0) + 1
+    report = {"mode": mode, "changed": changed, "counts": counts, "findings": findings}
+
+    if not changed:
+        return None, report
+    return ET.tostring(root, encoding="UTF-8", xml_declaration=True), report
+
+
+def visit(tree: ET.Element, path: List[str], mode: str, findings: List[Dict]) -> None:
+    children = [child for child in tree if child.tag is not ET.Comment]
+    # Elements are followed by the hashTree of their children.
+    for element, subtree in zip(children[::2], children[1::2]):
+        name = element.get("testname", element.tag)
+        kind = classify(element)
+        if kind is None:
+            visit(subtree, path + [name], mode, findings)
+            continue
+
+        enabled = element.get("enabled", "true") == "true"
+        action = "none"
+        if enabled and mode == "disable":
+            element.set("enabled", "false")
+            action = "disabled"
+        elif mode == "strip":
+            tree.remove(element)
+            tree.remove(subtree)
+            action = "stripped"
+
+        findings.append({
+            "kind": kind,
+            "element": element.get("guiclass", element.tag),
+            "testname": name,
+            "path": "/".join(path + [name]),
+            "enabled": enabled,
+            "reason": REASONS[kind],
+            "action": action,
+        })
+
+
+class InvalidTestPlanException(Exception):
+    def __init__(self, message):
+        super().__init__(message)
@@ -0,0 +1,65 @@
+"""JMeter runtime profiles the scenario of a test is written with.
+
+A profile holds the share of the task memory the JMeter heap gets, the
+garbage collector and the JMeter properties for connection reuse and result
+saving. The tester container sizes the heap and GC threads from the profile
+and the task's actual CPU and memory before bzt starts.
+"""
+import copy
+
+DEFAULT_RUNTIME_PROFILE = "balanced"
+
+# Connections are kept across iterations instead of being reopened by every thread on every loop.
+CONNECTION_REUSE = {
+    "httpclient.reset_state_on_thread_group_iteration": "false",
+    "httpclient4.time_to_live": "60000",
+    "httpclient4.validate_after_inactivity": "2000",
+    "https.use.cached.ssl.context": "true",
+}
+
+# Only what the KPI file needs, response bodies and headers stay out of the sample results.
+LEAN_RESULTS = {
+    "jmeter.save.saveservice.output_format": "csv",
+    "jmeter.save.saveservice.response_data": "false",
+    "jmeter.save.saveservice.response_data.on_error": "false",
+    "jmeter.save.saveservice.samplerData": "false",
+    "jmeter.save.saveservice.requestHeaders": "false",
+    "jmeter.save.saveservice.responseHeaders": "false",
+    "jmeter.save.saveservice.assertion_results_failure_message": "true",
+    "jmeter.save.saveservice.assertion_results": "none",
+}
+
+RUNTIME_PROFILES = {
+    "balanced": {
+        "heap_percent": 75,
+        "gc": "auto",
+        "properties": {**CONNECTION_REUSE, **LEAN_RESULTS},
+    },
+    "throughput": {
+        "heap_percent": 80,
+        "gc": "Parallel",
+        "properties": {
+            **CONNECTION_REUSE,
+            **LEAN_RESULTS,
+            "jmeter.save.saveservice.assertion_results_failure_message": "false",
+            "summariser.interval": "60",
+        },
+    },
+    "low-latency": {
+        "heap_percent": 70,
+        "gc": "G1",
+        "max_gc_pause_ms": 50,
+        "properties": {**CONNECTION_REUSE, **LEAN_RESULTS},
+    },
+    # Keeps JMeter's defaults apart from the heap, for investigating a script.
+    "debug": {
+        "heap_percent": 75,
+        "gc": "auto",
+        "properties": {"jmeter.save.saveservice.response_data.on_error": "true"},
+    },
+}
+
+
+def apply_runtime_profile(test_scenario, name):
+    """Returns a copy of the scenario with the named profile for the tester container to apply."""
+    return {**test_scenario, "runtime-profile": {"name": name, **copy.deepcopy(RUNTIME_PROFILES[name])}}
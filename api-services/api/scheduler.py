@@ -0,0 +1,166 @@
+"""Capacity-aware queue of tests waiting to be started.
+
+Queued tests live in the queue table under their region, sorted by a queue
+key made of the inverted priority, the enqueue time and the test id, so a
+query returns them highest priority first and in submission order within a
+priority.
+
+The capacity of a region is the ``max_tasks`` attribute of its record in the
+region infra table. Admitting a test reserves its task count from the
+record's ``available_tasks`` with a conditional update, and the reservation
+is given back when the test's execution ends. Regions without ``max_tasks``
+are not capacity limited.
+
+Admission is strictly in queue order: when the test at the head of the queue
+does not fit, nothing behind it is started either, so large tests are not
+starved by a stream of small ones.
+"""
+import logging
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+from botocore.exceptions import ClientError
+
+from capacity import is_conditional_check_failure, release_capacity
+
+logger = logging.getLogger()
+
+MAX_PRIORITY = 9999
+SCHEDULE_BATCH_SIZE = 25
+
+
+def get_queue_key(priority: int, enqueued_at: str, test_id: str) -> str:
+    return f"{MAX_PRIORITY - priority:04d}#{enqueued_at}#{test_id}"
+
+
+def get_max_tasks(region_record: Dict) -> Optional[int]:
+    return int(region_record["max_tasks"]["N"]) if "max_tasks" in region_record else None
+
+
+def enqueue_test(dynamodb, table: str, region: str, queue_key: str, test_id: str, task_count: int, execution: Dict):
+    """Queues a test; ``execution`` holds the name and input its execution is started with."""
+    dynamodb.put_item(
+        TableName=table,
+        Item={
+            "region": {"S": region},
+            "queue_key": {"S": queue_key},
+            "test_id": {"S": test_id},
+            "task_count": {"N": str(task_count)},
+            "execution_name": {"S": execution["name"]},
+            "execution_input": {"S": execution["input"]},
+            "enqueued_at": {"S": datetime.now(timezone.utc).isoformat()},
+        },
+    )
+
+
+def dequeue_test(dynamodb, table: str, region: str, queue_key: str) -> bool:
+    """Removes the test from the queue, returns False if it was not queued anymore."""
+    try:
+        dynamodb.delete_item(
+            TableName=table,
+            Key={"region": {"S": region}, "queue_key": {"S": queue_key}},
+            ConditionExpression="attribute_exists(test_id)",
+        )
+    except ClientError as e:
+        if is_conditional_check_failure(e):
+            return False
+        raise
+    return True
+
+
+def list_queued_tests(dynamodb, table: str, region: str, limit: int = SCHEDULE_BATCH_SIZE) -> List[Dict]:
+    response = dynamodb.query(
+        TableName=table,
+        KeyConditionExpression="#region = :region",
+        ExpressionAttributeNames={"#region": "region"},
+        ExpressionAttributeValues={":region": {"S": region}},
+        ConsistentRead=True,
+        Limit=limit,
+    )
+    return [
+        {
+            "queue_key": item["queue_key"]["S"],
+            "test_id": item["test_id"]["S"],
+            "task_count": int(item["task_count"]["N"]),
+            "execution": {"name": item["execution_name"]["S"], "input": item["execution_input"]["S"]},
+        }
+        for item in response.get("Items", [])
+    ]
+
+
+def reserve_capacity(dynamodb, table: str, region: str, task_count: int, max_tasks: Optional[int]) -> bool:
+    """Reserves task_count tasks of the region, returns False if they are not available."""
+    if max_tasks is None:
+        return True
+    try:
+        dynamodb.update_item(
+            TableName=table,
+            Key={"region": {"S": region}},
+            # The first reservation initialises the available tasks from the region's maximum.
+            UpdateExpression="SET available_tasks = if_not_exists(available_tasks, :max_tasks) - :count",
+            ConditionExpression="attribute_not_exists(available_tasks) OR available_tasks >= :count",
+            ExpressionAttributeValues={":max_tasks": {"N": str(max_tasks)}, ":count": {"N": str(task_count)}},
+        )
+    except ClientError as e:
+        if is_conditional_check_failure(e):
+            return False
+        raise
+    return True
+
+
+def schedule_tests(
+    dynamodb,
+    queue_table: str,
+    region_table: str,
+    region: str,
+    region_record: Dict,
+    start: Callable[[Dict, bool], None],
+    reject: Callable[[Dict], None],
+) -> List[str]:
+    """Starts queued tests for as long as the region has capacity, returns the started test ids.
+
+    ``start`` is called with the dequeued test and whether capacity was
+    reserved for it; if it fails the reservation is released and the test is
+    queued again. ``reject`` is called with tests that can never fit.
+    """
+    max_tasks = get_max_tasks(region_record)
+    started = []
+
+    for queued_test in list_queued_tests(dynamodb, queue_table, region):
+        if max_tasks is not None and queued_test["task_count"] > max_tasks:
+            if dequeue_test(dynamodb, queue_table, region, queued_test["queue_key"]):
+                logger.warning("Test %s needs more than the %d tasks of %s", queued_test["test_id"], max_tasks, region)
+                reject(queued_test)
+            continue
+
+        if not reserve_capacity(dynamodb, region_table, region, queued_test["task_count"], max_tasks):
+            logger.info("Not enough capacity in %s for test %s yet", region, queued_test["test_id"])
+            break
+
+        if not dequeue_test(dynamodb, queue_table, region, queued_test["queue_key"]):
+            # Another scheduler run admitted it meanwhile.
+            if max_tasks is not None:
+                release_capacity(dynamodb, region_table, region, queued_test["task_count"])
+            continue
+
+        try:
+            start(queued_test, max_tasks is not None)
+        except Exception:
+            logger.exception("Failed to start test %s, queueing it again", queued_test["test_id"])
+            if max_tasks is not None:
+                release_capacity(dynamodb, region_table, region, queued_test["task_count"])
+            enqueue_test(
+                dynamodb,
+                queue_table,
+                region,
+                queued_test["queue_key"],
+                queued_test["test_id"],
+                queued_test["task_count"],
+                queued_test["execution"],
+            )
+            break
+
+        logger.info("Started queued test %s", queued_test["test_id"])
+        started.append(queued_test["test_id"])
+
+    return started
@@ -0,0 +1,136 @@
+"""Parameter sweeps: one scenario run over a matrix of load settings.
+
+A sweep expands the matrix of ``concurrency``, ``task_count`` and variable
+values into points, the cartesian product in the order the values were
+given. Every point is a regular test; the points run one after another on
+the region's infrastructure, each queued when the previous one ends, so no
+two points share the cluster and skew each other's results.
+
+Once points have results, their summaries are reduced to a curve of
+throughput and latency against the offered load.
+"""
+import itertools
+from typing import Dict, List, Optional
+
+from run_results import get_throughput
+
+MAX_SWEEP_POINTS = 50
+CURVE_PERCENTILES = ("p50", "p90", "p95", "p99")
+
+# A point whose throughput grew by less than this share over the previous
+# point, while the load grew, is past the knee of the curve.
+KNEE_THROUGHPUT_GAIN = 0.05
+
+
+def get_sweep_key(sweep_id: str) -> str:
+    # Sweeps share the tests table, keyed apart from the test ids.
+    return f"sweep#{sweep_id}"
+
+
+def get_point_test_id(sweep_id: str, index: int) -> str:
+    return f"{sweep_id}-{index:03d}"
+
+
+def get_matrix_values(matrix: Dict, name: str, default) -> List:
+    values = matrix.get(name, [default])
+    if not isinstance(values, list) or not values:
+        raise InvalidSweepException(f"Sweep {name} must be a non-empty list, got {values}")
+    return values
+
+
+def positive_integers(values: List, name: str) -> List[int]:
+    try:
+        integers = [int(value) for value in values]
+    except (TypeError, ValueError):
+        raise InvalidSweepException(f"Sweep {name} values must be integers, got {values}")
+    if any(value < 1 for value in integers):
+        raise InvalidSweepException(f"Sweep {name} values must be positive, got {values}")
+    return integers
+
+
+def expand_sweep(matrix: Dict, test_task_config: Dict, variables: Optional[Dict] = None) -> List[Dict]:
+    """Returns the points of the matrix, defaulting to the values of the base test."""
+    concurrency = positive_integers(
+        get_matrix_values(matrix, "concurrency", test_task_config["concurrency"]), "concurrency"
+    )
+    task_count = positive_integers(
+        get_matrix_values(matrix, "task_count", test_task_config["task_count"]), "task_count"
+    )
+    matrix_variables = matrix.get("variables", {})
+    if not isinstance(matrix_variables, dict):
+        raise InvalidSweepException(f"Sweep variables must map names to lists of values, got {matrix_variables}")
+    names = sorted(matrix_variables)
+    variable_values = [get_matrix_values(matrix_variables, name, None) for name in names]
+
+    combinations = list(itertools.product(task_count, concurrency, *variable_values))
+    if len(combinations) > MAX_SWEEP_POINTS:
+        raise InvalidSweepException(f"Sweep has {len(combinations)} points, at most {MAX_SWEEP_POINTS} are allowed")
+
+    return [
+        {
+            "index": index,
+            "task_count": point_task_count,
+            "concurrency": point_concurrency,
+            "variables": {**(variables or {}), **dict(zip(names, values))},
+        }
+        for index, (point_task_count, point_concurrency, *values) in enumerate(combinations)
+    ]
+
+
+def build_curve(points: List[Dict], summaries: Dict[str, Dict]) -> Dict:
+    """Reduces the summaries of the points, keyed by test id, to a load/throughput/latency curve."""
+    curve_points = []
+    for point in points:
+        summary = summaries.get(point["test_id"])
+        curve_point = {
+            "test_id": point["test_id"],
+            "task_count": point["task_count"],
+            "concurrency": point["concurrency"],
+            "total_concurrency": point["task_count"] * point["concurrency"],
+            "variables": point["variables"],
+            "status": point.get("status"),
+            "throughput_rps": None,
+            "error_rate": None,
+            "latency_ms": None,
+        }
+        if summary is not None:
+            curve_point.update({
+                "throughput_rps": get_throughput(summary),
+                "error_rate": summary["error_rate"],
+                "latency_ms": {
+                    "mean": summary["latency_ms"]["mean"],
+                    **{percentile: summary["latency_ms"][percentile] for percentile in CURVE_PERCENTILES},
+                },
+            })
+        curve_points.append(curve_point)
+
+    measured = [point for point in curve_points if point["throughput_rps"] is not None]
+    peak = max(measured, key=lambda point: point["throughput_rps"], default=None)
+    return {
+        "points": curve_points,
+        "completed_points": len(measured),
+        "peak_throughput": (
+            {"test_id": peak["test_id"], "throughput_rps": peak["throughput_rps"]} if peak is not None else None
+        ),
+        "knee": find_knee(measured),
+    }
+
+
+def find_knee(measured: List[Dict]) -> Optional[Dict]:
+    """Returns the last point before throughput stops growing with the load."""
+    ordered = sorted(measured, key=lambda point: point["total_concurrency"])
+    for previous, point in zip(ordered, ordered[1:]):
+        if point["total_concurrency"] == previous["total_concurrency"] or not previous["throughput_rps"]:
+            continue
+        if point["throughput_rps"] < previous["throughput_rps"] * (1 + KNEE_THROUGHPUT_GAIN):
+            return {
+                "test_id": previous["test_id"],
+                "total_concurrency": previous["total_concurrency"],
+                "throughput_rps": previous["throughput_rps"],
+            }
+    return None
+
+
+class InvalidSweepException(Exception):
+    def __init__(self, message):
+        super().__init__(message)
@@ -0,0 +1,84 @@
+import logging
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, List, Optional
+
+
+logger = logging.getLogger()
+
+
+class TaskGraph:
+    """Runs a small set of dependent steps concurrently on a thread pool.
+
+    Every step starts as soon as the steps it depends on have finished. When a
+    step fails no new steps are started; once the running ones settle, the
+    rollback of every completed step is called in reverse completion order and
+    the original exception is raised.
+    """
+
+    def __init__(self, max_workers: int = 4):
+        self.max_workers = max_workers
+        self.results: Dict[str, object] = {}
+        self._steps: Dict[str, dict] = {}
+
+    def add(
+        self,
+        name: str,
+        action: Callable[[], object],
+        depends_on: Iterable[str] = (),
+        rollback: Optional[Callable[[], None]] = None,
+    ) -> "TaskGraph":
+        depends_on = tuple(depends_on)
+        for dependency in depends_on:
+            if dependency not in self._steps:
+                raise TaskGraphException(f"Unknown dependency '{dependency}' for step '{name}'")
+
+        self._steps[name] = {"action": action, "depends_on": depends_on, "rollback": rollback}
+        return self
+
+    def run(self) -> Dict[str, object]:
+        pending = dict(self._steps)
+        completed: List[str] = []
+        running = {}
+        failure = None
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                if failure is None:
+                    for name, step in list(pending.items()):
+                        if all(dependency in completed for dependency in step["depends_on"]):
+                            running[executor.submit(step["action"])] = name
+                            del pending[name]
+
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        self.results[name] = future.result()
+                        completed.append(name)
+                    except Exception as e:
+                        failure = failure or e
+
+        if failure is not None:
+            self._rollback(completed)
+            raise failure
+
+        return self.results
+
+    def _rollback(self, completed: List[str]) -> None:
+        for name in reversed(completed):
+            rollback = self._steps[name]["rollback"]
+            if rollback is None:
+                continue
+            try:
+                rollback()
+            except Exception:
+                # Keep undoing the remaining steps, the original failure is what gets raised.
+                logger.exception("Rollback of step '%s' failed", name)
+
+
+class TaskGraphException(Exception):
+    def __init__(self, message):
+        super().__init__(message)
@@ -0,0 +1,180 @@
+"""Trends of a test: its per-label results over many runs.
+
+The finalizer appends every run of a test to a columnar segment per quarter
+(see ``trend_store.py`` of the finalizer), so a chart over the last 90 days
+reads one or two segments instead of one summary per run. The segments of
+the requested window are merged here, the runs outside of it dropped, and
+the series downsampled to at most ``points`` points: consecutive runs are
+grouped, the rows and errors of a group summed and every percentile reported
+as the mean, min and max of its runs so spikes survive the downsampling.
+"""
+from datetime import datetime, time, timedelta, timezone
+from typing import Dict, List, Optional
+
+PERCENTILES = (50, 90, 95, 99)
+
+DEFAULT_TREND_DAYS = 90
+DEFAULT_MAX_POINTS = 200
+MAX_POINTS = 1000
+
+
+def get_partitions(since: datetime, until: datetime) -> List[str]:
+    """Returns the partitions of the window, oldest first."""
+    partitions, year, quarter = [], since.year, (since.month - 1) // 3
+    while (year, quarter) <= (until.year, (until.month - 1) // 3):
+        partitions.append(f"{year}-Q{quarter + 1}")
+        year, quarter = (year + 1, 0) if quarter == 3 else (year, quarter + 1)
+    return partitions
+
+
+def parse_day(value: str, name: str, end_of_day: bool = False) -> datetime:
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise InvalidTrendQueryException(f"Trend {name} must be an ISO 8601 date, got {value}")
+    if len(value) == 10 and end_of_day:
+        parsed = datetime.combine(parsed.date(), time.max)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def parse_list(value: Optional[str]) -> Optional[List[str]]:
+    if not value:
+        return None
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def positive_integer(value: str, name: str) -> int:
+    try:
+        integer = int(value)
+    except ValueError:
+        raise InvalidTrendQueryException(f"Trend {name} must be an integer, got {value}")
+    if integer < 1:
+        raise InvalidTrendQueryException(f"Trend {name} must be positive, got {value}")
+    return integer
+
+
+def get_trend_query(params: Dict, now: datetime) -> Dict:
+    """Validates the query string of a trend request and fills in the defaults."""
+    until = parse_day(params["until"], "until", end_of_day=True) if params.get("until") else now
+    since = parse_day(params["since"], "since") if params.get("since") else until - timedelta(days=DEFAULT_TREND_DAYS)
+    if since > until:
+        raise InvalidTrendQueryException(f"Trend since {since.isoformat()} is after until {until.isoformat()}")
+
+    percentiles = PERCENTILES
+    if params.get("percentiles"):
+        try:
+            percentiles = tuple(sorted({int(percentile) for percentile in parse_list(params["percentiles"])}))
+        except ValueError:
+            percentiles = ()
+        if not percentiles or not set(percentiles) <= set(PERCENTILES):
+            raise InvalidTrendQueryException(
+                f"Trend percentiles must be among {', '.join(map(str, PERCENTILES))}, got {params['percentiles']}"
+            )
+
+    points = positive_integer(params["points"], "points") if params.get("points") else DEFAULT_MAX_POINTS
+    return {
+        "since": since,
+        "until": until,
+        "labels": parse_list(params.get("labels")),
+        "percentiles": percentiles,
+        "last": positive_integer(params["last"], "last") if params.get("last") else None,
+        "points": min(points, MAX_POINTS),
+    }
+
+
+def column_rows(columns: Dict, index: int) -> Optional[Dict]:
+    row = {column: values[index] for column, values in columns.items()}
+    return row if row.get("rows") is not None else None
+
+
+def collect_runs(segments: List[Dict], query: Dict) -> List[Dict]:
+    """Returns the runs of the segments within the window, oldest first."""
+    runs = []
+    for segment in segments:
+        columns = segment["runs"]
+        labels = segment["labels"]
+        if query["labels"] is not None:
+            labels = {name: labels[name] for name in query["labels"] if name in labels}
+
+        for index, completed_at in enumerate(columns["completed_at"]):
+            if not query["since"] <= datetime.fromisoformat(completed_at) <= query["until"]:
+                continue
+            runs.append({
+                "test_id": columns["test_id"][index],
+                "completed_at": completed_at,
+                "overall": column_rows(segment["overall"], index),
+                "labels": {name: column_rows(label, index) for name, label in labels.items()},
+            })
+
+    runs.sort(key=lambda run: datetime.fromisoformat(run["completed_at"]))
+    return runs[-query["last"]:] if query["last"] else runs
+
+
+def group_runs(runs: List, max_points: int) -> List[List]:
+    """Splits the runs into at most ``max_points`` consecutive groups of nearly equal size."""
+    count = min(len(runs), max_points)
+    bounds = [round(point * len(runs) / count) for point in range(count + 1)]
+    return [runs[start:end] for start, end in zip(bounds, bounds[1:])]
+
+
+def reduce_rows(rows: List[Optional[Dict]], percentiles) -> Dict:
+    rows = [row for row in rows if row is not None]
+    total = sum(row["rows"] for row in rows)
+    reduced = {
+        "rows": total if rows else None,
+        "error_rate": round(sum(row["errors"] for row in rows) / total, 6) if total else None,
+    }
+    for percentile in percentiles:
+        values = [row[f"p{percentile}"] for row in rows if row.get(f"p{percentile}") is not None]
+        reduced[f"p{percentile}"] = {
+            "mean": round(sum(values) / len(values), 3) if values else None,
+            "min": min(values) if values else None,
+            "max": max(values) if values else None,
+        }
+    return reduced
+
+
+def series(points: List[Dict], percentiles) -> Dict:
+    """Turns the points of a label into one column per value."""
+    columns = {"rows": [point["rows"] for point in points], "error_rate": [point["error_rate"] for point in points]}
+    for percentile in percentiles:
+        name = f"p{percentile}"
+        columns[name] = {stat: [point[name][stat] for point in points] for stat in ("mean", "min", "max")}
+    return columns
+
+
+def build_trend(test_name: str, segments: List[Dict], query: Dict) -> Dict:
+    """Returns the downsampled series of the overall results and of every label."""
+    runs = collect_runs(segments, query)
+    groups = group_runs(runs, query["points"]) if runs else []
+    names = sorted({name for run in runs for name, row in run["labels"].items() if row is not None})
+    percentiles = query["percentiles"]
+
+    return {
+        "test_name": test_name,
+        "since": query["since"].isoformat(),
+        "until": query["until"].isoformat(),
+        "runs": len(runs),
+        "downsampled": len(groups) < len(runs),
+        "points": {
+            "from": [group[0]["completed_at"] for group in groups],
+            "to": [group[-1]["completed_at"] for group in groups],
+            "runs": [len(group) for group in groups],
+            # The run to drill down into, the last one of its group.
+            "last_test_id": [group[-1]["test_id"] for group in groups],
+        },
+        "overall": series(
+            [reduce_rows([run["overall"] for run in group], percentiles) for group in groups], percentiles
+        ),
+        "labels": {
+            name: series(
+                [reduce_rows([run["labels"].get(name) for run in group], percentiles) for group in groups], percentiles
+            )
+            for name in names
+        },
+    }
+
+
+class InvalidTrendQueryException(Exception):
+    def __init__(self, message):
+        super().__init__(message)
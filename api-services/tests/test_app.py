@@ -1,20 +1,46 @@
+import gzip
+import io
 import json
 import os
-from unittest.mock import patch, Mock
+from unittest.mock import ANY, patch, Mock
 from datetime import datetime, timezone
 
 import pytest
+from botocore.exceptions import ClientError
 from api.app import (
     lambda_handler,
     get_test_duration_seconds,
     handle_tests,
     start_state_machine_execution,
     write_scenario_to_s3,
+    write_compressed_scenario,
     merge_region_infra_config_details,
     upload_test_entry_to_db,
+    delete_scenario_from_s3,
+    delete_test_entry_from_db,
+    abort_test,
+    cancel_started_or_queued_test,
+    compare_test_to_baseline,
+    optimize_test_script,
+    pin_baseline,
+    get_comparison_thresholds,
+    get_deadline_grace_seconds,
+    get_execution_arn,
+    get_execution_name,
+    get_priority,
+    get_runtime_profile,
+    get_sla_criteria,
+    get_trend,
+    handle_scheduler_event,
+    release_test_capacity,
     InvalidParameterException,
     InvalidRegionException,
-    TableNotFoundInEnvironmentException
+    TableNotFoundInEnvironmentException,
+    EndedTestException,
+    ResultsNotReadyException,
+    UnknownBaselineException,
+    UnknownSweepException,
+    UnknownTestException
 )
 
 
@@ -51,13 +77,31 @@ def test_handle_tests_invalid_region():
             handle_tests(event)
 
 
+@patch("api.app.abort_test")
+def test_lambda_handler_calls_abort_test_on_delete(mock_abort_test):
+    mock_abort_test.return_value = {"test_id": "123", "status": "ABORTED"}
+    event = {"resource": "/test/{id}", "httpMethod": "DELETE", "pathParameters": {"id": "123"}}
+
+    response = lambda_handler(event, None)
+
+    mock_abort_test.assert_called_once_with("123", "us-east-1")
+    assert response == {"statusCode": 200, "body": {"test_id": "123", "status": "ABORTED"}}
+
+
+@patch("api.app.abort_test")
+def test_lambda_handler_returns_not_found_for_unknown_test(mock_abort_test):
+    mock_abort_test.side_effect = UnknownTestException("123")
+    event = {"resource": "/test/{id}", "httpMethod": "DELETE", "pathParameters": {"id": "123"}}
+
+    response = lambda_handler(event, None)
+
+    assert response["statusCode"] == 404
+    assert response["body"]["message"] == "Test not found: 123"
+
+
 @patch("api.app.boto3.client")
-@patch("api.app.datetime")
 @patch.dict(os.environ, {"TAURUS_STATE_MACHINE_ARN": "ARN"})
-def test_start_state_machine_execution(mock_datetime, mock_boto3_client):
-    mock_now = datetime(2023, 10, 12, 15, 30, 45, tzinfo=timezone.utc)
-    mock_datetime.now.return_value = mock_now
-
+def test_start_state_machine_execution(mock_boto3_client):
     sfn = mock_boto3_client.return_value
     step_function_params = {
         "test_task_config": {"concurrency": 5},
@@ -67,11 +111,9 @@ def test_start_state_machine_execution(mock_datetime, mock_boto3_client):
 
     start_state_machine_execution(sfn, step_function_params)
 
-    expected_prefix = "".join(reversed(mock_now.isoformat().replace("Z", "")))
-
     sfn.start_execution.assert_called_once_with(
         stateMachineArn=os.environ["TAURUS_STATE_MACHINE_ARN"],
-        input=json.dumps({**step_function_params, "prefix": expected_prefix}),
+        input=json.dumps(step_function_params),
     )
 
 
@@ -128,6 +170,60 @@ def test_merge_region_infra_config_details(mock_boto3_client):
     }
 
 
+@patch("api.app.boto3.client")
+def test_merge_region_infra_config_details_with_subnets_and_capacity_strategy(mock_boto3_client):
+    mock_ddb_client = mock_boto3_client.return_value
+    mock_ddb_client.get_item.return_value = {
+        "Item": {
+            "subnets": {"SS": ["subnet-b", "subnet-a"]},
+            "capacity_provider_strategy": {
+                "L": [
+                    {"M": {"capacity_provider": {"S": "FARGATE_SPOT"}, "weight": {"N": "3"}}},
+                    {"M": {"capacity_provider": {"S": "FARGATE"}, "weight": {"N": "1"}, "base": {"N": "2"}}},
+                ]
+            },
+            "cluster": {"S": "cluster-abc"},
+            "task_definition": {"S": "task-def-xyz"},
+            "task_container": {"S": "container-789"},
+        }
+    }
+
+    test_task_config = {}
+    merge_region_infra_config_details(mock_ddb_client, "us-east-1", test_task_config)
+
+    assert test_task_config == {
+        "subnets": ["subnet-a", "subnet-b"],
+        "capacity_provider_strategy": [
+            {"capacityProvider": "FARGATE_SPOT", "weight": 3, "base": 0},
+            {"capacityProvider": "FARGATE", "weight": 1, "base": 2},
+        ],
+        "cluster": "cluster-abc",
+        "task_definition": "task-def-xyz",
+        "container_name": "container-789",
+    }
+
+
+@patch("api.app.boto3.client")
+def test_merge_region_infra_config_details_with_private_network(mock_boto3_client):
+    mock_ddb_client = mock_boto3_client.return_value
+    mock_ddb_client.get_item.return_value = {
+        "Item": {
+            "subnets": {"SS": ["subnet-private-a"]},
+            "network_mode": {"S": "private"},
+            "security_groups": {"SS": ["sg-b", "sg-a"]},
+            "cluster": {"S": "cluster-abc"},
+            "task_definition": {"S": "task-def-xyz"},
+            "task_container": {"S": "container-789"},
+        }
+    }
+
+    test_task_config = {}
+    merge_region_infra_config_details(mock_ddb_client, "us-east-1", test_task_config)
+
+    assert test_task_config["network_mode"] == "private"
+    assert test_task_config["security_groups"] == ["sg-a", "sg-b"]
+
+
 @patch("api.app.start_state_machine_execution")
 @patch("api.app.boto3.client")
 def test_handle_tests_valid_post(mock_boto3_client, mock_start_state_machine_execution):
@@ -183,8 +279,311 @@ def test_handle_tests_valid_post(mock_boto3_client, mock_start_state_machine_exe
             },
             "test_id": "123",
             "duration": 600,
+            "deadline_grace_seconds": 902,
+            "test_name": "test_name",
+        },
+        ANY,
+    )
+
+
+def make_post_event(task_count=10, priority=None):
+    event = {
+        "httpMethod": "POST",
+        "test_id": "123",
+        "test_task_config": {"concurrency": 5, "task_count": task_count},
+        "test_scenario": {
+            "execution": [{"hold-for": "10m", "scenario": "test_name", "ramp-up": "2s"}],
+            "scenarios": {"test_name": {"script": "123.jmx"}},
         },
+        "test_description": "some_description",
+        "test_name": "test_name",
+    }
+    if priority is not None:
+        event["priority"] = priority
+    return event
+
+
+REGION_RECORD = {
+    "region": {"S": "us-east-1"},
+    "cluster": {"S": "cluster name"},
+    "task_definition": {"S": "task definition"},
+    "task_container": {"S": "task container"},
+    "max_tasks": {"N": "50"},
+}
+
+QUEUE_ENVIRONMENT = {
+    "TESTS_TABLE": "TestsTable",
+    "TEST_QUEUE_TABLE": "TestQueueTable",
+    "REGION_INFRA_TABLE": "RegionInfraTable",
+}
+
+
+@patch("api.app.start_state_machine_execution")
+@patch("api.app.boto3.client")
+@patch.dict(os.environ, QUEUE_ENVIRONMENT)
+def test_handle_tests_reserves_capacity_and_starts(mock_boto3_client, mock_start_state_machine_execution):
+    mock_client = mock_boto3_client.return_value
+    mock_client.get_item.return_value = {"Item": REGION_RECORD}
+    mock_client.query.return_value = {"Items": []}
+
+    result = handle_tests(make_post_event())
+
+    assert result == {"test_id": "123", "status": "STARTED"}
+    reservation = mock_client.update_item.call_args_list[0].kwargs
+    assert reservation["TableName"] == "RegionInfraTable"
+    assert reservation["ExpressionAttributeValues"][":count"] == {"N": "10"}
+    step_function_params = mock_start_state_machine_execution.call_args.args[1]
+    assert step_function_params["test_task_config"]["reserved_tasks"] == 10
+    status = mock_client.update_item.call_args.kwargs
+    assert status["ExpressionAttributeValues"][":status"] == {"S": "STARTED"}
+    mock_client.put_item.assert_called_once()
+
+
+@patch("api.app.start_state_machine_execution")
+@patch("api.app.boto3.client")
+@patch.dict(os.environ, QUEUE_ENVIRONMENT)
+def test_handle_tests_queues_behind_queued_tests(mock_boto3_client, mock_start_state_machine_execution):
+    mock_client = mock_boto3_client.return_value
+    mock_client.get_item.return_value = {"Item": REGION_RECORD}
+    mock_client.query.return_value = {
+        "Items": [{
+            "queue_key": {"S": "9999#2024-01-01T00:00:00#001"},
+            "test_id": {"S": "001"},
+            "task_count": {"N": "40"},
+            "execution_name": {"S": "name"},
+            "execution_input": {"S": "{}"},
+        }]
+    }
+
+    result = handle_tests(make_post_event(priority=3))
+
+    assert result == {"test_id": "123", "status": "QUEUED"}
+    mock_start_state_machine_execution.assert_not_called()
+    mock_client.update_item.assert_not_called()
+    tables = {call.kwargs["TableName"]: call.kwargs["Item"] for call in mock_client.put_item.call_args_list}
+    assert tables["TestsTable"]["status"] == {"S": "QUEUED"}
+    assert tables["TestQueueTable"]["queue_key"] == tables["TestsTable"]["queue_key"]
+    assert tables["TestQueueTable"]["queue_key"]["S"].startswith("9996#")
+    assert json.loads(tables["TestQueueTable"]["execution_input"]["S"])["test_id"] == "123"
+
+
+@patch("api.app.start_state_machine_execution")
+@patch("api.app.boto3.client")
+@patch.dict(os.environ, QUEUE_ENVIRONMENT)
+def test_handle_tests_stops_started_execution_on_rollback(mock_boto3_client, mock_start_state_machine_execution):
+    mock_client = mock_boto3_client.return_value
+    mock_client.get_item.return_value = {"Item": REGION_RECORD}
+    mock_client.query.return_value = {"Items": []}
+    # The reservation succeeds, marking the started test fails.
+    mock_client.update_item.side_effect = [{}, RuntimeError("throttled"), {}, {}]
+
+    with pytest.raises(RuntimeError):
+        handle_tests(make_post_event())
+
+    mock_start_state_machine_execution.assert_called_once()
+    assert mock_client.stop_execution.call_args.kwargs["executionArn"].endswith(
+        mock_start_state_machine_execution.call_args.args[2]
     )
+    claim, release = (call.kwargs for call in mock_client.update_item.call_args_list[2:])
+    assert claim["UpdateExpression"] == "SET capacity_released = :released"
+    assert release["TableName"] == "RegionInfraTable"
+    mock_client.delete_object.assert_called_once()
+
+
+@patch("api.app.boto3.client")
+@patch.dict(os.environ, QUEUE_ENVIRONMENT)
+def test_cancel_started_or_queued_test(mock_boto3_client):
+    mock_client = mock_boto3_client.return_value
+
+    cancel_started_or_queued_test(mock_client, mock_client, "us-east-1", "9999#t#123", "123", "name", "QUEUED")
+
+    assert mock_client.delete_item.call_args.kwargs["Key"] == {
+        "region": {"S": "us-east-1"}, "queue_key": {"S": "9999#t#123"}
+    }
+    mock_client.stop_execution.assert_not_called()
+
+    cancel_started_or_queued_test(mock_client, mock_client, "us-east-1", "9999#t#123", "123", "name", "STARTED")
+
+    assert mock_client.stop_execution.call_args.kwargs["executionArn"].endswith(":name")
+    assert mock_client.update_item.call_args.kwargs["Key"] == {"test_id": {"S": "123"}}
+
+
+@patch("api.app.boto3.client")
+@patch.dict(os.environ, QUEUE_ENVIRONMENT)
+def test_handle_tests_rejects_tests_larger_than_the_region(mock_boto3_client):
+    mock_client = mock_boto3_client.return_value
+    mock_client.get_item.return_value = {"Item": REGION_RECORD}
+    mock_client.query.return_value = {"Items": []}
+
+    with pytest.raises(InvalidParameterException):
+        handle_tests(make_post_event(task_count=51))
+
+    mock_client.delete_object.assert_called_once()
+    mock_client.delete_item.assert_called_once()
+
+
+@pytest.mark.parametrize("priority", [-1, 10000, "high"])
+def test_get_priority_out_of_range(priority):
+    with pytest.raises(InvalidParameterException):
+        get_priority({"priority": priority})
+
+
+def test_get_priority_defaults_to_lowest():
+    assert get_priority({}) == 0
+
+
+def test_get_deadline_grace_seconds_adds_ramp_up():
+    scenario = {"execution": [{"hold-for": "10m", "ramp-up": "2m"}]}
+
+    assert get_deadline_grace_seconds({}, scenario) == 900 + 120
+    assert get_deadline_grace_seconds({"deadline_grace_seconds": "60"}, {"execution": [{"hold-for": "1m"}]}) == 60
+    with pytest.raises(InvalidParameterException):
+        get_deadline_grace_seconds({"deadline_grace_seconds": -1}, scenario)
+
+
+def test_get_sla_criteria_applies_defaults():
+    assert get_sla_criteria({}) is None
+    assert get_sla_criteria({"sla": {"max_error_rate": "0.05", "window_seconds": 300}}) == {
+        "interval_seconds": 60,
+        "window_seconds": 300,
+        "grace_seconds": 120,
+        "max_error_rate": 0.05,
+        "max_p99_ms": None,
+        "min_throughput_rps": None,
+    }
+
+
+@pytest.mark.parametrize(
+    "sla",
+    [
+        {"interval_seconds": 30},
+        {"max_error_rate": "often"},
+        {"max_p99_ms": -1},
+        {"max_p99_ms": 500, "window_seconds": 90},
+        {"max_p99_ms": 500, "interval_seconds": 0},
+        {"max_p99": 500},
+    ],
+)
+def test_get_sla_criteria_rejects_invalid_criteria(sla):
+    with pytest.raises(InvalidParameterException):
+        get_sla_criteria({"sla": sla})
+
+
+@patch("api.app.start_state_machine_execution")
+@patch("api.app.boto3.client")
+@patch.dict(os.environ, QUEUE_ENVIRONMENT)
+def test_handle_tests_passes_sla_to_execution(mock_boto3_client, mock_start_state_machine_execution):
+    mock_client = mock_boto3_client.return_value
+    mock_client.get_item.return_value = {"Item": REGION_RECORD}
+    mock_client.query.return_value = {"Items": []}
+
+    handle_tests({**make_post_event(), "sla": {"max_p99_ms": 1500}})
+
+    step_function_params = mock_start_state_machine_execution.call_args.args[1]
+    assert step_function_params["sla"]["max_p99_ms"] == 1500.0
+    assert step_function_params["sla"]["interval_seconds"] == 60
+
+
+def test_get_runtime_profile():
+    assert get_runtime_profile({}) == "balanced"
+    assert get_runtime_profile({"runtime_profile": "throughput"}) == "throughput"
+    with pytest.raises(InvalidParameterException):
+        get_runtime_profile({"runtime_profile": "turbo"})
+
+
+def test_write_scenario_to_s3_with_runtime_profile():
+    mock_s3 = Mock()
+    test_scenario = {"execution": [{"hold-for": "10m"}]}
+
+    with patch.dict(os.environ, {"TEST_SCENARIOS_BUCKET": "test_bucket"}):
+        write_scenario_to_s3(mock_s3, test_scenario, {"concurrency": 5, "task_count": 10}, "123", "throughput")
+
+    stored = json.loads(mock_s3.put_object.call_args.kwargs["Body"])
+    assert stored["runtime-profile"]["name"] == "throughput"
+    assert stored["runtime-profile"]["properties"]["httpclient.reset_state_on_thread_group_iteration"] == "false"
+    # The scenario kept in the test record is left as submitted.
+    assert "runtime-profile" not in test_scenario
+
+
+def make_status_change(status, reserved_tasks=10):
+    test_task_config = {"task_count": 10}
+    if reserved_tasks is not None:
+        test_task_config["reserved_tasks"] = reserved_tasks
+    return {
+        "status": status,
+        "input": json.dumps({"test_id": "123", "test_task_config": test_task_config}),
+    }
+
+
+@patch.dict(os.environ, QUEUE_ENVIRONMENT)
+def test_release_test_capacity():
+    mock_dynamodb = Mock()
+
+    release_test_capacity(mock_dynamodb, "us-east-1", make_status_change("SUCCEEDED"))
+
+    flag, release = [call.kwargs for call in mock_dynamodb.update_item.call_args_list]
+    assert flag["TableName"] == "TestsTable"
+    assert flag["ConditionExpression"] == "attribute_exists(test_id) AND attribute_not_exists(capacity_released)"
+    assert release["TableName"] == "RegionInfraTable"
+    assert release["ExpressionAttributeValues"] == {":count": {"N": "10"}}
+
+
+@patch.dict(os.environ, QUEUE_ENVIRONMENT)
+def test_release_test_capacity_only_once():
+    mock_dynamodb = Mock()
+    mock_dynamodb.update_item.side_effect = ClientError(
+        {"Error": {"Code": "ConditionalCheckFailedException", "Message": ""}}, "UpdateItem"
+    )
+
+    release_test_capacity(mock_dynamodb, "us-east-1", make_status_change("FAILED"))
+
+    assert mock_dynamodb.update_item.call_count == 1
+
+
+@pytest.mark.parametrize("detail", [make_status_change("RUNNING"), make_status_change("ABORTED", None)])
+def test_release_test_capacity_ignores_running_and_unreserved_executions(detail):
+    mock_dynamodb = Mock()
+
+    release_test_capacity(mock_dynamodb, "us-east-1", detail)
+
+    mock_dynamodb.update_item.assert_not_called()
+
+
+@patch("api.app.schedule_tests")
+@patch("api.app.release_test_capacity")
+@patch("api.app.boto3.client")
+@patch.dict(os.environ, QUEUE_ENVIRONMENT)
+def test_lambda_handler_schedules_on_execution_status_change(
+    mock_boto3_client, mock_release_test_capacity, mock_schedule_tests
+):
+    mock_client = mock_boto3_client.return_value
+    mock_client.get_item.return_value = {"Item": REGION_RECORD}
+    mock_schedule_tests.return_value = ["456"]
+    event = {
+        "source": "aws.states",
+        "detail-type": "Step Functions Execution Status Change",
+        "detail": make_status_change("SUCCEEDED"),
+    }
+
+    result = lambda_handler(event, None)
+
+    mock_release_test_capacity.assert_called_once_with(mock_client, "us-east-1", event["detail"])
+    assert mock_schedule_tests.call_args.args[:5] == (
+        mock_client, "TestQueueTable", "RegionInfraTable", "us-east-1", REGION_RECORD
+    )
+    assert result == {"started": ["456"]}
+
+
+@patch("api.app.release_test_capacity")
+@patch("api.app.boto3.client")
+@patch.dict(os.environ, QUEUE_ENVIRONMENT)
+def test_handle_scheduler_event_on_schedule_only_schedules(mock_boto3_client, mock_release_test_capacity):
+    mock_client = mock_boto3_client.return_value
+    mock_client.get_item.return_value = {"Item": REGION_RECORD}
+    mock_client.query.return_value = {"Items": []}
+
+    assert handle_scheduler_event({"source": "aws.events", "detail-type": "Scheduled Event"}) == {"started": []}
+    mock_release_test_capacity.assert_not_called()
 
 
 @patch("api.app.upload_test_entry_to_db")
@@ -272,6 +671,8 @@ def test_create_test_uploads_test_information_to_db(
         "some_description",
         expected_test_scenario,
         expected_task_test_config,
+        execution_arn=ANY,
+        queue_key=ANY,
     )
 
 
@@ -429,3 +830,567 @@ def test_write_scenario_to_s3_takes_default_region(mock_boto3_client):
             Bucket="test_bucket",
             Key="test-scenarios/123-us-east-1.json",
         )
+
+
+@patch("api.app.boto3.client")
+def test_handle_tests_rolls_back_when_execution_fails(mock_boto3_client):
+    event = {
+        "httpMethod": "POST",
+        "test_id": "123",
+        "test_task_config": {"concurrency": 5, "task_count": 10},
+        "test_scenario": {
+            "execution": [
+                {
+                    "hold-for": "10m",
+                    "scenario": "test_name",
+                    "ramp-up": "2s",
+                }
+            ],
+            "scenarios": {
+                "test_name": {
+                    "script": "123.jmx"
+                }
+            }
+        },
+        "test_description": "some_description",
+        "test_name": "test_name"
+    }
+
+    mock_client = mock_boto3_client.return_value
+    mock_client.get_item.return_value = {
+        "Item": {
+            "subnet": {"S": "subnet id"},
+            "cluster": {"S": "cluster name"},
+            "task_definition": {"S": "task definition"},
+            "task_container": {"S": "task container"},
+        }
+    }
+    mock_client.start_execution.side_effect = RuntimeError("execution limit exceeded")
+
+    with patch.dict(os.environ, {"TESTS_TABLE": "TESTS_TABLE", "TEST_SCENARIOS_BUCKET": "test_bucket"}):
+        with pytest.raises(RuntimeError):
+            handle_tests(event)
+
+    mock_client.delete_object.assert_called_once_with(
+        Bucket="test_bucket", Key="test-scenarios/123-us-east-1.json"
+    )
+    mock_client.delete_item.assert_called_once_with(
+        TableName="TESTS_TABLE", Key={"test_id": {"S": "123"}}
+    )
+    mock_client.stop_execution.assert_not_called()
+
+
+@patch("api.app.boto3.client")
+def test_delete_scenario_from_s3(mock_boto3_client):
+    s3 = mock_boto3_client.return_value
+
+    with patch.dict(os.environ, {"TEST_SCENARIOS_BUCKET": "test_bucket", "AWS_TESTS_REGION": "us-east-1"}):
+        delete_scenario_from_s3(s3, "123")
+
+    s3.delete_object.assert_called_once_with(
+        Bucket="test_bucket", Key="test-scenarios/123-us-east-1.json"
+    )
+
+
+@patch("api.app.boto3.client")
+def test_delete_test_entry_from_db(mock_boto3_client):
+    dynamodb = mock_boto3_client.return_value
+
+    with patch.dict(os.environ, {"TESTS_TABLE": "TESTS_TABLE"}):
+        delete_test_entry_from_db(dynamodb, "123")
+
+    dynamodb.delete_item.assert_called_once_with(
+        TableName="TESTS_TABLE", Key={"test_id": {"S": "123"}}
+    )
+
+
+@patch("api.app.boto3.client")
+def test_write_scenario_to_s3_with_gzip_compression(mock_boto3_client):
+    s3 = mock_boto3_client.return_value
+    uploaded = {}
+    s3.upload_fileobj.side_effect = lambda body, *_, **__: uploaded.update(body=body.read())
+
+    test_scenario = {"execution": [{"hold-for": "10m"}]}
+    test_task_config = {"concurrency": 5, "task_count": 10}
+
+    with patch.dict(
+        os.environ,
+        {"TEST_SCENARIOS_BUCKET": "test_bucket", "SCENARIO_COMPRESSION": "gzip"},
+    ):
+        write_scenario_to_s3(s3, test_scenario, test_task_config, "123")
+
+    s3.put_object.assert_not_called()
+    _, bucket, key = s3.upload_fileobj.call_args.args
+    assert bucket == "test_bucket"
+    assert key == "test-scenarios/123-us-east-1.json"
+    assert s3.upload_fileobj.call_args.kwargs["ExtraArgs"] == {
+        "ContentType": "application/json",
+        "ContentEncoding": "gzip",
+    }
+    assert json.loads(gzip.decompress(uploaded["body"])) == {
+        "execution": [{"hold-for": "10m", "task_count": 10, "concurrency": 5}]
+    }
+
+
+def test_write_compressed_scenario_round_trips_large_scenarios():
+    test_scenario = {
+        "scenarios": {
+            "test_name": {
+                "requests": [{"url": f"https://example.com/items/{i}", "body": "x" * 100} for i in range(5000)]
+            }
+        }
+    }
+    body = io.BytesIO()
+
+    write_compressed_scenario(body, test_scenario)
+
+    assert json.loads(gzip.decompress(body.getvalue())) == test_scenario
+    assert len(body.getvalue()) < len(json.dumps(test_scenario)) / 10
+
+
+@patch("api.app.boto3.client")
+@patch.dict(os.environ, {"TAURUS_STATE_MACHINE_ARN": "ARN"})
+def test_start_state_machine_execution_with_name(mock_boto3_client):
+    sfn = mock_boto3_client.return_value
+    sfn.start_execution.return_value = {"executionArn": "execution ARN"}
+
+    execution_arn = start_state_machine_execution(sfn, {"test_id": "123"}, "123-abc")
+
+    assert execution_arn == "execution ARN"
+    assert sfn.start_execution.call_args.kwargs["name"] == "123-abc"
+
+
+def test_get_execution_name_is_unique_and_valid():
+    first, second = get_execution_name("my test/42"), get_execution_name("my test/42")
+
+    assert first != second
+    assert first.startswith("my-test-42-")
+    assert len(get_execution_name("x" * 200)) <= 80
+
+
+@patch.dict(
+    os.environ,
+    {"TAURUS_STATE_MACHINE_ARN": "arn:aws:states:us-east-1:123456789012:stateMachine:TaurusStateMachine"},
+)
+def test_get_execution_arn():
+    assert get_execution_arn("123-abc") == (
+        "arn:aws:states:us-east-1:123456789012:execution:TaurusStateMachine:123-abc"
+    )
+
+
+@patch("api.app.boto3.client")
+def test_upload_test_entry_to_db_with_execution_arn(mock_boto3_client):
+    mock_dynamodb = mock_boto3_client.return_value
+    test_scenario = {
+        "execution": [{"scenario": "scenario1", "hold-for": "10m", "ramp-up": "5m"}]
+    }
+    test_task_config = {"task_count": "10", "concurrency": "5"}
+
+    with patch.dict(os.environ, {"TESTS_TABLE": "TESTS_TABLE"}):
+        upload_test_entry_to_db(
+            mock_dynamodb, "test123", "Test Description", test_scenario, test_task_config,
+            execution_arn="execution ARN"
+        )
+
+    item = mock_dynamodb.put_item.call_args.kwargs["Item"]
+    assert item["execution_arn"] == {"S": "execution ARN"}
+
+
+@patch("api.app.stop_tasks")
+@patch("api.app.list_running_test_task_arns")
+@patch("api.app.boto3.client")
+def test_abort_test(mock_boto3_client, mock_list_running_test_task_arns, mock_stop_tasks):
+    mock_client = mock_boto3_client.return_value
+    mock_client.get_item.side_effect = [
+        {"Item": {"test_id": {"S": "123"}, "execution_arn": {"S": "execution ARN"}}},
+        {
+            "Item": {
+                "subnet": {"S": "subnet id"},
+                "cluster": {"S": "cluster name"},
+                "task_definition": {"S": "task definition"},
+                "task_container": {"S": "task container"},
+            }
+        },
+    ]
+    mock_list_running_test_task_arns.return_value = ["task-1", "task-2", "task-3"]
+    mock_stop_tasks.return_value = ["task-3"]
+
+    with patch.dict(os.environ, {"TESTS_TABLE": "TESTS_TABLE"}):
+        result = abort_test("123", "us-east-1")
+
+    mock_client.stop_execution.assert_called_once_with(
+        executionArn="execution ARN", cause="Test 123 aborted"
+    )
+    mock_list_running_test_task_arns.assert_called_once_with(mock_client, "cluster name", "123")
+    mock_stop_tasks.assert_called_once_with(
+        mock_client, "cluster name", ["task-1", "task-2", "task-3"], "Test 123 aborted"
+    )
+    update = mock_client.update_item.call_args.kwargs
+    assert update["Key"] == {"test_id": {"S": "123"}}
+    assert update["ExpressionAttributeValues"][":status"] == {"S": "ABORTED"}
+    assert update["ExpressionAttributeValues"][":running"] == {"BOOL": False}
+    assert result == {
+        "test_id": "123",
+        "status": "ABORTED",
+        "stopped_tasks": 2,
+        "failed_tasks": ["task-3"],
+    }
+
+
+@patch("api.app.abort_test")
+def test_lambda_handler_returns_conflict_for_ended_test(mock_abort_test):
+    mock_abort_test.side_effect = EndedTestException("123", "COMPLETED")
+    event = {"resource": "/test/{id}", "httpMethod": "DELETE", "pathParameters": {"id": "123"}}
+
+    response = lambda_handler(event, None)
+
+    assert response["statusCode"] == 409
+    assert response["body"]["message"] == "Test has already ended: 123 is COMPLETED"
+
+
+@pytest.mark.parametrize("status", ["COMPLETED", "FAILED", "ABORTED"])
+@patch("api.app.boto3.client")
+def test_abort_ended_test(mock_boto3_client, status):
+    mock_client = mock_boto3_client.return_value
+    mock_client.get_item.return_value = {
+        "Item": {"test_id": {"S": "123"}, "status": {"S": status}, "execution_arn": {"S": "execution ARN"}}
+    }
+
+    with patch.dict(os.environ, {"TESTS_TABLE": "TESTS_TABLE"}):
+        with pytest.raises(EndedTestException):
+            abort_test("123", "us-east-1")
+
+    mock_client.stop_execution.assert_not_called()
+    mock_client.update_item.assert_not_called()
+
+
+@patch("api.app.list_running_test_task_arns")
+@patch("api.app.boto3.client")
+def test_abort_pending_sweep_point(mock_boto3_client, mock_list_running_test_task_arns):
+    mock_client = mock_boto3_client.return_value
+    mock_client.get_item.return_value = {"Item": {"test_id": {"S": "123"}, "status": {"S": "PENDING"}}}
+
+    with patch.dict(os.environ, {"TESTS_TABLE": "TESTS_TABLE"}):
+        result = abort_test("123", "us-east-1")
+
+    mock_client.stop_execution.assert_not_called()
+    mock_list_running_test_task_arns.assert_not_called()
+    update = mock_client.update_item.call_args.kwargs
+    assert "NOT #status IN" in update["ConditionExpression"]
+    assert update["ExpressionAttributeValues"][":completed"] == {"S": "COMPLETED"}
+    assert result == {"test_id": "123", "status": "ABORTED", "stopped_tasks": 0, "failed_tasks": []}
+
+
+REGION_INFRA_ITEM = {
+    "Item": {
+        "cluster": {"S": "cluster name"},
+        "task_definition": {"S": "task definition"},
+        "task_container": {"S": "task container"},
+    }
+}
+
+
+@patch("api.app.stop_tasks")
+@patch("api.app.list_running_test_task_arns")
+@patch("api.app.boto3.client")
+def test_abort_test_without_execution_to_stop(mock_boto3_client, mock_list_running_test_task_arns, mock_stop_tasks):
+    mock_client = mock_boto3_client.return_value
+    mock_client.get_item.side_effect = [
+        {"Item": {"test_id": {"S": "123"}, "status": {"S": "RUNNING"}, "execution_arn": {"S": "execution ARN"}}},
+        REGION_INFRA_ITEM,
+    ]
+    mock_client.stop_execution.side_effect = ClientError(
+        {"Error": {"Code": "ExecutionDoesNotExist"}}, "StopExecution"
+    )
+    mock_list_running_test_task_arns.return_value = []
+    mock_stop_tasks.return_value = []
+
+    with patch.dict(os.environ, {"TESTS_TABLE": "TESTS_TABLE"}):
+        result = abort_test("123", "us-east-1")
+
+    assert result == {"test_id": "123", "status": "ABORTED", "stopped_tasks": 0, "failed_tasks": []}
+
+
+@patch("api.app.stop_tasks")
+@patch("api.app.list_running_test_task_arns")
+@patch("api.app.boto3.client")
+def test_abort_test_that_ended_meanwhile(mock_boto3_client, mock_list_running_test_task_arns, mock_stop_tasks):
+    mock_client = mock_boto3_client.return_value
+    mock_client.get_item.side_effect = [
+        {"Item": {"test_id": {"S": "123"}, "status": {"S": "RUNNING"}, "execution_arn": {"S": "execution ARN"}}},
+        REGION_INFRA_ITEM,
+        {"Item": {"test_id": {"S": "123"}, "status": {"S": "COMPLETED"}}},
+    ]
+    mock_client.update_item.side_effect = ClientError(
+        {"Error": {"Code": "ConditionalCheckFailedException"}}, "UpdateItem"
+    )
+    mock_list_running_test_task_arns.return_value = []
+    mock_stop_tasks.return_value = []
+
+    with patch.dict(os.environ, {"TESTS_TABLE": "TESTS_TABLE"}):
+        result = abort_test("123", "us-east-1")
+
+    assert result["status"] == "COMPLETED"
+
+
+@patch("api.app.boto3.client")
+def test_abort_test_unknown_test(mock_boto3_client):
+    mock_boto3_client.return_value.get_item.return_value = {}
+
+    with patch.dict(os.environ, {"TESTS_TABLE": "TESTS_TABLE"}):
+        with pytest.raises(UnknownTestException):
+            abort_test("123", "us-east-1")
+
+    mock_boto3_client.return_value.stop_execution.assert_not_called()
+
+
+@patch("api.app.list_running_test_task_arns")
+@patch("api.app.boto3.client")
+@patch.dict(os.environ, QUEUE_ENVIRONMENT)
+def test_abort_queued_test(mock_boto3_client, mock_list_running_test_task_arns):
+    mock_client = mock_boto3_client.return_value
+    mock_client.get_item.return_value = {
+        "Item": {"test_id": {"S": "123"}, "status": {"S": "QUEUED"}, "queue_key": {"S": "9999#t#123"}}
+    }
+
+    result = abort_test("123", "us-east-1")
+
+    assert mock_client.delete_item.call_args.kwargs["Key"] == {
+        "region": {"S": "us-east-1"}, "queue_key": {"S": "9999#t#123"}
+    }
+    mock_client.stop_execution.assert_not_called()
+    mock_list_running_test_task_arns.assert_not_called()
+    assert mock_client.update_item.call_args.kwargs["ExpressionAttributeValues"][":status"] == {"S": "ABORTED"}
+    assert result == {"test_id": "123", "status": "ABORTED", "stopped_tasks": 0, "failed_tasks": []}
+
+
+def make_test_entry(test_id, test_name="nightly", results_summary=None):
+    item = {"test_id": {"S": test_id}, "test_name": {"S": test_name}}
+    if results_summary is not None:
+        item["results_summary"] = {"S": results_summary}
+    return {"Item": item}
+
+
+@patch("api.app.compare_summaries")
+@patch("api.app.boto3.client")
+def test_compare_test_to_baseline(mock_boto3_client, mock_compare_summaries):
+    mock_client = mock_boto3_client.return_value
+    mock_client.get_item.side_effect = [
+        make_test_entry("456", results_summary="results/456/summary.json"),
+        {"Item": {"test_id": {"S": "baseline#nightly"}, "baseline_test_id": {"S": "123"}}},
+        make_test_entry("123", results_summary="results/123/summary.json"),
+    ]
+    summaries = {
+        "results/123/summary.json": {"run": "baseline"},
+        "results/456/summary.json": {"run": "candidate"},
+    }
+    mock_client.get_object.side_effect = lambda Bucket, Key: {"Body": io.BytesIO(json.dumps(summaries[Key]).encode())}
+    mock_compare_summaries.return_value = {"verdict": "PASS"}
+
+    with patch.dict(os.environ, {"TESTS_TABLE": "TESTS_TABLE", "TEST_SCENARIOS_BUCKET": TEST_SCENARIOS_BUCKET}):
+        result = compare_test_to_baseline("456", "us-east-1", {"alpha": 0.01})
+
+    assert mock_client.get_item.call_args_list[1].kwargs["Key"] == {"test_id": {"S": "baseline#nightly"}}
+    mock_compare_summaries.assert_called_once_with({"run": "baseline"}, {"run": "candidate"}, {"alpha": 0.01})
+    assert result == {"test_id": "456", "test_name": "nightly", "baseline_test_id": "123", "verdict": "PASS"}
+
+
+@patch("api.app.boto3.client")
+def test_compare_test_to_baseline_without_baseline(mock_boto3_client):
+    mock_boto3_client.return_value.get_item.side_effect = [make_test_entry("456", results_summary="key"), {}]
+
+    with patch.dict(os.environ, {"TESTS_TABLE": "TESTS_TABLE"}):
+        with pytest.raises(UnknownBaselineException):
+            compare_test_to_baseline("456", "us-east-1")
+
+
+@patch("api.app.boto3.client")
+def test_compare_test_to_baseline_before_results_are_aggregated(mock_boto3_client):
+    mock_boto3_client.return_value.get_item.side_effect = [
+        make_test_entry("456"),
+        {"Item": {"baseline_test_id": {"S": "123"}}},
+        make_test_entry("123", results_summary="results/123/summary.json"),
+    ]
+
+    with patch.dict(os.environ, {"TESTS_TABLE": "TESTS_TABLE"}):
+        with pytest.raises(ResultsNotReadyException):
+            compare_test_to_baseline("456", "us-east-1")
+
+    mock_boto3_client.return_value.get_object.assert_not_called()
+
+
+def test_pin_baseline():
+    mock_dynamodb = Mock()
+    mock_dynamodb.get_item.return_value = make_test_entry("123", results_summary="results/123/summary.json")
+
+    with patch.dict(os.environ, {"TESTS_TABLE": "TESTS_TABLE"}):
+        result = pin_baseline(mock_dynamodb, "nightly", "123")
+
+    item = mock_dynamodb.put_item.call_args.kwargs["Item"]
+    assert item["test_id"] == {"S": "baseline#nightly"}
+    assert item["baseline_test_id"] == {"S": "123"}
+    assert result["baseline_test_id"] == "123"
+
+
+def test_pin_baseline_of_another_test_name():
+    mock_dynamodb = Mock()
+    mock_dynamodb.get_item.return_value = make_test_entry("123", test_name="other", results_summary="key")
+
+    with patch.dict(os.environ, {"TESTS_TABLE": "TESTS_TABLE"}):
+        with pytest.raises(InvalidParameterException):
+            pin_baseline(mock_dynamodb, "nightly", "123")
+
+    mock_dynamodb.put_item.assert_not_called()
+
+
+def test_get_comparison_thresholds():
+    assert get_comparison_thresholds({"alpha": "0.01", "percentile": "99"}) == {"alpha": 0.01, "percentile": 99.0}
+    with pytest.raises(InvalidParameterException):
+        get_comparison_thresholds({"alpha": "low"})
+    with pytest.raises(InvalidParameterException):
+        get_comparison_thresholds({"unknown": "1"})
+
+
+@patch("api.app.compare_test_to_baseline")
+def test_lambda_handler_maps_comparison_errors(mock_compare_test_to_baseline):
+    event = {"resource": "/test/{id}/comparison", "httpMethod": "GET", "pathParameters": {"id": "456"}}
+
+    mock_compare_test_to_baseline.side_effect = ResultsNotReadyException("456")
+    assert lambda_handler(event, None)["statusCode"] == 409
+
+    mock_compare_test_to_baseline.side_effect = UnknownBaselineException("nightly")
+    assert lambda_handler(event, None)["statusCode"] == 404
+
+    mock_compare_test_to_baseline.side_effect = None
+    mock_compare_test_to_baseline.return_value = {"verdict": "FAIL"}
+    assert lambda_handler(event, None) == {"statusCode": 200, "body": {"verdict": "FAIL"}}
+
+
+@patch("api.app.boto3.client")
+def test_get_trend_reads_segments_of_window(mock_boto3_client):
+    segment = {
+        "runs": {"test_id": ["123"], "completed_at": ["2026-10-01T02:00:00+00:00"]},
+        "overall": {"rows": [100], "errors": [1], "p95": [40.0]},
+        "labels": {},
+    }
+
+    def get_object(Bucket, Key):
+        if Key == "trends/nightly%20run/2026-Q4.json":
+            return {"Body": io.BytesIO(json.dumps(segment).encode())}
+        raise ClientError({"Error": {"Code": "NoSuchKey"}}, "GetObject")
+
+    mock_client = mock_boto3_client.return_value
+    mock_client.get_object.side_effect = get_object
+    query = {
+        "since": datetime(2026, 8, 1, tzinfo=timezone.utc),
+        "until": datetime(2026, 10, 19, tzinfo=timezone.utc),
+        "labels": None,
+        "percentiles": (95,),
+        "last": None,
+        "points": 200,
+    }
+
+    with patch.dict(os.environ, {"TEST_SCENARIOS_BUCKET": TEST_SCENARIOS_BUCKET}):
+        trend = get_trend("nightly run", "us-east-1", query)
+
+    assert sorted(call.kwargs["Key"] for call in mock_client.get_object.call_args_list) == [
+        "trends/nightly%20run/2026-Q3.json",
+        "trends/nightly%20run/2026-Q4.json",
+    ]
+    assert trend["runs"] == 1
+    assert trend["overall"]["p95"]["mean"] == [40.0]
+
+
+def test_lambda_handler_rejects_invalid_trend_query():
+    event = {
+        "resource": "/trend/{name}",
+        "httpMethod": "GET",
+        "pathParameters": {"name": "nightly"},
+        "queryStringParameters": {"percentiles": "75"},
+    }
+
+    assert lambda_handler(event, None)["statusCode"] == 400
+
+
+def make_script(body, etag='"abc"'):
+    return {"Body": io.BytesIO(body), "ETag": etag}
+
+
+JMX = b"""<jmeterTestPlan><hashTree>
+    <TestPlan testname="Plan"/><hashTree>
+        <ResultCollector guiclass="ViewResultsFullVisualizer" testname="Tree" enabled="true"/><hashTree/>
+    </hashTree>
+</hashTree></jmeterTestPlan>"""
+
+
+def test_optimize_test_script_stores_plan_and_report():
+    mock_s3 = Mock()
+    mock_s3.get_object.return_value = make_script(JMX)
+
+    with patch.dict(os.environ, {"TEST_SCENARIOS_BUCKET": TEST_SCENARIOS_BUCKET}):
+        report = optimize_test_script(mock_s3, "123", "disable")
+
+    mock_s3.get_object.assert_called_once_with(Bucket=TEST_SCENARIOS_BUCKET, Key="public/test-scenarios/jmeter/123.jmx")
+    plan, stored_report = [call.kwargs for call in mock_s3.put_object.call_args_list]
+    assert plan["Key"] == "public/test-scenarios/jmeter/123.optimized.jmx"
+    assert plan["Metadata"] == {"source-etag": "abc"}
+    assert b'enabled="false"' in plan["Body"]
+    assert stored_report["Key"] == "public/test-scenarios/jmeter/123.jmx-report.json"
+    assert json.loads(stored_report["Body"]) == report
+    assert report["optimized_script"] == "public/test-scenarios/jmeter/123.optimized.jmx"
+    assert report["counts"] == {"listener": 1}
+
+
+def test_optimize_test_script_report_only():
+    mock_s3 = Mock()
+    mock_s3.get_object.return_value = make_script(JMX)
+
+    with patch.dict(os.environ, {"TEST_SCENARIOS_BUCKET": TEST_SCENARIOS_BUCKET}):
+        report = optimize_test_script(mock_s3, "123", "report")
+
+    assert report["optimized_script"] is None
+    assert mock_s3.put_object.call_args.kwargs["Key"] == "public/test-scenarios/jmeter/123.jmx-report.json"
+    assert mock_s3.put_object.call_count == 1
+
+
+@patch("api.app.boto3.client")
+def test_lambda_handler_returns_not_found_for_missing_script(mock_boto3_client):
+    mock_boto3_client.return_value.get_object.side_effect = ClientError(
+        {"Error": {"Code": "NoSuchKey", "Message": ""}}, "GetObject"
+    )
+    event = {"resource": "/test/{id}/script", "httpMethod": "POST", "pathParameters": {"id": "123"}}
+
+    response = lambda_handler(event, None)
+
+    assert response == {"statusCode": 404, "body": {"message": "Test script not found: 123"}}
+
+
+@patch("api.app.boto3.client")
+def test_lambda_handler_rejects_invalid_script(mock_boto3_client):
+    mock_boto3_client.return_value.get_object.return_value = make_script(b"<html/>")
+    event = {"resource": "/test/{id}/script", "httpMethod": "POST", "pathParameters": {"id": "123"}, "mode": "strip"}
+
+    response = lambda_handler(event, None)
+
+    assert response["statusCode"] == 400
+
+
+@patch("api.app.get_sweep")
+def test_lambda_handler_returns_not_found_for_unknown_sweep(mock_get_sweep):
+    mock_get_sweep.side_effect = UnknownSweepException("nightly")
+    event = {"resource": "/sweep/{id}", "httpMethod": "GET", "pathParameters": {"id": "nightly"}}
+
+    response = lambda_handler(event, None)
+
+    assert response == {"statusCode": 404, "body": {"message": "Sweep not found: nightly"}}
+    mock_get_sweep.assert_called_once_with("nightly", "us-east-1")
+
+
+@patch("api.app.boto3.client")
+def test_lambda_handler_rejects_invalid_sweep_matrix(mock_boto3_client):
+    event = {**make_post_event(), "resource": "/sweep", "sweep_id": "nightly", "matrix": {"concurrency": []}}
+
+    response = lambda_handler(event, None)
+
+    assert response["statusCode"] == 400
+    mock_boto3_client.return_value.put_item.assert_not_called()
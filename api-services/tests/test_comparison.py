@@ -0,0 +1,163 @@
+import math
+import random
+
+import numpy as np
+import pytest
+
+from comparison import (
+    IncomparableSummariesException,
+    compare_summaries,
+    mann_whitney_greater,
+    sketch_matrix,
+    sketch_percentiles,
+)
+
+GAMMA = 1.02
+
+
+def sketch(latencies):
+    buckets = {}
+    for latency in latencies:
+        bucket = str(math.ceil(math.log(max(latency, 1), GAMMA)))
+        buckets[bucket] = buckets.get(bucket, 0) + 1
+    return buckets
+
+
+def summary(labels, requests_per_second=100, seconds=60):
+    """Builds a finalizer summary from {label: (latencies, errors)}."""
+    all_latencies = [latency for latencies, _ in labels.values() for latency in latencies]
+    return {
+        "rows": len(all_latencies),
+        "errors": sum(errors for _, errors in labels.values()),
+        "latency_gamma": GAMMA,
+        "latency_buckets": sketch(all_latencies),
+        "timeline": [
+            {"second": second, "requests": requests_per_second + (second % 3), "errors": 0}
+            for second in range(seconds)
+        ],
+        "labels": {
+            name: {"rows": len(latencies), "errors": errors, "latency_buckets": sketch(latencies)}
+            for name, (latencies, errors) in labels.items()
+        },
+    }
+
+
+def latencies(mean, count=2000, seed=1):
+    generator = random.Random(seed)
+    return [generator.lognormvariate(math.log(mean), 0.3) for _ in range(count)]
+
+
+def test_sketch_percentiles_match_exact_percentiles():
+    samples = latencies(200)
+    counts, buckets = sketch_matrix([sketch(samples), {}])
+
+    percentiles = sketch_percentiles(counts, GAMMA ** buckets.astype(float), (50, 99))
+
+    assert percentiles[0] == pytest.approx(np.percentile(samples, [50, 99]), rel=0.02)
+    assert np.isnan(percentiles[1]).all()
+
+
+def test_mann_whitney_detects_shift_per_row():
+    # Baseline rows first, then the candidate rows, all over the same bucket columns.
+    counts, _ = sketch_matrix([
+        sketch(latencies(100)), sketch(latencies(100, seed=3)),
+        sketch(latencies(100, seed=2)), sketch(latencies(130, seed=4)),
+    ])
+
+    p_values = mann_whitney_greater(counts[:2], counts[2:])
+
+    assert p_values[0] > 0.05
+    assert p_values[1] < 0.001
+
+
+def test_identical_runs_pass():
+    baseline = summary({"home": (latencies(100), 2), "login": (latencies(300, seed=2), 0)})
+    candidate = summary({"home": (latencies(100, seed=5), 2), "login": (latencies(300, seed=6), 0)})
+
+    comparison = compare_summaries(baseline, candidate)
+
+    assert comparison["verdict"] == "PASS"
+    assert comparison["failures"] == []
+    assert set(comparison["labels"]) == {"home", "login"}
+    assert comparison["labels"]["home"]["latency_ms"]["p95"]["delta_percent"] == pytest.approx(0, abs=5)
+
+
+def test_latency_regression_of_one_label_fails():
+    baseline = summary({"home": (latencies(100), 0), "login": (latencies(300, seed=2), 0)})
+    candidate = summary({"home": (latencies(100, seed=5), 0), "login": (latencies(400, seed=6), 0)})
+
+    comparison = compare_summaries(baseline, candidate)
+
+    assert comparison["verdict"] == "FAIL"
+    assert comparison["labels"]["login"]["regressed"] is True
+    assert comparison["labels"]["home"]["regressed"] is False
+    assert any(failure.startswith("login: p95 latency") for failure in comparison["failures"])
+
+
+def test_thresholds_can_be_relaxed():
+    baseline = summary({"login": (latencies(300), 0)})
+    candidate = summary({"login": (latencies(400, seed=6), 0)})
+
+    comparison = compare_summaries(baseline, candidate, {"max_latency_increase_percent": 50})
+
+    assert comparison["verdict"] == "PASS"
+
+
+def test_small_samples_are_not_gated():
+    baseline = summary({"rare": (latencies(100, count=10), 0)})
+    candidate = summary({"rare": (latencies(300, count=10, seed=2), 0)})
+
+    comparison = compare_summaries(baseline, candidate, {"min_rows": 30})
+
+    assert comparison["labels"]["rare"]["gated"] is False
+    assert comparison["labels"]["rare"]["regressed"] is False
+
+
+def test_error_rate_regression_fails():
+    baseline = summary({"home": (latencies(100), 10)})
+    candidate = summary({"home": (latencies(100, seed=5), 100)})
+
+    comparison = compare_summaries(baseline, candidate)
+
+    assert comparison["verdict"] == "FAIL"
+    assert comparison["labels"]["home"]["error_rate"]["p_value"] < 0.001
+
+
+def test_throughput_drop_fails():
+    baseline = summary({"home": (latencies(100), 0)}, requests_per_second=100)
+    candidate = summary({"home": (latencies(100, seed=5), 0)}, requests_per_second=70)
+
+    comparison = compare_summaries(baseline, candidate)
+
+    assert comparison["verdict"] == "FAIL"
+    assert comparison["throughput"]["delta_percent"] == pytest.approx(-30, abs=1)
+
+
+def test_throughput_counts_silent_seconds():
+    baseline = summary({"home": (latencies(100), 0)}, requests_per_second=100)
+    candidate = summary({"home": (latencies(100, seed=5), 0)}, requests_per_second=100)
+    # Requests completed only every other second, the timeline is sparse.
+    candidate["timeline"] = [point for point in candidate["timeline"] if point["second"] % 2 == 0]
+
+    comparison = compare_summaries(baseline, candidate)
+
+    assert comparison["verdict"] == "FAIL"
+    assert comparison["throughput"]["delta_percent"] == pytest.approx(-50, abs=1)
+
+
+def test_labels_only_in_one_run_are_reported():
+    baseline = summary({"home": (latencies(100), 0), "old": (latencies(100), 0)})
+    candidate = summary({"home": (latencies(100, seed=5), 0), "new": (latencies(100), 0)})
+
+    comparison = compare_summaries(baseline, candidate)
+
+    assert comparison["missing_labels"] == ["old"]
+    assert comparison["new_labels"] == ["new"]
+
+
+def test_summaries_with_different_sketches_are_incomparable():
+    baseline = summary({"home": (latencies(100), 0)})
+    candidate = {**summary({"home": (latencies(100), 0)}), "latency_gamma": 1.05}
+
+    with pytest.raises(IncomparableSummariesException):
+        compare_summaries(baseline, candidate)
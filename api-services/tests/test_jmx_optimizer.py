@@ -0,0 +1,98 @@
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from jmx_optimizer import InvalidTestPlanException, optimize_plan
+
+PLAN = b"""<?xml version="1.0" encoding="UTF-8"?>
+<jmeterTestPlan version="1.2" properties="5.0" jmeter="5.6.3">
+  <hashTree>
+    <TestPlan guiclass="TestPlanGui" testclass="TestPlan" testname="Checkout" enabled="true"/>
+    <hashTree>
+      <ThreadGroup guiclass="ThreadGroupGui" testclass="ThreadGroup" testname="Users" enabled="true"/>
+      <hashTree>
+        <HTTPSamplerProxy guiclass="HttpTestSampleGui" testclass="HTTPSamplerProxy" testname="GET /" enabled="true"/>
+        <hashTree>
+          <DebugPostProcessor guiclass="TestBeanGUI" testclass="DebugPostProcessor" testname="Dump" enabled="true"/>
+          <hashTree/>
+        </hashTree>
+        <DebugSampler guiclass="TestBeanGUI" testclass="DebugSampler" testname="Debug" enabled="false"/>
+        <hashTree/>
+      </hashTree>
+      <!-- GUI only -->
+      <ResultCollector guiclass="ViewResultsFullVisualizer" testclass="ResultCollector" testname="Tree" enabled="true">
+        <stringProp name="filename"></stringProp>
+      </ResultCollector>
+      <hashTree/>
+      <ResultCollector guiclass="SimpleDataWriter" testclass="ResultCollector" testname="Writer" enabled="true">
+        <stringProp name="filename">/tmp/all.jtl</stringProp>
+      </ResultCollector>
+      <hashTree/>
+    </hashTree>
+  </hashTree>
+</jmeterTestPlan>
+"""
+
+
+def test_report_finds_throughput_killing_elements_without_changing_the_plan():
+    optimized, report = optimize_plan(PLAN)
+
+    assert optimized is None
+    assert report["changed"] is False
+    assert report["counts"] == {"debug": 2, "listener": 1, "file_writer": 1}
+    assert [finding["path"] for finding in report["findings"]] == [
+        "Checkout/Users/GET //Dump",
+        "Checkout/Users/Debug",
+        "Checkout/Tree",
+        "Checkout/Writer",
+    ]
+    assert {finding["action"] for finding in report["findings"]} == {"none"}
+
+
+def test_disable_keeps_elements_but_turns_them_off():
+    optimized, report = optimize_plan(PLAN, "disable")
+
+    root = ET.fromstring(optimized)
+    assert root.find(".//ResultCollector[@testname='Tree']").get("enabled") == "false"
+    assert root.find(".//DebugPostProcessor").get("enabled") == "false"
+    assert root.find(".//HTTPSamplerProxy").get("enabled") == "true"
+    # Already disabled elements are reported but left alone.
+    assert [finding["action"] for finding in report["findings"]] == ["disabled", "none", "disabled", "disabled"]
+    assert optimized.startswith(b"<?xml")
+    assert b"<!-- GUI only -->" in optimized
+
+
+def test_strip_removes_elements_with_their_children():
+    optimized, report = optimize_plan(PLAN, "strip")
+
+    root = ET.fromstring(optimized)
+    assert root.find(".//ResultCollector") is None
+    assert root.find(".//DebugSampler") is None
+    assert root.find(".//DebugPostProcessor") is None
+    assert root.find(".//HTTPSamplerProxy") is not None
+    # Every remaining element is still followed by its hashTree.
+    thread_group_tree = root.find("hashTree/hashTree/hashTree")
+    assert [child.tag for child in thread_group_tree] == ["HTTPSamplerProxy", "hashTree"]
+    assert report["changed"] is True
+
+
+def test_clean_plan_is_not_rewritten():
+    plan = b"""<jmeterTestPlan><hashTree>
+        <TestPlan testname="Clean"/><hashTree/>
+    </hashTree></jmeterTestPlan>"""
+
+    optimized, report = optimize_plan(plan, "strip")
+
+    assert optimized is None
+    assert report["findings"] == []
+
+
+@pytest.mark.parametrize("plan", [b"not xml", b"<project/>"])
+def test_invalid_plan(plan):
+    with pytest.raises(InvalidTestPlanException):
+        optimize_plan(plan)
+
+
+def test_unknown_mode():
+    with pytest.raises(InvalidTestPlanException):
+        optimize_plan(PLAN, "delete")
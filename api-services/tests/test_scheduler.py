@@ -0,0 +1,132 @@
+from unittest.mock import Mock
+
+from botocore.exceptions import ClientError
+
+from scheduler import get_queue_key, list_queued_tests, reserve_capacity, schedule_tests
+
+
+def conditional_check_failed():
+    return ClientError({"Error": {"Code": "ConditionalCheckFailedException", "Message": ""}}, "UpdateItem")
+
+
+def queue_item(test_id, task_count, priority=0, enqueued_at="2024-01-01T00:00:00"):
+    return {
+        "region": {"S": "us-east-1"},
+        "queue_key": {"S": get_queue_key(priority, enqueued_at, test_id)},
+        "test_id": {"S": test_id},
+        "task_count": {"N": str(task_count)},
+        "execution_name": {"S": f"{test_id}-execution"},
+        "execution_input": {"S": "{}"},
+    }
+
+
+def schedule(dynamodb, max_tasks=None, start=None, reject=None):
+    region_record = {"region": {"S": "us-east-1"}}
+    if max_tasks is not None:
+        region_record["max_tasks"] = {"N": str(max_tasks)}
+    return schedule_tests(
+        dynamodb, "TestQueueTable", "RegionInfraTable", "us-east-1", region_record, start or Mock(), reject or Mock()
+    )
+
+
+def test_queue_key_orders_by_priority_then_submission():
+    keys = [
+        get_queue_key(0, "2024-01-01T00:00:01", "late-low"),
+        get_queue_key(5, "2024-01-01T00:00:02", "late-high"),
+        get_queue_key(0, "2024-01-01T00:00:00", "early-low"),
+    ]
+
+    assert [key.split("#")[-1] for key in sorted(keys)] == ["late-high", "early-low", "late-low"]
+
+
+def test_list_queued_tests():
+    dynamodb = Mock()
+    dynamodb.query.return_value = {"Items": [queue_item("123", 10)]}
+
+    queued_tests = list_queued_tests(dynamodb, "TestQueueTable", "us-east-1", limit=1)
+
+    assert queued_tests == [{
+        "queue_key": get_queue_key(0, "2024-01-01T00:00:00", "123"),
+        "test_id": "123",
+        "task_count": 10,
+        "execution": {"name": "123-execution", "input": "{}"},
+    }]
+    assert dynamodb.query.call_args.kwargs["Limit"] == 1
+
+
+def test_reserve_capacity_without_limit_does_not_touch_the_region():
+    dynamodb = Mock()
+
+    assert reserve_capacity(dynamodb, "RegionInfraTable", "us-east-1", 10, None) is True
+    dynamodb.update_item.assert_not_called()
+
+
+def test_reserve_capacity_when_not_available():
+    dynamodb = Mock()
+    dynamodb.update_item.side_effect = conditional_check_failed()
+
+    assert reserve_capacity(dynamodb, "RegionInfraTable", "us-east-1", 10, 50) is False
+    assert dynamodb.update_item.call_args.kwargs["ExpressionAttributeValues"] == {
+        ":max_tasks": {"N": "50"},
+        ":count": {"N": "10"},
+    }
+
+
+def test_schedule_tests_starts_in_order_until_capacity_runs_out():
+    dynamodb = Mock()
+    dynamodb.query.return_value = {"Items": [queue_item("a", 10), queue_item("b", 30), queue_item("c", 1)]}
+    dynamodb.update_item.side_effect = [{}, conditional_check_failed()]
+    start = Mock()
+
+    started = schedule(dynamodb, max_tasks=40, start=start)
+
+    # "c" would fit but must not overtake "b".
+    assert started == ["a"]
+    assert [call.args[0]["test_id"] for call in start.call_args_list] == ["a"]
+    assert start.call_args.args[1] is True
+    assert dynamodb.delete_item.call_count == 1
+
+
+def test_schedule_tests_rejects_tests_larger_than_the_region():
+    dynamodb = Mock()
+    dynamodb.query.return_value = {"Items": [queue_item("huge", 100), queue_item("a", 10)]}
+    reject, start = Mock(), Mock()
+
+    started = schedule(dynamodb, max_tasks=40, start=start, reject=reject)
+
+    assert started == ["a"]
+    assert reject.call_args.args[0]["test_id"] == "huge"
+
+
+def test_schedule_tests_skips_tests_admitted_meanwhile():
+    dynamodb = Mock()
+    dynamodb.query.return_value = {"Items": [queue_item("a", 10)]}
+    dynamodb.delete_item.side_effect = conditional_check_failed()
+    start = Mock()
+
+    assert schedule(dynamodb, max_tasks=40, start=start) == []
+    start.assert_not_called()
+    # Reserved, then handed back.
+    assert dynamodb.update_item.call_count == 2
+    assert "+ :count" in dynamodb.update_item.call_args.kwargs["UpdateExpression"]
+
+
+def test_schedule_tests_queues_test_again_when_start_fails():
+    dynamodb = Mock()
+    dynamodb.query.return_value = {"Items": [queue_item("a", 10), queue_item("b", 10)]}
+    start = Mock(side_effect=RuntimeError("execution limit exceeded"))
+
+    assert schedule(dynamodb, max_tasks=40, start=start) == []
+    assert start.call_count == 1
+    assert dynamodb.put_item.call_args.kwargs["Item"]["queue_key"] == queue_item("a", 10)["queue_key"]
+    assert "+ :count" in dynamodb.update_item.call_args.kwargs["UpdateExpression"]
+
+
+def test_schedule_tests_without_capacity_limit():
+    dynamodb = Mock()
+    dynamodb.query.return_value = {"Items": [queue_item("a", 10), queue_item("b", 1000)]}
+    start = Mock()
+
+    assert schedule(dynamodb, start=start) == ["a", "b"]
+    assert start.call_args.args[1] is False
+    dynamodb.update_item.assert_not_called()
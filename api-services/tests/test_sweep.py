@@ -0,0 +1,89 @@
+import pytest
+
+from sweep import (
+    MAX_SWEEP_POINTS,
+    InvalidSweepException,
+    build_curve,
+    expand_sweep,
+    find_knee,
+    get_point_test_id,
+)
+
+BASE_TASK_CONFIG = {"concurrency": "50", "task_count": "2"}
+
+
+def test_expand_sweep_is_the_product_in_the_given_order():
+    points = expand_sweep(
+        {"concurrency": [10, 20], "variables": {"THINK_TIME": [0, 500]}},
+        BASE_TASK_CONFIG,
+        {"HOST": "example.com"},
+    )
+
+    assert [(point["task_count"], point["concurrency"], point["variables"]["THINK_TIME"]) for point in points] == [
+        (2, 10, 0), (2, 10, 500), (2, 20, 0), (2, 20, 500),
+    ]
+    assert all(point["variables"]["HOST"] == "example.com" for point in points)
+    assert [point["index"] for point in points] == [0, 1, 2, 3]
+
+
+def test_expand_sweep_without_matrix_is_the_base_test():
+    assert expand_sweep({}, BASE_TASK_CONFIG) == [{"index": 0, "task_count": 2, "concurrency": 50, "variables": {}}]
+
+
+@pytest.mark.parametrize(
+    "matrix",
+    [
+        {"concurrency": []},
+        {"concurrency": "10"},
+        {"concurrency": [10, "many"]},
+        {"task_count": [0, 1]},
+        {"variables": ["THINK_TIME"]},
+        {"variables": {"THINK_TIME": []}},
+        {"concurrency": list(range(1, MAX_SWEEP_POINTS + 2))},
+    ],
+)
+def test_expand_sweep_rejects_invalid_matrices(matrix):
+    with pytest.raises(InvalidSweepException):
+        expand_sweep(matrix, BASE_TASK_CONFIG)
+
+
+def test_get_point_test_id():
+    assert get_point_test_id("nightly", 7) == "nightly-007"
+
+
+def summary(rows, seconds, p95=100.0, error_rate=0.0):
+    return {
+        "rows": rows,
+        "error_rate": error_rate,
+        "latency_ms": {"mean": p95 / 2, "p50": p95 / 2, "p90": p95, "p95": p95, "p99": p95},
+        "timeline": [{"second": 100 + second, "requests": 0, "errors": 0} for second in range(seconds)],
+    }
+
+
+def point(index, concurrency, task_count=1):
+    return {"test_id": f"sweep-{index:03d}", "concurrency": concurrency, "task_count": task_count, "variables": {}}
+
+
+def test_build_curve_with_points_still_running():
+    points = [point(0, 10), point(1, 20)]
+
+    curve = build_curve(points, {"sweep-000": summary(1000, 10, p95=80.0, error_rate=0.01)})
+
+    first, second = curve["points"]
+    assert (first["throughput_rps"], first["error_rate"], first["latency_ms"]["p95"]) == (100.0, 0.01, 80.0)
+    assert (second["throughput_rps"], second["latency_ms"]) == (None, None)
+    assert curve["completed_points"] == 1
+    assert curve["peak_throughput"] == {"test_id": "sweep-000", "throughput_rps": 100.0}
+    assert curve["knee"] is None
+
+
+def test_find_knee_orders_points_by_total_load():
+    measured = [
+        {"test_id": "c", "total_concurrency": 40, "throughput_rps": 300.0},
+        {"test_id": "a", "total_concurrency": 10, "throughput_rps": 100.0},
+        {"test_id": "b", "total_concurrency": 20, "throughput_rps": 200.0},
+        {"test_id": "d", "total_concurrency": 80, "throughput_rps": 305.0},
+    ]
+
+    assert find_knee(measured) == {"test_id": "c", "total_concurrency": 40, "throughput_rps": 300.0}
+    assert find_knee(measured[:3]) is None
@@ -0,0 +1,78 @@
+import threading
+
+import pytest
+from task_graph import TaskGraph, TaskGraphException
+
+
+def test_run_returns_results_of_all_steps():
+    graph = TaskGraph()
+    graph.add("a", lambda: 1)
+    graph.add("b", lambda: graph.results["a"] + 1, depends_on=["a"])
+
+    assert graph.run() == {"a": 1, "b": 2}
+
+
+def test_independent_steps_run_concurrently():
+    barrier = threading.Barrier(2, timeout=1)
+    graph = TaskGraph()
+    graph.add("a", barrier.wait)
+    graph.add("b", barrier.wait)
+
+    graph.run()
+
+
+def test_dependent_step_waits_for_its_dependencies():
+    order = []
+    graph = TaskGraph()
+    graph.add("a", lambda: order.append("a"))
+    graph.add("b", lambda: order.append("b"))
+    graph.add("c", lambda: order.append("c"), depends_on=["a", "b"])
+
+    graph.run()
+
+    assert order[-1] == "c"
+
+
+def test_unknown_dependency_raises():
+    graph = TaskGraph()
+
+    with pytest.raises(TaskGraphException):
+        graph.add("b", lambda: None, depends_on=["a"])
+
+
+def test_failure_rolls_back_completed_steps_in_reverse_order():
+    rolled_back = []
+    graph = TaskGraph(max_workers=1)
+    graph.add("a", lambda: None, rollback=lambda: rolled_back.append("a"))
+    graph.add("b", lambda: None, depends_on=["a"], rollback=lambda: rolled_back.append("b"))
+    graph.add("c", lambda: 1 / 0, depends_on=["b"], rollback=lambda: rolled_back.append("c"))
+
+    with pytest.raises(ZeroDivisionError):
+        graph.run()
+
+    assert rolled_back == ["b", "a"]
+
+
+def test_failure_skips_steps_not_started():
+    started = []
+    graph = TaskGraph()
+    graph.add("a", lambda: 1 / 0)
+    graph.add("b", lambda: started.append("b"), depends_on=["a"])
+
+    with pytest.raises(ZeroDivisionError):
+        graph.run()
+
+    assert started == []
+
+
+def test_failing_rollback_does_not_hide_original_error():
+    rolled_back = []
+    graph = TaskGraph(max_workers=1)
+    graph.add("a", lambda: None, rollback=lambda: rolled_back.append("a"))
+    graph.add("b", lambda: None, depends_on=["a"], rollback=lambda: 1 / 0)
+    graph.add("c", lambda: [][0], depends_on=["b"])
+
+    with pytest.raises(IndexError):
+        graph.run()
+
+    assert rolled_back == ["a"]
@@ -0,0 +1,111 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from trends import InvalidTrendQueryException, build_trend, get_partitions, get_trend_query, group_runs
+
+NOW = datetime(2026, 10, 19, 12, 0, tzinfo=timezone.utc)
+
+
+def segment(runs):
+    """Builds a trend segment from [(test_id, completed_at, {label: p95})]."""
+    labels = sorted({name for _, _, label_p95 in runs for name in label_p95})
+    return {
+        "runs": {
+            "test_id": [test_id for test_id, _, _ in runs],
+            "completed_at": [completed_at for _, completed_at, _ in runs],
+        },
+        "overall": {
+            "rows": [100] * len(runs),
+            "errors": [index for index in range(len(runs))],
+            "p95": [max(label_p95.values(), default=10.0) for _, _, label_p95 in runs],
+        },
+        "labels": {
+            name: {
+                "rows": [50 if name in label_p95 else None for _, _, label_p95 in runs],
+                "errors": [0 if name in label_p95 else None for _, _, label_p95 in runs],
+                "p95": [label_p95.get(name) for _, _, label_p95 in runs],
+            }
+            for name in labels
+        },
+    }
+
+
+def nightly_runs(month, days, label_p95):
+    return [(f"run-{month}-{day}", f"2026-{month:02d}-{day:02d}T02:00:00+00:00", label_p95(day)) for day in days]
+
+
+def test_get_trend_query_defaults_to_last_90_days():
+    query = get_trend_query({}, NOW)
+
+    assert query["until"] == NOW
+    assert (query["until"] - query["since"]).days == 90
+    assert get_partitions(query["since"], query["until"]) == ["2026-Q3", "2026-Q4"]
+    assert (query["labels"], query["percentiles"], query["last"]) == (None, (50, 90, 95, 99), None)
+    assert query["points"] == 200
+
+
+def test_get_trend_query_parses_parameters():
+    query = get_trend_query(
+        {"since": "2025-11-01", "until": "2026-01-31", "labels": "/checkout, /home", "percentiles": "99,95",
+         "last": "30", "points": "5000"},
+        NOW,
+    )
+
+    assert query["until"] == datetime(2026, 1, 31, 23, 59, 59, 999999, tzinfo=timezone.utc)
+    assert get_partitions(query["since"], query["until"]) == ["2025-Q4", "2026-Q1"]
+    assert (query["labels"], query["percentiles"], query["last"], query["points"]) == (
+        ["/checkout", "/home"], (95, 99), 30, 1000
+    )
+
+
+@pytest.mark.parametrize(
+    "params",
+    [{"since": "yesterday"}, {"since": "2026-10-20"}, {"percentiles": "75"}, {"points": "0"}, {"last": "many"}],
+)
+def test_get_trend_query_rejects_invalid_parameters(params):
+    with pytest.raises(InvalidTrendQueryException):
+        get_trend_query(params, NOW)
+
+
+def test_group_runs_splits_evenly():
+    assert [len(group) for group in group_runs(list(range(10)), 4)] == [2, 3, 3, 2]
+    assert [len(group) for group in group_runs(list(range(3)), 200)] == [1, 1, 1]
+
+
+def test_build_trend_filters_window_and_keeps_spikes():
+    segments = [
+        segment(nightly_runs(9, range(1, 31), lambda day: {"/checkout": 100.0 + day})),
+        segment(
+            nightly_runs(10, range(1, 19), lambda day: {"/checkout": 500.0 if day == 10 else 100.0, "/new": 5.0})
+        ),
+    ]
+    query = get_trend_query({"since": "2026-09-21", "percentiles": "95", "points": "4"}, NOW)
+
+    trend = build_trend("nightly", segments, query)
+
+    assert trend["runs"] == 28
+    assert trend["downsampled"]
+    assert trend["points"]["runs"] == [7, 7, 7, 7]
+    assert trend["points"]["from"][0] == "2026-09-21T02:00:00+00:00"
+    assert trend["points"]["last_test_id"][-1] == "run-10-18"
+    checkout = trend["labels"]["/checkout"]
+    assert checkout["p95"]["max"] == [127.0, 130.0, 500.0, 100.0]
+    assert checkout["p95"]["min"] == [121.0, 100.0, 100.0, 100.0]
+    assert checkout["rows"] == [350, 350, 350, 350]
+    # Runs of September did not have the label.
+    assert trend["labels"]["/new"]["rows"] == [None, 200, 350, 350]
+    assert set(checkout) == {"rows", "error_rate", "p95"}
+
+
+def test_build_trend_keeps_last_runs_of_requested_labels():
+    segments = [segment(nightly_runs(10, range(1, 19), lambda day: {"/checkout": float(day), "/home": 1.0}))]
+    query = get_trend_query({"labels": "/checkout,/missing", "last": "3"}, NOW)
+
+    trend = build_trend("nightly", segments, query)
+
+    assert not trend["downsampled"]
+    assert trend["points"]["last_test_id"] == ["run-10-16", "run-10-17", "run-10-18"]
+    assert list(trend["labels"]) == ["/checkout"]
+    assert trend["labels"]["/checkout"]["p95"]["mean"] == [16.0, 17.0, 18.0]
+    assert trend["overall"]["error_rate"] == [0.15, 0.16, 0.17]
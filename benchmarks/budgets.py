@@ -0,0 +1,127 @@
+"""API-call and round-trip budgets the orchestration must stay within.
+
+``round_trips`` is the number of AWS calls on the critical path: with a
+simulated latency ``L`` the simulated time of a benchmark, measured on the
+``CriticalPathClock`` of the fakes, is expected to stay within
+``round_trips * L``. Local work takes no simulated time, so the budgets do
+not depend on the speed of the machine running them.
+"""
+import math
+
+
+# Absorbs the rounding of the sums of simulated latencies.
+SIMULATED_TIME_EPSILON = 1e-9
+
+HANDLE_TESTS = {
+    "calls": {
+        "dynamodb.get_item": 1,
+        "dynamodb.query": 1,
+        "s3.put_object": 1,
+        "stepfunctions.start_execution": 1,
+        "dynamodb.put_item": 1,
+        "dynamodb.update_item": 1,
+    },
+    # region lookup, queue peek, scenario and record in parallel, then the execution and its status
+    "round_trips": 3,
+}
+
+
+def task_launch(task_count: int) -> dict:
+    run_task_calls = math.ceil(task_count / 10)
+    return {
+        "calls": {"ecs.run_task": run_task_calls},
+        "round_trips": run_task_calls,
+    }
+
+
+def status_check(test_task_count: int, task_ids_recorded: bool = True, page_size: int = 100) -> dict:
+    # Only the test's own tasks are described, by the ids the runner recorded or, before it has
+    # run, by listing the ones started by the test, so the cost does not grow with the cluster.
+    # The lifecycle breakdown is saved on the test record.
+    describe_calls = math.ceil(test_task_count / 100)
+    calls = {"ecs.describe_tasks": describe_calls, "dynamodb.update_item": 1}
+    pages = 0
+    if not task_ids_recorded:
+        pages = max(1, math.ceil(test_task_count / page_size))
+        calls["ecs.list_tasks"] = pages
+    return {
+        "calls": {name: count for name, count in calls.items() if count},
+        "round_trips": pages + describe_calls + 1,
+    }
+
+
+def time_budget(round_trips: int, latency: float) -> float:
+    return round_trips * latency + SIMULATED_TIME_EPSILON
+
+
+def abort(test_task_count: int, stop_workers: int = 32, page_size: int = 100) -> dict:
+    pages = max(1, math.ceil(test_task_count / page_size))
+    stop_rounds = math.ceil(test_task_count / stop_workers)
+    return {
+        "calls": {
+            "dynamodb.get_item": 2,
+            "stepfunctions.stop_execution": 1,
+            "ecs.list_tasks": pages,
+            "ecs.stop_task": test_task_count,
+            "dynamodb.update_item": 1,
+        },
+        # record lookup, execution stop, listing the test's tasks by startedBy, parallel stops
+        # and the record update; the rest of the cluster is never listed
+        "round_trips": 1 + 1 + pages + stop_rounds + 1,
+    }
+
+
+def compaction(task_count: int, artifacts_per_task: int) -> dict:
+    raw_objects = task_count * artifacts_per_task
+    return {
+        "calls": {
+            "s3.get_object": raw_objects,
+            # archive, one KPI part and the index, each small enough for a single PUT
+            "s3.put_object": 3,
+            "s3.delete_objects": math.ceil(raw_objects / 1000),
+        },
+    }
+
+
+def aggregation(new_files: int, fetch_workers: int = 16) -> dict:
+    return {
+        "calls": {"s3.get_object": new_files} if new_files else {},
+        "round_trips": math.ceil(new_files / fetch_workers),
+    }
+
+
+def schedule(started: int, queued: int) -> dict:
+    """Scheduler run that starts ``started`` of the ``queued`` tests and stops at the first that does not fit."""
+    blocked = 1 if queued > started else 0
+    calls = {
+        "dynamodb.get_item": 1,
+        "dynamodb.query": 1,
+        "dynamodb.update_item": 2 * started + blocked,
+    }
+    if started:
+        calls.update({"dynamodb.delete_item": started, "stepfunctions.start_execution": started})
+    return {"calls": calls}
+
+
+def sweep_submission(points: int) -> dict:
+    """Every point gets its scenario and test record up front, only the first one is started."""
+    return {
+        "calls": {
+            "dynamodb.get_item": 1,
+            "dynamodb.query": 1,
+            "s3.put_object": points,
+            "dynamodb.put_item": points + 1,
+            "stepfunctions.start_execution": 1,
+            "dynamodb.update_item": 1,
+        },
+    }
+
+
+def trend_append() -> dict:
+    """The run's segment is read and rewritten with a conditional PUT."""
+    return {"calls": {"s3.get_object": 1, "s3.put_object": 1}}
+
+
+def trend_query(partitions: int) -> dict:
+    """The quarterly segments of the window are read concurrently."""
+    return {"calls": {"s3.get_object": partitions}, "round_trips": 1}
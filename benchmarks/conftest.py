@@ -0,0 +1,116 @@
+import os
+import time
+from contextlib import ExitStack
+from unittest.mock import patch
+
+import pytest
+
+from benchmarks.fake_aws import CriticalPathClock, FakeAWS
+from benchmarks.paths import add_lambda_folders
+
+add_lambda_folders()
+
+
+REGION = "us-east-1"
+CLUSTER = "DLT-ECS-Cluster"
+STATE_MACHINE_ARN = "arn:aws:states:us-east-1:000000000000:stateMachine:TaurusStateMachine"
+
+ENVIRONMENT = {
+    "AWS_TESTS_REGION": REGION,
+    "TEST_AWS_REGION": REGION,
+    "TEST_SCENARIOS_BUCKET": "dlt-bucket",
+    "SCENARIOS_BUCKET": "dlt-bucket",
+    "TAURUS_STATE_MACHINE_ARN": STATE_MACHINE_ARN,
+    "REGION_INFRA_TABLE": "RegionInfraTable",
+    "TESTS_TABLE": "TestsTable",
+    "RESULTS_BUCKET": "dlt-bucket",
+    "TEST_QUEUE_TABLE": "TestQueueTable",
+}
+
+_results = []
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--bench-latency",
+        type=float,
+        default=0.005,
+        help="Simulated AWS round trip in seconds used by the latency benchmarks.",
+    )
+
+
+@pytest.fixture
+def bench_latency(request):
+    return request.config.getoption("--bench-latency")
+
+
+@pytest.fixture
+def make_aws():
+    """Returns a factory building a FakeAWS wired in place of boto3.client.
+
+    Unless another clock is given, the fake runs on a ``CriticalPathClock``
+    installed on the thread pools.
+    """
+    patchers = []
+
+    def factory(**kwargs):
+        if "clock" not in kwargs:
+            kwargs["clock"] = CriticalPathClock()
+            patchers.append(kwargs["clock"].installed())
+        aws = FakeAWS(**kwargs)
+        aws.dynamodb.create_table("RegionInfraTable", "region")
+        aws.dynamodb.create_table("TestsTable", "test_id")
+        aws.dynamodb.create_table("TestQueueTable", "region", "queue_key")
+        aws.dynamodb.tables["RegionInfraTable"][(("S", REGION),)] = {
+            "region": {"S": REGION},
+            "subnet": {"S": "subnet-0123456789"},
+            "cluster": {"S": CLUSTER},
+            "task_definition": {"S": "dlt-task-family:1"},
+            "task_container": {"S": "dlt-load-tester"},
+        }
+
+        patcher = patch("boto3.client", side_effect=aws.client)
+        patcher.start()
+        patchers.append(patcher)
+        return aws
+
+    with patch.dict(os.environ, ENVIRONMENT):
+        yield factory
+
+    for patcher in reversed(patchers):
+        if isinstance(patcher, ExitStack):
+            patcher.close()
+        else:
+            patcher.stop()
+
+
+@pytest.fixture
+def record(request):
+    """Runs a callable, returns its result and the simulated time of its critical path.
+
+    The wall time is only kept for the terminal summary, it depends on the
+    machine and no benchmark asserts on it.
+    """
+
+    def measure(fn, aws: FakeAWS):
+        simulated_start = aws.clock.now()
+        started = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started
+        simulated = aws.clock.now() - simulated_start
+        _results.append((request.node.name, simulated, elapsed, aws.total_calls(), sum(aws.throttled.values())))
+        return result, simulated
+
+    return measure
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not _results:
+        return
+
+    terminalreporter.section("orchestration benchmarks")
+    terminalreporter.write_line(
+        f"{'benchmark':<60} {'simulated':>9} {'wall':>9} {'calls':>7} {'throttled':>9}"
+    )
+    for name, simulated, elapsed, calls, throttled in _results:
+        terminalreporter.write_line(f"{name:<60} {simulated:>9.4f} {elapsed:>9.4f} {calls:>7} {throttled:>9}")
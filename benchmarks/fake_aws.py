@@ -0,0 +1,767 @@
+"""In-memory fakes of the AWS clients used by the DLT lambdas.
+
+The fakes implement only the operations the lambdas call, but they model the
+service behaviour that matters for orchestration performance: per-call
+latency, client-side retries on throttling, ECS request limits and
+paginated listings. Every attempt is counted so benchmarks can assert on the
+number of API calls as well as on the simulated time of the critical path.
+"""
+import io
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import ExitStack
+from datetime import timedelta
+from unittest.mock import patch
+
+from botocore.exceptions import ClientError
+
+
+RUN_TASK_MAX_COUNT = 10
+DESCRIBE_TASKS_MAX_ARNS = 100
+LIST_TASKS_MAX_RESULTS = 100
+
+
+class RealClock:
+    def now(self) -> float:
+        return time.monotonic()
+
+    def sleep(self, seconds: float) -> None:
+        if seconds > 0:
+            time.sleep(seconds)
+
+
+class SimulatedClock:
+    """Clock whose time only moves when something sleeps on it."""
+
+    def __init__(self, start: float = 0.0):
+        self._now = start
+        self._lock = threading.Lock()
+
+    def now(self) -> float:
+        return self._now
+
+    def sleep(self, seconds: float) -> None:
+        if seconds > 0:
+            with self._lock:
+                self._now += seconds
+
+
+class CriticalPathClock:
+    """Clock following the critical path of work spread over thread pools.
+
+    Every thread has its own time. Work submitted to a ``ThreadPoolExecutor``
+    runs on one of the pool's workers in turn, starting at the time of the
+    thread submitting it or once the previous work of its worker finished,
+    and a thread collecting its result moves on to the time it finished. The
+    time of the calling thread is then the latency of its critical path:
+    concurrent calls overlap instead of adding up, and local work takes no
+    time at all. Sleeps also pass in real time so that work finishes in the
+    order of its simulated time.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def now(self) -> float:
+        return getattr(self._local, "now", 0.0)
+
+    def set(self, now: float) -> None:
+        self._local.now = now
+
+    def sleep(self, seconds: float) -> None:
+        if seconds > 0:
+            self.set(self.now() + seconds)
+            time.sleep(seconds)
+
+    def installed(self) -> ExitStack:
+        """Patches the thread pools to carry the time of the threads along with the work."""
+        clock = self
+        submit, result = ThreadPoolExecutor.submit, Future.result
+
+        def timed_submit(executor, fn, *args, **kwargs):
+            submitted_at = clock.now()
+            timing = {"done": threading.Event()}
+            with clock._lock:
+                if not hasattr(executor, "_worker_timings"):
+                    executor._worker_timings, executor._submitted = [None] * executor._max_workers, 0
+                # Workers take the work in turn whatever thread happens to run it, so the
+                # simulated time does not depend on how the threads are scheduled.
+                worker = executor._submitted % executor._max_workers
+                previous, executor._worker_timings[worker] = executor._worker_timings[worker], timing
+                executor._submitted += 1
+
+            def run():
+                free_at = 0.0
+                if previous is not None:
+                    previous["done"].wait()
+                    free_at = previous["finished_at"]
+                clock.set(max(submitted_at, free_at))
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    timing["finished_at"] = clock.now()
+
+            future = submit(executor, run)
+            future._timing = timing
+
+            def finished(_):
+                # Cancelled work never ran, its worker is free as soon as it was submitted.
+                timing.setdefault("finished_at", submitted_at)
+                timing["done"].set()
+
+            future.add_done_callback(finished)
+            return future
+
+        def timed_result(future, timeout=None):
+            try:
+                return result(future, timeout)
+            finally:
+                finished_at = getattr(future, "_timing", {}).get("finished_at")
+                if finished_at is not None:
+                    clock.set(max(clock.now(), finished_at))
+
+        stack = ExitStack()
+        stack.enter_context(patch.object(ThreadPoolExecutor, "submit", timed_submit))
+        stack.enter_context(patch.object(Future, "result", timed_result))
+        return stack
+
+
+class FakeAWS:
+    """Factory handing out fake clients that share counters and a clock.
+
+    ``latency`` is the simulated round trip of every attempt in seconds.
+    ``throttle_rate`` is the probability that an attempt is throttled; the
+    fake then retries like the botocore legacy retry mode would, up to
+    ``max_attempts`` attempts with exponential backoff, before raising.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        throttle_rate: float = 0.0,
+        max_attempts: int = 5,
+        page_size: int = LIST_TASKS_MAX_RESULTS,
+        clock=None,
+        seed: int = 0,
+    ):
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.max_attempts = max_attempts
+        self.page_size = page_size
+        self.clock = clock or RealClock()
+        self.calls = Counter()
+        self.throttled = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+        self.ecs = FakeECS(self)
+        self.s3 = FakeS3(self)
+        self.dynamodb = FakeDynamoDB(self)
+        self.stepfunctions = FakeStepFunctions(self)
+        self.cloudwatch = FakeCloudWatch(self)
+
+    def client(self, service_name, region_name=None, **_):
+        return getattr(self, service_name)
+
+    def call(self, service: str, operation: str) -> None:
+        name = f"{service}.{operation}"
+        for attempt in range(1, self.max_attempts + 1):
+            with self._lock:
+                self.calls[name] += 1
+                throttled = self._random.random() < self.throttle_rate
+            self.clock.sleep(self.latency)
+
+            if not throttled:
+                return
+
+            with self._lock:
+                self.throttled[name] += 1
+            if attempt == self.max_attempts:
+                raise client_error("ThrottlingException", "Rate exceeded", operation)
+            self.clock.sleep(min(0.05 * 2 ** (attempt - 1), 1.0))
+
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+
+def client_error(code: str, message: str, operation: str) -> ClientError:
+    return ClientError({"Error": {"Code": code, "Message": message}}, operation)
+
+
+class FakeECS:
+    """Fake ECS; ``spot_capacity`` caps how many FARGATE_SPOT tasks can be placed."""
+
+    def __init__(self, aws: FakeAWS, spot_capacity=None):
+        self._aws = aws
+        self._lock = threading.Lock()
+        self.clusters = {}
+        self.spot_capacity = spot_capacity
+        self.task_definitions = {}
+
+    def add_tasks(self, cluster: str, group: str, count: int, last_status: str = "RUNNING"):
+        """Seeds ``count`` tasks directly, started by ``group`` like the runner starts them.
+
+        Returns the ARNs of the seeded tasks.
+        """
+        with self._lock:
+            tasks = self.clusters.setdefault(cluster, [])
+            seeded = [self._new_task(cluster, group, last_status, {"startedBy": group}, "FARGATE") for _ in range(count)]
+            for task in seeded:
+                if last_status == "STOPPED":
+                    task["desiredStatus"] = "STOPPED"
+            tasks.extend(seeded)
+        return [task["taskArn"] for task in seeded]
+
+    def tasks_in_group(self, cluster: str, group: str):
+        return [task for task in self.clusters.get(cluster, []) if task["group"] == group]
+
+    def run_task(self, cluster, count=1, group=None, **params):
+        self._aws.call("ecs", "run_task")
+        if count > RUN_TASK_MAX_COUNT:
+            raise client_error(
+                "InvalidParameterException",
+                f"count must be between 1 and {RUN_TASK_MAX_COUNT}",
+                "RunTask",
+            )
+
+        with self._lock:
+            tasks = self.clusters.setdefault(cluster, [])
+            started, failures = [], []
+            for capacity_provider in self._place(count, params):
+                if capacity_provider == "FARGATE_SPOT" and self.spot_capacity is not None:
+                    if self.spot_capacity == 0:
+                        failures.append({"arn": "", "reason": "Capacity is unavailable at this time."})
+                        continue
+                    self.spot_capacity -= 1
+                started.append(self._new_task(cluster, group, "PROVISIONING", params, capacity_provider))
+            tasks.extend(started)
+
+        return {"tasks": [dict(task) for task in started], "failures": failures}
+
+    @staticmethod
+    def _place(count, params):
+        strategy = params.get("capacityProviderStrategy")
+        if not strategy:
+            return [params.get("launchType", "FARGATE")] * count
+
+        total_weight = sum(item.get("weight", 0) for item in strategy) or 1
+        placements = []
+        for item in strategy:
+            share = round(count * item.get("weight", 0) / total_weight)
+            placements += [item["capacityProvider"]] * share
+        return (placements + [strategy[0]["capacityProvider"]] * count)[:count]
+
+    def list_tasks(self, cluster, nextToken=None, maxResults=None, desiredStatus=None, startedBy=None, **filters):
+        self._aws.call("ecs", "list_tasks")
+        if startedBy is not None and (desiredStatus is not None or filters):
+            raise client_error(
+                "InvalidParameterException",
+                "startedBy must be the only filter when it is specified.",
+                "ListTasks",
+            )
+        desiredStatus = desiredStatus or "RUNNING"
+        page_size = min(maxResults or self._aws.page_size, self._aws.page_size)
+        start = int(nextToken or 0)
+
+        with self._lock:
+            arns = [
+                task["taskArn"]
+                for task in self.clusters.get(cluster, [])
+                if task["desiredStatus"] == desiredStatus and startedBy in (None, task["startedBy"])
+            ]
+
+        page = arns[start:start + page_size]
+        response = {"taskArns": page}
+        if start + page_size < len(arns):
+            response["nextToken"] = str(start + page_size)
+        return response
+
+    def describe_tasks(self, cluster, tasks, **_):
+        self._aws.call("ecs", "describe_tasks")
+        if len(tasks) > DESCRIBE_TASKS_MAX_ARNS:
+            raise client_error(
+                "InvalidParameterException",
+                f"tasks can have at most {DESCRIBE_TASKS_MAX_ARNS} items",
+                "DescribeTasks",
+            )
+
+        # Like ECS, a task is described by its ARN or by its id.
+        wanted = set(tasks)
+        with self._lock:
+            found = [
+                dict(task)
+                for task in self.clusters.get(cluster, [])
+                if task["taskArn"] in wanted or task["taskArn"].rsplit("/", 1)[-1] in wanted
+            ]
+        return {"tasks": found, "failures": []}
+
+    def stop_task(self, cluster, task, reason=None, **_):
+        self._aws.call("ecs", "stop_task")
+        with self._lock:
+            for candidate in self.clusters.get(cluster, []):
+                if candidate["taskArn"] == task:
+                    candidate["desiredStatus"] = "STOPPED"
+                    candidate["lastStatus"] = "STOPPED"
+                    candidate["stoppedReason"] = reason
+                    return {"task": dict(candidate)}
+        raise client_error("InvalidParameterException", "The referenced task was not found.", "StopTask")
+
+    def register_task_definition(self, family, **params):
+        self._aws.call("ecs", "register_task_definition")
+        with self._lock:
+            revision = 1 + sum(1 for definition in self.task_definitions.values() if definition["family"] == family)
+            arn = f"arn:aws:ecs:us-east-1:000000000000:task-definition/{family}:{revision}"
+            definition = {**params, "family": family, "revision": revision, "taskDefinitionArn": arn}
+            self.task_definitions[f"{family}:{revision}"] = definition
+        return {"taskDefinition": dict(definition)}
+
+    def describe_task_definition(self, taskDefinition, **_):
+        self._aws.call("ecs", "describe_task_definition")
+        name = taskDefinition.rsplit("/", 1)[-1]
+        with self._lock:
+            if ":" not in name:
+                revisions = [key for key, value in self.task_definitions.items() if value["family"] == name]
+                name = max(revisions, key=lambda key: self.task_definitions[key]["revision"], default=name)
+            definition = self.task_definitions.get(name)
+        if definition is None:
+            raise client_error("ClientException", "Unable to describe task definition.", "DescribeTaskDefinition")
+        return {"taskDefinition": dict(definition)}
+
+    def _new_task(self, cluster, group, last_status, params, capacity_provider):
+        subnets = params.get("networkConfiguration", {}).get("awsvpcConfiguration", {}).get("subnets", [])
+        return {
+            "taskArn": f"arn:aws:ecs:us-east-1:000000000000:task/{cluster}/{uuid.uuid4().hex}",
+            "clusterArn": f"arn:aws:ecs:us-east-1:000000000000:cluster/{cluster}",
+            "group": group,
+            "startedBy": params.get("startedBy"),
+            "lastStatus": last_status,
+            "desiredStatus": "RUNNING",
+            "createdAt": self._aws.clock.now(),
+            "launchType": "FARGATE",
+            "capacityProviderName": capacity_provider,
+            "subnet": subnets[0] if subnets else None,
+        }
+
+
+class FakeS3:
+    def __init__(self, aws: FakeAWS):
+        self._aws = aws
+        self._lock = threading.Lock()
+        self.objects = {}
+        self.uploads = {}
+
+    def put_object(self, Bucket, Key, Body=b"", IfMatch=None, IfNoneMatch=None, **extra):
+        self._aws.call("s3", "put_object")
+        if isinstance(Body, str):
+            Body = Body.encode()
+        elif hasattr(Body, "read"):
+            Body = Body.read()
+        return self._store(Bucket, Key, bytes(Body), extra, if_match=IfMatch, if_none_match=IfNoneMatch)
+
+    def upload_fileobj(self, Fileobj, Bucket, Key, ExtraArgs=None, **_):
+        self._aws.call("s3", "upload_fileobj")
+        self._store(Bucket, Key, Fileobj.read(), ExtraArgs or {})
+
+    def get_object(self, Bucket, Key, **_):
+        self._aws.call("s3", "get_object")
+        stored = self._get(Bucket, Key, "GetObject")
+        return {**stored["metadata"], "Body": io.BytesIO(stored["body"]), "ETag": stored["etag"]}
+
+    def head_object(self, Bucket, Key, **_):
+        self._aws.call("s3", "head_object")
+        stored = self._get(Bucket, Key, "HeadObject")
+        return {**stored["metadata"], "ContentLength": len(stored["body"]), "ETag": stored["etag"]}
+
+    def delete_object(self, Bucket, Key, **_):
+        self._aws.call("s3", "delete_object")
+        with self._lock:
+            self.objects.pop((Bucket, Key), None)
+        return {}
+
+    def delete_objects(self, Bucket, Delete, **_):
+        self._aws.call("s3", "delete_objects")
+        keys = [item["Key"] for item in Delete["Objects"]]
+        if len(keys) > 1000:
+            raise client_error("MalformedXML", "DeleteObjects accepts at most 1000 keys.", "DeleteObjects")
+        with self._lock:
+            for key in keys:
+                self.objects.pop((Bucket, key), None)
+        return {"Deleted": [{"Key": key} for key in keys]}
+
+    def create_multipart_upload(self, Bucket, Key, **extra):
+        self._aws.call("s3", "create_multipart_upload")
+        upload_id = uuid.uuid4().hex
+        with self._lock:
+            self.uploads[upload_id] = {"bucket": Bucket, "key": Key, "parts": {}, "metadata": dict(extra)}
+        return {"UploadId": upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body, **_):
+        self._aws.call("s3", "upload_part")
+        etag = f'"{uuid.uuid4().hex}"'
+        with self._lock:
+            self.uploads[UploadId]["parts"][PartNumber] = (etag, bytes(Body))
+        return {"ETag": etag}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload, **_):
+        self._aws.call("s3", "complete_multipart_upload")
+        with self._lock:
+            upload = self.uploads.pop(UploadId)
+        parts = [upload["parts"][part["PartNumber"]] for part in MultipartUpload["Parts"]]
+        for number, (_, body) in enumerate(parts[:-1], start=1):
+            if len(body) < 5 * 1024 * 1024:
+                raise client_error("EntityTooSmall", f"Part {number} is smaller than 5 MiB.", "CompleteMultipartUpload")
+        return self._store(Bucket, Key, b"".join(body for _, body in parts), upload["metadata"])
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId, **_):
+        self._aws.call("s3", "abort_multipart_upload")
+        with self._lock:
+            self.uploads.pop(UploadId, None)
+        return {}
+
+    def list_objects_v2(self, Bucket, Prefix="", ContinuationToken=None, MaxKeys=1000, **_):
+        self._aws.call("s3", "list_objects_v2")
+        start = int(ContinuationToken or 0)
+        with self._lock:
+            keys = sorted(key for bucket, key in self.objects if bucket == Bucket and key.startswith(Prefix))
+            page = [
+                {
+                    "Key": key,
+                    "Size": len(self.objects[(Bucket, key)]["body"]),
+                    "ETag": self.objects[(Bucket, key)]["etag"],
+                }
+                for key in keys[start:start + MaxKeys]
+            ]
+
+        response = {"Contents": page, "KeyCount": len(page), "IsTruncated": False}
+        if start + MaxKeys < len(keys):
+            response["IsTruncated"] = True
+            response["NextContinuationToken"] = str(start + MaxKeys)
+        return response
+
+    def _store(self, bucket, key, body, metadata, if_match=None, if_none_match=None):
+        etag = f'"{uuid.uuid4().hex}"'
+        with self._lock:
+            current = self.objects.get((bucket, key))
+            # Conditional writes are checked and applied atomically, like S3 does.
+            if (if_none_match == "*" and current) or (if_match and (not current or current["etag"] != if_match)):
+                raise client_error("PreconditionFailed", "At least one of the preconditions did not hold.", "PutObject")
+            self.objects[(bucket, key)] = {"body": body, "etag": etag, "metadata": dict(metadata)}
+        return {"ETag": etag}
+
+    def _get(self, bucket, key, operation):
+        with self._lock:
+            stored = self.objects.get((bucket, key))
+        if stored is None:
+            raise client_error("NoSuchKey", "The specified key does not exist.", operation)
+        return stored
+
+
+def split_top_level(expression: str):
+    """Splits on the commas outside of parentheses."""
+    parts, depth, current = [], 0, ""
+    for character in expression:
+        depth += {"(": 1, ")": -1}.get(character, 0)
+        if character == "," and depth == 0:
+            parts.append(current)
+            current = ""
+        else:
+            current += character
+    return parts + [current]
+
+
+def number_or_string(value: dict):
+    if "N" in value:
+        number = float(value["N"])
+        return int(number) if number.is_integer() else number
+    return next(iter(value.values()))
+
+
+class FakeDynamoDB:
+    def __init__(self, aws: FakeAWS):
+        self._aws = aws
+        self._lock = threading.Lock()
+        self.tables = {}
+        self._key_schemas = {}
+
+    def create_table(self, name: str, *key_attributes: str):
+        self._key_schemas[name] = key_attributes
+        self.tables[name] = {}
+
+    def get_item(self, TableName, Key, **_):
+        self._aws.call("dynamodb", "get_item")
+        with self._lock:
+            item = self._table(TableName).get(self._key(TableName, Key))
+        return {"Item": dict(item)} if item is not None else {}
+
+    def put_item(self, TableName, Item, **_):
+        self._aws.call("dynamodb", "put_item")
+        with self._lock:
+            self._table(TableName)[self._key(TableName, Item)] = dict(Item)
+        return {}
+
+    def update_item(
+        self,
+        TableName,
+        Key,
+        UpdateExpression,
+        ExpressionAttributeValues=None,
+        ExpressionAttributeNames=None,
+        ConditionExpression=None,
+        **_,
+    ):
+        """Supports ``SET a = :x, #b = if_not_exists(b, :y) - :z`` update expressions."""
+        self._aws.call("dynamodb", "update_item")
+        names = ExpressionAttributeNames or {}
+        values = ExpressionAttributeValues or {}
+        action, _, assignments = UpdateExpression.strip().partition(" ")
+        if action.upper() != "SET":
+            raise NotImplementedError(UpdateExpression)
+
+        with self._lock:
+            table = self._table(TableName)
+            key = self._key(TableName, Key)
+            self._check_condition(table.get(key), ConditionExpression, names, values, "UpdateItem")
+            item = dict(table.get(key, Key))
+            for assignment in split_top_level(assignments):
+                path, _, value = assignment.partition("=")
+                item[names.get(path.strip(), path.strip())] = self._evaluate(item, value.strip(), names, values)
+            table[key] = item
+        return {}
+
+    def delete_item(self, TableName, Key, ConditionExpression=None, ExpressionAttributeNames=None,
+                    ExpressionAttributeValues=None, **_):
+        self._aws.call("dynamodb", "delete_item")
+        with self._lock:
+            table = self._table(TableName)
+            key = self._key(TableName, Key)
+            self._check_condition(
+                table.get(key), ConditionExpression, ExpressionAttributeNames or {},
+                ExpressionAttributeValues or {}, "DeleteItem",
+            )
+            table.pop(key, None)
+        return {}
+
+    def batch_write_item(self, RequestItems, **_):
+        self._aws.call("dynamodb", "batch_write_item")
+        with self._lock:
+            for table_name, requests in RequestItems.items():
+                table = self._table(table_name)
+                for request in requests:
+                    if "PutRequest" in request:
+                        item = request["PutRequest"]["Item"]
+                        table[self._key(table_name, item)] = dict(item)
+                    else:
+                        table.pop(self._key(table_name, request["DeleteRequest"]["Key"]), None)
+        return {"UnprocessedItems": {}}
+
+    def query(
+        self,
+        TableName,
+        KeyConditionExpression,
+        ExpressionAttributeValues,
+        ExpressionAttributeNames=None,
+        Limit=None,
+        ExclusiveStartKey=None,
+        **_,
+    ):
+        """Supports hash key equality, items come back sorted by their range key."""
+        self._aws.call("dynamodb", "query")
+        names = ExpressionAttributeNames or {}
+        path, _, value = KeyConditionExpression.partition("=")
+        hash_attribute = names.get(path.strip(), path.strip())
+        hash_value = ExpressionAttributeValues[value.strip()]
+
+        with self._lock:
+            items = sorted(
+                (key, dict(item)) for key, item in self._table(TableName).items()
+                if item.get(hash_attribute) == hash_value
+            )
+        if ExclusiveStartKey is not None:
+            start = self._key(TableName, ExclusiveStartKey)
+            items = [(key, item) for key, item in items if key > start]
+
+        response = {"Items": [item for _, item in items[:Limit]]}
+        if Limit is not None and len(items) > Limit:
+            last = response["Items"][-1]
+            response["LastEvaluatedKey"] = {attribute: last[attribute] for attribute in self._key_schemas[TableName]}
+        response["Count"] = len(response["Items"])
+        return response
+
+    def _check_condition(self, item, expression, names, values, operation):
+        """Supports attribute_exists, attribute_not_exists, IN and comparisons, NOT and OR/AND."""
+        if expression is None:
+            return
+        item = item or {}
+
+        def holds(term):
+            term = term.strip()
+            if term.startswith("NOT "):
+                return not holds(term[len("NOT "):])
+            if " IN (" in term:
+                path, _, candidates = term.partition(" IN (")
+                path = names.get(path.strip(), path.strip())
+                return item.get(path) in [values[value.strip()] for value in candidates.rstrip(")").split(",")]
+            for function, expected in (("attribute_exists", True), ("attribute_not_exists", False)):
+                if term.startswith(function + "("):
+                    path = term[len(function) + 1:-1].strip()
+                    return (names.get(path, path) in item) == expected
+            for operator in (">=", "<=", "<>", "=", ">", "<"):
+                if operator in term:
+                    path, _, value = term.partition(operator)
+                    path = names.get(path.strip(), path.strip())
+                    if path not in item:
+                        return False
+                    left, right = number_or_string(item[path]), number_or_string(values[value.strip()])
+                    return {
+                        ">=": left >= right, "<=": left <= right, "<>": left != right,
+                        "=": left == right, ">": left > right, "<": left < right,
+                    }[operator]
+            raise NotImplementedError(term)
+
+        if not any(
+            all(holds(term) for term in alternative.split(" AND "))
+            for alternative in expression.split(" OR ")
+        ):
+            raise client_error("ConditionalCheckFailedException", "The conditional request failed", operation)
+
+    def _evaluate(self, item, expression, names, values):
+        for operator in (" + ", " - "):
+            if operator in expression:
+                left, _, right = expression.rpartition(operator)
+                left = self._evaluate(item, left.strip(), names, values)
+                right = self._evaluate(item, right.strip(), names, values)
+                total = number_or_string(left) + (1 if operator == " + " else -1) * number_or_string(right)
+                return {"N": str(total)}
+        if expression.startswith("if_not_exists("):
+            path, _, default = expression[len("if_not_exists("):-1].partition(",")
+            path = names.get(path.strip(), path.strip())
+            return item[path] if path in item else values[default.strip()]
+        if expression.startswith(":"):
+            return values[expression]
+        return item[names.get(expression, expression)]
+
+    def _table(self, name):
+        if name not in self.tables:
+            raise client_error("ResourceNotFoundException", f"Table {name} not found", "GetItem")
+        return self.tables[name]
+
+    def _key(self, table, item):
+        return tuple(
+            tuple(item[attribute].items())[0]
+            for attribute in self._key_schemas[table]
+        )
+
+
+class FakeStepFunctions:
+    def __init__(self, aws: FakeAWS):
+        self._aws = aws
+        self._lock = threading.Lock()
+        self.executions = {}
+
+    def start_execution(self, stateMachineArn, input="{}", name=None, **_):
+        self._aws.call("stepfunctions", "start_execution")
+        name = name or uuid.uuid4().hex
+        execution_arn = f"{stateMachineArn}:{name}".replace(":stateMachine:", ":execution:")
+        with self._lock:
+            self.executions[execution_arn] = {"input": input, "status": "RUNNING"}
+        return {"executionArn": execution_arn, "startDate": self._aws.clock.now()}
+
+    def stop_execution(self, executionArn, **_):
+        self._aws.call("stepfunctions", "stop_execution")
+        with self._lock:
+            execution = self.executions.get(executionArn)
+            if execution is None:
+                raise client_error("ExecutionDoesNotExist", "Execution does not exist", "StopExecution")
+            execution["status"] = "ABORTED"
+        return {"stopDate": self._aws.clock.now()}
+
+
+class FakeCloudWatch:
+    """Keeps metric data points at the time they were put.
+
+    ``get_metric_data`` aggregates every query by ``Period`` over the points
+    put within ``EndTime - StartTime`` seconds before the current time of the
+    clock, the last period ending at the current time. A window read by the
+    SLA guard follows simulated time whatever wall time it was computed from,
+    the periods are stamped from ``StartTime`` as CloudWatch stamps them.
+    """
+
+    def __init__(self, aws: FakeAWS):
+        self._aws = aws
+        self._lock = threading.Lock()
+        self.points = []
+
+    def put_metric_data(self, Namespace, MetricData, **_):
+        self._aws.call("cloudwatch", "put_metric_data")
+        self.store(Namespace, MetricData)
+        return {}
+
+    def store(self, namespace, metric_data, timestamp=None):
+        """Adds data points without counting a call, for writes made by the generators."""
+        timestamp = self._aws.clock.now() if timestamp is None else timestamp
+        with self._lock:
+            for datum in metric_data:
+                if "Values" in datum:
+                    values = list(zip(datum["Values"], datum.get("Counts") or [1] * len(datum["Values"])))
+                else:
+                    values = [(datum["Value"], 1)]
+                self.points.append({
+                    "namespace": namespace,
+                    "name": datum["MetricName"],
+                    "dimensions": tuple(sorted((d["Name"], d["Value"]) for d in datum.get("Dimensions", []))),
+                    "timestamp": timestamp,
+                    "values": values,
+                })
+
+    def get_metric_data(self, MetricDataQueries, StartTime, EndTime, **_):
+        self._aws.call("cloudwatch", "get_metric_data")
+        window = (EndTime - StartTime).total_seconds()
+        since = self._aws.clock.now() - window
+        results = []
+        for query in MetricDataQueries:
+            stat = query["MetricStat"]
+            metric = stat["Metric"]
+            period = stat["Period"]
+            dimensions = tuple(sorted((d["Name"], d["Value"]) for d in metric.get("Dimensions", [])))
+            periods = {}
+            with self._lock:
+                for point in self.points:
+                    if (
+                        point["namespace"] == metric["Namespace"]
+                        and point["name"] == metric["MetricName"]
+                        and point["dimensions"] == dimensions
+                        and point["timestamp"] > since
+                    ):
+                        index = min(int((point["timestamp"] - since) // period), int(window // period) - 1)
+                        periods.setdefault(index, []).extend(point["values"])
+            # Newest first, the default order of CloudWatch.
+            indexes = sorted(periods, reverse=True)
+            results.append({
+                "Id": query["Id"],
+                "Timestamps": [StartTime + timedelta(seconds=index * period) for index in indexes],
+                "Values": [self._statistic(stat["Stat"], periods[index]) for index in indexes],
+                "StatusCode": "Complete",
+            })
+        return {"MetricDataResults": results}
+
+    @staticmethod
+    def _statistic(stat, values):
+        if stat == "Sum":
+            return float(sum(value * count for value, count in values))
+        if stat == "SampleCount":
+            return float(sum(count for _, count in values))
+        if stat == "Maximum":
+            return float(max(value for value, _ in values))
+        if stat.startswith("p"):
+            rank = float(stat[1:]) / 100 * sum(count for _, count in values)
+            seen = 0
+            for value, count in sorted(values):
+                seen += count
+                if seen >= rank:
+                    return float(value)
+        raise ValueError(f"Unsupported statistic {stat}")
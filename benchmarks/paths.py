@@ -0,0 +1,28 @@
+"""Puts the code directories of the Lambdas on ``sys.path``.
+
+Each Lambda imports its modules by their bare names from its code
+directory, the benchmarks and the simulator import the handlers the same way.
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LAMBDA_FOLDERS = (
+    "shared",
+    "api-services",
+    "api-services/api",
+    "task-runner",
+    "task-runner/task_runner_function",
+    "task-status-checker",
+    "task-status-checker/task_status_checker_function",
+    "test-finalizer",
+    "test-finalizer/test_finalizer_function",
+)
+
+
+def add_lambda_folders() -> None:
+    for lambda_folder in LAMBDA_FOLDERS:
+        path = os.path.join(ROOT, lambda_folder)
+        if path not in sys.path:
+            sys.path.insert(0, path)
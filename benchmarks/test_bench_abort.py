@@ -0,0 +1,26 @@
+import pytest
+
+from api.app import abort_test, handle_tests
+
+from benchmarks import budgets
+from benchmarks.conftest import CLUSTER, REGION
+from benchmarks.test_bench_handle_tests import submission_event
+
+
+@pytest.mark.parametrize("task_count", [10, 300])
+def test_abort_tears_down_fleet(make_aws, record, bench_latency, task_count):
+    aws = make_aws(latency=bench_latency)
+    handle_tests(submission_event())
+    aws.ecs.add_tasks(CLUSTER, "other-test", 200)
+    aws.ecs.add_tasks(CLUSTER, "bench-test", task_count)
+    aws.calls.clear()
+    budget = budgets.abort(task_count)
+
+    result, elapsed = record(lambda: abort_test("bench-test", REGION), aws)
+
+    assert result["stopped_tasks"] == task_count
+    assert all(task["lastStatus"] == "STOPPED" for task in aws.ecs.tasks_in_group(CLUSTER, "bench-test"))
+    assert {execution["status"] for execution in aws.stepfunctions.executions.values()} == {"ABORTED"}
+    assert aws.dynamodb.tables["TestsTable"][(("S", "bench-test"),)]["status"] == {"S": "ABORTED"}
+    assert dict(aws.calls) == budget["calls"]
+    assert elapsed <= budgets.time_budget(budget["round_trips"], bench_latency)
@@ -0,0 +1,95 @@
+import csv
+import hashlib
+import io
+import json
+
+import pytest
+
+from test_finalizer_function.aggregation import ResultCache, aggregate_results, aggregate_rows
+from test_finalizer_function.compaction import compact_results, delete_objects, get_results_prefix
+
+from benchmarks import budgets
+
+ARTIFACTS = ["results.xml", "bzt.log", "jmeter.log", "jmeter.out", "jmeter.err", "kpi.jtl", "telemetry.csv", "telemetry.json"]
+KPI_HEADER = b"timeStamp,elapsed,label,responseCode,success\n"
+
+
+def upload_task_artifacts(aws, test_id: str, task_count: int, partials: bool = False):
+    """Stores the artifacts of the tasks and returns their manifest entries."""
+    kpi_body = KPI_HEADER + b"1700000000000,12,home,200,true\n" * 50
+    bodies = {name: kpi_body if name.endswith(".jtl") else b"log line\n" * 20 for name in ARTIFACTS}
+    if partials:
+        bodies["kpi-partial.json"] = json.dumps(aggregate_rows(csv.DictReader(io.StringIO(kpi_body.decode())))).encode()
+
+    entries = []
+    for task in range(task_count):
+        for name, body in bodies.items():
+            key = f"{get_results_prefix(test_id)}task-{task:04d}/{name}"
+            etag = hashlib.md5(key.encode()).hexdigest()
+            aws.s3.objects[("dlt-bucket", key)] = {"body": body, "etag": f'"{etag}"', "metadata": {}}
+            entries.append({"key": key, "size": len(body), "etag": etag, "rows": body.count(b"\n")})
+    return entries
+
+
+@pytest.mark.parametrize("task_count", [10, 300])
+def test_compaction_leaves_few_objects(make_aws, record, task_count):
+    aws = make_aws()
+    entries = upload_task_artifacts(aws, "bench-test", task_count)
+    budget = budgets.compaction(task_count, len(ARTIFACTS))
+
+    def compact():
+        # As the finalizer does, the replaced objects are deleted after the compaction.
+        index, compacted_entries, replaced_keys = compact_results(aws.client("s3"), "dlt-bucket", "bench-test", entries)
+        delete_objects(aws.client("s3"), "dlt-bucket", replaced_keys)
+        return index, compacted_entries
+
+    (index, compacted_entries), _ = record(compact, aws)
+
+    assert len(index["artifacts"]) == task_count * (len(ARTIFACTS) - 1)
+    assert len(compacted_entries) == 2
+    assert len(aws.s3.objects) == 3
+    assert dict(aws.calls) == budget["calls"]
+
+    aws.calls.clear()
+    aws.client("s3").list_objects_v2(Bucket="dlt-bucket", Prefix=get_results_prefix("bench-test"))
+    assert aws.calls["s3.list_objects_v2"] == 1
+
+
+@pytest.mark.parametrize("task_count", [10, 300])
+def test_aggregation_fetches_only_new_files(make_aws, record, bench_latency, tmp_path, task_count):
+    aws = make_aws(latency=bench_latency)
+    entries = upload_task_artifacts(aws, "bench-test", task_count)
+    cache = ResultCache(str(tmp_path))
+    s3 = aws.client("s3")
+
+    budget = budgets.aggregation(task_count)
+    (summary, stats), elapsed = record(lambda: aggregate_results(s3, "dlt-bucket", entries, cache), aws)
+    assert summary["rows"] == task_count * 50
+    assert stats["fetched"] == task_count
+    assert dict(aws.calls) == budget["calls"]
+    assert elapsed <= budgets.time_budget(budget["round_trips"], bench_latency)
+
+    # One late task: a re-aggregation fetches its file only.
+    aws.calls.clear()
+    entries += upload_task_artifacts(aws, "bench-test-late", 1)
+    budget = budgets.aggregation(1)
+    (summary, stats), elapsed = record(lambda: aggregate_results(s3, "dlt-bucket", entries, cache), aws)
+    assert summary["rows"] == (task_count + 1) * 50
+    assert (stats["fetched"], stats["cached"]) == (1, task_count)
+    assert dict(aws.calls) == budget["calls"]
+    assert elapsed <= budgets.time_budget(budget["round_trips"], bench_latency)
+
+
+@pytest.mark.parametrize("task_count", [10, 300])
+def test_aggregation_merges_task_partials_instead_of_kpi_files(make_aws, record, tmp_path, task_count):
+    aws = make_aws()
+    entries = upload_task_artifacts(aws, "bench-test", task_count, partials=True)
+
+    (summary, stats), _ = record(
+        lambda: aggregate_results(aws.client("s3"), "dlt-bucket", entries, ResultCache(str(tmp_path))), aws
+    )
+
+    assert summary["rows"] == task_count * 50
+    # One partial per task is fetched, none of the KPI files is parsed.
+    assert stats["fetched"] == task_count
+    assert dict(aws.calls) == budgets.aggregation(task_count)["calls"]
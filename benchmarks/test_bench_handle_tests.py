@@ -0,0 +1,84 @@
+import json
+
+import pytest
+
+from api.app import handle_tests
+
+from benchmarks import budgets
+from benchmarks.conftest import CLUSTER
+
+
+def submission_event(test_id="bench-test"):
+    return {
+        "httpMethod": "POST",
+        "test_id": test_id,
+        "test_name": "checkout",
+        "test_description": "benchmark submission",
+        "test_task_config": {"concurrency": "50", "task_count": "10"},
+        "test_scenario": {
+            "execution": [
+                {"scenario": "checkout", "hold-for": "10m", "ramp-up": "1m"}
+            ],
+            "scenarios": {"checkout": {"script": f"{test_id}.jmx"}},
+        },
+    }
+
+
+def test_handle_tests_api_calls(make_aws, record):
+    aws = make_aws()
+
+    record(lambda: handle_tests(submission_event()), aws)
+
+    assert dict(aws.calls) == budgets.HANDLE_TESTS["calls"]
+    execution_input = next(iter(aws.stepfunctions.executions.values()))["input"]
+    assert CLUSTER in execution_input
+
+
+def test_handle_tests_latency(make_aws, record, bench_latency):
+    aws = make_aws(latency=bench_latency)
+
+    _, elapsed = record(lambda: handle_tests(submission_event()), aws)
+
+    assert elapsed <= budgets.time_budget(budgets.HANDLE_TESTS["round_trips"], bench_latency)
+
+
+@pytest.mark.parametrize("throttle_rate", [0.1, 0.3])
+def test_handle_tests_under_throttling(make_aws, record, throttle_rate):
+    aws = make_aws(throttle_rate=throttle_rate, seed=7)
+
+    record(lambda: handle_tests(submission_event()), aws)
+
+    assert len(aws.dynamodb.tables["TestsTable"]) == 1
+    assert len(aws.stepfunctions.executions) == 1
+    assert aws.total_calls() - sum(aws.throttled.values()) == sum(budgets.HANDLE_TESTS["calls"].values())
+
+
+def test_handle_tests_rolls_back_when_execution_fails(make_aws):
+    aws = make_aws()
+
+    def failing_start_execution(**_):
+        raise RuntimeError("execution limit exceeded")
+
+    aws.stepfunctions.start_execution = failing_start_execution
+
+    with pytest.raises(RuntimeError):
+        handle_tests(submission_event())
+
+    assert aws.dynamodb.tables["TestsTable"] == {}
+    assert aws.s3.objects == {}
+
+
+def test_handle_tests_uploads_large_scenario_compressed(make_aws, record, monkeypatch):
+    monkeypatch.setenv("SCENARIO_COMPRESSION", "gzip")
+    aws = make_aws()
+    event = submission_event()
+    event["test_scenario"]["scenarios"]["checkout"]["requests"] = [
+        {"url": f"https://shop.example.com/items/{i}", "body": {"sku": i, "qty": 1}}
+        for i in range(20000)
+    ]
+
+    record(lambda: handle_tests(event), aws)
+
+    stored = aws.s3.objects[("dlt-bucket", "test-scenarios/bench-test-us-east-1.json")]
+    assert stored["metadata"]["ContentEncoding"] == "gzip"
+    assert len(stored["body"]) < len(json.dumps(event["test_scenario"])) / 10
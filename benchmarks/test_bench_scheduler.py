@@ -0,0 +1,85 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from api.app import handle_scheduler_event, handle_tests
+
+from benchmarks import budgets
+from benchmarks.conftest import REGION
+from benchmarks.test_bench_handle_tests import submission_event
+
+REGION_KEY = (("S", REGION),)
+
+
+def limit_region(aws, max_tasks):
+    aws.dynamodb.tables["RegionInfraTable"][REGION_KEY]["max_tasks"] = {"N": str(max_tasks)}
+
+
+def available_tasks(aws):
+    return int(aws.dynamodb.tables["RegionInfraTable"][REGION_KEY]["available_tasks"]["N"])
+
+
+def execution_ended(aws, test_id, status="SUCCEEDED"):
+    execution = next(
+        execution for execution in aws.stepfunctions.executions.values()
+        if json.loads(execution["input"])["test_id"] == test_id
+    )
+    execution["status"] = status
+    return {
+        "source": "aws.states",
+        "detail-type": "Step Functions Execution Status Change",
+        "detail": {"status": status, "input": execution["input"]},
+    }
+
+
+def test_concurrent_submissions_never_exceed_region_capacity(make_aws):
+    aws = make_aws(latency=0.001)
+    limit_region(aws, 30)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda i: handle_tests(submission_event(f"test-{i:02d}")), range(8)))
+
+    started = [result["test_id"] for result in results if result["status"] == "STARTED"]
+    assert len(started) <= 3
+    assert available_tasks(aws) == 30 - 10 * len(started)
+    assert len(aws.stepfunctions.executions) == len(started)
+    assert len(aws.dynamodb.tables["TestQueueTable"]) == 8 - len(started)
+
+
+def test_finished_test_admits_the_next_in_queue_order(make_aws, record):
+    aws = make_aws()
+    limit_region(aws, 20)
+    for i in range(5):
+        handle_tests(submission_event(f"test-{i}"))
+    urgent = submission_event("urgent")
+    urgent["priority"] = 10
+    assert handle_tests(urgent)["status"] == "QUEUED"
+    aws.calls.clear()
+
+    result, _ = record(lambda: handle_scheduler_event(execution_ended(aws, "test-0")), aws)
+
+    assert result == {"started": ["urgent"]}
+    assert available_tasks(aws) == 0
+    # Delivered twice, the capacity is still only handed back once.
+    handle_scheduler_event(execution_ended(aws, "test-0"))
+    assert available_tasks(aws) == 0
+
+
+def test_schedule_calls(make_aws, record):
+    aws = make_aws()
+    limit_region(aws, 40)
+    for i in range(8):
+        handle_tests(submission_event(f"test-{i}"))
+    # Two of the running tests hand their tasks back.
+    aws.dynamodb.update_item(
+        TableName="RegionInfraTable",
+        Key={"region": {"S": REGION}},
+        UpdateExpression="SET available_tasks = available_tasks + :count",
+        ExpressionAttributeValues={":count": {"N": "20"}},
+    )
+    aws.calls.clear()
+    budget = budgets.schedule(started=2, queued=4)
+
+    result, _ = record(lambda: handle_scheduler_event({"source": "aws.events", "detail-type": "Scheduled Event"}), aws)
+
+    assert result == {"started": ["test-4", "test-5"]}
+    assert dict(aws.calls) == budget["calls"]
@@ -0,0 +1,84 @@
+import pytest
+from botocore.exceptions import ClientError
+
+from task_status_checker_function.app import lambda_handler
+
+from benchmarks import budgets
+from benchmarks.conftest import CLUSTER
+
+
+CLUSTER_SIZES = [10, 100, 1000, 10000]
+TEST_TASK_COUNT = 150
+
+
+def checker_event(test_id="bench-test", task_arns=None):
+    event = {"test_id": test_id, "test_task_config": {"cluster": CLUSTER}}
+    if task_arns is not None:
+        event["task_ids"] = [task_arn.rsplit("/", 1)[-1] for task_arn in task_arns]
+    return event
+
+
+def add_foreign_tasks(aws, cluster_size):
+    """Fills the cluster with the running and the recently stopped tasks of other tests."""
+    aws.ecs.add_tasks(CLUSTER, "other-test", cluster_size)
+    aws.ecs.add_tasks(CLUSTER, "stopped-test", cluster_size, last_status="STOPPED")
+
+
+@pytest.mark.parametrize("cluster_size", CLUSTER_SIZES)
+def test_status_check_with_test_running(make_aws, record, bench_latency, cluster_size):
+    aws = make_aws(latency=bench_latency)
+    add_foreign_tasks(aws, cluster_size)
+    task_arns = aws.ecs.add_tasks(CLUSTER, "bench-test", TEST_TASK_COUNT - 1)
+    task_arns += aws.ecs.add_tasks(CLUSTER, "bench-test", 1, last_status="STOPPED")
+    budget = budgets.status_check(TEST_TASK_COUNT)
+
+    result, elapsed = record(lambda: lambda_handler(checker_event(task_arns=task_arns), {}), aws)
+
+    assert result["isRunning"] is True
+    assert result["task_lifecycle"]["tasks"] == TEST_TASK_COUNT
+    assert dict(aws.calls) == budget["calls"]
+    assert elapsed <= budgets.time_budget(budget["round_trips"], bench_latency)
+
+
+@pytest.mark.parametrize("cluster_size", CLUSTER_SIZES)
+def test_status_check_with_test_finished(make_aws, record, cluster_size):
+    aws = make_aws()
+    add_foreign_tasks(aws, cluster_size)
+    task_arns = aws.ecs.add_tasks(CLUSTER, "bench-test", TEST_TASK_COUNT, last_status="STOPPED")
+
+    result, _ = record(lambda: lambda_handler(checker_event(task_arns=task_arns), {}), aws)
+
+    assert result["isRunning"] is False
+    assert result["task_lifecycle"]["by_status"] == {"STOPPED": TEST_TASK_COUNT}
+    assert dict(aws.calls) == budgets.status_check(TEST_TASK_COUNT)["calls"]
+
+
+@pytest.mark.parametrize("cluster_size", CLUSTER_SIZES)
+def test_status_check_before_launch(make_aws, record, cluster_size):
+    aws = make_aws()
+    add_foreign_tasks(aws, cluster_size)
+
+    result, _ = record(lambda: lambda_handler(checker_event(), {}), aws)
+
+    assert result["isRunning"] is False
+    assert dict(aws.calls) == budgets.status_check(0, task_ids_recorded=False)["calls"]
+
+
+def test_status_check_counts_stopped_tasks_of_the_test_only(make_aws):
+    aws = make_aws()
+    task_arns = aws.ecs.add_tasks(CLUSTER, "bench-test", 2)
+    aws.ecs.add_tasks(CLUSTER, "other-test", 3)
+    ecs = aws.client("ecs")
+    for task in aws.ecs.tasks_in_group(CLUSTER, "bench-test")[:1] + aws.ecs.tasks_in_group(CLUSTER, "other-test"):
+        ecs.stop_task(cluster=CLUSTER, task=task["taskArn"])
+
+    result = lambda_handler(checker_event(task_arns=task_arns), {})
+
+    assert result["task_lifecycle"]["by_status"] == {"RUNNING": 1, "STOPPED": 1}
+
+
+def test_fake_ecs_rejects_started_by_with_other_filters(make_aws):
+    ecs = make_aws().client("ecs")
+
+    with pytest.raises(ClientError, match="startedBy must be the only filter"):
+        ecs.list_tasks(cluster=CLUSTER, startedBy="bench-test", desiredStatus="STOPPED")
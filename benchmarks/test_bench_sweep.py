@@ -0,0 +1,137 @@
+import json
+
+from api.app import handle_scheduler_event, lambda_handler
+
+from benchmarks import budgets
+from benchmarks.test_bench_handle_tests import submission_event
+from benchmarks.test_bench_scheduler import execution_ended, limit_region
+
+
+def sweep_event(sweep_id="sweep", concurrency=(10, 20, 40)):
+    event = submission_event(sweep_id)
+    del event["test_id"]
+    event.update({
+        "resource": "/sweep",
+        "sweep_id": sweep_id,
+        "matrix": {"concurrency": list(concurrency)},
+    })
+    return event
+
+
+def get_sweep(sweep_id="sweep"):
+    return lambda_handler(
+        {"resource": "/sweep/{id}", "httpMethod": "GET", "pathParameters": {"id": sweep_id}}, None
+    )["body"]
+
+
+def statuses(sweep_id="sweep"):
+    return {
+        point["test_id"]: point["status"]
+        for point in get_sweep(sweep_id)["curve"]["points"]
+    }
+
+
+def add_results(aws, test_id, requests, seconds=10, p95=100.0):
+    key = f"results/{test_id}/summary.json"
+    summary = {
+        "rows": requests,
+        "error_rate": 0.0,
+        "latency_ms": {"mean": p95 / 2, "p50": p95 / 2, "p90": p95, "p95": p95, "p99": p95 * 2},
+        "timeline": [{"second": 1700000000 + second, "requests": requests // seconds, "errors": 0} for second in range(seconds)],
+    }
+    aws.s3.put_object(Bucket="dlt-bucket", Key=key, Body=json.dumps(summary).encode())
+    aws.dynamodb.update_item(
+        TableName="TestsTable",
+        Key={"test_id": {"S": test_id}},
+        UpdateExpression="SET results_summary = :key",
+        ExpressionAttributeValues={":key": {"S": key}},
+    )
+
+
+def test_sweep_runs_points_back_to_back(make_aws):
+    aws = make_aws()
+    limit_region(aws, 40)
+
+    response = lambda_handler(sweep_event(), None)
+
+    assert response["statusCode"] == 200
+    assert response["body"]["status"] == "STARTED"
+    assert [point["concurrency"] for point in response["body"]["points"]] == [10, 20, 40]
+    assert statuses() == {"sweep-000": "STARTED", "sweep-001": "PENDING", "sweep-002": "PENDING"}
+
+    # The region has room for more, the next point still waits for the previous one.
+    assert handle_scheduler_event({"source": "aws.events", "detail-type": "Scheduled Event"}) == {"started": []}
+    assert handle_scheduler_event(execution_ended(aws, "sweep-000")) == {"started": ["sweep-001"]}
+    # Delivered twice, the point is not queued again.
+    assert handle_scheduler_event(execution_ended(aws, "sweep-000")) == {"started": []}
+    assert handle_scheduler_event(execution_ended(aws, "sweep-001")) == {"started": ["sweep-002"]}
+    handle_scheduler_event(execution_ended(aws, "sweep-002"))
+
+    assert len(aws.stepfunctions.executions) == 3
+    assert get_sweep()["status"] == "COMPLETED"
+
+
+def test_sweep_points_carry_the_sla(make_aws):
+    aws = make_aws()
+
+    lambda_handler({**sweep_event(concurrency=(10, 20)), "sla": {"max_error_rate": 0.1}}, None)
+    handle_scheduler_event(execution_ended(aws, "sweep-000"))
+
+    inputs = [json.loads(execution["input"]) for execution in aws.stepfunctions.executions.values()]
+    assert [execution_input["test_id"] for execution_input in inputs] == ["sweep-000", "sweep-001"]
+    assert all(execution_input["sla"]["max_error_rate"] == 0.1 for execution_input in inputs)
+
+
+def test_failed_point_ends_the_sweep(make_aws):
+    aws = make_aws()
+    lambda_handler(sweep_event(), None)
+
+    handle_scheduler_event(execution_ended(aws, "sweep-000", status="FAILED"))
+
+    assert get_sweep()["status"] == "FAILED"
+    assert statuses() == {"sweep-000": "STARTED", "sweep-001": "SKIPPED", "sweep-002": "SKIPPED"}
+    assert len(aws.stepfunctions.executions) == 1
+
+
+def test_sweep_queues_behind_other_tests(make_aws):
+    aws = make_aws()
+    limit_region(aws, 10)
+    lambda_handler({**submission_event("other"), "resource": "/test"}, None)
+
+    assert lambda_handler(sweep_event(concurrency=(10, 20)), None)["body"]["status"] == "QUEUED"
+    assert handle_scheduler_event(execution_ended(aws, "other")) == {"started": ["sweep-000"]}
+
+
+def test_sweep_larger_than_the_region_is_rejected(make_aws):
+    aws = make_aws()
+    limit_region(aws, 10)
+    event = sweep_event()
+    event["matrix"]["task_count"] = [5, 20]
+
+    response = lambda_handler(event, None)
+
+    assert response["statusCode"] == 400
+    assert aws.dynamodb.tables["TestsTable"] == {}
+
+
+def test_sweep_curve(make_aws):
+    aws = make_aws()
+    lambda_handler(sweep_event(), None)
+    for test_id, requests, p95 in (("sweep-000", 1000, 80.0), ("sweep-001", 1900, 90.0), ("sweep-002", 1950, 300.0)):
+        add_results(aws, test_id, requests, p95=p95)
+
+    curve = get_sweep()["curve"]
+
+    assert [point["throughput_rps"] for point in curve["points"]] == [100.0, 190.0, 195.0]
+    assert [point["total_concurrency"] for point in curve["points"]] == [100, 200, 400]
+    assert curve["points"][2]["latency_ms"]["p95"] == 300.0
+    assert curve["peak_throughput"] == {"test_id": "sweep-002", "throughput_rps": 195.0}
+    assert curve["knee"]["test_id"] == "sweep-001"
+
+
+def test_sweep_submission_calls(make_aws, record):
+    aws = make_aws()
+
+    record(lambda: lambda_handler(sweep_event(concurrency=(10, 20, 40, 80)), None), aws)
+
+    assert dict(aws.calls) == budgets.sweep_submission(points=4)["calls"]
@@ -0,0 +1,86 @@
+from collections import Counter
+
+import pytest
+
+import sizing
+from task_runner_function.app import lambda_handler
+
+from benchmarks import budgets
+from benchmarks.conftest import CLUSTER
+
+
+TASK_COUNTS = [1, 10, 50, 100, 250, 500]
+
+
+def runner_event(task_count, test_id="bench-test"):
+    return {
+        "isRunning": False,
+        "test_id": test_id,
+        "test_task_config": {
+            "task_count": str(task_count),
+            "cluster": CLUSTER,
+            "task_definition": "dlt-task-family:1",
+            "container_name": "dlt-load-tester",
+            "subnet": "subnet-0123456789",
+        },
+    }
+
+
+@pytest.mark.parametrize("task_count", TASK_COUNTS)
+def test_task_launch(make_aws, record, bench_latency, task_count):
+    aws = make_aws(latency=bench_latency)
+    budget = budgets.task_launch(task_count)
+
+    result, elapsed = record(lambda: lambda_handler(runner_event(task_count), {}), aws)
+
+    assert result["isRunning"] is True
+    assert len(aws.ecs.tasks_in_group(CLUSTER, "bench-test")) == task_count
+    assert dict(aws.calls) == budget["calls"]
+    assert elapsed <= budgets.time_budget(budget["round_trips"], bench_latency)
+
+
+@pytest.mark.parametrize("task_count", [100, 500])
+def test_task_launch_under_throttling(make_aws, record, task_count):
+    aws = make_aws(throttle_rate=0.2, seed=3)
+
+    record(lambda: lambda_handler(runner_event(task_count), {}), aws)
+
+    assert len(aws.ecs.tasks_in_group(CLUSTER, "bench-test")) == task_count
+
+
+def test_task_launch_spreads_subnets_and_falls_back_from_spot(make_aws, record):
+    aws = make_aws()
+    aws.ecs.spot_capacity = 200
+    event = runner_event(500)
+    event["test_task_config"]["subnets"] = ["subnet-a", "subnet-b", "subnet-c", "subnet-d"]
+    event["test_task_config"]["capacity_provider_strategy"] = [
+        {"capacityProvider": "FARGATE_SPOT", "weight": 4, "base": 0},
+        {"capacityProvider": "FARGATE", "weight": 1, "base": 0},
+    ]
+
+    record(lambda: lambda_handler(event, {}), aws)
+
+    tasks = aws.ecs.tasks_in_group(CLUSTER, "bench-test")
+    assert len(tasks) == 500
+    assert Counter(task["capacityProviderName"] for task in tasks)["FARGATE_SPOT"] == 200
+    assert set(Counter(task["subnet"] for task in tasks).values()) == {120, 130}
+
+
+def test_auto_sized_launch_registers_each_size_once(make_aws, record):
+    sizing._sized_task_definitions.clear()
+    aws = make_aws()
+    aws.ecs.register_task_definition(family="dlt-task-family", cpu="2048", memory="4096", containerDefinitions=[])
+
+    def launch(test_id, concurrency):
+        event = runner_event(20, test_id)
+        event["test_task_config"].update(auto_size=True, concurrency=str(concurrency))
+        return lambda_handler(event, {})
+
+    first = launch("first", 1000)
+    record(lambda: launch("second", 900), aws)
+    sizing._sized_task_definitions.clear()
+    third = launch("third", 1000)
+
+    assert aws.calls["ecs.register_task_definition"] == 2
+    assert first["test_task_config"]["task_definition"] == third["test_task_config"]["task_definition"]
+    assert first["test_task_config"]["task_definition"].endswith("dlt-task-family-r1-4096cpu-8192mb:1")
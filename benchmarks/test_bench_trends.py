@@ -0,0 +1,80 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from api.app import lambda_handler
+from run_results import get_segment_key
+from test_finalizer_function.trend_store import append_to_trend
+
+from benchmarks import budgets
+
+FIRST_RUN = datetime(2026, 7, 22, 2, 0, tzinfo=timezone.utc)
+LABELS = [f"/endpoint-{index:02d}" for index in range(20)]
+
+
+def run_summary(night: int) -> dict:
+    p95 = 100.0 + night
+    return {
+        "rows": 10000,
+        "errors": 10,
+        "latency_ms": {"mean": p95 / 2, "max": p95 * 3, "p50": p95 / 2, "p90": p95, "p95": p95, "p99": p95 * 2},
+        "latency_gamma": 1.02,
+        "timeline": [{"second": second, "requests": 100, "errors": 0} for second in range(100)],
+        "labels": {
+            label: {"rows": 500, "errors": 0, "latency_ms": {"p50": p95 / 2, "p90": p95, "p95": p95, "p99": p95 * 2}}
+            for label in LABELS
+        },
+    }
+
+
+def trend_event(**params):
+    return {
+        "resource": "/trend/{name}",
+        "httpMethod": "GET",
+        "pathParameters": {"name": "nightly"},
+        "queryStringParameters": params,
+    }
+
+
+def test_trend_of_90_nightly_runs_reads_two_segments(make_aws, record, bench_latency):
+    aws = make_aws(latency=bench_latency)
+    s3 = aws.client("s3")
+
+    for night in range(90):
+        aws.calls.clear()
+        completed_at = FIRST_RUN + timedelta(days=night)
+        append_to_trend(s3, "dlt-bucket", "nightly", f"run-{night:03d}", completed_at, run_summary(night))
+        assert dict(aws.calls) == budgets.trend_append()["calls"]
+
+    aws.calls.clear()
+    budget = budgets.trend_query(partitions=2)
+    response, elapsed = record(
+        lambda: lambda_handler(trend_event(since="2026-07-22", until="2026-10-19", labels="/endpoint-07"), None), aws
+    )
+
+    trend = response["body"]
+    assert trend["runs"] == 90 and not trend["downsampled"]
+    assert trend["labels"]["/endpoint-07"]["p95"]["mean"] == [100.0 + night for night in range(90)]
+    assert dict(aws.calls) == budget["calls"]
+    assert elapsed <= budgets.time_budget(budget["round_trips"], bench_latency)
+
+    aws.calls.clear()
+    trend = lambda_handler(trend_event(since="2026-07-22", until="2026-10-19", points="30"), None)["body"]
+    assert trend["points"]["runs"] == [3] * 30
+    assert len(trend["labels"]) == len(LABELS)
+    assert trend["overall"]["p95"]["max"][-1] == 189.0
+
+
+def test_concurrent_finalizers_keep_every_run(make_aws):
+    aws = make_aws()
+    s3 = aws.client("s3")
+
+    def append(run):
+        return append_to_trend(s3, "dlt-bucket", "nightly", f"run-{run}", FIRST_RUN, run_summary(run))
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        keys = set(executor.map(append, range(8)))
+
+    segment_key = get_segment_key("nightly", "2026-Q3")
+    assert keys == {segment_key}
+    trend = lambda_handler(trend_event(since="2026-07-01", until="2026-07-31"), None)["body"]
+    assert sorted(trend["points"]["last_test_id"]) == [f"run-{run}" for run in range(8)]
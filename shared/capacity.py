@@ -0,0 +1,52 @@
+"""Capacity a test reserves from its region, see ``scheduler.py`` of the API.
+
+A test admitted by the scheduler holds ``reserved_tasks`` of the region's
+``available_tasks`` until they are handed back, either when its execution
+ends or when the state machine gives up finalizing it. The
+``capacity_released`` flag on the test record makes sure whichever comes
+first is the only one handing them back.
+"""
+from typing import Optional
+
+from botocore.exceptions import ClientError
+
+
+def is_conditional_check_failure(error: ClientError) -> bool:
+    return error.response["Error"]["Code"] == "ConditionalCheckFailedException"
+
+
+def release_capacity(dynamodb, table: str, region: str, task_count: int):
+    dynamodb.update_item(
+        TableName=table,
+        Key={"region": {"S": region}},
+        UpdateExpression="SET available_tasks = available_tasks + :count",
+        ConditionExpression="attribute_exists(available_tasks)",
+        ExpressionAttributeValues={":count": {"N": str(task_count)}},
+    )
+
+
+def claim_capacity_release(dynamodb, table: str, test_id: str) -> bool:
+    """Flags the capacity of the test released, returns False if it was released already or the test is gone."""
+    try:
+        dynamodb.update_item(
+            TableName=table,
+            Key={"test_id": {"S": test_id}},
+            UpdateExpression="SET capacity_released = :released",
+            ConditionExpression="attribute_exists(test_id) AND attribute_not_exists(capacity_released)",
+            ExpressionAttributeValues={":released": {"BOOL": True}},
+        )
+    except ClientError as e:
+        if is_conditional_check_failure(e):
+            return False
+        raise
+    return True
+
+
+def release_test_reservation(
+    dynamodb, tests_table: str, region_table: str, region: str, test_id: str, reserved_tasks: Optional[int]
+) -> bool:
+    """Hands back the tasks reserved for the test, returns False if there were none or they were handed back already."""
+    if not reserved_tasks or not claim_capacity_release(dynamodb, tests_table, test_id):
+        return False
+    release_capacity(dynamodb, region_table, region, reserved_tasks)
+    return True
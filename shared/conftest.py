@@ -0,0 +1,7 @@
+import os
+import sys
+
+
+# The modules are copied next to the handler of every Lambda that uses them,
+# which imports them by their bare names.
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
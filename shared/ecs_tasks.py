@@ -0,0 +1,45 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+logger = logging.getLogger()
+
+# StopTask is throttled per account, a bounded pool keeps teardown fast without tripping it.
+STOP_TASKS_MAX_WORKERS = 32
+
+
+def list_running_test_task_arns(ecs, cluster: str, test_id: str) -> List[str]:
+    """Returns the ARNs of the tasks the runner started for the test that have not stopped yet.
+
+    The runner starts every task of a test with ``startedBy`` set to the test
+    id, so only the test's own tasks are listed, whatever else runs on the
+    cluster.
+    """
+    task_arns = []
+    params = {"cluster": cluster, "startedBy": test_id}
+
+    while True:
+        response = ecs.list_tasks(**params)
+        task_arns += response.get("taskArns", [])
+
+        next_token = response.get("nextToken")
+        if not next_token:
+            return task_arns
+        params["nextToken"] = next_token
+
+
+def stop_tasks(ecs, cluster: str, task_arns: List[str], reason: str, max_workers: int = STOP_TASKS_MAX_WORKERS):
+    """Stops the tasks concurrently, returns the ARNs that could not be stopped."""
+    if not task_arns:
+        return []
+
+    def stop(task_arn):
+        try:
+            ecs.stop_task(cluster=cluster, task=task_arn, reason=reason)
+            return None
+        except Exception as e:
+            logger.error("Failed to stop task %s: %s", task_arn, e)
+            return task_arn
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(task_arns))) as executor:
+        return [task_arn for task_arn in executor.map(stop, task_arns) if task_arn is not None]
@@ -0,0 +1,144 @@
+"""Mergeable heavy-hitter sketches of the failed requests of a test.
+
+Failed KPI rows are counted by error message, response code and URL in a
+Space-Saving summary per dimension: at most ``2 * TOP_K_CAPACITY`` counters
+are kept, and pruning back to the largest ``TOP_K_CAPACITY`` raises the
+floor every new item starts from. A count may then be over-estimated by its
+recorded error, never under-estimated, and two summaries merge into one
+with the same guarantee, so every task file is sketched on its own and the
+sketches are merged fleet-wide.
+
+A count-min sketch over ``(dimension, minute, item)`` gives the per-minute
+breakdown of the items that end up on top, whichever tasks they came from.
+
+Memory stays bounded by the capacities whatever the number of distinct
+messages or URLs.
+"""
+import hashlib
+from typing import Dict, List
+
+DIMENSIONS = ("messages", "response_codes", "urls")
+
+TOP_K_CAPACITY = 100
+REPORT_TOP_K = 10
+
+COUNT_MIN_WIDTH = 2048
+COUNT_MIN_DEPTH = 4
+
+# Error messages and URLs are truncated, they sometimes carry whole response bodies.
+MAX_ITEM_LENGTH = 200
+
+
+def new_error_sketch() -> Dict:
+    return {
+        "dimensions": {dimension: {"floor": 0, "counters": {}} for dimension in DIMENSIONS},
+        "minutes": {},
+        # Sparse, cells are keyed by their index into the depth x width table.
+        "count_min": {},
+    }
+
+
+def count_min_cells(key: str) -> List[str]:
+    """Returns the cell of the key in every row of the count-min table."""
+    digest = hashlib.blake2b(key.encode(), digest_size=4 * COUNT_MIN_DEPTH).digest()
+    return [
+        str(row * COUNT_MIN_WIDTH + int.from_bytes(digest[4 * row:4 * row + 4], "little") % COUNT_MIN_WIDTH)
+        for row in range(COUNT_MIN_DEPTH)
+    ]
+
+
+def count_min_key(dimension: str, minute: str, item: str) -> str:
+    return f"{dimension}\x1f{minute}\x1f{item}"
+
+
+def add_to_summary(summary: Dict, item: str, count: int = 1) -> None:
+    counters = summary["counters"]
+    if item in counters:
+        counters[item][0] += count
+        return
+    counters[item] = [summary["floor"] + count, summary["floor"]]
+    if len(counters) > 2 * TOP_K_CAPACITY:
+        prune_summary(summary)
+
+
+def prune_summary(summary: Dict) -> None:
+    ordered = sorted(summary["counters"].items(), key=lambda counter: counter[1][0], reverse=True)
+    if len(ordered) > TOP_K_CAPACITY:
+        summary["floor"] = max(summary["floor"], ordered[TOP_K_CAPACITY][1][0])
+    summary["counters"] = dict(ordered[:TOP_K_CAPACITY])
+
+
+def get_error_items(row: Dict) -> Dict[str, str]:
+    message = row.get("failureMessage") or row.get("responseMessage") or ""
+    return {
+        "messages": message[:MAX_ITEM_LENGTH],
+        "response_codes": row.get("responseCode") or "",
+        # JMeter only saves the URL when configured to, the label stands in for it.
+        "urls": (row.get("URL") or row.get("label") or "")[:MAX_ITEM_LENGTH],
+    }
+
+
+def add_error(sketch: Dict, row: Dict, second: int) -> None:
+    """Counts a failed KPI row."""
+    minute = str(second // 60 * 60)
+    sketch["minutes"][minute] = sketch["minutes"].get(minute, 0) + 1
+    table = sketch["count_min"]
+    for dimension, item in get_error_items(row).items():
+        add_to_summary(sketch["dimensions"][dimension], item)
+        for cell in count_min_cells(count_min_key(dimension, minute, item)):
+            table[cell] = table.get(cell, 0) + 1
+
+
+def merge_error_sketches(merged: Dict, sketch: Dict) -> None:
+    """Merges ``sketch`` into ``merged`` in place."""
+    for dimension in DIMENSIONS:
+        target, source = merged["dimensions"][dimension], sketch["dimensions"][dimension]
+        counters = {}
+        for item in set(target["counters"]) | set(source["counters"]):
+            # An item missing from a summary may have been counted up to its floor there.
+            count, error = target["counters"].get(item, [target["floor"], target["floor"]])
+            other_count, other_error = source["counters"].get(item, [source["floor"], source["floor"]])
+            counters[item] = [count + other_count, error + other_error]
+        target["counters"] = counters
+        target["floor"] += source["floor"]
+        prune_summary(target)
+
+    for minute, count in sketch["minutes"].items():
+        merged["minutes"][minute] = merged["minutes"].get(minute, 0) + count
+    table = merged["count_min"]
+    for cell, count in sketch["count_min"].items():
+        table[cell] = table.get(cell, 0) + count
+
+
+def estimate_minute_count(sketch: Dict, dimension: str, minute: str, item: str) -> int:
+    table = sketch["count_min"]
+    estimate = min(table.get(cell, 0) for cell in count_min_cells(count_min_key(dimension, minute, item)))
+    return min(estimate, sketch["minutes"].get(minute, 0))
+
+
+def minute_counts(sketch: Dict, dimension: str, item: str) -> List[Dict]:
+    counts = []
+    for minute in sorted(sketch["minutes"], key=int):
+        count = estimate_minute_count(sketch, dimension, minute, item)
+        if count:
+            counts.append({"minute": int(minute), "count": count})
+    return counts
+
+
+def top_errors(sketch: Dict, top_k: int = REPORT_TOP_K) -> Dict:
+    """Returns the most frequent items of every dimension with their per-minute counts."""
+    report = {"errors": sum(sketch["minutes"].values())}
+    for dimension in DIMENSIONS:
+        counters = sketch["dimensions"][dimension]["counters"]
+        ranked = sorted(counters.items(), key=lambda counter: (-counter[1][0], counter[0]))[:top_k]
+        report[dimension] = [
+            {
+                "value": item,
+                "count": count,
+                # The count is exact when this is 0.
+                "max_overcount": error,
+                "per_minute": minute_counts(sketch, dimension, item),
+            }
+            for item, (count, error) in ranked
+        ]
+    return report
@@ -0,0 +1,72 @@
+"""Latency sketch and partial aggregate of KPI rows.
+
+The tasks of the tester image (``sampling.py``, ``live_metrics.py``) and the
+finalizer's ``aggregation.py`` compute partials that are merged with each
+other, so they bucket latencies, lay partials out and fold rows into them
+from this one module.
+"""
+import math
+from typing import Dict, Optional, Tuple
+
+from error_sketch import add_error, new_error_sketch
+
+# Latency buckets grow by 2%, which keeps every percentile within 1% of the exact value.
+LATENCY_GAMMA = 1.02
+
+
+def latency_bucket(elapsed_ms: float) -> int:
+    return math.ceil(math.log(max(elapsed_ms, 1), LATENCY_GAMMA))
+
+
+def new_partial() -> Dict:
+    return {
+        "rows": 0,
+        "errors": 0,
+        "elapsed_sum": 0,
+        "elapsed_max": 0,
+        "latency_buckets": {},
+        "timeline": {},
+        "labels": {},
+        "error_sketch": new_error_sketch(),
+        # The tasks whose generator was saturated, see telemetry.py of the tester image.
+        "saturated_tasks": [],
+    }
+
+
+def new_label() -> Dict:
+    return {"rows": 0, "errors": 0, "elapsed_sum": 0, "latency_buckets": {}}
+
+
+def add_row(partial: Dict, label_name: str, elapsed: int, second: str, error: bool) -> None:
+    partial["rows"] += 1
+    partial["errors"] += error
+    partial["elapsed_sum"] += elapsed
+    partial["elapsed_max"] = max(partial["elapsed_max"], elapsed)
+
+    bucket = str(latency_bucket(elapsed))
+    partial["latency_buckets"][bucket] = partial["latency_buckets"].get(bucket, 0) + 1
+
+    point = partial["timeline"].setdefault(second, [0, 0])
+    point[0] += 1
+    point[1] += error
+
+    label = partial["labels"].setdefault(label_name, new_label())
+    label["rows"] += 1
+    label["errors"] += error
+    label["elapsed_sum"] += elapsed
+    label["latency_buckets"][bucket] = label["latency_buckets"].get(bucket, 0) + 1
+
+
+def fold_row(partial: Dict, row: Dict) -> Optional[Tuple[str, int, bool]]:
+    """Folds a KPI row into the partial, returns its label, elapsed time and error flag, or None if malformed."""
+    try:
+        elapsed = int(row["elapsed"])
+        second = str(int(row["timeStamp"]) // 1000)
+    except (KeyError, TypeError, ValueError):
+        return None
+    error = row.get("success") != "true"
+    label_name = row.get("label", "")
+    add_row(partial, label_name, elapsed, second, error)
+    if error:
+        add_error(partial["error_sketch"], row, int(second))
+    return label_name, elapsed, error
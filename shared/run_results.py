@@ -0,0 +1,37 @@
+"""Definitions of the results of a run, shared by the finalizer that writes
+them and the API that reads them.
+
+The timeline of a summary is sparse, it only has the seconds in which
+requests completed. Throughput is the rows over the seconds the timeline
+spans, silent seconds included, wherever it is reported: in the trends, the
+sweep curves and the comparisons.
+"""
+from typing import Dict, List, Optional
+from urllib.parse import quote
+
+TRENDS_PREFIX = "trends/"
+
+
+def get_segment_key(test_name: str, partition: str) -> str:
+    # Test names are free text, they must not add levels to the key.
+    return f"{TRENDS_PREFIX}{quote(test_name, safe='')}/{partition}.json"
+
+
+def get_requests_per_second(timeline: List[Dict]) -> List[int]:
+    """Returns the requests of every second the timeline spans, 0 for the seconds without any."""
+    if not timeline:
+        return []
+    first = timeline[0]["second"]
+    requests = [0] * (timeline[-1]["second"] - first + 1)
+    for point in timeline:
+        requests[point["second"] - first] = point["requests"]
+    return requests
+
+
+def get_throughput(summary: Dict) -> Optional[float]:
+    """Requests per second over the seconds the timeline spans."""
+    timeline = summary.get("timeline") or []
+    if not timeline:
+        return None
+    seconds = timeline[-1]["second"] - timeline[0]["second"] + 1
+    return round(summary["rows"] / seconds, 3)
@@ -0,0 +1,47 @@
+from unittest.mock import MagicMock, call
+
+from ecs_tasks import list_running_test_task_arns, stop_tasks
+
+
+def test_list_running_test_task_arns_pages_by_started_by():
+    ecs = MagicMock()
+    ecs.list_tasks.side_effect = [
+        {"taskArns": ["1", "2"], "nextToken": "token"},
+        {"taskArns": ["3"]},
+    ]
+
+    assert list_running_test_task_arns(ecs, "cluster", "123") == ["1", "2", "3"]
+    ecs.list_tasks.assert_has_calls([
+        call(cluster="cluster", startedBy="123"),
+        call(cluster="cluster", startedBy="123", nextToken="token"),
+    ])
+    ecs.describe_tasks.assert_not_called()
+
+
+def test_stop_tasks_stops_every_task():
+    ecs = MagicMock()
+
+    failed = stop_tasks(ecs, "cluster", ["1", "2", "3"], "aborted")
+
+    assert failed == []
+    assert sorted(c.kwargs["task"] for c in ecs.stop_task.call_args_list) == ["1", "2", "3"]
+    assert all(c.kwargs["reason"] == "aborted" for c in ecs.stop_task.call_args_list)
+
+
+def test_stop_tasks_returns_tasks_that_failed_to_stop():
+    def stop_task(task, **_):
+        if task == "2":
+            raise RuntimeError("task not found")
+        return {}
+
+    ecs = MagicMock()
+    ecs.stop_task.side_effect = stop_task
+
+    assert stop_tasks(ecs, "cluster", ["1", "2", "3"], "aborted") == ["2"]
+
+
+def test_stop_tasks_without_tasks():
+    ecs = MagicMock()
+
+    assert stop_tasks(ecs, "cluster", [], "aborted") == []
+    ecs.stop_task.assert_not_called()
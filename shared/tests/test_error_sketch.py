@@ -0,0 +1,64 @@
+import random
+
+import error_sketch
+from error_sketch import add_error, merge_error_sketches, new_error_sketch, top_errors
+
+
+def failed_row(message, code="500", url="https://example.com/checkout"):
+    return {"responseMessage": message, "responseCode": code, "URL": url, "label": "checkout", "success": "false"}
+
+
+def test_top_errors_counts_exactly_within_capacity():
+    sketch = new_error_sketch()
+    for second in range(120):
+        add_error(sketch, failed_row("Internal Server Error"), 1700000040 + second)
+    for second in range(30):
+        add_error(sketch, {**failed_row("Timeout", code="504"), "failureMessage": "Read timed out"}, 1700000040)
+
+    report = top_errors(sketch)
+
+    assert report["errors"] == 150
+    assert [(entry["value"], entry["count"], entry["max_overcount"]) for entry in report["messages"]] == [
+        ("Internal Server Error", 120, 0),
+        ("Read timed out", 30, 0),
+    ]
+    assert [entry["value"] for entry in report["response_codes"]] == ["500", "504"]
+    assert report["urls"][0] == {
+        "value": "https://example.com/checkout",
+        "count": 150,
+        "max_overcount": 0,
+        "per_minute": [{"minute": 1700000040, "count": 90}, {"minute": 1700000100, "count": 60}],
+    }
+
+
+def test_heavy_hitters_survive_a_long_tail(monkeypatch):
+    monkeypatch.setattr(error_sketch, "TOP_K_CAPACITY", 20)
+    generator = random.Random(7)
+    sketch = new_error_sketch()
+    exact = {}
+    for index in range(20000):
+        message = f"heavy {index % 3}" if index % 4 == 0 else f"unique {generator.random()}"
+        exact[message] = exact.get(message, 0) + 1
+        add_error(sketch, failed_row(message), 1700000000)
+
+    report = top_errors(sketch, top_k=3)
+
+    assert {entry["value"] for entry in report["messages"]} == {"heavy 0", "heavy 1", "heavy 2"}
+    for entry in report["messages"]:
+        # Never under-estimated, and over-estimated by at most the recorded error.
+        assert entry["count"] - entry["max_overcount"] <= exact[entry["value"]] <= entry["count"]
+    assert len(sketch["dimensions"]["messages"]["counters"]) <= 40
+
+
+def test_merged_sketches_match_one_sketch_of_all_rows():
+    rows = [(failed_row(f"error {index % 5}", code=str(500 + index % 3)), 1700000000 + index) for index in range(300)]
+    whole, first, second = new_error_sketch(), new_error_sketch(), new_error_sketch()
+    for index, (row, second_of_row) in enumerate(rows):
+        add_error(whole, row, second_of_row)
+        add_error(first if index % 2 else second, row, second_of_row)
+
+    merged = new_error_sketch()
+    merge_error_sketches(merged, first)
+    merge_error_sketches(merged, second)
+
+    assert top_errors(merged) == top_errors(whole)
@@ -0,0 +1,31 @@
+from error_sketch import top_errors
+from latency_sketch import fold_row, latency_bucket, new_partial
+
+
+def kpi_row(timestamp, elapsed, label, success):
+    return {"timeStamp": str(timestamp), "elapsed": str(elapsed), "label": label, "success": success}
+
+
+def test_fold_row_counts_the_row_in_the_partial_and_its_label():
+    partial = new_partial()
+
+    assert fold_row(partial, kpi_row(1700000000500, 120, "home", "true")) == ("home", 120, False)
+    assert fold_row(partial, {**kpi_row(1700000001000, 80, "home", "false"), "responseCode": "500"}) == (
+        "home", 80, True
+    )
+
+    assert (partial["rows"], partial["errors"], partial["elapsed_sum"], partial["elapsed_max"]) == (2, 1, 200, 120)
+    assert partial["timeline"] == {"1700000000": [1, 0], "1700000001": [1, 1]}
+    assert partial["labels"]["home"]["latency_buckets"] == {
+        str(latency_bucket(120)): 1,
+        str(latency_bucket(80)): 1,
+    }
+    assert top_errors(partial["error_sketch"])["errors"] == 1
+
+
+def test_fold_row_skips_malformed_rows():
+    partial = new_partial()
+
+    assert fold_row(partial, {"timeStamp": "not a number", "elapsed": "10"}) is None
+    assert fold_row(partial, {"elapsed": "10"}) is None
+    assert partial["rows"] == 0
@@ -0,0 +1,22 @@
+from run_results import get_requests_per_second, get_segment_key, get_throughput
+
+
+def timeline(*points):
+    return [{"second": second, "requests": requests, "errors": 0} for second, requests in points]
+
+
+def test_get_segment_key():
+    assert get_segment_key("checkout/nightly run", "2026-Q4") == "trends/checkout%2Fnightly%20run/2026-Q4.json"
+
+
+def test_get_requests_per_second_fills_silent_seconds():
+    assert get_requests_per_second(timeline((100, 5), (101, 7), (104, 3))) == [5, 7, 0, 0, 3]
+    assert get_requests_per_second([]) == []
+
+
+def test_get_throughput_counts_silent_seconds():
+    summary = {"rows": 15, "timeline": timeline((100, 5), (101, 7), (104, 3))}
+
+    assert get_throughput(summary) == 3.0
+    assert get_throughput(summary) == sum(get_requests_per_second(summary["timeline"])) / 5
+    assert get_throughput({"rows": 0, "timeline": []}) is None
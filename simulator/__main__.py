@@ -0,0 +1,62 @@
+"""Simulates the test flow for a range of fleet sizes and prints what each took.
+
+    python -m simulator --task-counts 1 10 100 500 --duration 3600 --straggler-rate 0.1
+"""
+import argparse
+import json
+import sys
+import time
+
+from simulator.harness import LambdaFaults, simulate_test
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Runs the DLT state machine in simulated time.")
+    parser.add_argument("--task-counts", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--duration", type=int, default=3600, help="Hold-for of the test in seconds.")
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated AWS round trip in seconds.")
+    parser.add_argument("--startup-seconds", type=float, default=45.0)
+    parser.add_argument("--straggler-rate", type=float, default=0.0)
+    parser.add_argument("--straggler-seconds", type=float, default=180.0)
+    parser.add_argument("--crash-rate", type=float, default=0.0)
+    parser.add_argument("--lambda-error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Prints one JSON report per line instead of a table.")
+    args = parser.parse_args(argv)
+
+    fleet_options = {
+        "startup_seconds": args.startup_seconds,
+        "straggler_rate": args.straggler_rate,
+        "straggler_seconds": args.straggler_seconds,
+        "crash_rate": args.crash_rate,
+    }
+    if not args.json:
+        print(f"{'tasks':>6} {'status':>10} {'simulated s':>12} {'to result s':>12} {'polls':>6} "
+              f"{'api calls':>10} {'retries':>8} {'wall ms':>8}")
+
+    for task_count in args.task_counts:
+        started = time.perf_counter()
+        report = simulate_test(
+            task_count=task_count,
+            duration=args.duration,
+            latency=args.latency,
+            faults=LambdaFaults(error_rate=args.lambda_error_rate, seed=args.seed),
+            fleet_options=fleet_options,
+            seed=args.seed,
+        )
+        wall_ms = (time.perf_counter() - started) * 1000
+        report.pop("history")
+        report.pop("output")
+
+        if args.json:
+            print(json.dumps({**report, "wall_ms": round(wall_ms, 1)}))
+            continue
+        time_to_result = report["time_to_result_seconds"]
+        print(f"{task_count:>6} {report['status']:>10} {report['simulated_seconds']:>12.1f} "
+              f"{'-' if time_to_result is None else f'{time_to_result:.1f}':>12} {report['polls']:>6} "
+              f"{sum(report['api_calls'].values()):>10} {report['retries']:>8} {wall_ms:>8.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,7 @@
+import os
+import sys
+
+
+# The simulator and the fakes it runs on are imported as packages from the
+# root of the repository, the harness adds the code directories of the Lambdas.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
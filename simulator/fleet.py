@@ -0,0 +1,162 @@
+"""Moves the tasks of the fake ECS cluster through their lifecycle in simulated time.
+
+Tasks started with RunTask provision, run the test and stop on their own,
+like the tester container does when bzt ends. Before stopping, each task
+stores a KPI file and records it in the results manifest, the way
+``load-test.sh`` does. These writes bypass the fakes' call counters because
+they are made by the container, not by the orchestration.
+
+Failure patterns are drawn per task from a seeded random generator:
+stragglers run longer than the test, crashed tasks stop early without
+uploading anything, and hung tasks upload their results but never exit,
+like a container stuck on a later upload.
+
+With ``live_metrics`` running tasks also publish the metrics the tester
+image's ``live_metrics.py`` would, at the given requests per second, error
+rate and latency. Tasks stopped through StopTask, by the SLA guard for
+instance, stop without uploading results.
+"""
+import hashlib
+import random
+import uuid
+from typing import Dict, Optional
+
+KPI_HEADER = "timeStamp,elapsed,label,responseCode,success\n"
+
+
+class FleetModel:
+    def __init__(
+        self,
+        aws,
+        duration: float,
+        results_bucket: str,
+        manifest_table: str = "ResultsManifestTable",
+        startup_seconds: float = 45.0,
+        shutdown_seconds: float = 20.0,
+        straggler_rate: float = 0.0,
+        straggler_seconds: float = 180.0,
+        crash_rate: float = 0.0,
+        hang_rate: float = 0.0,
+        kpi_rows: int = 50,
+        live_metrics: Optional[Dict] = None,
+        seed: int = 0,
+    ):
+        self.aws = aws
+        self.duration = duration
+        self.results_bucket = results_bucket
+        self.manifest_table = manifest_table
+        self.startup_seconds = startup_seconds
+        self.shutdown_seconds = shutdown_seconds
+        self.straggler_rate = straggler_rate
+        self.straggler_seconds = straggler_seconds
+        self.crash_rate = crash_rate
+        self.hang_rate = hang_rate
+        self.kpi_rows = kpi_rows
+        self.live_metrics = live_metrics
+        self._random = random.Random(seed)
+        self._plans: Dict[str, Dict] = {}
+        self.stopped = {"completed": 0, "crashed": 0, "stopped": 0}
+        self.last_stopped_at: Optional[float] = None
+
+    def advance(self) -> None:
+        """Applies every status change that is due at the current simulated time."""
+        now = self.aws.clock.now()
+        for tasks in self.aws.ecs.clusters.values():
+            for task in tasks:
+                plan = self._plans.get(task["taskArn"])
+                if task["desiredStatus"] == "STOPPED":
+                    if plan is not None and not plan["stopped"]:
+                        self._stopped_by_request(task, plan, now)
+                    continue
+                plan = plan or self._plan(task)
+                if now >= plan["running_at"] and task["lastStatus"] == "PROVISIONING":
+                    task["lastStatus"] = "RUNNING"
+                    task["startedAt"] = plan["running_at"]
+                if plan["hung"] and not plan["uploaded"] and now >= plan["uploads_at"]:
+                    plan["uploaded"] = True
+                    self._upload_results(task)
+                if self.live_metrics and task["lastStatus"] == "RUNNING":
+                    self._publish_metrics(task, plan, min(now, plan["stops_at"], plan["uploads_at"]))
+                if now >= plan["stops_at"]:
+                    self._stop(task, plan)
+
+    def _plan(self, task: Dict) -> Dict:
+        running_at = task["createdAt"] + self.startup_seconds
+        crashed = self._random.random() < self.crash_rate
+        hung = not crashed and self.hang_rate > 0 and self._random.random() < self.hang_rate
+        uploads_at = running_at + self.duration + self.shutdown_seconds
+        if crashed:
+            stops_at = running_at + self._random.uniform(0, self.duration)
+        elif hung:
+            stops_at = float("inf")
+        else:
+            stops_at = uploads_at
+            if self._random.random() < self.straggler_rate:
+                stops_at += self._random.uniform(0, self.straggler_seconds)
+
+        plan = {
+            "running_at": running_at,
+            "stops_at": stops_at,
+            "crashed": crashed,
+            "hung": hung,
+            "uploaded": False,
+            "uploads_at": uploads_at,
+            "stopped": False,
+            "published_at": running_at,
+        }
+        self._plans[task["taskArn"]] = plan
+        return plan
+
+    def _publish_metrics(self, task: Dict, plan: Dict, until: float) -> None:
+        requests = int(self.live_metrics["requests_per_second"] * (until - plan["published_at"]))
+        if requests <= 0:
+            return
+        plan["published_at"] = until
+        dimensions = [{"Name": "TestId", "Value": task["group"]}]
+        self.aws.cloudwatch.store("DLT/LoadTest", [
+            {"MetricName": "Requests", "Dimensions": dimensions, "Value": requests},
+            {"MetricName": "Errors", "Dimensions": dimensions, "Value": int(requests * self.live_metrics["error_rate"])},
+            {
+                "MetricName": "Latency",
+                "Dimensions": dimensions,
+                "Values": [self.live_metrics["latency_ms"]],
+                "Counts": [requests],
+            },
+        ], timestamp=until)
+
+    def _stopped_by_request(self, task: Dict, plan: Dict, now: float) -> None:
+        plan["stopped"] = True
+        task["stoppedAt"] = now
+        # bzt is interrupted, the container exits on SIGTERM.
+        task["containers"] = [{"name": "dlt-load-tester", "exitCode": 143}]
+        self.stopped["stopped"] += 1
+        self.last_stopped_at = max(self.last_stopped_at or now, now)
+
+    def _stop(self, task: Dict, plan: Dict) -> None:
+        plan["stopped"] = True
+        if not plan["crashed"]:
+            self._upload_results(task)
+        task["desiredStatus"] = task["lastStatus"] = "STOPPED"
+        task["stoppedReason"] = "Essential container in task exited"
+        task["stoppedAt"] = plan["stops_at"]
+        task["containers"] = [{"name": "dlt-load-tester", "exitCode": 137 if plan["crashed"] else 0}]
+        self.stopped["crashed" if plan["crashed"] else "completed"] += 1
+        self.last_stopped_at = max(self.last_stopped_at or plan["stops_at"], plan["stops_at"])
+
+    def _upload_results(self, task: Dict) -> None:
+        key = f"results/{task['group']}/{uuid.UUID(int=self._random.getrandbits(128)).hex}/kpi.jtl"
+        started_ms = int(task["createdAt"] * 1000)
+        body = (KPI_HEADER + "".join(
+            f"{started_ms + row * 1000},{self._random.randint(20, 400)},home,200,true\n"
+            for row in range(self.kpi_rows)
+        )).encode()
+        etag = hashlib.md5(body).hexdigest()
+
+        self.aws.s3.objects[(self.results_bucket, key)] = {"body": body, "etag": f'"{etag}"', "metadata": {}}
+        self.aws.dynamodb.tables[self.manifest_table][(("S", task["group"]), ("S", key))] = {
+            "test_id": {"S": task["group"]},
+            "key": {"S": key},
+            "size": {"N": str(len(body))},
+            "etag": {"S": etag},
+            "rows": {"N": str(self.kpi_rows)},
+        }
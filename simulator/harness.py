@@ -0,0 +1,188 @@
+"""Runs the DLT test flow end to end in simulated time.
+
+A test is submitted through the real API handler, then the execution it
+starts is interpreted from the state machine definition, invoking the real
+task runner, status checker and finalizer handlers. Every AWS client is a
+fake from ``benchmarks/fake_aws.py`` sharing one simulated clock, so waits,
+retries, API latency and the fleet's lifetime cost no wall time.
+"""
+import json
+import os
+import random
+import tempfile
+from collections import Counter
+from typing import Dict, List, Optional
+from unittest.mock import patch
+
+from benchmarks.paths import ROOT, add_lambda_folders
+
+add_lambda_folders()
+
+from api.app import handle_tests  # noqa: E402
+from task_runner_function.app import lambda_handler as task_runner_handler  # noqa: E402
+from task_status_checker_function.app import lambda_handler as task_status_checker_handler  # noqa: E402
+from task_status_checker_function.deadline_watchdog import lambda_handler as deadline_watchdog_handler  # noqa: E402
+from task_status_checker_function.sla_guard import lambda_handler as sla_guard_handler  # noqa: E402
+from test_finalizer_function.app import lambda_handler as test_finalizer_handler  # noqa: E402
+from test_finalizer_function.finalize_failure import lambda_handler as finalize_failure_handler  # noqa: E402
+
+from benchmarks.fake_aws import FakeAWS, SimulatedClock  # noqa: E402
+from simulator.fleet import FleetModel  # noqa: E402
+from simulator.interpreter import StateMachineInterpreter, StatesError, load_definition  # noqa: E402
+
+DEFINITION_PATH = os.path.join(ROOT, "state-machine", "taurus-test-task-handler.json")
+
+REGION = "us-east-1"
+CLUSTER = "DLT-ECS-Cluster"
+BUCKET = "dlt-bucket"
+STATE_MACHINE_ARN = "arn:aws:states:us-east-1:000000000000:stateMachine:TaurusStateMachine"
+
+# The DefinitionSubstitutions of the template, each Lambda is registered under its logical name.
+FUNCTIONS = {
+    "TaskStatusCheckerLambdaFunction": task_status_checker_handler,
+    "TaskRunnerLambdaFunction": task_runner_handler,
+    "TestFinalizerLambdaFunction": test_finalizer_handler,
+    "SLAGuardLambdaFunction": sla_guard_handler,
+    "DeadlineWatchdogLambdaFunction": deadline_watchdog_handler,
+    "FinalizeFailureLambdaFunction": finalize_failure_handler,
+}
+STATUS_CHECKER = "TaskStatusCheckerLambdaFunction"
+
+ENVIRONMENT = {
+    "AWS_TESTS_REGION": REGION,
+    "TEST_AWS_REGION": REGION,
+    "TEST_SCENARIOS_BUCKET": BUCKET,
+    "SCENARIOS_BUCKET": BUCKET,
+    "RESULTS_BUCKET": BUCKET,
+    "TAURUS_STATE_MACHINE_ARN": STATE_MACHINE_ARN,
+    "REGION_INFRA_TABLE": "RegionInfraTable",
+    "TESTS_TABLE": "TestsTable",
+    "TEST_QUEUE_TABLE": "TestQueueTable",
+    "RESULTS_MANIFEST_TABLE": "ResultsManifestTable",
+}
+
+
+def create_environment(aws: FakeAWS, max_tasks: Optional[int] = None) -> None:
+    aws.dynamodb.create_table("RegionInfraTable", "region")
+    aws.dynamodb.create_table("TestsTable", "test_id")
+    aws.dynamodb.create_table("TestQueueTable", "region", "queue_key")
+    aws.dynamodb.create_table("ResultsManifestTable", "test_id", "key")
+    aws.dynamodb.tables["RegionInfraTable"][(("S", REGION),)] = {
+        "region": {"S": REGION},
+        "subnet": {"S": "subnet-0123456789"},
+        "cluster": {"S": CLUSTER},
+        "task_definition": {"S": "dlt-task-family:1"},
+        "task_container": {"S": "dlt-load-tester"},
+    }
+    if max_tasks is not None:
+        aws.dynamodb.tables["RegionInfraTable"][(("S", REGION),)]["max_tasks"] = {"N": str(max_tasks)}
+
+
+def submission_event(test_id: str, task_count: int, duration: int, concurrency: int, sla: Optional[Dict] = None) -> Dict:
+    event = {
+        "httpMethod": "POST",
+        "test_id": test_id,
+        "test_name": "simulation",
+        "test_description": "simulated test",
+        "test_task_config": {"concurrency": str(concurrency), "task_count": str(task_count)},
+        "test_scenario": {
+            "execution": [{"scenario": "simulation", "hold-for": f"{duration}s", "ramp-up": "1m"}],
+            "scenarios": {"simulation": {"script": f"{test_id}.jmx"}},
+        },
+    }
+    if sla is not None:
+        event["sla"] = sla
+    return event
+
+
+class LambdaFaults:
+    """Fails invocations with Lambda service errors, scripted per function or at random."""
+
+    def __init__(self, scripted: Optional[Dict[str, List[str]]] = None, error_rate: float = 0.0, seed: int = 0):
+        self.scripted = {name: list(errors) for name, errors in (scripted or {}).items()}
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+
+    def check(self, function_name: str) -> None:
+        errors = self.scripted.get(function_name)
+        if errors:
+            raise StatesError(errors.pop(0), "Injected by the simulator")
+        if self._random.random() < self.error_rate:
+            raise StatesError("Lambda.ServiceException", "Injected by the simulator")
+
+
+def simulate_test(
+    task_count: int = 10,
+    duration: int = 3600,
+    concurrency: int = 50,
+    latency: float = 0.05,
+    lambda_overhead: float = 0.2,
+    faults: Optional[LambdaFaults] = None,
+    fleet_options: Optional[Dict] = None,
+    sla: Optional[Dict] = None,
+    definition_path: str = DEFINITION_PATH,
+    test_id: str = "simulated-test",
+    seed: int = 0,
+    max_tasks: Optional[int] = None,
+) -> Dict:
+    """Submits a test and runs its execution to the end, returns what it took.
+
+    ``latency`` is the simulated round trip of every AWS call and
+    ``lambda_overhead`` the time every invocation adds on top of its calls.
+    ``fleet_options`` are passed on to :class:`FleetModel`, ``sla`` is
+    submitted with the test and ``max_tasks`` limits the capacity of the
+    region, the test then reserves its tasks.
+    """
+    clock = SimulatedClock()
+    aws = FakeAWS(latency=latency, clock=clock, seed=seed)
+    create_environment(aws, max_tasks)
+    fleet = FleetModel(aws, duration, BUCKET, seed=seed, **(fleet_options or {}))
+    faults = faults or LambdaFaults(seed=seed)
+    invocations = Counter()
+
+    def lambda_function(name, handler):
+        def invoke(payload):
+            fleet.advance()
+            invocations[name] += 1
+            clock.sleep(lambda_overhead)
+            faults.check(name)
+            return handler(payload, None)
+        return invoke
+
+    functions = {name: lambda_function(name, handler) for name, handler in FUNCTIONS.items()}
+    definition = load_definition(definition_path, {name: name for name in FUNCTIONS})
+
+    with tempfile.TemporaryDirectory() as cache_dir, \
+            patch.dict(os.environ, {**ENVIRONMENT, "AGGREGATION_CACHE_DIR": cache_dir}), \
+            patch("boto3.client", side_effect=aws.client):
+        handle_tests(submission_event(test_id, task_count, duration, concurrency, sla))
+        submission_calls = dict(aws.calls)
+        aws.calls.clear()
+
+        execution = next(iter(aws.stepfunctions.executions.values()))
+        result = StateMachineInterpreter(definition, functions, clock).run(json.loads(execution["input"]))
+        execution["status"] = result["status"]
+
+    finished_at = clock.now()
+    region_record = aws.dynamodb.tables["RegionInfraTable"][(("S", REGION),)]
+    return {
+        "task_count": task_count,
+        "status": result["status"],
+        "error": result["error"],
+        "output": result["output"],
+        "simulated_seconds": round(result["duration_seconds"], 3),
+        # From the last task stopping to the results being in place.
+        "time_to_result_seconds": (
+            round(finished_at - fleet.last_stopped_at, 3) if fleet.last_stopped_at is not None else None
+        ),
+        "polls": invocations[STATUS_CHECKER],
+        "lambda_invocations": dict(invocations),
+        "state_transitions": len(result["history"]),
+        "retries": result["retries"],
+        "api_calls": dict(aws.calls),
+        "submission_api_calls": submission_calls,
+        "tasks": dict(fleet.stopped),
+        "test_status": aws.dynamodb.tables["TestsTable"][(("S", test_id),)]["status"]["S"],
+        "available_tasks": region_record.get("available_tasks", {}).get("N"),
+        "history": result["history"],
+    }
@@ -0,0 +1,253 @@
+"""Interprets Amazon States Language definitions against local functions.
+
+Only what the DLT state machines use is supported: Task, Choice, Wait, Pass,
+Succeed and Fail states, Retry and Catch on tasks, and dotted JSONPaths in
+InputPath, Parameters, ResultPath and OutputPath. Time is read from and
+advanced on the given clock, so with a simulated clock an execution that
+waits for an hour finishes as soon as its functions return.
+"""
+import copy
+import json
+from typing import Any, Callable, Dict, List, Optional
+
+LAMBDA_INVOKE = "arn:aws:states:::lambda:invoke"
+
+# Guards against definitions that loop forever.
+MAX_TRANSITIONS = 100000
+
+COMPARISONS = {
+    "StringEquals": lambda value, expected: value == expected,
+    "BooleanEquals": lambda value, expected: value is expected,
+    "NumericEquals": lambda value, expected: value == expected,
+    "NumericLessThan": lambda value, expected: value < expected,
+    "NumericLessThanEquals": lambda value, expected: value <= expected,
+    "NumericGreaterThan": lambda value, expected: value > expected,
+    "NumericGreaterThanEquals": lambda value, expected: value >= expected,
+}
+
+
+def load_definition(path: str, substitutions: Optional[Dict[str, str]] = None) -> Dict:
+    """Reads a definition, replacing ``${Name}`` like the DefinitionSubstitutions of the template."""
+    with open(path) as definition:
+        text = definition.read()
+    for name, value in (substitutions or {}).items():
+        text = text.replace("${" + name + "}", value)
+    return json.loads(text)
+
+
+def get_path(data: Any, path: str) -> Any:
+    if path == "$":
+        return data
+    if not path.startswith("$."):
+        raise SimulationException(f"Unsupported JSONPath {path}")
+    for field in path[2:].split("."):
+        if not isinstance(data, dict) or field not in data:
+            raise StatesError("States.Runtime", f"Path {path} not found in the input")
+        data = data[field]
+    return data
+
+
+def has_path(data: Any, path: str) -> bool:
+    try:
+        get_path(data, path)
+    except StatesError:
+        return False
+    return True
+
+
+def set_path(data: Any, path: Optional[str], value: Any) -> Any:
+    """Returns ``data`` with ``value`` placed at the ResultPath."""
+    if path is None:
+        return data
+    if path == "$":
+        return value
+    data = copy.deepcopy(data)
+    target = data
+    fields = path[2:].split(".")
+    for field in fields[:-1]:
+        target = target.setdefault(field, {})
+    target[fields[-1]] = value
+    return data
+
+
+def resolve_parameters(template: Any, data: Any) -> Any:
+    if isinstance(template, dict):
+        return {
+            (key[:-2] if key.endswith(".$") else key): (
+                get_path(data, value) if key.endswith(".$") else resolve_parameters(value, data)
+            )
+            for key, value in template.items()
+        }
+    if isinstance(template, list):
+        return [resolve_parameters(value, data) for value in template]
+    return template
+
+
+def matches(rule: Dict, data: Any) -> bool:
+    if "And" in rule:
+        return all(matches(inner, data) for inner in rule["And"])
+    if "Or" in rule:
+        return any(matches(inner, data) for inner in rule["Or"])
+    if "Not" in rule:
+        return not matches(rule["Not"], data)
+
+    if "IsPresent" in rule:
+        return has_path(data, rule["Variable"]) == rule["IsPresent"]
+    # Like Step Functions, comparing a missing variable fails the execution with States.Runtime.
+    value = get_path(data, rule["Variable"])
+    for operator, compare in COMPARISONS.items():
+        if operator in rule:
+            return compare(value, rule[operator])
+        if operator + "Path" in rule:
+            return compare(value, get_path(data, rule[operator + "Path"]))
+    raise SimulationException(f"Unsupported choice rule {rule}")
+
+
+def error_matches(error: str, error_equals: List[str]) -> bool:
+    return (
+        error in error_equals
+        or "States.ALL" in error_equals
+        or ("States.TaskFailed" in error_equals and error != "States.Timeout")
+    )
+
+
+class StateMachineInterpreter:
+    """Runs executions of one definition.
+
+    ``functions`` maps the FunctionName of every Task to a callable taking
+    the payload; exceptions it raises fail the task with the exception's
+    class name as the error, like Lambda reports ``errorType``. Raise a
+    :class:`StatesError` to fail with a specific error such as
+    ``Lambda.TooManyRequestsException``.
+    """
+
+    def __init__(self, definition: Dict, functions: Dict[str, Callable[[Any], Any]], clock):
+        self.definition = definition
+        self.functions = functions
+        self.clock = clock
+        self._retries = 0
+
+    def run(self, execution_input: Any) -> Dict:
+        history = []
+        started_at = self.clock.now()
+        state_name, data = self.definition["StartAt"], execution_input
+        self._retries = 0
+
+        while True:
+            if len(history) >= MAX_TRANSITIONS:
+                raise SimulationException(f"Execution did not finish within {MAX_TRANSITIONS} transitions")
+            state = self.definition["States"][state_name]
+            history.append({"state": state_name, "type": state["Type"], "entered_at": self.clock.now() - started_at})
+
+            try:
+                if state["Type"] == "Task":
+                    data = self._run_task(state, data)
+                elif state["Type"] == "Pass":
+                    result = state.get("Result", get_path(data, state.get("InputPath", "$")))
+                    data = set_path(data, state.get("ResultPath", "$"), result)
+                elif state["Type"] == "Wait":
+                    self.clock.sleep(state["Seconds"] if "Seconds" in state else get_path(data, state["SecondsPath"]))
+                elif state["Type"] == "Choice":
+                    state_name = next(
+                        (choice["Next"] for choice in state["Choices"] if matches(choice, data)),
+                        state.get("Default"),
+                    )
+                    if state_name is None:
+                        raise StatesError("States.NoChoiceMatched", "No choice rule matched")
+                    continue
+                elif state["Type"] == "Succeed":
+                    return self._result("SUCCEEDED", data, history, started_at)
+                elif state["Type"] == "Fail":
+                    return self._result(
+                        "FAILED", None, history, started_at,
+                        error=state.get("Error", "States.Fail"), cause=state.get("Cause"),
+                    )
+                else:
+                    raise SimulationException(f"Unsupported state type {state['Type']}")
+            except StatesError as e:
+                catcher = next(
+                    (catcher for catcher in state.get("Catch", []) if error_matches(e.error, catcher["ErrorEquals"])),
+                    None,
+                )
+                if catcher is None:
+                    return self._result("FAILED", None, history, started_at, error=e.error, cause=e.cause)
+                data = set_path(data, catcher.get("ResultPath", "$"), {"Error": e.error, "Cause": e.cause})
+                state_name = catcher["Next"]
+                continue
+
+            if state.get("End"):
+                return self._result("SUCCEEDED", data, history, started_at)
+            state_name = state["Next"]
+
+    def _run_task(self, state: Dict, data: Any):
+        effective_input = get_path(data, state.get("InputPath", "$"))
+        if "Parameters" in state:
+            effective_input = resolve_parameters(state["Parameters"], effective_input)
+
+        attempts = 0
+        while True:
+            attempts += 1
+            try:
+                result = self._invoke(state["Resource"], effective_input)
+                break
+            except StatesError as e:
+                delay = self._retry_delay(state.get("Retry", []), e.error, attempts)
+                if delay is None:
+                    raise
+                self._retries += 1
+                self.clock.sleep(delay)
+
+        result = get_path(result, state.get("ResultSelector", "$")) if "ResultSelector" in state else result
+        data = set_path(data, state.get("ResultPath", "$"), result)
+        return get_path(data, state.get("OutputPath", "$"))
+
+    def _invoke(self, resource: str, effective_input: Any) -> Any:
+        if resource == LAMBDA_INVOKE:
+            function_name, payload = effective_input["FunctionName"], effective_input.get("Payload")
+        else:
+            function_name, payload = resource, effective_input
+        if function_name not in self.functions:
+            raise SimulationException(f"No function registered for {function_name}")
+
+        try:
+            # Handlers may change their event in place, the execution's data must not change with it.
+            output = self.functions[function_name](copy.deepcopy(payload))
+        except StatesError:
+            raise
+        except Exception as e:
+            raise StatesError(type(e).__name__, str(e))
+        output = json.loads(json.dumps(output, default=str))
+        return {"Payload": output, "StatusCode": 200} if resource == LAMBDA_INVOKE else output
+
+    @staticmethod
+    def _retry_delay(retriers: List[Dict], error: str, attempts: int) -> Optional[float]:
+        for retrier in retriers:
+            if error_matches(error, retrier["ErrorEquals"]):
+                if attempts > retrier.get("MaxAttempts", 3):
+                    return None
+                delay = retrier.get("IntervalSeconds", 1) * retrier.get("BackoffRate", 2.0) ** (attempts - 1)
+                return min(delay, retrier.get("MaxDelaySeconds", delay))
+        return None
+
+    def _result(self, status, output, history, started_at, error=None, cause=None) -> Dict:
+        return {
+            "status": status,
+            "output": output,
+            "error": error,
+            "cause": cause,
+            "history": history,
+            "retries": self._retries,
+            "duration_seconds": self.clock.now() - started_at,
+        }
+
+
+class StatesError(Exception):
+    def __init__(self, error: str, cause: Optional[str] = None):
+        self.error = error
+        self.cause = cause
+        super().__init__(f"{error}: {cause}" if cause else error)
+
+
+class SimulationException(Exception):
+    def __init__(self, message):
+        super().__init__(message)
@@ -0,0 +1,130 @@
+from simulator.harness import LambdaFaults, simulate_test
+
+
+def test_hour_long_test_runs_to_its_results():
+    report = simulate_test(task_count=20, duration=3600)
+
+    assert report["status"] == "SUCCEEDED"
+    assert report["output"]["results_summary"] == "results/simulated-test/summary.json"
+    assert report["tasks"] == {"completed": 20, "crashed": 0, "stopped": 0}
+    # Initial check, one after the hold-for and one per minute until the fleet has stopped.
+    assert report["polls"] == 1 + 1 + 2
+    assert report["simulated_seconds"] > 3600
+    assert report["time_to_result_seconds"] < 120
+    assert report["api_calls"]["ecs.run_task"] == 2
+
+
+def test_stragglers_add_polls():
+    steady = simulate_test(task_count=20, duration=600)
+    straggling = simulate_test(
+        task_count=20, duration=600, fleet_options={"straggler_rate": 0.5, "straggler_seconds": 600}
+    )
+
+    assert straggling["status"] == "SUCCEEDED"
+    assert straggling["polls"] > steady["polls"]
+    assert straggling["api_calls"]["ecs.describe_tasks"] > steady["api_calls"]["ecs.describe_tasks"]
+
+
+def test_crashed_tasks_upload_nothing():
+    report = simulate_test(task_count=20, duration=600, fleet_options={"crash_rate": 0.5}, seed=3)
+
+    assert report["status"] == "SUCCEEDED"
+    assert report["tasks"]["crashed"] > 0
+    assert report["tasks"]["completed"] + report["tasks"]["crashed"] == 20
+    # The status checker sees the crashed generators in the lifecycle breakdown.
+    assert report["output"]["task_lifecycle"]["failed"] == report["tasks"]["crashed"]
+
+
+def test_hung_tasks_are_stopped_at_the_deadline():
+    report = simulate_test(task_count=20, duration=600, fleet_options={"hang_rate": 0.25}, seed=1)
+
+    assert report["status"] == "SUCCEEDED"
+    assert report["tasks"]["stopped"] > 0
+    assert report["tasks"]["completed"] + report["tasks"]["stopped"] == 20
+    assert len(report["output"]["timed_out_tasks"]) == report["tasks"]["stopped"]
+    # The hung tasks uploaded their results before hanging, they are part of the summary.
+    assert report["output"]["results_summary"] == "results/simulated-test/summary.json"
+    # A default grace of 15 minutes plus the 1 minute ramp-up, polled once a minute.
+    assert report["polls"] == 1 + 1 + 16
+    assert report["lambda_invocations"]["DeadlineWatchdogLambdaFunction"] == 1
+
+
+def test_sla_breach_stops_the_test_early():
+    report = simulate_test(
+        task_count=10,
+        duration=3600,
+        fleet_options={"live_metrics": {"requests_per_second": 20, "error_rate": 0.5, "latency_ms": 200}},
+        sla={"max_error_rate": 0.05},
+    )
+
+    assert report["status"] == "FAILED"
+    assert report["error"] == "SLA.Breached"
+    assert report["tasks"] == {"completed": 0, "crashed": 0, "stopped": 10}
+    # Stopped after the grace period instead of running the hour.
+    assert report["simulated_seconds"] < 600
+    assert report["lambda_invocations"]["TestFinalizerLambdaFunction"] == 1
+
+
+def test_sla_is_still_enforced_after_a_guard_error():
+    # Fails the first check and both of its retries, the next checks still catch the breach.
+    faults = LambdaFaults({"SLAGuardLambdaFunction": ["RuntimeError"] * 3})
+
+    report = simulate_test(
+        task_count=10,
+        duration=3600,
+        faults=faults,
+        fleet_options={"live_metrics": {"requests_per_second": 20, "error_rate": 0.5, "latency_ms": 200}},
+        sla={"max_error_rate": 0.05},
+    )
+
+    assert report["status"] == "FAILED"
+    assert report["error"] == "SLA.Breached"
+    assert report["retries"] == 2
+    assert report["tasks"] == {"completed": 0, "crashed": 0, "stopped": 10}
+    assert report["simulated_seconds"] < 600
+
+
+def test_healthy_test_runs_through_its_sla_checks():
+    report = simulate_test(
+        task_count=10,
+        duration=600,
+        fleet_options={"live_metrics": {"requests_per_second": 20, "error_rate": 0.01, "latency_ms": 200}},
+        sla={"max_error_rate": 0.05, "max_p99_ms": 1000},
+    )
+
+    assert report["status"] == "SUCCEEDED"
+    assert report["tasks"]["completed"] == 10
+    assert report["lambda_invocations"]["SLAGuardLambdaFunction"] == 10
+    assert "sla_breach" not in report["output"]
+
+
+def test_lambda_throttling_is_retried():
+    faults = LambdaFaults({"TaskRunnerLambdaFunction": ["Lambda.TooManyRequestsException"] * 2})
+
+    report = simulate_test(task_count=5, duration=600, faults=faults)
+
+    assert report["status"] == "SUCCEEDED"
+    assert report["retries"] == 2
+    assert report["lambda_invocations"]["TaskRunnerLambdaFunction"] == 3
+
+
+def test_persistent_lambda_failure_fails_the_execution():
+    faults = LambdaFaults({"TaskStatusCheckerLambdaFunction": ["Lambda.ServiceException"] * 4})
+
+    report = simulate_test(task_count=5, duration=600, faults=faults)
+
+    assert report["status"] == "FAILED"
+    assert report["error"] == "Lambda.ServiceException"
+    assert "ecs.run_task" not in report["api_calls"]
+
+
+def test_failed_finalizer_marks_the_test_failed_and_releases_its_capacity():
+    faults = LambdaFaults({"TestFinalizerLambdaFunction": ["Lambda.ServiceException"] * 4})
+
+    report = simulate_test(task_count=5, duration=600, faults=faults, max_tasks=20)
+
+    assert report["status"] == "FAILED"
+    assert report["error"] == "Results.NotFinalized"
+    assert report["lambda_invocations"]["FinalizeFailureLambdaFunction"] == 1
+    assert report["test_status"] == "FAILED"
+    assert report["available_tasks"] == "20"
@@ -0,0 +1,116 @@
+import pytest
+
+from benchmarks.fake_aws import SimulatedClock
+from simulator.interpreter import SimulationException, StateMachineInterpreter, StatesError
+
+RETRY = [{"ErrorEquals": ["Lambda.TooManyRequestsException"], "IntervalSeconds": 1, "MaxAttempts": 3, "BackoffRate": 2}]
+
+
+def polling_definition(retry=None, catch=None):
+    check = {
+        "Type": "Task",
+        "Resource": "arn:aws:states:::lambda:invoke",
+        "Parameters": {"Payload.$": "$", "FunctionName": "check"},
+        "OutputPath": "$.Payload",
+        "Next": "Done?",
+    }
+    if retry:
+        check["Retry"] = retry
+    if catch:
+        check["Catch"] = catch
+    return {
+        "StartAt": "Check",
+        "States": {
+            "Check": check,
+            "Done?": {
+                "Type": "Choice",
+                "Choices": [{"Variable": "$.polls", "NumericGreaterThanEquals": 3, "Next": "Success"}],
+                "Default": "Wait",
+            },
+            "Wait": {"Type": "Wait", "SecondsPath": "$.interval", "Next": "Check"},
+            "Success": {"Type": "Succeed"},
+            "Handled": {"Type": "Pass", "Result": "handled", "ResultPath": "$.outcome", "End": True},
+        },
+    }
+
+
+def check(event):
+    event["polls"] = event.get("polls", 0) + 1
+    return event
+
+
+def test_polls_in_simulated_time():
+    clock = SimulatedClock()
+
+    result = StateMachineInterpreter(polling_definition(), {"check": check}, clock).run({"interval": 600})
+
+    assert result["status"] == "SUCCEEDED"
+    assert result["output"] == {"interval": 600, "polls": 3}
+    assert result["duration_seconds"] == 1200
+    assert [entry["state"] for entry in result["history"]].count("Check") == 3
+
+
+def test_retries_with_backoff():
+    clock = SimulatedClock()
+    errors = ["Lambda.TooManyRequestsException"] * 2
+
+    def flaky_check(event):
+        if errors:
+            raise StatesError(errors.pop())
+        return check(event)
+
+    result = StateMachineInterpreter(polling_definition(RETRY), {"check": flaky_check}, clock).run({"interval": 0})
+
+    assert result["status"] == "SUCCEEDED"
+    assert result["retries"] == 2
+    assert result["duration_seconds"] == 1 + 2
+
+
+def test_fails_when_retries_are_exhausted():
+    def failing_check(_):
+        raise StatesError("Lambda.TooManyRequestsException")
+
+    result = StateMachineInterpreter(
+        polling_definition(RETRY), {"check": failing_check}, SimulatedClock()
+    ).run({"interval": 0})
+
+    assert result["status"] == "FAILED"
+    assert result["error"] == "Lambda.TooManyRequestsException"
+    assert result["retries"] == 3
+
+
+def test_choice_on_a_missing_variable_fails_the_execution():
+    result = StateMachineInterpreter(
+        polling_definition(), {"check": lambda event: event}, SimulatedClock()
+    ).run({"interval": 0})
+
+    assert result["status"] == "FAILED"
+    assert result["error"] == "States.Runtime"
+
+
+def test_handler_exceptions_are_caught_by_their_class_name():
+    def broken_check(_):
+        raise KeyError("cluster")
+
+    catch = [{"ErrorEquals": ["KeyError"], "ResultPath": "$.error", "Next": "Handled"}]
+    result = StateMachineInterpreter(
+        polling_definition(RETRY, catch), {"check": broken_check}, SimulatedClock()
+    ).run({"interval": 0})
+
+    assert result["status"] == "SUCCEEDED"
+    assert result["output"]["error"]["Error"] == "KeyError"
+    assert result["output"]["outcome"] == "handled"
+    assert result["retries"] == 0
+
+
+def test_fail_state():
+    definition = {"StartAt": "Fail", "States": {"Fail": {"Type": "Fail", "Error": "Busy", "Cause": "Already running"}}}
+
+    result = StateMachineInterpreter(definition, {}, SimulatedClock()).run({})
+
+    assert (result["status"], result["error"], result["cause"]) == ("FAILED", "Busy", "Already running")
+
+
+def test_unregistered_function():
+    with pytest.raises(SimulationException):
+        StateMachineInterpreter(polling_definition(), {}, SimulatedClock()).run({"interval": 0})
@@ -2,10 +2,24 @@ import os
 import boto3
 import logging
 
+from sizing import get_sized_task_definition, get_task_size
+
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# ECS accepts at most 10 tasks per RunTask request.
+RUN_TASK_MAX_COUNT = 10
+
+# How often tasks of a test with an SLA publish their live metrics.
+LIVE_METRICS_INTERVAL_SECONDS = 10
+
+# Whether tasks get a public IP, by the network mode of the region. Private
+# subnets reach S3 and DynamoDB through the VPC's gateway endpoints, so
+# scenarios and results stay off the path the generated load takes.
+ASSIGN_PUBLIC_IP = {"public": "ENABLED", "private": "DISABLED"}
+DEFAULT_NETWORK_MODE = "public"
+
 
 def lambda_handler(event, _):
     logger.info("Lambda function invoked with event: %s", event)
@@ -17,41 +31,57 @@ def lambda_handler(event, _):
 
     TEST_AWS_REGION = os.environ.get("TEST_AWS_REGION")
     SCENARIOS_BUCKET = os.environ.get("SCENARIOS_BUCKET")
+    RESULTS_MANIFEST_TABLE = os.environ.get("RESULTS_MANIFEST_TABLE", "ResultsManifestTable")
 
-    test_id, prefix = (
-        event.get("test_id"),
-        event.get("prefix")
-    )
+    test_id = event.get("test_id")
 
+    test_task_config = event.get("test_task_config")
     task_count, task_definition, cluster, container_name, subnet = (
-        int(event.get("test_task_config").get("task_count")),
-        event.get("test_task_config").get("task_definition"),
-        event.get("test_task_config").get("cluster"),
-        event.get("test_task_config").get("container_name"),
-        event.get("test_task_config").get("subnet")
+        int(test_task_config.get("task_count")),
+        test_task_config.get("task_definition"),
+        test_task_config.get("cluster"),
+        test_task_config.get("container_name"),
+        test_task_config.get("subnet")
     )
+    subnets = test_task_config.get("subnets") or ([subnet] if subnet else [])
+    capacity_provider_strategy = test_task_config.get("capacity_provider_strategy")
 
     if container_name is None or len(container_name) == 0:
         raise NameParameterNeededException()
 
-    if subnet is None or len(subnet) == 0:
+    if len(subnets) == 0 or any(len(subnet_id) == 0 for subnet_id in subnets):
         raise SubnetIDNeededException()
 
+    awsvpc_configuration = get_awsvpc_configuration(test_task_config)
+
     logger.info(
         "Running tasks with the following parameters: "
         "Region: %s, Task Count: %d, Test ID: %s, Cluster: %s, "
-        "Task Definition: %s, Prefix: %s, S3 Bucket: %s",
+        "Task Definition: %s, S3 Bucket: %s, Subnets: %s, "
+        "Network: %s, Capacity Provider Strategy: %s",
         TEST_AWS_REGION,
         task_count,
         test_id,
         cluster,
         task_definition,
-        prefix,
         SCENARIOS_BUCKET,
+        subnets,
+        awsvpc_configuration,
+        capacity_provider_strategy,
     )
 
     ecs = boto3.client("ecs", region_name=TEST_AWS_REGION)
 
+    if test_task_config.get("auto_size"):
+        throughput = test_task_config.get("throughput")
+        cpu, memory = get_task_size(
+            int(test_task_config.get("concurrency")), float(throughput) if throughput else None
+        )
+        task_definition = get_sized_task_definition(ecs, task_definition, cpu, memory)
+        logger.info("Sized tasks to %d CPU units and %d MiB: %s", cpu, memory, task_definition)
+        test_task_config["task_definition"] = task_definition
+        test_task_config["task_size"] = {"cpu": cpu, "memory": memory}
+
     overrides = {
         "containerOverrides": [
             {
@@ -59,41 +89,116 @@ def lambda_handler(event, _):
                 "environment": [
                     {"name": "S3_BUCKET", "value": SCENARIOS_BUCKET},
                     {"name": "TEST_ID", "value": test_id},
-                    {"name": "PREFIX", "value": prefix},
                     {"name": "AWS_REGION", "value": TEST_AWS_REGION},
+                    {"name": "RESULTS_MANIFEST_TABLE", "value": RESULTS_MANIFEST_TABLE},
                 ],
             },
         ]
     }
 
+    kpi_sample_max_bytes = test_task_config.get("kpi_sample_max_bytes")
+    if kpi_sample_max_bytes:
+        # Tasks then upload a sketch of all KPI rows and a sample of the rows within this budget.
+        overrides["containerOverrides"][0]["environment"].append(
+            {"name": "KPI_SAMPLE_MAX_BYTES", "value": str(int(kpi_sample_max_bytes))}
+        )
+
+    if event.get("sla"):
+        # The SLA guard evaluates the metrics the tasks publish while they run.
+        overrides["containerOverrides"][0]["environment"].append(
+            {"name": "LIVE_METRICS_INTERVAL", "value": str(LIVE_METRICS_INTERVAL_SECONDS)}
+        )
+
     task_params = {
         "group": test_id,
+        # Lets the status checker list the stopped tasks of the test without the rest of the cluster.
+        "startedBy": test_id,
         "launchType": 'FARGATE',
         "overrides": overrides,
         "cluster": cluster,
         "count": task_count,
         "taskDefinition": task_definition,
-        "networkConfiguration": {
-            "awsvpcConfiguration": {
-                "subnets": [ subnet ],
-                "assignPublicIp": "ENABLED"
-            }
-        },
     }
 
+    if capacity_provider_strategy:
+        del task_params["launchType"]
+        task_params["capacityProviderStrategy"] = capacity_provider_strategy
+
     logger.info("Starting ECS tasks with parameters: %s", task_params)
 
+    # Chunks are spread round-robin over the subnets so every AZ gets an even share.
+    task_arns = []
+    for index, count in enumerate(split_task_count(task_count)):
+        task_arns += launch_tasks(ecs, task_params, count, subnets[index % len(subnets)], awsvpc_configuration)
+
+    is_running = True
+    event["isRunning"] = is_running
+    # The status checker describes these instead of scanning the cluster. Only the task ids are
+    # kept, the ARNs of a large fleet would weigh on the execution's payload limit.
+    event["task_ids"] = [task_arn.rsplit("/", 1)[-1] for task_arn in task_arns]
+
+    return event
+
+
+def get_awsvpc_configuration(test_task_config):
+    """Returns the network configuration of the tasks, without their subnet."""
+    network_mode = test_task_config.get("network_mode") or DEFAULT_NETWORK_MODE
+    if network_mode not in ASSIGN_PUBLIC_IP:
+        raise NetworkModeException(network_mode)
+
+    awsvpc_configuration = {"assignPublicIp": ASSIGN_PUBLIC_IP[network_mode]}
+    if test_task_config.get("security_groups"):
+        awsvpc_configuration["securityGroups"] = test_task_config["security_groups"]
+    return awsvpc_configuration
+
+
+def launch_tasks(ecs, task_params, count, subnet, awsvpc_configuration):
+    """Starts the tasks in the subnet, returns the ARNs of the ones that were started."""
+    params = {
+        **task_params,
+        "count": count,
+        "networkConfiguration": {"awsvpcConfiguration": {"subnets": [subnet], **awsvpc_configuration}},
+    }
+    response = run_task(ecs, params)
+    task_arns = [task["taskArn"] for task in response.get("tasks", [])]
+
+    if "capacityProviderStrategy" not in params:
+        return task_arns
+
+    refused = [failure for failure in response.get("failures", []) if is_capacity_failure(failure)]
+    if refused:
+        logger.warning(
+            "%d tasks were refused for lack of capacity in subnet %s, falling back to on-demand FARGATE",
+            len(refused),
+            subnet,
+        )
+        fallback_params = {key: value for key, value in params.items() if key != "capacityProviderStrategy"}
+        response = run_task(ecs, {**fallback_params, "launchType": "FARGATE", "count": len(refused)})
+        task_arns += [task["taskArn"] for task in response.get("tasks", [])]
+    return task_arns
+
+
+def run_task(ecs, params):
     try:
-        response = ecs.run_task(**task_params)
+        response = ecs.run_task(**params)
         logger.info("ECS run_task response: %s", response)
     except Exception as e:
         logger.error("Failed to run ECS task: %s", e)
         raise
 
-    is_running = True
-    event["isRunning"] = is_running
+    return response
+
+
+def is_capacity_failure(failure) -> bool:
+    return "capacity" in (failure.get("reason") or "").lower()
 
-    return event
+
+def split_task_count(task_count: int, chunk_size: int = RUN_TASK_MAX_COUNT):
+    full_chunks, remainder = divmod(task_count, chunk_size)
+    chunks = [chunk_size] * full_chunks
+    if remainder:
+        chunks.append(remainder)
+    return chunks
 
 
 class NameParameterNeededException(Exception):
@@ -106,3 +211,9 @@ class SubnetIDNeededException(Exception):
     def __init__(self, msg: str = "Subnet IDs parameter is needed for aws vpc network configuration") -> None:
         super().__init__(msg)
         self.msg = msg
+
+
+class NetworkModeException(Exception):
+    def __init__(self, network_mode: str) -> None:
+        self.msg = f"Network mode must be one of {', '.join(ASSIGN_PUBLIC_IP)}, got {network_mode}"
+        super().__init__(self.msg)
@@ -0,0 +1,103 @@
+import logging
+from typing import Dict, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+
+logger = logging.getLogger()
+
+# What one vCPU of a JMeter generator sustains before it starts skewing latencies.
+THREADS_PER_VCPU = 250
+REQUESTS_PER_SECOND_PER_VCPU = 400
+
+# JVM, bzt and OS baseline plus the per thread stack and sample buffers.
+BASE_MEMORY_MB = 1024
+MEMORY_MB_PER_THREAD = 3
+
+# Valid Fargate CPU units and the memory (MiB) each of them accepts.
+FARGATE_SIZES = [
+    (1024, range(2048, 8192 + 1, 1024)),
+    (2048, range(4096, 16384 + 1, 1024)),
+    (4096, range(8192, 30720 + 1, 1024)),
+    (8192, range(16384, 61440 + 1, 4096)),
+    (16384, range(32768, 122880 + 1, 8192)),
+]
+
+# Task definition attributes carried over from the base revision when registering a sized one.
+INHERITED_ATTRIBUTES = [
+    "containerDefinitions",
+    "taskRoleArn",
+    "executionRoleArn",
+    "networkMode",
+    "volumes",
+    "placementConstraints",
+    "requiresCompatibilities",
+    "runtimePlatform",
+    "ephemeralStorage",
+]
+
+_sized_task_definitions: Dict[Tuple[str, int, int], str] = {}
+
+
+def get_task_size(concurrency: int, throughput: Optional[float] = None) -> Tuple[int, int]:
+    """Returns the smallest Fargate (cpu, memory) that fits the per-task load."""
+    vcpus = concurrency / THREADS_PER_VCPU
+    if throughput:
+        vcpus = max(vcpus, throughput / REQUESTS_PER_SECOND_PER_VCPU)
+    memory = BASE_MEMORY_MB + concurrency * MEMORY_MB_PER_THREAD
+
+    for cpu, memory_options in FARGATE_SIZES:
+        if cpu < vcpus * 1024:
+            continue
+        for memory_option in memory_options:
+            if memory_option >= memory:
+                return cpu, memory_option
+
+    cpu, memory_options = FARGATE_SIZES[-1]
+    logger.warning(
+        "Per task load (concurrency %d, throughput %s) exceeds the largest Fargate size, "
+        "consider raising task_count",
+        concurrency,
+        throughput,
+    )
+    return cpu, memory_options[-1]
+
+
+def get_sized_task_definition(ecs, base_task_definition: str, cpu: int, memory: int) -> str:
+    """Returns the ARN of a revision of the base task definition with the given size.
+
+    Sized revisions live in their own family named after the base revision and
+    the size, so they are registered once and then found again by name.
+    """
+    cache_key = (base_task_definition, cpu, memory)
+    if cache_key in _sized_task_definitions:
+        return _sized_task_definitions[cache_key]
+
+    base = ecs.describe_task_definition(taskDefinition=base_task_definition)["taskDefinition"]
+    if int(base.get("cpu", 0)) == cpu and int(base.get("memory", 0)) == memory:
+        task_definition_arn = base["taskDefinitionArn"]
+    else:
+        family = f"{base['family']}-r{base['revision']}-{cpu}cpu-{memory}mb"
+        task_definition_arn = find_task_definition(ecs, family) or register_sized_task_definition(
+            ecs, base, family, cpu, memory
+        )
+
+    _sized_task_definitions[cache_key] = task_definition_arn
+    return task_definition_arn
+
+
+def find_task_definition(ecs, family: str) -> Optional[str]:
+    try:
+        response = ecs.describe_task_definition(taskDefinition=family)
+    except ClientError as e:
+        if e.response["Error"]["Code"] in ("ClientException", "InvalidParameterException"):
+            return None
+        raise
+    return response["taskDefinition"]["taskDefinitionArn"]
+
+
+def register_sized_task_definition(ecs, base, family: str, cpu: int, memory: int) -> str:
+    logger.info("Registering task definition %s from %s", family, base["taskDefinitionArn"])
+    params = {attribute: base[attribute] for attribute in INHERITED_ATTRIBUTES if base.get(attribute)}
+    response = ecs.register_task_definition(family=family, cpu=str(cpu), memory=str(memory), **params)
+    return response["taskDefinition"]["taskDefinitionArn"]
@@ -2,7 +2,13 @@ import os
 from unittest.mock import patch, Mock
 
 import pytest
-from task_runner_function.app import NameParameterNeededException, SubnetIDNeededException, lambda_handler
+from task_runner_function.app import (
+    NameParameterNeededException,
+    NetworkModeException,
+    SubnetIDNeededException,
+    lambda_handler,
+    split_task_count,
+)
 
 @patch("boto3.client")
 def test_lambda_returns_if_tasks_are_running(mock_boto_client: Mock):
@@ -26,7 +32,6 @@ def test_lambda_starts_tasks(mock_boto_client: Mock):
     SCENARIOS_BUCKET = "some bucket"
 
     test_id = "123"
-    prefix = "some_prefix"
 
     cluster = "some_cluster"
     task_count = 2
@@ -55,14 +60,14 @@ def test_lambda_starts_tasks(mock_boto_client: Mock):
                         'name': 'TEST_ID',
                         'value': test_id
                     },
-                    {
-                        'name': 'PREFIX',
-                        'value': prefix
-                    },
                     {
                         'name': 'AWS_REGION',
                         'value': region
                     },
+                    {
+                        'name': 'RESULTS_MANIFEST_TABLE',
+                        'value': 'ResultsManifestTable'
+                    },
                 ],
             },
         ]
@@ -71,7 +76,6 @@ def test_lambda_starts_tasks(mock_boto_client: Mock):
     event = {
         "isRunning": False,
         "test_id": test_id,
-        "prefix": prefix,
         "test_task_config": test_task_config
     }
 
@@ -82,6 +86,7 @@ def test_lambda_starts_tasks(mock_boto_client: Mock):
     assert_values = {
         "launchType": 'FARGATE',
         "group": test_id,
+        "startedBy": test_id,
         "overrides": overrides,
         "cluster": cluster,
         "count": task_count,
@@ -105,7 +110,6 @@ def test_lambda_starts_task_fail_without_container_name(mock_boto_client: Mock):
     mock_ecs.run_task = run_task
 
     test_id = "123"
-    prefix = "some_prefix"
 
     cluster = "some_cluster"
     task_count = 2
@@ -120,7 +124,6 @@ def test_lambda_starts_task_fail_without_container_name(mock_boto_client: Mock):
     event = {
         "isRunning": False,
         "test_id": test_id,
-        "prefix": prefix,
         "test_task_config": test_task_config
     }
 
@@ -137,7 +140,6 @@ def test_lambda_starts_task_fail_with_empty_container_name(mock_boto_client: Moc
     mock_ecs.run_task = run_task
 
     test_id = "123"
-    prefix = "some_prefix"
 
     cluster = "some_cluster"
     task_count = 2
@@ -154,7 +156,6 @@ def test_lambda_starts_task_fail_with_empty_container_name(mock_boto_client: Moc
     event = {
         "isRunning": False,
         "test_id": test_id,
-        "prefix": prefix,
         "test_task_config": test_task_config
     }
 
@@ -171,7 +172,6 @@ def test_lambda_starts_task_fail_without_subnet(mock_boto_client: Mock):
     mock_ecs.run_task = run_task
 
     test_id = "123"
-    prefix = "some_prefix"
     
     cluster = "some_cluster"
     task_count = 2
@@ -188,7 +188,6 @@ def test_lambda_starts_task_fail_without_subnet(mock_boto_client: Mock):
     event = {
         "isRunning": False,
         "test_id": test_id,
-        "prefix": prefix,
         "test_task_config": test_task_config
     }
 
@@ -205,7 +204,6 @@ def test_lambda_starts_task_fail_with_empty_subnets(mock_boto_client: Mock):
     mock_ecs.run_task = run_task
 
     test_id = "123"
-    prefix = "some_prefix"
 
     task_count = 2
     task_definition = "some_task_definition"
@@ -223,7 +221,6 @@ def test_lambda_starts_task_fail_with_empty_subnets(mock_boto_client: Mock):
 
     event = {
         "isRunning": False,
-        "prefix": prefix,
         "test_id": test_id,
         "test_task_config": test_task_config
     }
@@ -243,7 +240,6 @@ def test_lambda_starts_with_fargate_launch_type(mock_boto_client: Mock):
     SCENARIOS_BUCKET = "some bucket"
 
     test_id = "123"
-    prefix = "some_prefix"
 
     cluster = "some_cluster"
     task_count = 2
@@ -264,14 +260,14 @@ def test_lambda_starts_with_fargate_launch_type(mock_boto_client: Mock):
                         'name': 'TEST_ID',
                         'value': test_id
                     },
-                    {
-                        'name': 'PREFIX',
-                        'value': prefix
-                    },
                     {
                         'name': 'AWS_REGION',
                         'value': region
                     },
+                    {
+                        'name': 'RESULTS_MANIFEST_TABLE',
+                        'value': 'ResultsManifestTable'
+                    },
                 ],
             },
         ]
@@ -288,7 +284,6 @@ def test_lambda_starts_with_fargate_launch_type(mock_boto_client: Mock):
     event = {
         "isRunning": False,
         "test_id": test_id,
-        "prefix": prefix,
         "test_task_config": test_task_config
     }
 
@@ -298,6 +293,7 @@ def test_lambda_starts_with_fargate_launch_type(mock_boto_client: Mock):
     
     assert_values = {
         "group": test_id,
+        "startedBy": test_id,
         "launchType": 'FARGATE',
         "overrides": overrides,
         "cluster": cluster,
@@ -326,7 +322,6 @@ def test_lambda_starts_tasks_which_has_public_ip_enable(mock_boto_client):
     SCENARIOS_BUCKET = "some bucket"
 
     test_id = "123"
-    prefix = "some_prefix"
 
     cluster = "some_cluster"
     task_count = 2
@@ -347,14 +342,14 @@ def test_lambda_starts_tasks_which_has_public_ip_enable(mock_boto_client):
                         'name': 'TEST_ID',
                         'value': test_id
                     },
-                    {
-                        'name': 'PREFIX',
-                        'value': prefix
-                    },
                     {
                         'name': 'AWS_REGION',
                         'value': region
                     },
+                    {
+                        'name': 'RESULTS_MANIFEST_TABLE',
+                        'value': 'ResultsManifestTable'
+                    },
                 ],
             },
         ]
@@ -371,7 +366,6 @@ def test_lambda_starts_tasks_which_has_public_ip_enable(mock_boto_client):
     event = {
         "isRunning": False,
         "test_id": test_id,
-        "prefix": prefix,
         "test_task_config": test_task_config
     }
 
@@ -381,6 +375,7 @@ def test_lambda_starts_tasks_which_has_public_ip_enable(mock_boto_client):
     
     assert_values = {
         "group": test_id,
+        "startedBy": test_id,
         "launchType": 'FARGATE',
         "overrides": overrides,
         "cluster": cluster,
@@ -395,3 +390,281 @@ def test_lambda_starts_tasks_which_has_public_ip_enable(mock_boto_client):
     }
 
     run_task.assert_called_once_with(**assert_values)
+
+
+def test_split_task_count():
+    assert split_task_count(2) == [2]
+    assert split_task_count(10) == [10]
+    assert split_task_count(25) == [10, 10, 5]
+    assert split_task_count(0) == []
+
+
+@patch("boto3.client")
+@patch.dict(os.environ, {"TEST_AWS_REGION": "us-east-1", "SCENARIOS_BUCKET": "some bucket"})
+def test_lambda_starts_tasks_in_chunks_of_ten(mock_boto_client: Mock):
+    mock_ecs: Mock = mock_boto_client.return_value
+    mock_ecs.run_task.return_value = {}
+
+    event = {
+        "isRunning": False,
+        "test_id": "123",
+        "test_task_config": {
+            "cluster": "some_cluster",
+            "task_count": 25,
+            "task_definition": "some_task_definition",
+            "container_name": "container_name",
+            "subnet": "some subnet 1"
+        }
+    }
+
+    lambda_handler(event, {})
+
+    counts = [call.kwargs["count"] for call in mock_ecs.run_task.call_args_list]
+    assert counts == [10, 10, 5]
+
+
+@patch("boto3.client")
+@patch.dict(os.environ, {"TEST_AWS_REGION": "us-east-1", "SCENARIOS_BUCKET": "some bucket"})
+def test_lambda_spreads_chunks_across_subnets(mock_boto_client: Mock):
+    mock_ecs: Mock = mock_boto_client.return_value
+    mock_ecs.run_task.return_value = {}
+
+    event = {
+        "isRunning": False,
+        "test_id": "123",
+        "test_task_config": {
+            "cluster": "some_cluster",
+            "task_count": 35,
+            "task_definition": "some_task_definition",
+            "container_name": "container_name",
+            "subnets": ["subnet-a", "subnet-b", "subnet-c"]
+        }
+    }
+
+    lambda_handler(event, {})
+
+    launched = [
+        (call.kwargs["networkConfiguration"]["awsvpcConfiguration"]["subnets"], call.kwargs["count"])
+        for call in mock_ecs.run_task.call_args_list
+    ]
+    assert launched == [(["subnet-a"], 10), (["subnet-b"], 10), (["subnet-c"], 10), (["subnet-a"], 5)]
+
+
+@patch("boto3.client")
+@patch.dict(os.environ, {"TEST_AWS_REGION": "us-east-1", "SCENARIOS_BUCKET": "some bucket"})
+def test_lambda_starts_tasks_without_public_ip_in_private_network_mode(mock_boto_client: Mock):
+    mock_ecs: Mock = mock_boto_client.return_value
+    mock_ecs.run_task.return_value = {}
+
+    event = {
+        "isRunning": False,
+        "test_id": "123",
+        "test_task_config": {
+            "cluster": "some_cluster",
+            "task_count": 15,
+            "task_definition": "some_task_definition",
+            "container_name": "container_name",
+            "subnets": ["subnet-private-a", "subnet-private-b"],
+            "network_mode": "private",
+            "security_groups": ["sg-0123"]
+        }
+    }
+
+    lambda_handler(event, {})
+
+    assert [call.kwargs["networkConfiguration"] for call in mock_ecs.run_task.call_args_list] == [
+        {"awsvpcConfiguration": {"subnets": [subnet], "assignPublicIp": "DISABLED", "securityGroups": ["sg-0123"]}}
+        for subnet in ("subnet-private-a", "subnet-private-b")
+    ]
+
+
+@patch("boto3.client")
+@patch.dict(os.environ, {"TEST_AWS_REGION": "us-east-1", "SCENARIOS_BUCKET": "some bucket"})
+def test_lambda_starts_task_fail_with_unknown_network_mode(mock_boto_client: Mock):
+    event = {
+        "isRunning": False,
+        "test_id": "123",
+        "test_task_config": {
+            "cluster": "some_cluster",
+            "task_count": 2,
+            "task_definition": "some_task_definition",
+            "container_name": "container_name",
+            "subnet": "subnet-a",
+            "network_mode": "isolated"
+        }
+    }
+
+    with pytest.raises(NetworkModeException):
+        lambda_handler(event, {})
+
+    mock_boto_client.return_value.run_task.assert_not_called()
+
+
+@patch("boto3.client")
+@patch.dict(os.environ, {"TEST_AWS_REGION": "us-east-1", "SCENARIOS_BUCKET": "some bucket"})
+def test_lambda_uses_capacity_provider_strategy(mock_boto_client: Mock):
+    mock_ecs: Mock = mock_boto_client.return_value
+    mock_ecs.run_task.return_value = {"tasks": [{"taskArn": "task/1"}, {"taskArn": "task/2"}], "failures": []}
+    strategy = [
+        {"capacityProvider": "FARGATE_SPOT", "weight": 3, "base": 0},
+        {"capacityProvider": "FARGATE", "weight": 1, "base": 0},
+    ]
+
+    event = {
+        "isRunning": False,
+        "test_id": "123",
+        "test_task_config": {
+            "cluster": "some_cluster",
+            "task_count": 2,
+            "task_definition": "some_task_definition",
+            "container_name": "container_name",
+            "subnet": "subnet-a",
+            "capacity_provider_strategy": strategy
+        }
+    }
+
+    lambda_handler(event, {})
+
+    mock_ecs.run_task.assert_called_once()
+    params = mock_ecs.run_task.call_args.kwargs
+    assert params["capacityProviderStrategy"] == strategy
+    assert "launchType" not in params
+
+
+@patch("boto3.client")
+@patch.dict(os.environ, {"TEST_AWS_REGION": "us-east-1", "SCENARIOS_BUCKET": "some bucket"})
+def test_lambda_passes_kpi_sample_budget_to_container(mock_boto_client: Mock):
+    mock_ecs: Mock = mock_boto_client.return_value
+    mock_ecs.run_task.return_value = {"tasks": [{"taskArn": "arn:aws:ecs:us-east-1:000000000000:task/cluster/1"}], "failures": []}
+
+    event = {
+        "isRunning": False,
+        "test_id": "123",
+        "test_task_config": {
+            "cluster": "some_cluster",
+            "task_count": 1,
+            "task_definition": "some_task_definition",
+            "container_name": "container_name",
+            "subnet": "subnet-a",
+            "kpi_sample_max_bytes": "1048576"
+        }
+    }
+
+    lambda_handler(event, {})
+
+    environment = mock_ecs.run_task.call_args.kwargs["overrides"]["containerOverrides"][0]["environment"]
+    assert {"name": "KPI_SAMPLE_MAX_BYTES", "value": "1048576"} in environment
+
+
+@patch("boto3.client")
+@patch.dict(os.environ, {"TEST_AWS_REGION": "us-east-1", "SCENARIOS_BUCKET": "some bucket"})
+def test_lambda_enables_live_metrics_for_tests_with_an_sla(mock_boto_client: Mock):
+    mock_ecs: Mock = mock_boto_client.return_value
+    mock_ecs.run_task.return_value = {"tasks": [{"taskArn": "arn:aws:ecs:us-east-1:000000000000:task/cluster/1"}], "failures": []}
+
+    event = {
+        "isRunning": False,
+        "test_id": "123",
+        "sla": {"max_error_rate": 0.05},
+        "test_task_config": {
+            "cluster": "some_cluster",
+            "task_count": 1,
+            "task_definition": "some_task_definition",
+            "container_name": "container_name",
+            "subnet": "subnet-a",
+        }
+    }
+
+    lambda_handler(event, {})
+
+    environment = mock_ecs.run_task.call_args.kwargs["overrides"]["containerOverrides"][0]["environment"]
+    assert {"name": "LIVE_METRICS_INTERVAL", "value": "10"} in environment
+
+
+@patch("boto3.client")
+@patch.dict(os.environ, {"TEST_AWS_REGION": "us-east-1", "SCENARIOS_BUCKET": "some bucket"})
+def test_lambda_falls_back_to_on_demand_when_spot_capacity_is_refused(mock_boto_client: Mock):
+    mock_ecs: Mock = mock_boto_client.return_value
+    mock_ecs.run_task.side_effect = [
+        {
+            "tasks": [{"taskArn": f"arn:aws:ecs:us-east-1:000000000000:task/some_cluster/spot-{i}"} for i in range(7)],
+            "failures": [{"arn": "", "reason": "Capacity is unavailable at this time. Please try again later."}] * 3,
+        },
+        {
+            "tasks": [{"taskArn": f"arn:aws:ecs:us-east-1:000000000000:task/some_cluster/fargate-{i}"} for i in range(3)],
+            "failures": [],
+        },
+    ]
+
+    event = {
+        "isRunning": False,
+        "test_id": "123",
+        "test_task_config": {
+            "cluster": "some_cluster",
+            "task_count": 10,
+            "task_definition": "some_task_definition",
+            "container_name": "container_name",
+            "subnet": "subnet-a",
+            "capacity_provider_strategy": [{"capacityProvider": "FARGATE_SPOT", "weight": 1, "base": 0}]
+        }
+    }
+
+    result = lambda_handler(event, {})
+
+    # The status checker describes every task that was started, on Spot or on demand.
+    assert result["task_ids"] == [f"spot-{i}" for i in range(7)] + [f"fargate-{i}" for i in range(3)]
+    assert mock_ecs.run_task.call_count == 2
+    fallback = mock_ecs.run_task.call_args_list[1].kwargs
+    assert fallback["launchType"] == "FARGATE"
+    assert fallback["count"] == 3
+    assert "capacityProviderStrategy" not in fallback
+    assert fallback["networkConfiguration"]["awsvpcConfiguration"]["subnets"] == ["subnet-a"]
+
+
+@patch("boto3.client")
+@patch.dict(os.environ, {"TEST_AWS_REGION": "us-east-1", "SCENARIOS_BUCKET": "some bucket"})
+def test_lambda_starts_task_fail_with_empty_subnet_in_list(mock_boto_client: Mock):
+    event = {
+        "isRunning": False,
+        "test_id": "123",
+        "test_task_config": {
+            "cluster": "some_cluster",
+            "task_count": 2,
+            "task_definition": "some_task_definition",
+            "container_name": "container_name",
+            "subnets": ["subnet-a", ""]
+        }
+    }
+
+    with pytest.raises(SubnetIDNeededException):
+        lambda_handler(event, {})
+
+
+@patch("task_runner_function.app.get_sized_task_definition")
+@patch("boto3.client")
+@patch.dict(os.environ, {"TEST_AWS_REGION": "us-east-1", "SCENARIOS_BUCKET": "some bucket"})
+def test_lambda_sizes_tasks_when_auto_size_is_requested(mock_boto_client: Mock, mock_get_sized_task_definition: Mock):
+    mock_ecs: Mock = mock_boto_client.return_value
+    mock_ecs.run_task.return_value = {}
+    mock_get_sized_task_definition.return_value = "sized task definition"
+
+    event = {
+        "isRunning": False,
+        "test_id": "123",
+        "test_task_config": {
+            "cluster": "some_cluster",
+            "task_count": 2,
+            "concurrency": "1000",
+            "auto_size": True,
+            "task_definition": "some_task_definition",
+            "container_name": "container_name",
+            "subnet": "subnet-a"
+        }
+    }
+
+    result = lambda_handler(event, {})
+
+    mock_get_sized_task_definition.assert_called_once_with(mock_ecs, "some_task_definition", 4096, 8192)
+    assert mock_ecs.run_task.call_args.kwargs["taskDefinition"] == "sized task definition"
+    assert result["test_task_config"]["task_definition"] == "sized task definition"
+    assert result["test_task_config"]["task_size"] == {"cpu": 4096, "memory": 8192}
@@ -0,0 +1,109 @@
+from unittest.mock import MagicMock
+
+import pytest
+from botocore.exceptions import ClientError
+
+import sizing
+from sizing import get_sized_task_definition, get_task_size
+
+
+BASE_TASK_DEFINITION = {
+    "taskDefinitionArn": "arn:aws:ecs:us-east-1:123:task-definition/dlt-task-family:3",
+    "family": "dlt-task-family",
+    "revision": 3,
+    "cpu": "2048",
+    "memory": "4096",
+    "containerDefinitions": [{"name": "dlt-load-tester", "image": "taurus-tester"}],
+    "taskRoleArn": "task role",
+    "executionRoleArn": "execution role",
+    "networkMode": "awsvpc",
+    "requiresCompatibilities": ["FARGATE"],
+    "volumes": [],
+}
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    sizing._sized_task_definitions.clear()
+
+
+def not_found():
+    return ClientError({"Error": {"Code": "ClientException", "Message": "Unable to describe task definition."}}, "DescribeTaskDefinition")
+
+
+@pytest.mark.parametrize(
+    "concurrency, throughput, expected",
+    [
+        (10, None, (1024, 2048)),
+        (250, None, (1024, 2048)),
+        (500, None, (2048, 4096)),
+        (1000, None, (4096, 8192)),
+        (50, 3000, (8192, 16384)),
+        (3000, None, (16384, 32768)),
+    ],
+)
+def test_get_task_size(concurrency, throughput, expected):
+    assert get_task_size(concurrency, throughput) == expected
+
+
+def test_get_task_size_caps_at_largest_size():
+    assert get_task_size(100000) == (16384, 122880)
+
+
+def test_get_sized_task_definition_registers_new_family():
+    ecs = MagicMock()
+    ecs.describe_task_definition.side_effect = [{"taskDefinition": BASE_TASK_DEFINITION}, not_found()]
+    ecs.register_task_definition.return_value = {"taskDefinition": {"taskDefinitionArn": "sized arn"}}
+
+    arn = get_sized_task_definition(ecs, "dlt-task-family:3", 4096, 8192)
+
+    assert arn == "sized arn"
+    params = ecs.register_task_definition.call_args.kwargs
+    assert params["family"] == "dlt-task-family-r3-4096cpu-8192mb"
+    assert params["cpu"] == "4096"
+    assert params["memory"] == "8192"
+    assert params["containerDefinitions"] == BASE_TASK_DEFINITION["containerDefinitions"]
+    assert params["executionRoleArn"] == "execution role"
+    assert "volumes" not in params
+
+
+def test_get_sized_task_definition_reuses_registered_family():
+    ecs = MagicMock()
+    ecs.describe_task_definition.side_effect = [
+        {"taskDefinition": BASE_TASK_DEFINITION},
+        {"taskDefinition": {"taskDefinitionArn": "existing sized arn"}},
+    ]
+
+    assert get_sized_task_definition(ecs, "dlt-task-family:3", 4096, 8192) == "existing sized arn"
+    ecs.register_task_definition.assert_not_called()
+
+
+def test_get_sized_task_definition_uses_base_when_size_matches():
+    ecs = MagicMock()
+    ecs.describe_task_definition.return_value = {"taskDefinition": BASE_TASK_DEFINITION}
+
+    arn = get_sized_task_definition(ecs, "dlt-task-family:3", 2048, 4096)
+
+    assert arn == BASE_TASK_DEFINITION["taskDefinitionArn"]
+    ecs.register_task_definition.assert_not_called()
+
+
+def test_get_sized_task_definition_is_cached():
+    ecs = MagicMock()
+    ecs.describe_task_definition.return_value = {"taskDefinition": BASE_TASK_DEFINITION}
+
+    get_sized_task_definition(ecs, "dlt-task-family:3", 2048, 4096)
+    get_sized_task_definition(ecs, "dlt-task-family:3", 2048, 4096)
+
+    assert ecs.describe_task_definition.call_count == 1
+
+
+def test_get_sized_task_definition_raises_other_errors():
+    ecs = MagicMock()
+    ecs.describe_task_definition.side_effect = [
+        {"taskDefinition": BASE_TASK_DEFINITION},
+        ClientError({"Error": {"Code": "AccessDeniedException", "Message": ""}}, "DescribeTaskDefinition"),
+    ]
+
+    with pytest.raises(ClientError):
+        get_sized_task_definition(ecs, "dlt-task-family:3", 4096, 8192)
@@ -0,0 +1,11 @@
+import os
+import sys
+
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Lambda imports the handler as a top-level module from the code directory, so
+# the modules next to it import each other by their bare names. The shared
+# modules are copied next to them when the function is packaged.
+sys.path.insert(0, os.path.join(os.path.dirname(ROOT), "shared"))
+sys.path.insert(0, os.path.join(ROOT, "task_status_checker_function"))
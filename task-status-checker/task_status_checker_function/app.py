@@ -1,12 +1,20 @@
+import json
 import logging
-from typing import Any, Dict, Optional
+from datetime import datetime, timezone
+from typing import Any, Dict
 import os
 import boto3
 
+from ecs_tasks import list_running_test_task_arns
+from lifecycle import describe_test_tasks, summarize_tasks
+
 # Set up logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# The state machine waits this long between the checks after the hold-for.
+POLL_INTERVAL_SECONDS = 60
+
 
 def lambda_handler(event, _):
     logger.info("Received event: %s", event)
@@ -15,52 +23,58 @@ def lambda_handler(event, _):
 
     test_id = event.get("test_id")
     cluster = event.get("test_task_config").get("cluster")
-    is_running = False
 
     ecs = boto3.client("ecs", region_name=TEST_AWS_REGION)
 
-    nextToken = None
-
-    while True:
-        logger.info("Retrieving task ARNs for cluster: %s", cluster)
-        tasks = list_tasks(ecs, cluster, nextToken)
-        tasks_arns = tasks.get("taskArns", [])
-        logger.info("Found task ARNs: %s", tasks_arns)
-
-        if len(tasks_arns) != 0:
-            tasks_result = ecs.describe_tasks(cluster=cluster, tasks=tasks_arns)
-            described_tasks = tasks_result.get("tasks", []) or []
-            logger.info("Described tasks: %s", tasks)
-
-            test_tasks = filter(lambda task: task["group"] == test_id, described_tasks)
+    # Once the runner has started the fleet only its tasks are described, running or stopped,
+    # whatever else runs or has stopped on the cluster. Before, the running tasks of the test
+    # are listed by the startedBy the runner sets on them.
+    task_arns = event.get("task_ids")
+    if task_arns is None:
+        task_arns = list_running_test_task_arns(ecs, cluster, test_id)
+    logger.info("Describing %d tasks of test %s in cluster %s", len(task_arns), test_id, cluster)
 
-            if any(test_tasks):
-                is_running = True
-                logger.info("Test tasks are running for test_id: %s", test_id)
+    test_tasks = describe_test_tasks(ecs, cluster, task_arns)
+    is_running = any(task.get("desiredStatus") == "RUNNING" for task in test_tasks)
+    task_lifecycle = summarize_tasks(test_tasks)
+    logger.info("Task lifecycle of test %s: %s", test_id, task_lifecycle)
 
-        nextToken = tasks["nextToken"]
-        logger.info("Next token for listing tasks: %s", nextToken)
-
-        if not nextToken:
-            break
+    TESTS_TABLE = os.environ.get("TESTS_TABLE")
+    if TESTS_TABLE:
+        dynamodb = boto3.client("dynamodb", region_name=TEST_AWS_REGION)
+        save_task_lifecycle(dynamodb, TESTS_TABLE, test_id, task_lifecycle)
 
     event["isRunning"] = is_running
+    event["task_lifecycle"] = task_lifecycle
+    if is_running and "deadline_grace_seconds" in event:
+        update_deadline(event)
     logger.info("Returning event: %s", event)
     return event
 
 
-def list_tasks(
-    ecs, cluster_name: str, next_token: Optional[str] = None
-) -> Dict[str, Any]:
-    logger.info("Listing tasks for cluster: %s", cluster_name)
-    params = {"cluster": cluster_name}
-
-    if next_token:
-        params["nextToken"] = next_token
-
-    tasks_result = ecs.list_tasks(**params)
-    tasks_arns = tasks_result.get("taskArns", [])
-    next_token = tasks_result.get("nextToken")
-    logger.info("Task ARNs retrieved: %s", tasks_arns)
-
-    return {"taskArns": tasks_arns, "nextToken": next_token}
+def update_deadline(event: Dict[str, Any]) -> None:
+    """Counts the time the tasks ran past the hold-for, from the waits between the checks.
+
+    The waits of the state machine are a lower bound of the time that passed,
+    so the deadline is never reached early.
+    """
+    overtime = event.get("overtime_seconds")
+    # The first check after the hold-for is made as soon as it has passed.
+    event["overtime_seconds"] = 0 if overtime is None else overtime + POLL_INTERVAL_SECONDS
+    event["deadline_exceeded"] = event["overtime_seconds"] >= event["deadline_grace_seconds"]
+    if event["deadline_exceeded"]:
+        logger.info(
+            "Tasks of test %s still run %d seconds past the hold-for", event.get("test_id"), event["overtime_seconds"]
+        )
+
+
+def save_task_lifecycle(dynamodb, table: str, test_id: str, task_lifecycle: Dict[str, Any]) -> None:
+    dynamodb.update_item(
+        TableName=table,
+        Key={"test_id": {"S": test_id}},
+        UpdateExpression="SET task_lifecycle = :task_lifecycle, task_lifecycle_checked_at = :checked_at",
+        ExpressionAttributeValues={
+            ":task_lifecycle": {"S": json.dumps(task_lifecycle)},
+            ":checked_at": {"S": datetime.now(timezone.utc).isoformat()},
+        },
+    )
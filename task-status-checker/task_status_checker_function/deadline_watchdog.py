@@ -0,0 +1,72 @@
+"""Stops the tasks of a test that still run past its deadline.
+
+The status checker flags the test once its tasks run longer than the
+hold-for plus the grace period the API computed. A generator that hung
+after bzt, on a stuck upload for instance, would otherwise keep the
+execution polling and the task billed. The watchdog stops every task of
+the test that is left and records which ones timed out, the finalizer
+then collects whatever artifacts they uploaded.
+"""
+import json
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Dict, List
+
+import boto3
+
+from ecs_tasks import list_running_test_task_arns, stop_tasks
+from lifecycle import DESCRIBE_TASKS_MAX_ARNS, to_epoch
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+
+def lambda_handler(event, _):
+    TEST_AWS_REGION = os.environ["TEST_AWS_REGION"]
+
+    test_id = event["test_id"]
+    cluster = event["test_task_config"]["cluster"]
+    ecs = boto3.client("ecs", region_name=TEST_AWS_REGION)
+
+    task_arns = list_running_test_task_arns(ecs, cluster, test_id)
+    timed_out_tasks = describe_timed_out_tasks(ecs, cluster, task_arns)
+    failed = stop_tasks(ecs, cluster, task_arns, f"Test deadline exceeded by {event.get('overtime_seconds')} seconds")
+    logger.info("Stopped %d timed out tasks of test %s, %d failed to stop", len(task_arns), test_id, len(failed))
+
+    TESTS_TABLE = os.environ.get("TESTS_TABLE")
+    if TESTS_TABLE:
+        dynamodb = boto3.client("dynamodb", region_name=TEST_AWS_REGION)
+        save_timed_out_tasks(dynamodb, TESTS_TABLE, test_id, timed_out_tasks)
+
+    event["timed_out_tasks"] = timed_out_tasks
+    event["isRunning"] = False
+    return event
+
+
+def describe_timed_out_tasks(ecs, cluster: str, task_arns: List[str]) -> List[Dict]:
+    """Returns the ARN, last status and start time of the tasks."""
+    timed_out_tasks = []
+    for start in range(0, len(task_arns), DESCRIBE_TASKS_MAX_ARNS):
+        described = ecs.describe_tasks(cluster=cluster, tasks=task_arns[start:start + DESCRIBE_TASKS_MAX_ARNS])
+        timed_out_tasks += [
+            {
+                "task_arn": task["taskArn"],
+                "last_status": task.get("lastStatus"),
+                "started_at": to_epoch(task.get("startedAt")),
+            }
+            for task in described.get("tasks", []) or []
+        ]
+    return timed_out_tasks
+
+
+def save_timed_out_tasks(dynamodb, table: str, test_id: str, timed_out_tasks: List[Dict]) -> None:
+    dynamodb.update_item(
+        TableName=table,
+        Key={"test_id": {"S": test_id}},
+        UpdateExpression="SET timed_out_tasks = :timed_out_tasks, timed_out_at = :timed_out_at",
+        ExpressionAttributeValues={
+            ":timed_out_tasks": {"S": json.dumps(timed_out_tasks)},
+            ":timed_out_at": {"S": datetime.now(timezone.utc).isoformat()},
+        },
+    )
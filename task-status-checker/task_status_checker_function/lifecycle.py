@@ -0,0 +1,78 @@
+"""Breaks the tasks of a test down by where they are in their lifecycle.
+
+The breakdown counts the tasks by last status, the exit codes and stop
+reasons of the stopped ones, and how far apart the tasks started and stopped.
+Launch latency, stragglers and crashed generators show up here while the test
+is still running.
+"""
+import math
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+DESCRIBE_TASKS_MAX_ARNS = 100
+
+
+def describe_test_tasks(ecs, cluster: str, task_arns: List[str]) -> List[Dict]:
+    """Returns the described tasks, running or stopped, 100 per call.
+
+    ECS keeps stopped tasks for about an hour, the ones it has forgotten are
+    not returned.
+    """
+    tasks = []
+    for start in range(0, len(task_arns), DESCRIBE_TASKS_MAX_ARNS):
+        described = ecs.describe_tasks(cluster=cluster, tasks=task_arns[start:start + DESCRIBE_TASKS_MAX_ARNS])
+        tasks += described.get("tasks", []) or []
+    return tasks
+
+
+def to_epoch(value) -> Optional[float]:
+    if value is None:
+        return None
+    return value.timestamp() if isinstance(value, datetime) else float(value)
+
+
+def exit_code(task: Dict) -> str:
+    codes = [container["exitCode"] for container in task.get("containers", []) if "exitCode" in container]
+    # A non-zero code of any container is what stopped the generator.
+    return str(next((code for code in codes if code != 0), codes[0] if codes else "none"))
+
+
+def count(values: Iterable[str]) -> Dict[str, int]:
+    counts = {}
+    for value in values:
+        counts[value] = counts.get(value, 0) + 1
+    return dict(sorted(counts.items()))
+
+
+def spread(times: List[float]) -> Optional[float]:
+    return round(max(times) - min(times), 3) if times else None
+
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(math.ceil(fraction * len(ordered)) - 1, len(ordered) - 1)], 3)
+
+
+def summarize_tasks(tasks: List[Dict]) -> Dict:
+    stopped = [task for task in tasks if task.get("lastStatus") == "STOPPED"]
+    started_at = [to_epoch(task["startedAt"]) for task in tasks if task.get("startedAt") is not None]
+    stopped_at = [to_epoch(task["stoppedAt"]) for task in stopped if task.get("stoppedAt") is not None]
+    launch_latencies = [
+        to_epoch(task["startedAt"]) - to_epoch(task["createdAt"])
+        for task in tasks
+        if task.get("startedAt") is not None and task.get("createdAt") is not None
+    ]
+    exit_codes = count(exit_code(task) for task in stopped)
+
+    return {
+        "tasks": len(tasks),
+        "by_status": count(task.get("lastStatus", "UNKNOWN") for task in tasks),
+        "exit_codes": exit_codes,
+        "stop_reasons": count(task.get("stoppedReason", "unknown") for task in stopped),
+        "failed": sum(number for code, number in exit_codes.items() if code != "0"),
+        "launch_latency_seconds": {"p50": percentile(launch_latencies, 0.5), "max": percentile(launch_latencies, 1)},
+        "start_skew_seconds": spread(started_at),
+        "stop_skew_seconds": spread(stopped_at),
+    }
@@ -0,0 +1,153 @@
+"""Stops a test early when its live metrics breach the test's SLA.
+
+The state machine invokes the guard every ``interval_seconds`` while the
+test runs. Past the ``grace_seconds`` of the ramp-up, the metrics the
+generators publish (see ``live_metrics.py`` in the tester image) are read
+over the last ``window_seconds`` of complete minutes and compared with the
+abort criteria:
+
+* ``max_error_rate``, the share of failed requests,
+* ``max_p99_ms``, the 99th percentile latency over the fleet in the worst minute,
+* ``min_throughput_rps``, the requests per second over the fleet.
+
+On a breach every task of the test is stopped and the test entry records
+the reason. A window without any metrics is not evaluated, the generators
+may still be starting.
+"""
+import json
+import logging
+import math
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+import boto3
+
+from ecs_tasks import list_running_test_task_arns, stop_tasks
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+NAMESPACE = "DLT/LoadTest"
+# The generators publish standard resolution metrics, aggregated by the minute.
+PERIOD_SECONDS = 60
+
+METRIC_QUERIES = (
+    ("requests", "Requests", "Sum"),
+    ("errors", "Errors", "Sum"),
+    ("p99_ms", "Latency", "p99"),
+)
+
+
+def lambda_handler(event, _):
+    TEST_AWS_REGION = os.environ["TEST_AWS_REGION"]
+
+    test_id, sla = event["test_id"], event["sla"]
+    remaining = event.get("sla_remaining", event["duration"]) - sla["interval_seconds"]
+    event["sla_remaining"] = remaining
+    if event["duration"] - remaining < sla["grace_seconds"]:
+        return event
+
+    cloudwatch = boto3.client("cloudwatch", region_name=TEST_AWS_REGION)
+    metrics = get_window_metrics(cloudwatch, test_id, sla["window_seconds"])
+    logger.info("Live metrics of test %s: %s", test_id, metrics)
+    if metrics is None:
+        return event
+    event["sla_metrics"] = metrics
+
+    reasons = find_breaches(sla, metrics)
+    if not reasons:
+        return event
+
+    logger.info("Test %s breached its SLA: %s", test_id, reasons)
+    ecs = boto3.client("ecs", region_name=TEST_AWS_REGION)
+    cluster = event["test_task_config"]["cluster"]
+    task_arns = list_running_test_task_arns(ecs, cluster, test_id)
+    failed = stop_tasks(ecs, cluster, task_arns, f"SLA breached: {'; '.join(reasons)}")
+
+    breach = {"reasons": reasons, "metrics": metrics, "stopped_tasks": len(task_arns) - len(failed)}
+    TESTS_TABLE = os.environ.get("TESTS_TABLE")
+    if TESTS_TABLE:
+        dynamodb = boto3.client("dynamodb", region_name=TEST_AWS_REGION)
+        save_sla_breach(dynamodb, TESTS_TABLE, test_id, breach)
+
+    event["sla_breach"] = breach
+    return event
+
+
+def get_window_metrics(cloudwatch, test_id: str, window_seconds: int, now: Optional[datetime] = None) -> Optional[Dict]:
+    """Returns the fleet's requests, errors, error rate, throughput and p99 over the window.
+
+    The window ends at the start of the current minute, whose data points are
+    still being published, and is read minute by minute: CloudWatch aligns
+    the periods with StartTime, so an unaligned window would mix partial
+    minutes. The throughput is over the minutes since the first one with
+    requests, a test that started within the window is not diluted by the
+    minutes before it.
+    """
+    end = (now or datetime.now(timezone.utc)).replace(second=0, microsecond=0)
+    start = end - timedelta(minutes=math.ceil(window_seconds / PERIOD_SECONDS))
+    response = cloudwatch.get_metric_data(
+        MetricDataQueries=[
+            {
+                "Id": query_id,
+                "MetricStat": {
+                    "Metric": {
+                        "Namespace": NAMESPACE,
+                        "MetricName": metric_name,
+                        "Dimensions": [{"Name": "TestId", "Value": test_id}],
+                    },
+                    "Period": PERIOD_SECONDS,
+                    "Stat": stat,
+                },
+            }
+            for query_id, metric_name, stat in METRIC_QUERIES
+        ],
+        StartTime=start,
+        EndTime=end,
+    )
+    results = {result["Id"]: result for result in response.get("MetricDataResults", [])}
+    values = {query_id: result.get("Values", []) for query_id, result in results.items()}
+
+    requests = sum(values.get("requests", []))
+    if not requests:
+        return None
+    first_minute = min(results["requests"]["Timestamps"])
+    covered_seconds = (end - first_minute).total_seconds()
+    errors = sum(values.get("errors", []))
+    p99 = values.get("p99_ms", [])
+    return {
+        "requests": requests,
+        "errors": errors,
+        "error_rate": round(errors / requests, 4),
+        "throughput_rps": round(requests / covered_seconds, 3),
+        # The worst minute of the window.
+        "p99_ms": round(max(p99), 3) if p99 else None,
+    }
+
+
+def find_breaches(sla: Dict, metrics: Dict) -> List[str]:
+    reasons = []
+    if sla.get("max_error_rate") is not None and metrics["error_rate"] > sla["max_error_rate"]:
+        reasons.append(f"error rate {metrics['error_rate']} > {sla['max_error_rate']}")
+    if (
+        sla.get("max_p99_ms") is not None
+        and metrics["p99_ms"] is not None
+        and metrics["p99_ms"] > sla["max_p99_ms"]
+    ):
+        reasons.append(f"p99 {metrics['p99_ms']} ms > {sla['max_p99_ms']} ms")
+    if sla.get("min_throughput_rps") is not None and metrics["throughput_rps"] < sla["min_throughput_rps"]:
+        reasons.append(f"throughput {metrics['throughput_rps']} rps < {sla['min_throughput_rps']} rps")
+    return reasons
+
+
+def save_sla_breach(dynamodb, table: str, test_id: str, breach: Dict) -> None:
+    dynamodb.update_item(
+        TableName=table,
+        Key={"test_id": {"S": test_id}},
+        UpdateExpression="SET failure_reason = :failure_reason, sla_breach = :sla_breach",
+        ExpressionAttributeValues={
+            ":failure_reason": {"S": f"SLA breached: {'; '.join(breach['reasons'])}"},
+            ":sla_breach": {"S": json.dumps(breach)},
+        },
+    )
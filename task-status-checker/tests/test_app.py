@@ -1,151 +1,177 @@
+import json
 import os
-from task_status_checker_function.app import lambda_handler, list_tasks
-from unittest.mock import Mock, patch, call
+from task_status_checker_function.app import lambda_handler, update_deadline
+from unittest.mock import patch
 
 
 @patch("boto3.client")
-def test_list_tasks(mock_boto_client):
+@patch.dict(os.environ, {"TEST_AWS_REGION": "us-east-1"})
+def test_lambda_handler(mock_boto_client):
     mock_ecs = mock_boto_client.return_value
-    expected_task_arns = ["1", "2"]
-    next_token = None
-    mock_ecs.list_tasks.return_value = {
-        "taskArns": expected_task_arns,
-        "nextToken": next_token,
-    }
-
-    cluster = "cluster"
-    tasks = list_tasks(mock_ecs, cluster)
-
-    assert tasks["taskArns"] == expected_task_arns
+    mock_ecs.describe_tasks.return_value = {"tasks": None}
 
+    event = {"test_task_config": {"cluster": "some cluster"}, "test_id": "123", "task_ids": ["1", "2"]}
+    result = lambda_handler(event, {})
 
-@patch("boto3.client")
-def test_list_tasks_with_next_token(mock_boto_client):
-    mock_ecs = mock_boto_client.return_value
-    list_tasks_mock: Mock = Mock()
-    mock_ecs.list_tasks = list_tasks_mock
-
-    expected_first_list_task_arns = ["1", "2"]
-    expected_first_next_token = "some token"
-
-    expected_second_list_task_arns = ["3", "4"]
-    expected_second_next_token = None
-
-    mock_ecs.list_tasks.side_effect = [
-        {
-            "taskArns": expected_first_list_task_arns,
-            "nextToken": expected_first_next_token,
-        },
-        {
-            "taskArns": expected_second_list_task_arns,
-            "nextToken": expected_second_next_token,
-        },
-    ]
-
-    cluster = "cluster"
-    tasks = list_tasks(mock_ecs, cluster)
-    next_tasks = list_tasks(mock_ecs, cluster, expected_first_next_token)
-
-    assert tasks["taskArns"] == expected_first_list_task_arns
-    assert tasks["nextToken"] == expected_first_next_token
-    assert next_tasks["taskArns"] == expected_second_list_task_arns
-    assert next_tasks["nextToken"] is expected_second_next_token
-
-    list_tasks_mock.assert_has_calls(
-        [
-            call(cluster=cluster),
-            call(cluster=cluster, nextToken=expected_first_next_token),
-        ]
-    )
+    assert result["isRunning"] is False
+    mock_ecs.describe_tasks.assert_called_once_with(cluster="some cluster", tasks=["1", "2"])
+    mock_ecs.list_tasks.assert_not_called()
 
 
 @patch("boto3.client")
 @patch.dict(os.environ, {"TEST_AWS_REGION": "us-east-1"})
-def test_lambda_handler(mock_boto_client):
+def test_lambda_handler_when_test_tasks_stopped(mock_boto_client):
     mock_ecs = mock_boto_client.return_value
-
-    expected_task_arns = ["1", "2"]
-    next_token = None
-    expected_is_running = False
-
-    mock_ecs.list_tasks.return_value = {
-        "taskArns": expected_task_arns,
-        "nextToken": next_token,
+    mock_ecs.describe_tasks.return_value = {
+        "tasks": [
+            {"taskArn": "1", "group": "123", "lastStatus": "STOPPED", "desiredStatus": "STOPPED"},
+            {"taskArn": "2", "group": "123", "lastStatus": "DEPROVISIONING", "desiredStatus": "STOPPED"},
+        ]
     }
-    mock_ecs.describe_tasks.return_value = {"tasks": None}
 
-    event = {"test_task_config": {"cluster": "some cluster"}}
+    event = {"test_task_config": {"cluster": "some cluster"}, "test_id": "123", "task_ids": ["1", "2"]}
     result = lambda_handler(event, {})
 
-    assert result["isRunning"] is expected_is_running
+    assert result["isRunning"] is False
 
 
 @patch("boto3.client")
 @patch.dict(os.environ, {"TEST_AWS_REGION": "us-east-1"})
-def test_lambda_handler_when_only_other_groups_running(mock_boto_client):
-    expected_is_running = False
-
+def test_lambda_handler_when_test_tasks_running(mock_boto_client):
     mock_ecs = mock_boto_client.return_value
-    mock_ecs.list_tasks.return_value = {"taskArns": ["1", "2"]}
     mock_ecs.describe_tasks.return_value = {
         "tasks": [
-            {"taskArn": "1", "group": "other_group"},
-            {"taskArn": "2", "group": "other_group"},
+            {"taskArn": "1", "group": "123", "lastStatus": "RUNNING", "desiredStatus": "RUNNING"},
+            {"taskArn": "2", "group": "123", "lastStatus": "STOPPED", "desiredStatus": "STOPPED"},
         ]
     }
 
-    event = {"test_task_config": {"cluster": "some cluster"}, "test_id": "123"}
+    event = {"test_task_config": {"cluster": "cluster"}, "test_id": "123", "task_ids": ["1", "2"]}
     result = lambda_handler(event, {})
 
-    assert result["isRunning"] is expected_is_running
+    assert result["isRunning"] is True
 
 
 @patch("boto3.client")
 @patch.dict(os.environ, {"TEST_AWS_REGION": "us-east-1"})
-def test_lambda_handler_when_test_group_running(mock_boto_client):
-    expected_is_running = True
+def test_lambda_handler_describes_recorded_tasks_in_batches(mock_boto_client):
+    mock_ecs = mock_boto_client.return_value
+    mock_ecs.describe_tasks.return_value = {"tasks": []}
+    task_ids = [str(index) for index in range(250)]
+
+    lambda_handler({"test_task_config": {"cluster": "cluster"}, "test_id": "123", "task_ids": task_ids}, {})
+
+    batches = [call.kwargs["tasks"] for call in mock_ecs.describe_tasks.call_args_list]
+    assert [len(batch) for batch in batches] == [100, 100, 50]
+    assert sum(batches, []) == task_ids
 
+
+@patch("boto3.client")
+@patch.dict(os.environ, {"TEST_AWS_REGION": "us-east-1"})
+def test_lambda_handler_without_recorded_tasks_lists_started_by_test(mock_boto_client):
     mock_ecs = mock_boto_client.return_value
-    mock_ecs.list_tasks.return_value = {"taskArns": ["1", "2"], "nextToken": None}
+    mock_ecs.list_tasks.side_effect = [{"taskArns": ["1"], "nextToken": "token"}, {"taskArns": ["2"]}]
     mock_ecs.describe_tasks.return_value = {
         "tasks": [
-            {"taskArn": "1", "group": "123"},
-            {"taskArn": "2", "group": "other_group"},
+            {"taskArn": "1", "group": "123", "lastStatus": "RUNNING", "desiredStatus": "RUNNING"},
+            {"taskArn": "2", "group": "123", "lastStatus": "PENDING", "desiredStatus": "RUNNING"},
         ]
     }
 
-    event = {"test_task_config": {"cluster": "cluster"}, "test_id": "123"}
-    result = lambda_handler(event, {})
+    result = lambda_handler({"test_task_config": {"cluster": "cluster"}, "test_id": "123"}, {})
 
-    assert result["isRunning"] is expected_is_running
+    assert result["isRunning"] is True
+    mock_ecs.list_tasks.assert_any_call(cluster="cluster", startedBy="123")
+    mock_ecs.list_tasks.assert_any_call(cluster="cluster", startedBy="123", nextToken="token")
+    mock_ecs.describe_tasks.assert_called_once_with(cluster="cluster", tasks=["1", "2"])
 
 
 @patch("boto3.client")
 @patch.dict(os.environ, {"TEST_AWS_REGION": "us-east-1"})
 def test_describe_not_calls_with_empty_task_arns(mock_boto_client):
     mock_ecs = mock_boto_client.return_value
-    list_tasks_mock: Mock = Mock()
-    mock_ecs.list_tasks = list_tasks_mock
-
-    expected_first_list_task_arns = []
-    expected_first_next_token = "some token"
-
-    expected_second_list_task_arns = []
-    expected_second_next_token = None
-
-    mock_ecs.list_tasks.side_effect = [
-        {
-            "taskArns": expected_first_list_task_arns,
-            "nextToken": expected_first_next_token,
-        },
-        {
-            "taskArns": expected_second_list_task_arns,
-            "nextToken": expected_second_next_token,
-        },
-    ]
+    mock_ecs.list_tasks.return_value = {"taskArns": []}
 
     event = {"test_task_config": {"cluster": "cluster"}, "test_id": "123"}
     result = lambda_handler(event, {})
 
     assert result["isRunning"] is False
     mock_ecs.describe_tasks.assert_not_called()
+
+
+@patch("boto3.client")
+@patch.dict(os.environ, {"TEST_AWS_REGION": "us-east-1", "TESTS_TABLE": "TestsTable"})
+def test_lambda_handler_saves_task_lifecycle(mock_boto_client):
+    mock_client = mock_boto_client.return_value
+    mock_client.describe_tasks.return_value = {
+        "tasks": [
+            {"taskArn": "1", "group": "123", "lastStatus": "RUNNING", "desiredStatus": "RUNNING"},
+            {
+                "taskArn": "2",
+                "group": "123",
+                "lastStatus": "STOPPED",
+                "desiredStatus": "STOPPED",
+                "stoppedReason": "Essential container in task exited",
+                "containers": [{"exitCode": 1}],
+            },
+        ]
+    }
+
+    event = {"test_task_config": {"cluster": "cluster"}, "test_id": "123", "task_ids": ["1", "2"]}
+    result = lambda_handler(event, {})
+
+    assert result["isRunning"] is True
+    assert result["task_lifecycle"]["by_status"] == {"RUNNING": 1, "STOPPED": 1}
+    assert result["task_lifecycle"]["exit_codes"] == {"1": 1}
+    assert result["task_lifecycle"]["failed"] == 1
+
+    update = mock_client.update_item.call_args.kwargs
+    assert update["TableName"] == "TestsTable"
+    assert update["Key"] == {"test_id": {"S": "123"}}
+    assert json.loads(update["ExpressionAttributeValues"][":task_lifecycle"]["S"]) == result["task_lifecycle"]
+
+
+@patch("boto3.client")
+@patch.dict(os.environ, {"TEST_AWS_REGION": "us-east-1"})
+def test_lambda_handler_without_tests_table_does_not_save(mock_boto_client):
+    mock_client = mock_boto_client.return_value
+    mock_client.list_tasks.return_value = {"taskArns": []}
+
+    result = lambda_handler({"test_task_config": {"cluster": "cluster"}, "test_id": "123"}, {})
+
+    assert result["task_lifecycle"]["tasks"] == 0
+    mock_client.update_item.assert_not_called()
+
+
+def test_update_deadline_counts_the_waits_past_the_hold_for():
+    event = {"test_id": "123", "deadline_grace_seconds": 120}
+
+    update_deadline(event)
+    assert (event["overtime_seconds"], event["deadline_exceeded"]) == (0, False)
+    update_deadline(event)
+    assert (event["overtime_seconds"], event["deadline_exceeded"]) == (60, False)
+    update_deadline(event)
+    assert (event["overtime_seconds"], event["deadline_exceeded"]) == (120, True)
+
+
+@patch("boto3.client")
+@patch.dict(os.environ, {"TEST_AWS_REGION": "us-east-1"})
+def test_lambda_handler_tracks_deadline_only_while_running(mock_boto_client):
+    mock_client = mock_boto_client.return_value
+    mock_client.list_tasks.return_value = {"taskArns": []}
+    event = {"test_task_config": {"cluster": "cluster"}, "test_id": "123", "deadline_grace_seconds": 0}
+
+    result = lambda_handler(event, {})
+
+    assert result["isRunning"] is False
+    assert "deadline_exceeded" not in result
+
+    mock_client.list_tasks.return_value = {"taskArns": ["1"]}
+    mock_client.describe_tasks.return_value = {
+        "tasks": [{"taskArn": "1", "group": "123", "lastStatus": "RUNNING", "desiredStatus": "RUNNING"}]
+    }
+
+    result = lambda_handler(event, {})
+
+    assert result["isRunning"] is True
+    assert result["deadline_exceeded"] is True
@@ -0,0 +1,57 @@
+import json
+import os
+from unittest.mock import Mock, patch
+
+from deadline_watchdog import describe_timed_out_tasks, lambda_handler
+
+
+def test_describe_timed_out_tasks_batches_arns():
+    ecs = Mock()
+    ecs.describe_tasks.side_effect = lambda cluster, tasks: {
+        "tasks": [{"taskArn": arn, "lastStatus": "RUNNING", "startedAt": 100} for arn in tasks]
+    }
+
+    timed_out_tasks = describe_timed_out_tasks(ecs, "cluster", [str(index) for index in range(150)])
+
+    assert len(timed_out_tasks) == 150
+    assert ecs.describe_tasks.call_count == 2
+    assert timed_out_tasks[0] == {"task_arn": "0", "last_status": "RUNNING", "started_at": 100.0}
+
+
+@patch("boto3.client")
+@patch.dict(os.environ, {"TEST_AWS_REGION": "us-east-1", "TESTS_TABLE": "TestsTable"})
+def test_lambda_handler_stops_and_records_timed_out_tasks(mock_boto_client: Mock):
+    mock_client = mock_boto_client.return_value
+    mock_client.list_tasks.return_value = {"taskArns": ["1", "2"]}
+    mock_client.describe_tasks.return_value = {
+        "tasks": [
+            {"taskArn": "1", "lastStatus": "RUNNING", "startedAt": 100},
+            {"taskArn": "2", "lastStatus": "DEPROVISIONING", "startedAt": 110},
+        ]
+    }
+    event = {"test_id": "123", "test_task_config": {"cluster": "cluster"}, "isRunning": True, "overtime_seconds": 960}
+
+    result = lambda_handler(event, None)
+
+    assert result["isRunning"] is False
+    assert [task["task_arn"] for task in result["timed_out_tasks"]] == ["1", "2"]
+    assert mock_client.stop_task.call_count == 2
+    assert mock_client.stop_task.call_args.kwargs["reason"] == "Test deadline exceeded by 960 seconds"
+    mock_client.list_tasks.assert_called_once_with(cluster="cluster", startedBy="123")
+
+    update = mock_client.update_item.call_args.kwargs
+    assert update["Key"] == {"test_id": {"S": "123"}}
+    assert json.loads(update["ExpressionAttributeValues"][":timed_out_tasks"]["S"]) == result["timed_out_tasks"]
+
+
+@patch("boto3.client")
+@patch.dict(os.environ, {"TEST_AWS_REGION": "us-east-1"})
+def test_lambda_handler_without_tasks_left(mock_boto_client: Mock):
+    mock_client = mock_boto_client.return_value
+    mock_client.list_tasks.return_value = {"taskArns": []}
+
+    result = lambda_handler({"test_id": "123", "test_task_config": {"cluster": "cluster"}}, None)
+
+    assert result["timed_out_tasks"] == []
+    mock_client.describe_tasks.assert_not_called()
+    mock_client.stop_task.assert_not_called()
@@ -0,0 +1,82 @@
+from datetime import datetime, timezone
+from unittest.mock import Mock
+
+from lifecycle import describe_test_tasks, exit_code, summarize_tasks
+
+
+def stopped_task(group, exit_codes, reason="Essential container in task exited", started=100.0, stopped=400.0):
+    return {
+        "group": group,
+        "lastStatus": "STOPPED",
+        "createdAt": started - 40,
+        "startedAt": started,
+        "stoppedAt": stopped,
+        "stoppedReason": reason,
+        "containers": [{"exitCode": code} for code in exit_codes],
+    }
+
+
+def test_describe_test_tasks_in_batches_of_100():
+    ecs = Mock()
+    ecs.describe_tasks.side_effect = [
+        {"tasks": [stopped_task("123", [0])] * 100},
+        {"tasks": [stopped_task("123", [1])]},
+    ]
+    task_arns = [str(index) for index in range(101)]
+
+    tasks = describe_test_tasks(ecs, "cluster", task_arns)
+
+    assert len(tasks) == 101
+    ecs.describe_tasks.assert_any_call(cluster="cluster", tasks=task_arns[:100])
+    ecs.describe_tasks.assert_any_call(cluster="cluster", tasks=task_arns[100:])
+
+
+def test_describe_test_tasks_without_tasks_does_not_describe():
+    ecs = Mock()
+
+    assert describe_test_tasks(ecs, "cluster", []) == []
+    ecs.describe_tasks.assert_not_called()
+
+
+def test_exit_code_prefers_the_failing_container():
+    assert exit_code({"containers": [{"exitCode": 0}, {"exitCode": 137}]}) == "137"
+    assert exit_code({"containers": [{"exitCode": 0}]}) == "0"
+    assert exit_code({"containers": [{"name": "never started"}]}) == "none"
+
+
+def test_summarize_tasks():
+    tasks = [
+        {"group": "123", "lastStatus": "RUNNING", "createdAt": 0.0, "startedAt": 30.0},
+        {"group": "123", "lastStatus": "PROVISIONING", "createdAt": 0.0},
+        stopped_task("123", [0], started=40.0, stopped=400.0),
+        stopped_task("123", [137], reason="OutOfMemoryError", started=45.0, stopped=250.0),
+    ]
+
+    summary = summarize_tasks(tasks)
+
+    assert summary["tasks"] == 4
+    assert summary["by_status"] == {"PROVISIONING": 1, "RUNNING": 1, "STOPPED": 2}
+    assert summary["exit_codes"] == {"0": 1, "137": 1}
+    assert summary["stop_reasons"] == {"Essential container in task exited": 1, "OutOfMemoryError": 1}
+    assert summary["failed"] == 1
+    assert summary["launch_latency_seconds"] == {"p50": 40.0, "max": 40.0}
+    assert summary["start_skew_seconds"] == 15.0
+    assert summary["stop_skew_seconds"] == 150.0
+
+
+def test_summarize_tasks_reads_datetimes():
+    created = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    started = datetime(2024, 1, 1, 0, 1, tzinfo=timezone.utc)
+
+    summary = summarize_tasks([{"lastStatus": "RUNNING", "createdAt": created, "startedAt": started}])
+
+    assert summary["launch_latency_seconds"] == {"p50": 60.0, "max": 60.0}
+    assert summary["stop_skew_seconds"] is None
+
+
+def test_summarize_no_tasks():
+    summary = summarize_tasks([])
+
+    assert summary["tasks"] == 0
+    assert summary["failed"] == 0
+    assert summary["launch_latency_seconds"] == {"p50": None, "max": None}
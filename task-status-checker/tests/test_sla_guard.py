@@ -0,0 +1,123 @@
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from unittest.mock import Mock, patch
+
+from sla_guard import find_breaches, get_window_metrics, lambda_handler
+
+NOW = datetime(2026, 10, 19, 2, 15, 42, tzinfo=timezone.utc)
+
+SLA = {
+    "interval_seconds": 60,
+    "window_seconds": 120,
+    "grace_seconds": 120,
+    "max_error_rate": 0.05,
+    "max_p99_ms": 2000,
+    "min_throughput_rps": None,
+}
+
+
+def metric_results(requests, errors, p99, timestamps=None):
+    timestamps = timestamps or [NOW.replace(second=0) - timedelta(minutes=minute + 1) for minute in range(len(requests))]
+    return {
+        "MetricDataResults": [
+            {"Id": "requests", "Timestamps": timestamps, "Values": requests},
+            {"Id": "errors", "Timestamps": timestamps[:len(errors)], "Values": errors},
+            {"Id": "p99_ms", "Timestamps": timestamps[:len(p99)], "Values": p99},
+        ]
+    }
+
+
+def guard_event(**fields):
+    return {
+        "test_id": "123",
+        "duration": 600,
+        "test_task_config": {"cluster": "cluster"},
+        "sla": SLA,
+        **fields,
+    }
+
+
+def test_get_window_metrics():
+    cloudwatch = Mock()
+    cloudwatch.get_metric_data.return_value = metric_results([600, 600], [12, 0], [850.5, 910.25])
+
+    metrics = get_window_metrics(cloudwatch, "123", 120, now=NOW)
+
+    assert metrics == {"requests": 1200, "errors": 12, "error_rate": 0.01, "throughput_rps": 10.0, "p99_ms": 910.25}
+    queries = cloudwatch.get_metric_data.call_args.kwargs["MetricDataQueries"]
+    assert [query["MetricStat"]["Stat"] for query in queries] == ["Sum", "Sum", "p99"]
+    assert all(query["MetricStat"]["Period"] == 60 for query in queries)
+
+
+def test_get_window_metrics_reads_complete_minutes():
+    cloudwatch = Mock()
+    cloudwatch.get_metric_data.return_value = metric_results([600], [0], [850.5])
+
+    metrics = get_window_metrics(cloudwatch, "123", 120, now=NOW)
+
+    # The current minute is left out, the window spans the two minutes before it.
+    assert cloudwatch.get_metric_data.call_args.kwargs["StartTime"] == datetime(2026, 10, 19, 2, 13, tzinfo=timezone.utc)
+    assert cloudwatch.get_metric_data.call_args.kwargs["EndTime"] == datetime(2026, 10, 19, 2, 15, tzinfo=timezone.utc)
+    # Only the last minute had requests, the throughput is not diluted by the one before it.
+    assert metrics["throughput_rps"] == 10.0
+
+
+def test_get_window_metrics_without_requests():
+    cloudwatch = Mock()
+    cloudwatch.get_metric_data.return_value = metric_results([], [], [])
+
+    assert get_window_metrics(cloudwatch, "123", 120, now=NOW) is None
+
+
+def test_find_breaches():
+    metrics = {"requests": 100, "errors": 50, "error_rate": 0.5, "throughput_rps": 0.8, "p99_ms": 2500}
+
+    assert find_breaches(SLA, metrics) == ["error rate 0.5 > 0.05", "p99 2500 ms > 2000 ms"]
+    assert find_breaches({**SLA, "min_throughput_rps": 1}, {**metrics, "errors": 0, "error_rate": 0, "p99_ms": None}) == [
+        "throughput 0.8 rps < 1 rps"
+    ]
+
+
+@patch("boto3.client")
+@patch.dict(os.environ, {"TEST_AWS_REGION": "us-east-1"})
+def test_lambda_handler_skips_grace_period(mock_boto_client: Mock):
+    event = lambda_handler(guard_event(), None)
+
+    assert event["sla_remaining"] == 540
+    assert "sla_breach" not in event
+    mock_boto_client.assert_not_called()
+
+
+@patch("boto3.client")
+@patch.dict(os.environ, {"TEST_AWS_REGION": "us-east-1"})
+def test_lambda_handler_passes_within_sla(mock_boto_client: Mock):
+    mock_client = mock_boto_client.return_value
+    mock_client.get_metric_data.return_value = metric_results([1200], [1], [300])
+
+    event = lambda_handler(guard_event(sla_remaining=480), None)
+
+    assert event["sla_remaining"] == 420
+    assert event["sla_metrics"]["error_rate"] == 0.0008
+    assert "sla_breach" not in event
+    mock_client.stop_task.assert_not_called()
+
+
+@patch("boto3.client")
+@patch.dict(os.environ, {"TEST_AWS_REGION": "us-east-1", "TESTS_TABLE": "TestsTable"})
+def test_lambda_handler_stops_tasks_on_breach(mock_boto_client: Mock):
+    mock_client = mock_boto_client.return_value
+    mock_client.get_metric_data.return_value = metric_results([1000], [1000], [30000])
+    mock_client.list_tasks.return_value = {"taskArns": ["1", "2"]}
+
+    event = lambda_handler(guard_event(sla_remaining=480), None)
+
+    breach = event["sla_breach"]
+    assert breach["reasons"] == ["error rate 1.0 > 0.05", "p99 30000 ms > 2000 ms"]
+    assert breach["stopped_tasks"] == 2
+    assert mock_client.stop_task.call_count == 2
+    assert mock_client.stop_task.call_args.kwargs["reason"].startswith("SLA breached: error rate")
+
+    update = mock_client.update_item.call_args.kwargs
+    assert update["Key"] == {"test_id": {"S": "123"}}
+    assert json.loads(update["ExpressionAttributeValues"][":sla_breach"]["S"]) == breach
@@ -0,0 +1,7 @@
+import os
+import sys
+
+
+# The image copies the shared modules next to the scripts, which import them
+# by their bare names.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "shared"))
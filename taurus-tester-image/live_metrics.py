@@ -0,0 +1,150 @@
+"""Publishes the generator's live request metrics to CloudWatch while bzt runs.
+
+The KPI file is tailed as JMeter writes it. Every interval the rows written
+since the last one are reduced to a request count, an error count and a
+latency distribution, published under the ``DLT/LoadTest`` namespace with
+the test id as the dimension. The SLA guard of the state machine reads them
+back over a sliding window to stop a failing test early.
+
+Latencies are published as values and counts, rounded to the log buckets
+the finalizer's aggregation uses, so CloudWatch computes percentiles over
+the whole fleet from a few hundred distinct values per interval.
+"""
+import argparse
+import csv
+import os
+import signal
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from latency_sketch import LATENCY_GAMMA, latency_bucket
+
+NAMESPACE = "DLT/LoadTest"
+DEFAULT_INTERVAL = 10
+
+# CloudWatch takes at most 150 values per datum and 1000 datums per request.
+MAX_VALUES_PER_DATUM = 150
+MAX_DATUMS_PER_REQUEST = 1000
+
+
+def latency_value(elapsed_ms: float) -> float:
+    """Rounds a latency up to the upper bound of its log bucket."""
+    return round(LATENCY_GAMMA ** latency_bucket(elapsed_ms), 3)
+
+
+class KpiTail:
+    """Reads the rows appended to a CSV file since the last read.
+
+    A line JMeter has not finished writing is kept until its end arrives.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.position = 0
+        self.fieldnames: Optional[List[str]] = None
+        self._partial = ""
+
+    def read_rows(self) -> List[Dict]:
+        try:
+            with open(self.path, newline="") as kpi_file:
+                kpi_file.seek(self.position)
+                text = kpi_file.read()
+                self.position = kpi_file.tell()
+        except FileNotFoundError:
+            return []
+
+        lines = (self._partial + text).split("\n")
+        self._partial = lines.pop()
+        lines = [line for line in lines if line]
+        if lines and self.fieldnames is None:
+            self.fieldnames = next(csv.reader([lines.pop(0)]))
+        if not lines:
+            return []
+        return list(csv.DictReader(lines, fieldnames=self.fieldnames))
+
+
+def summarize_rows(rows: List[Dict]) -> Dict:
+    metrics = {"requests": 0, "errors": 0, "latency": {}}
+    for row in rows:
+        try:
+            elapsed = int(row["elapsed"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        metrics["requests"] += 1
+        metrics["errors"] += row.get("success") != "true"
+        value = latency_value(elapsed)
+        metrics["latency"][value] = metrics["latency"].get(value, 0) + 1
+    return metrics
+
+
+def metric_data(test_id: str, metrics: Dict, timestamp: datetime) -> List[Dict]:
+    dimensions = [{"Name": "TestId", "Value": test_id}]
+    data = [
+        {"MetricName": name, "Dimensions": dimensions, "Timestamp": timestamp, "Value": metrics[key], "Unit": "Count"}
+        for name, key in (("Requests", "requests"), ("Errors", "errors"))
+    ]
+    latency = sorted(metrics["latency"].items())
+    for start in range(0, len(latency), MAX_VALUES_PER_DATUM):
+        chunk = latency[start:start + MAX_VALUES_PER_DATUM]
+        data.append({
+            "MetricName": "Latency",
+            "Dimensions": dimensions,
+            "Timestamp": timestamp,
+            "Values": [value for value, _ in chunk],
+            "Counts": [count for _, count in chunk],
+            "Unit": "Milliseconds",
+        })
+    return data
+
+
+def publish(cloudwatch, test_id: str, metrics: Dict, timestamp: Optional[datetime] = None) -> None:
+    data = metric_data(test_id, metrics, timestamp or datetime.now(timezone.utc))
+    for start in range(0, len(data), MAX_DATUMS_PER_REQUEST):
+        cloudwatch.put_metric_data(Namespace=NAMESPACE, MetricData=data[start:start + MAX_DATUMS_PER_REQUEST])
+
+
+def publish_new_rows(cloudwatch, tail: KpiTail, test_id: str) -> int:
+    """Publishes the rows written since the last call, returns how many there were."""
+    metrics = summarize_rows(tail.read_rows())
+    if metrics["requests"]:
+        try:
+            publish(cloudwatch, test_id, metrics)
+        except Exception as e:
+            # Live metrics must never fail the test, the interval is skipped.
+            print(f"Failed to publish live metrics: {e}", file=sys.stderr)
+    return metrics["requests"]
+
+
+def run(cloudwatch, path: str, test_id: str, interval: float):
+    stopped = []
+    signal.signal(signal.SIGTERM, lambda *_: stopped.append(True))
+    signal.signal(signal.SIGINT, lambda *_: stopped.append(True))
+
+    tail = KpiTail(path)
+    while not stopped:
+        time.sleep(interval)
+        publish_new_rows(cloudwatch, tail, test_id)
+    # The rows of the last interval.
+    publish_new_rows(cloudwatch, tail, test_id)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("kpi_file")
+    parser.add_argument("--test-id", default=os.environ.get("TEST_ID"))
+    parser.add_argument("--interval", type=float, default=float(os.environ.get("LIVE_METRICS_INTERVAL") or DEFAULT_INTERVAL))
+    parser.add_argument("--region", default=os.environ.get("AWS_REGION"))
+    args = parser.parse_args(argv)
+
+    # The image ships botocore with the AWS CLI.
+    import botocore.session
+
+    cloudwatch = botocore.session.get_session().create_client("cloudwatch", region_name=args.region)
+    run(cloudwatch, args.kpi_file, args.test_id, args.interval)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,13 +3,21 @@
 UUID=$(cat /proc/sys/kernel/random/uuid)
 echo "S3_BUCKET:: ${S3_BUCKET}"
 echo "TEST_ID:: ${TEST_ID}"
-echo "PREFIX:: ${PREFIX}"
 echo "UUID:: ${UUID}"
 echo "AWS_REGION:: ${AWS_REGION}"
 
 echo "Download test scenario"
 aws s3 cp s3://$S3_BUCKET/test-scenarios/$TEST_ID-$AWS_REGION.json test.json --region $AWS_REGION
 
+# Scenarios may be stored gzip-compressed (Content-Encoding: gzip), the CLI keeps the raw bytes.
+if [ "$(head -c 2 test.json | od -An -tx1 | tr -d ' \n')" = "1f8b" ]; then
+  echo "Decompressing test scenario"
+  mv test.json test.json.gz && gunzip -f test.json.gz
+fi
+
+echo "Tuning JMeter for the task's resources"
+python3 /bzt-configs/runtime.py test.json
+
 LOG_FILE="jmeter.log"
 OUT_FILE="jmeter.out"
 ERR_FILE="jmeter.err"
@@ -20,13 +28,91 @@ TEST_TYPE="jmeter"
 echo "Downloading test file"
 aws s3 cp s3://$S3_BUCKET/public/test-scenarios/jmeter/$TEST_ID.$EXT ./ --region $AWS_REGION
 
+# The API stores an optimized plan next to the script, it is run in its place
+# as long as it was made from the script that is uploaded now.
+SCRIPT_ETAG=$(aws s3api head-object --bucket $S3_BUCKET --key public/test-scenarios/jmeter/$TEST_ID.$EXT --region $AWS_REGION --query ETag --output text | tr -d '"')
+OPTIMIZED_SOURCE_ETAG=$(aws s3api head-object --bucket $S3_BUCKET --key public/test-scenarios/jmeter/$TEST_ID.optimized.$EXT --region $AWS_REGION --query 'Metadata."source-etag"' --output text 2>/dev/null)
+if [ -n "$SCRIPT_ETAG" ] && [ "$OPTIMIZED_SOURCE_ETAG" = "$SCRIPT_ETAG" ]; then
+  echo "Using optimized test file"
+  aws s3 cp s3://$S3_BUCKET/public/test-scenarios/jmeter/$TEST_ID.optimized.$EXT ./$TEST_ID.$EXT --region $AWS_REGION
+fi
+
+TELEMETRY_DIR="/tmp/telemetry"
+mkdir -p $TELEMETRY_DIR
+
+echo "Starting generator telemetry sampler"
+python3 /bzt-configs/telemetry.py sample --output $TELEMETRY_DIR/telemetry.csv --interval ${TELEMETRY_INTERVAL:-5} &
+TELEMETRY_PID=$!
+
+# With an SLA the generator's live metrics are published for the guard to evaluate.
+if [ -n "${LIVE_METRICS_INTERVAL}" ]; then
+  echo "Starting live metrics publisher"
+  python3 /bzt-configs/live_metrics.py /tmp/artifacts/kpi.${KPI_EXT} --interval $LIVE_METRICS_INTERVAL &
+  LIVE_METRICS_PID=$!
+fi
+
 echo "Running test"
-stdbuf -i0 -o0 -e0 bzt test.json -o modules.console.disable=true | stdbuf -i0 -o0 -e0 tee -a result.tmp | sed -u -e "s|^|$TEST_ID|"
-
-echo "Uploading results, bzt log, and JMeter log, out, and err files"
-aws s3 cp /tmp/artifacts/results.xml s3://$S3_BUCKET/results/${TEST_ID}/${PREFIX}-${UUID}-${AWS_REGION}.xml --region $AWS_REGION
-aws s3 cp /tmp/artifacts/bzt.log s3://$S3_BUCKET/results/${TEST_ID}/bzt-${PREFIX}-${UUID}-${AWS_REGION}.log --region $AWS_REGION
-aws s3 cp /tmp/artifacts/$LOG_FILE s3://$S3_BUCKET/results/${TEST_ID}/${TEST_TYPE}-${PREFIX}-${UUID}-${AWS_REGION}.log --region $AWS_REGION
-aws s3 cp /tmp/artifacts/$OUT_FILE s3://$S3_BUCKET/results/${TEST_ID}/${TEST_TYPE}-${PREFIX}-${UUID}-${AWS_REGION}.out --region $AWS_REGION
-aws s3 cp /tmp/artifacts/$ERR_FILE s3://$S3_BUCKET/results/${TEST_ID}/${TEST_TYPE}-${PREFIX}-${UUID}-${AWS_REGION}.err --region $AWS_REGION
-aws s3 cp /tmp/artifacts/kpi.${KPI_EXT} s3://$S3_BUCKET/results/${TEST_ID}/kpi-${PREFIX}-${UUID}-${AWS_REGION}.${KPI_EXT} --region $AWS_REGION
+# The full console output is kept in an artifact, the task log only gets a
+# rate-limited batch of it and a progress summary per interval.
+bzt test.json -o modules.console.disable=true | \
+  python3 /bzt-configs/log_shipper.py --log /tmp/artifacts/bzt-console.log --prefix "$TEST_ID " \
+    --interval ${LOG_SHIP_INTERVAL:-30} --max-lines ${LOG_SHIP_MAX_LINES:-20}
+
+if [ -n "${LIVE_METRICS_PID}" ]; then
+  echo "Stopping live metrics publisher"
+  kill $LIVE_METRICS_PID
+  wait $LIVE_METRICS_PID
+fi
+
+echo "Stopping generator telemetry sampler"
+kill $TELEMETRY_PID
+wait $TELEMETRY_PID
+python3 /bzt-configs/telemetry.py summarize $TELEMETRY_DIR/telemetry.csv --output $TELEMETRY_DIR/telemetry-summary.json
+
+# Uploads an artifact and records it in the test's results manifest so the
+# finalizer finds it without listing the results prefix.
+upload_artifact() {
+  SOURCE=$1
+  NAME=$2
+  KEY="results/${TEST_ID}/${UUID}/${NAME}"
+  aws s3 cp $SOURCE s3://$S3_BUCKET/$KEY --region $AWS_REGION || return 1
+
+  ETAG=$(aws s3api head-object --bucket $S3_BUCKET --key $KEY --region $AWS_REGION --query ETag --output text | tr -d '"')
+  SIZE=$(wc -c < $SOURCE | tr -d ' ')
+  ROWS=$(wc -l < $SOURCE | tr -d ' ')
+  case $NAME in
+    # CSV files carry a header line.
+    *.jtl|*.csv) ROWS=$((ROWS > 0 ? ROWS - 1 : 0)) ;;
+  esac
+
+  aws dynamodb put-item --table-name ${RESULTS_MANIFEST_TABLE:-ResultsManifestTable} --region $AWS_REGION \
+    --item "{\"test_id\": {\"S\": \"${TEST_ID}\"}, \"key\": {\"S\": \"${KEY}\"}, \"size\": {\"N\": \"${SIZE}\"}, \"etag\": {\"S\": \"${ETAG}\"}, \"rows\": {\"N\": \"${ROWS}\"}}"
+}
+
+echo "Uploading results, bzt log and console output, JMeter log, out, and err files, and generator telemetry"
+# Each task writes under its own UUID so the artifacts of the tasks of a test never collide.
+upload_artifact /tmp/artifacts/results.xml results.xml
+upload_artifact /tmp/artifacts/bzt.log bzt.log
+upload_artifact /tmp/artifacts/bzt-console.log bzt-console.log
+upload_artifact /tmp/artifacts/$LOG_FILE ${TEST_TYPE}.log
+upload_artifact /tmp/artifacts/$OUT_FILE ${TEST_TYPE}.out
+upload_artifact /tmp/artifacts/$ERR_FILE ${TEST_TYPE}.err
+# With a sample budget only the sketch of all KPI rows and a bounded sample of them are uploaded,
+# the finalizer aggregates the sketch instead of the rows.
+# Should sampling fail the whole KPI file is uploaded as before.
+if [ "${KPI_SAMPLE_MAX_BYTES:-0}" -gt 0 ] && \
+  python3 /bzt-configs/sampling.py /tmp/artifacts/kpi.${KPI_EXT} --max-bytes $KPI_SAMPLE_MAX_BYTES \
+    --sample /tmp/artifacts/kpi-sample.csv --partial /tmp/artifacts/kpi-partial.json \
+    --telemetry $TELEMETRY_DIR/telemetry-summary.json --task $UUID; then
+  upload_artifact /tmp/artifacts/kpi-partial.json kpi-partial.json
+  upload_artifact /tmp/artifacts/kpi-sample.csv kpi-sample.csv
+else
+  # The partial aggregate of all rows is uploaded next to them, the finalizer merges it instead of parsing them.
+  if python3 /bzt-configs/sampling.py /tmp/artifacts/kpi.${KPI_EXT} --partial /tmp/artifacts/kpi-partial.json \
+    --telemetry $TELEMETRY_DIR/telemetry-summary.json --task $UUID; then
+    upload_artifact /tmp/artifacts/kpi-partial.json kpi-partial.json
+  fi
+  upload_artifact /tmp/artifacts/kpi.${KPI_EXT} kpi.${KPI_EXT}
+fi
+upload_artifact $TELEMETRY_DIR/telemetry.csv telemetry.csv
+upload_artifact $TELEMETRY_DIR/telemetry-summary.json telemetry.json
@@ -0,0 +1,138 @@
+"""Ships bzt's console output to the task log in batches, at a bounded rate.
+
+Every line read from stdin is kept in the full log file, which is uploaded
+with the other artifacts. Of the lines only a few per interval reach
+stdout, and so CloudWatch:
+
+* a run of identical lines is collapsed into the line and a repeat count,
+* past ``--max-lines`` lines in an interval the rest are only counted,
+* at the end of every interval a one-line summary reports the lines seen
+  and suppressed, with bzt's latest ``Current:`` progress line.
+
+Output is written in one batch per interval instead of line by line.
+"""
+import argparse
+import io
+import queue
+import sys
+import threading
+import time
+from typing import Optional, TextIO
+
+DEFAULT_INTERVAL = 30
+DEFAULT_MAX_LINES = 20
+
+# bzt logs the load of the last second on lines containing this marker.
+PROGRESS_MARKER = "Current:"
+
+
+class LogShipper:
+    def __init__(self, out: TextIO, prefix: str = "", max_lines: int = DEFAULT_MAX_LINES, started_at: float = 0.0):
+        self.out = out
+        self.prefix = prefix
+        self.max_lines = max_lines
+        self.started_at = started_at
+        self.lines = 0
+        self.suppressed = 0
+        self.progress: Optional[str] = None
+        self._batch = io.StringIO()
+        self._emitted = 0
+        self._window_lines = 0
+        self._last_line: Optional[str] = None
+        self._repeats = 0
+
+    def add(self, line: str) -> None:
+        line = line.rstrip("\r\n")
+        self.lines += 1
+        self._window_lines += 1
+        if PROGRESS_MARKER in line:
+            self.progress = line.split(PROGRESS_MARKER, 1)[1].strip()
+        if line == self._last_line:
+            self._repeats += 1
+            return
+
+        self._flush_repeats()
+        self._last_line = line
+        self._emit(line)
+
+    def tick(self, now: float) -> None:
+        """Ends the interval, writes its batch and summary."""
+        self._flush_repeats()
+        self._last_line = None
+        self._write(
+            f"progress: {int(now - self.started_at)}s, {self._window_lines} lines "
+            f"({self.suppressed} suppressed, {self.lines} total)"
+            + (f", current: {self.progress}" if self.progress else "")
+        )
+        self.out.write(self._batch.getvalue())
+        self.out.flush()
+        self._batch = io.StringIO()
+        self._emitted = self._window_lines = self.suppressed = 0
+
+    def _emit(self, line: str) -> None:
+        if self._emitted < self.max_lines:
+            self._emitted += 1
+            self._write(line)
+        else:
+            self.suppressed += 1
+
+    def _flush_repeats(self) -> None:
+        if self._repeats:
+            if self._emitted < self.max_lines:
+                self._emitted += 1
+                self._write(f"(last line repeated {self._repeats} times)")
+            else:
+                self.suppressed += self._repeats
+            self._repeats = 0
+
+    def _write(self, line: str) -> None:
+        self._batch.write(f"{self.prefix}{line}\n")
+
+
+def read_lines(stream: TextIO, lines: queue.Queue) -> None:
+    for line in stream:
+        lines.put(line)
+    lines.put(None)
+
+
+def ship(stream: TextIO, log_file: TextIO, shipper: LogShipper, interval: float) -> None:
+    lines: queue.Queue = queue.Queue()
+    threading.Thread(target=read_lines, args=(stream, lines), daemon=True).start()
+
+    deadline = time.monotonic() + interval
+    while True:
+        try:
+            line = lines.get(timeout=max(deadline - time.monotonic(), 0))
+        except queue.Empty:
+            line = ""
+        if line is None:
+            break
+        if line:
+            log_file.write(line)
+            shipper.add(line)
+        if time.monotonic() >= deadline:
+            log_file.flush()
+            shipper.tick(time.monotonic())
+            deadline = time.monotonic() + interval
+
+    log_file.flush()
+    shipper.tick(time.monotonic())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--log", required=True, help="Where the full log is written.")
+    parser.add_argument("--prefix", default="", help="Prepended to every line shipped.")
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL, help="Seconds between batches.")
+    parser.add_argument("--max-lines", type=int, default=DEFAULT_MAX_LINES, help="Lines shipped per interval.")
+    args = parser.parse_args(argv)
+
+    stream = io.TextIOWrapper(sys.stdin.buffer, errors="replace")
+    with open(args.log, "a") as log_file:
+        shipper = LogShipper(sys.stdout, args.prefix, args.max_lines, started_at=time.monotonic())
+        ship(stream, log_file, shipper, args.interval)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+"""Tunes the JMeter JVM for the resources of the task it runs on.
+
+The API writes a ``runtime-profile`` section into the scenario with the share
+of memory to give to the heap, the garbage collector to use and the JMeter
+properties of the profile. This script reads the task's CPU and memory limits
+from the ECS task metadata endpoint (falling back to cgroups and /proc when it
+is not available), sizes the heap and GC threads accordingly and rewrites the
+scenario with the result in ``settings.env`` and ``modules.jmeter.properties``,
+where bzt hands them to JMeter. The profile section itself is removed.
+
+Run before bzt::
+
+    python3 runtime.py test.json
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import urllib.request
+
+PROFILE_KEY = "runtime-profile"
+
+# Kept for bzt, the telemetry sampler and the JVM's own off-heap memory.
+RESERVED_MEMORY_MB = 512
+MIN_HEAP_MB = 256
+METASPACE_MB = 256
+DEFAULT_HEAP_PERCENT = 75
+
+# Below these the concurrent collector costs more than it saves.
+G1_MIN_HEAP_MB = 1024
+G1_MIN_CPUS = 2
+
+
+def read_task_limits(metadata_uri=None, timeout=2):
+    """Returns the task's (vCPUs, memory MiB) from the ECS task metadata endpoint, None if unavailable."""
+    metadata_uri = metadata_uri or os.environ.get("ECS_CONTAINER_METADATA_URI_V4")
+    if not metadata_uri:
+        return None
+    try:
+        with urllib.request.urlopen(f"{metadata_uri}/task", timeout=timeout) as response:
+            limits = json.load(response).get("Limits", {})
+        return float(limits["CPU"]), int(limits["Memory"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def read_cgroup_memory_mb(paths=("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes")):
+    for path in paths:
+        try:
+            with open(path) as limit:
+                value = limit.read().strip()
+        except OSError:
+            continue
+        # cgroup v1 reports "no limit" as a huge number.
+        if value.isdigit() and int(value) < 2 ** 60:
+            return int(value) // (1024 * 1024)
+    return None
+
+
+def read_total_memory_mb(path="/proc/meminfo"):
+    with open(path) as meminfo:
+        for line in meminfo:
+            if line.startswith("MemTotal:"):
+                return int(line.split()[1]) // 1024
+    return None
+
+
+def detect_resources():
+    limits = read_task_limits()
+    if limits is not None:
+        return limits
+    return float(os.cpu_count() or 1), read_cgroup_memory_mb() or read_total_memory_mb()
+
+
+def tune(profile, cpus, memory_mb):
+    """Returns the environment bzt starts JMeter with."""
+    heap_percent = profile.get("heap_percent", DEFAULT_HEAP_PERCENT)
+    heap_mb = min(memory_mb * heap_percent // 100, memory_mb - RESERVED_MEMORY_MB - METASPACE_MB)
+    heap_mb = max(heap_mb, MIN_HEAP_MB)
+    gc_threads = max(1, math.ceil(cpus))
+
+    gc = profile.get("gc", "auto")
+    if gc == "auto":
+        gc = "G1" if cpus >= G1_MIN_CPUS and heap_mb >= G1_MIN_HEAP_MB else "Parallel"
+    gc_args = [f"-XX:+Use{gc}GC", f"-XX:ParallelGCThreads={gc_threads}"]
+    if gc == "G1" and "max_gc_pause_ms" in profile:
+        gc_args.append(f"-XX:MaxGCPauseMillis={profile['max_gc_pause_ms']}")
+
+    return {
+        # A fixed heap size spares the JVM resizing it under load.
+        "HEAP": f"-Xms{heap_mb}m -Xmx{heap_mb}m -XX:MaxMetaspaceSize={METASPACE_MB}m",
+        "GC_ALGO": " ".join(gc_args),
+        "JVM_ARGS": " ".join(profile.get("jvm_args", [])),
+    }
+
+
+def apply(scenario, cpus, memory_mb):
+    """Moves the runtime profile of the scenario into its bzt settings, returns the applied environment."""
+    profile = scenario.pop(PROFILE_KEY, None)
+    if profile is None:
+        return None
+
+    env = tune(profile, cpus, memory_mb)
+    scenario.setdefault("settings", {}).setdefault("env", {}).update(env)
+
+    # Properties the script author set in the scenario win over the profile's.
+    jmeter = scenario.setdefault("modules", {}).setdefault("jmeter", {})
+    jmeter["properties"] = {**profile.get("properties", {}), **jmeter.get("properties", {})}
+    return env
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("scenario")
+    args = parser.parse_args(argv)
+
+    with open(args.scenario) as scenario_file:
+        scenario = json.load(scenario_file)
+
+    cpus, memory_mb = detect_resources()
+    env = apply(scenario, cpus, memory_mb)
+    if env is None:
+        print("No runtime profile in the scenario, running JMeter with its defaults")
+        return 0
+
+    with open(args.scenario, "w") as scenario_file:
+        json.dump(scenario, scenario_file)
+    print(f"Tuned JMeter for {cpus:g} vCPU and {memory_mb} MiB: {env['HEAP']} {env['GC_ALGO']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,223 @@
+"""Reduces the KPI file of a task to an exact sketch and a bounded sample of raw rows.
+
+Every row is folded into a partial aggregate in the format of the
+finalizer's ``aggregation.py`` (counters, latency sketch, timeline and
+per-label stats), so the test summary stays exact. Of the raw rows only a
+stratified sample is kept within a byte budget:
+
+* the slowest rows of every label,
+* a reservoir per label, drawn uniformly from the rows of that label. When
+  the budget is exceeded a row is dropped from the label holding the most
+  bytes, so labels share the budget evenly and rare labels keep all of
+  their rows. Errors are only dropped once no successful row is left to
+  drop.
+
+The upload then depends on the budget instead of on the length of the test.
+
+Without a sample path only the partial aggregate is written. Tasks that
+upload their whole KPI file upload it too, so the finalizer merges one small
+partial per task instead of parsing every KPI file again.
+"""
+import argparse
+import csv
+import heapq
+import io
+import json
+import os
+import random
+import sys
+from typing import Dict, List, Optional
+
+from latency_sketch import fold_row, new_partial
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_SLOWEST_ROWS = 10
+
+
+class LabelSample:
+    """The rows kept for one label, as heaps of ``(priority, index, line)``."""
+
+    def __init__(self):
+        # Max-heaps on a random key (stored negated), the row with the highest key is dropped first.
+        self.successes: List = []
+        self.errors: List = []
+        # Min-heap on the elapsed time.
+        self.slowest: List = []
+        self.reservoir_bytes = 0
+        self.slowest_bytes = 0
+        self.trimmed = False
+
+
+class KpiSampler:
+    def __init__(self, fieldnames: List[str], max_bytes: int, slowest_rows: int = DEFAULT_SLOWEST_ROWS, seed=None):
+        self.fieldnames = fieldnames
+        self.header = format_line(fieldnames, dict(zip(fieldnames, fieldnames)))
+        self.max_bytes = max_bytes
+        self.slowest_rows = slowest_rows
+        self.partial = new_partial()
+        self.labels: Dict[str, LabelSample] = {}
+        self.bytes = len(self.header)
+        self._random = random.Random(seed)
+        self._index = 0
+        self._line = io.StringIO()
+        self._writer = csv.DictWriter(self._line, fieldnames=fieldnames, extrasaction="ignore", lineterminator="\n")
+
+    def add(self, row: Dict) -> None:
+        folded = fold_row(self.partial, row)
+        if folded is None:
+            return
+        label_name, elapsed, error = folded
+
+        index, self._index = self._index, self._index + 1
+        label = self.labels.setdefault(label_name, LabelSample())
+        key = self._random.random()
+        slowest = self.slowest_rows and (len(label.slowest) < self.slowest_rows or elapsed > label.slowest[0][0])
+        # Once a label has been trimmed, a success drawing a higher key than every kept row of it
+        # would be the next row dropped, it is skipped without formatting it.
+        trimmed = label.trimmed and not error and label.successes and key > -label.successes[0][0]
+        if trimmed and not slowest:
+            return
+
+        line = self._format(row)
+        size = len(line)
+        if slowest:
+            if len(label.slowest) < self.slowest_rows:
+                heapq.heappush(label.slowest, (elapsed, index, line))
+                dropped_size = 0
+            else:
+                dropped_size = len(heapq.heapreplace(label.slowest, (elapsed, index, line))[2])
+            label.slowest_bytes += size - dropped_size
+            self.bytes += size - dropped_size
+        if trimmed:
+            return
+
+        heapq.heappush(label.errors if error else label.successes, (-key, index, line))
+        label.reservoir_bytes += size
+        self.bytes += size
+
+        while self.bytes > self.max_bytes and self._drop():
+            pass
+
+    def _drop(self) -> bool:
+        """Drops one reservoir row, returns False when there is none left to drop."""
+        for heap_name in ("successes", "errors"):
+            candidates = [label for label in self.labels.values() if getattr(label, heap_name)]
+            if candidates:
+                label = max(candidates, key=lambda candidate: candidate.reservoir_bytes)
+                label.trimmed = True
+                size = len(heapq.heappop(getattr(label, heap_name))[2])
+                label.reservoir_bytes -= size
+                self.bytes -= size
+                return True
+        return False
+
+    def _format(self, row: Dict) -> str:
+        self._line.seek(0)
+        self._line.truncate()
+        self._writer.writerow(row)
+        return self._line.getvalue()
+
+    def sample_lines(self) -> List[str]:
+        """Returns the kept rows in their original order, the header first."""
+        kept = {}
+        for label in self.labels.values():
+            for _, index, line in label.successes + label.errors + label.slowest:
+                kept[index] = line
+        return [self.header] + [kept[index] for index in sorted(kept)]
+
+    def stats(self) -> Dict:
+        sampled_rows = len(self.sample_lines()) - 1
+        return {
+            "rows": self.partial["rows"],
+            "sampled_rows": sampled_rows,
+            "sampled_errors": sum(len(label.errors) for label in self.labels.values()),
+            "labels": len(self.labels),
+        }
+
+
+def format_line(fieldnames: List[str], row: Dict) -> str:
+    line = io.StringIO()
+    csv.DictWriter(line, fieldnames=fieldnames, extrasaction="ignore", lineterminator="\n").writerow(row)
+    return line.getvalue()
+
+
+def get_saturated_tasks(telemetry_path: Optional[str], task: str) -> List[Dict]:
+    """Returns the task with its saturation reasons if its telemetry summary flags it, else nothing."""
+    if not telemetry_path:
+        return []
+    try:
+        with open(telemetry_path) as telemetry_file:
+            telemetry = json.load(telemetry_file)
+    except (OSError, ValueError):
+        # Without telemetry the saturation is unknown, the partial is still written.
+        return []
+    if not telemetry.get("saturated"):
+        return []
+    return [{"task": task, "reasons": telemetry.get("saturation_reasons", [])}]
+
+
+def sample_kpi_file(
+    path: str,
+    sample_path: str,
+    partial_path: str,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    slowest_rows: int = DEFAULT_SLOWEST_ROWS,
+    seed: Optional[int] = None,
+    saturated_tasks: Optional[List[Dict]] = None,
+) -> Dict:
+    with open(path, newline="") as kpi_file:
+        reader = csv.DictReader(kpi_file)
+        sampler = KpiSampler(reader.fieldnames or [], max_bytes, slowest_rows, seed)
+        for row in reader:
+            sampler.add(row)
+    sampler.partial["saturated_tasks"] += saturated_tasks or []
+
+    with open(sample_path, "w", newline="") as sample_file:
+        sample_file.writelines(sampler.sample_lines())
+    with open(partial_path, "w") as partial_file:
+        json.dump(sampler.partial, partial_file)
+    return sampler.stats()
+
+
+def summarize_kpi_file(path: str, partial_path: str, saturated_tasks: Optional[List[Dict]] = None) -> Dict:
+    """Writes the partial aggregate of every row of the KPI file, without sampling any."""
+    partial = new_partial()
+    with open(path, newline="") as kpi_file:
+        for row in csv.DictReader(kpi_file):
+            fold_row(partial, row)
+    partial["saturated_tasks"] += saturated_tasks or []
+
+    with open(partial_path, "w") as partial_file:
+        json.dump(partial, partial_file)
+    return {"rows": partial["rows"], "labels": len(partial["labels"])}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("kpi_file")
+    parser.add_argument("--sample", help="Where the sampled raw rows are written, only the partial is written without.")
+    parser.add_argument("--partial", required=True, help="Where the partial aggregate of all rows is written.")
+    parser.add_argument("--max-bytes", type=int, default=int(os.environ.get("KPI_SAMPLE_MAX_BYTES") or DEFAULT_MAX_BYTES))
+    parser.add_argument("--slowest", type=int, default=DEFAULT_SLOWEST_ROWS, help="Slowest rows kept per label.")
+    parser.add_argument("--telemetry", help="Telemetry summary of the task, a saturated task is flagged in the partial.")
+    parser.add_argument("--task", default="", help="Id of the task in the results, reported when it was saturated.")
+    args = parser.parse_args(argv)
+    saturated_tasks = get_saturated_tasks(args.telemetry, args.task)
+
+    if args.sample is None:
+        stats = summarize_kpi_file(args.kpi_file, args.partial, saturated_tasks)
+        print(f"Aggregated {stats['rows']} KPI rows over {stats['labels']} labels")
+        return 0
+
+    stats = sample_kpi_file(
+        args.kpi_file, args.sample, args.partial, args.max_bytes, args.slowest, saturated_tasks=saturated_tasks
+    )
+    print(
+        f"Kept {stats['sampled_rows']} of {stats['rows']} KPI rows ({stats['sampled_errors']} errors) "
+        f"over {stats['labels']} labels within {args.max_bytes} bytes"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
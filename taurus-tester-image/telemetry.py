@@ -0,0 +1,203 @@
+"""Samples the generator's own resource usage while bzt runs.
+
+Every few seconds one CSV row is written with CPU and memory utilisation,
+the share of wall time the JMeter JVM spent in GC and the network
+throughput of the task. When the test is over ``summarize`` reduces the
+samples to a small JSON document that flags the task as saturated if the
+generator itself was the bottleneck.
+"""
+import argparse
+import csv
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+
+
+FIELDS = ["timestamp", "cpu_percent", "memory_percent", "memory_used_mb", "gc_percent", "rx_bytes_per_sec", "tx_bytes_per_sec"]
+
+CPU_SATURATION_PERCENT = float(os.environ.get("TELEMETRY_CPU_SATURATION_PERCENT", 90))
+MEMORY_SATURATION_PERCENT = float(os.environ.get("TELEMETRY_MEMORY_SATURATION_PERCENT", 90))
+GC_SATURATION_PERCENT = float(os.environ.get("TELEMETRY_GC_SATURATION_PERCENT", 10))
+
+
+def read_cpu_times(path="/proc/stat"):
+    """Returns (busy, total) jiffies summed over all CPUs."""
+    with open(path) as stat:
+        values = [int(value) for value in stat.readline().split()[1:]]
+    idle = values[3] + (values[4] if len(values) > 4 else 0)
+    total = sum(values[:8])
+    return total - idle, total
+
+
+def read_memory(path="/proc/meminfo"):
+    """Returns (used, total) memory in kB."""
+    meminfo = {}
+    with open(path) as memory:
+        for line in memory:
+            name, value = line.split(":", 1)
+            meminfo[name] = int(value.split()[0])
+    total = meminfo["MemTotal"]
+    available = meminfo.get("MemAvailable", meminfo.get("MemFree", 0))
+    return total - available, total
+
+
+def read_network_bytes(path="/proc/net/dev"):
+    """Returns (received, transmitted) bytes over all interfaces except loopback."""
+    received = transmitted = 0
+    with open(path) as dev:
+        for line in dev.readlines()[2:]:
+            interface, counters = line.split(":", 1)
+            if interface.strip() == "lo":
+                continue
+            counters = counters.split()
+            received += int(counters[0])
+            transmitted += int(counters[8])
+    return received, transmitted
+
+
+def find_jmeter_pid():
+    try:
+        output = subprocess.run(["pgrep", "-f", "ApacheJMeter"], capture_output=True, text=True, timeout=5).stdout
+    except (OSError, subprocess.SubprocessError):
+        return None
+    pids = output.split()
+    return pids[0] if pids else None
+
+
+def read_gc_seconds(pid):
+    """Returns the JVM's accumulated GC time in seconds, None when jstat can't tell."""
+    if pid is None:
+        return None
+    try:
+        output = subprocess.run(["jstat", "-gcutil", pid], capture_output=True, text=True, timeout=5).stdout
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return parse_jstat_gc_seconds(output)
+
+
+def parse_jstat_gc_seconds(output):
+    lines = output.strip().splitlines()
+    if len(lines) < 2:
+        return None
+    columns = dict(zip(lines[0].split(), lines[1].split()))
+    try:
+        return float(columns["GCT"])
+    except (KeyError, ValueError):
+        return None
+
+
+def sample(output, interval):
+    stopped = []
+    signal.signal(signal.SIGTERM, lambda *_: stopped.append(True))
+    signal.signal(signal.SIGINT, lambda *_: stopped.append(True))
+
+    with open(output, "w", newline="") as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames=FIELDS)
+        writer.writeheader()
+
+        previous_cpu = read_cpu_times()
+        previous_network = read_network_bytes()
+        previous_gc, previous_time = None, time.monotonic()
+        jmeter_pid = None
+
+        while not stopped:
+            time.sleep(interval)
+            now = time.monotonic()
+            elapsed = now - previous_time
+
+            busy, total = read_cpu_times()
+            cpu_percent = 100.0 * (busy - previous_cpu[0]) / max(total - previous_cpu[1], 1)
+            used, memory_total = read_memory()
+            received, transmitted = read_network_bytes()
+
+            jmeter_pid = jmeter_pid or find_jmeter_pid()
+            gc_seconds = read_gc_seconds(jmeter_pid)
+            gc_percent = None
+            if gc_seconds is not None and previous_gc is not None:
+                gc_percent = round(100.0 * max(gc_seconds - previous_gc, 0) / elapsed, 2)
+
+            writer.writerow({
+                "timestamp": int(time.time()),
+                "cpu_percent": round(cpu_percent, 2),
+                "memory_percent": round(100.0 * used / memory_total, 2),
+                "memory_used_mb": used // 1024,
+                "gc_percent": "" if gc_percent is None else gc_percent,
+                "rx_bytes_per_sec": int((received - previous_network[0]) / elapsed),
+                "tx_bytes_per_sec": int((transmitted - previous_network[1]) / elapsed),
+            })
+            csv_file.flush()
+
+            previous_cpu, previous_network = (busy, total), (received, transmitted)
+            previous_gc, previous_time = gc_seconds, now
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+def summarize(rows):
+    """Reduces telemetry rows to percentiles and a saturation verdict."""
+    def column(name):
+        return [float(row[name]) for row in rows if row.get(name) not in (None, "")]
+
+    cpu, memory, gc = column("cpu_percent"), column("memory_percent"), column("gc_percent")
+    rx, tx = column("rx_bytes_per_sec"), column("tx_bytes_per_sec")
+
+    summary = {
+        "samples": len(rows),
+        "cpu_percent": {"p50": percentile(cpu, 0.5), "p90": percentile(cpu, 0.9), "max": max(cpu, default=None)},
+        "memory_percent": {"p50": percentile(memory, 0.5), "max": max(memory, default=None)},
+        "gc_percent": {"p90": percentile(gc, 0.9), "max": max(gc, default=None)},
+        "rx_bytes_per_sec": {"p50": percentile(rx, 0.5), "max": max(rx, default=None)},
+        "tx_bytes_per_sec": {"p50": percentile(tx, 0.5), "max": max(tx, default=None)},
+    }
+
+    reasons = []
+    if cpu and summary["cpu_percent"]["p90"] >= CPU_SATURATION_PERCENT:
+        reasons.append(f"cpu p90 {summary['cpu_percent']['p90']}% >= {CPU_SATURATION_PERCENT}%")
+    if memory and summary["memory_percent"]["max"] >= MEMORY_SATURATION_PERCENT:
+        reasons.append(f"memory max {summary['memory_percent']['max']}% >= {MEMORY_SATURATION_PERCENT}%")
+    if gc and summary["gc_percent"]["p90"] >= GC_SATURATION_PERCENT:
+        reasons.append(f"gc p90 {summary['gc_percent']['p90']}% >= {GC_SATURATION_PERCENT}%")
+
+    summary["saturated"] = bool(reasons)
+    summary["saturation_reasons"] = reasons
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    sample_parser = commands.add_parser("sample")
+    sample_parser.add_argument("--output", required=True)
+    sample_parser.add_argument("--interval", type=float, default=5)
+
+    summarize_parser = commands.add_parser("summarize")
+    summarize_parser.add_argument("input")
+    summarize_parser.add_argument("--output", required=True)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "sample":
+        sample(args.output, args.interval)
+        return 0
+
+    with open(args.input, newline="") as csv_file:
+        summary = summarize(list(csv.DictReader(csv_file)))
+    with open(args.output, "w") as output:
+        json.dump(summary, output, indent=2)
+
+    if summary["saturated"]:
+        print(f"GENERATOR SATURATED: {'; '.join(summary['saturation_reasons'])}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+from datetime import datetime, timezone
+from unittest.mock import Mock
+
+from live_metrics import (
+    MAX_VALUES_PER_DATUM,
+    NAMESPACE,
+    KpiTail,
+    latency_value,
+    metric_data,
+    publish_new_rows,
+    summarize_rows,
+)
+
+HEADER = "timeStamp,elapsed,label,responseCode,success\n"
+
+
+def test_tail_reads_only_new_complete_rows(tmp_path):
+    kpi_path = tmp_path / "kpi.jtl"
+    tail = KpiTail(str(kpi_path))
+    assert tail.read_rows() == []
+
+    kpi_path.write_text(HEADER + "1,100,home,200,true\n2,20")
+    assert [row["elapsed"] for row in tail.read_rows()] == ["100"]
+
+    with kpi_path.open("a") as kpi_file:
+        kpi_file.write("0,home,500,false\n")
+    rows = tail.read_rows()
+    assert [(row["elapsed"], row["success"]) for row in rows] == [("200", "false")]
+    assert tail.read_rows() == []
+
+
+def test_summarize_rows_buckets_latencies():
+    rows = [
+        {"elapsed": "100", "success": "true"},
+        {"elapsed": "99", "success": "true"},
+        {"elapsed": "900", "success": "false"},
+        {"elapsed": "", "success": "true"},
+    ]
+
+    metrics = summarize_rows(rows)
+
+    assert (metrics["requests"], metrics["errors"]) == (3, 1)
+    assert metrics["latency"] == {latency_value(100): 2, latency_value(900): 1}
+    assert 100 <= latency_value(100) <= 102
+
+
+def test_metric_data_chunks_latency_values():
+    metrics = {"requests": 400, "errors": 4, "latency": {float(value): 1 for value in range(1, 401)}}
+
+    data = metric_data("test-1", metrics, datetime(2024, 1, 1, tzinfo=timezone.utc))
+
+    assert [datum["MetricName"] for datum in data] == ["Requests", "Errors", "Latency", "Latency", "Latency"]
+    assert all(len(datum.get("Values", [])) <= MAX_VALUES_PER_DATUM for datum in data)
+    assert sum(sum(datum["Counts"]) for datum in data[2:]) == 400
+    assert data[0]["Dimensions"] == [{"Name": "TestId", "Value": "test-1"}]
+
+
+def test_publish_new_rows_skips_empty_intervals_and_errors(tmp_path):
+    kpi_path = tmp_path / "kpi.jtl"
+    kpi_path.write_text(HEADER)
+    cloudwatch = Mock()
+    tail = KpiTail(str(kpi_path))
+
+    assert publish_new_rows(cloudwatch, tail, "test-1") == 0
+    cloudwatch.put_metric_data.assert_not_called()
+
+    with kpi_path.open("a") as kpi_file:
+        kpi_file.write("1,100,home,200,true\n")
+    cloudwatch.put_metric_data.side_effect = Exception("throttled")
+    assert publish_new_rows(cloudwatch, tail, "test-1") == 1
+    assert cloudwatch.put_metric_data.call_args.kwargs["Namespace"] == NAMESPACE
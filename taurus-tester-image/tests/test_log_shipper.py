@@ -0,0 +1,70 @@
+import io
+
+from log_shipper import LogShipper, ship
+
+
+def shipped(shipper):
+    return shipper.out.getvalue().splitlines()
+
+
+def test_repeated_lines_are_collapsed():
+    shipper = LogShipper(io.StringIO(), prefix="123 ")
+    for line in ["starting\n", "retrying\n", "retrying\n", "retrying\n", "done\n"]:
+        shipper.add(line)
+    shipper.tick(30)
+
+    assert shipped(shipper) == [
+        "123 starting",
+        "123 retrying",
+        "123 (last line repeated 2 times)",
+        "123 done",
+        "123 progress: 30s, 5 lines (0 suppressed, 5 total)",
+    ]
+
+
+def test_lines_past_the_limit_are_counted_not_shipped():
+    shipper = LogShipper(io.StringIO(), max_lines=3)
+    for index in range(10):
+        shipper.add(f"line {index}\n")
+    shipper.tick(30)
+    shipper.add("next interval\n")
+    shipper.tick(60)
+
+    assert shipped(shipper) == [
+        "line 0",
+        "line 1",
+        "line 2",
+        "progress: 30s, 10 lines (7 suppressed, 10 total)",
+        "next interval",
+        "progress: 60s, 1 lines (0 suppressed, 11 total)",
+    ]
+
+
+def test_summary_reports_latest_progress():
+    shipper = LogShipper(io.StringIO(), max_lines=0)
+    shipper.add("INFO: Current: 10 vu\t50 succ\t0 fail\t0.120 avg rt\n")
+    shipper.add("INFO: Current: 20 vu\t95 succ\t1 fail\t0.150 avg rt\n")
+    shipper.tick(5)
+
+    assert shipped(shipper) == [
+        "progress: 5s, 2 lines (2 suppressed, 2 total), current: 20 vu\t95 succ\t1 fail\t0.150 avg rt"
+    ]
+
+
+def test_nothing_is_written_before_the_interval_ends():
+    shipper = LogShipper(io.StringIO())
+    shipper.add("line\n")
+
+    assert shipper.out.getvalue() == ""
+
+
+def test_ship_keeps_every_line_in_the_log():
+    stream = io.StringIO("".join(f"line {index}\n" for index in range(100)))
+    log_file, out = io.StringIO(), io.StringIO()
+
+    ship(stream, log_file, LogShipper(out, max_lines=5), interval=60)
+
+    assert log_file.getvalue() == stream.getvalue()
+    lines = out.getvalue().splitlines()
+    assert len(lines) == 6
+    assert lines[-1].endswith("100 lines (95 suppressed, 100 total)")
@@ -0,0 +1,72 @@
+import json
+from unittest.mock import patch
+
+from runtime import apply, main, read_cgroup_memory_mb, read_task_limits, tune
+
+
+def test_tune_sizes_heap_from_task_memory():
+    env = tune({"heap_percent": 75, "gc": "auto"}, 2, 4096)
+
+    assert env["HEAP"] == "-Xms3072m -Xmx3072m -XX:MaxMetaspaceSize=256m"
+    assert env["GC_ALGO"] == "-XX:+UseG1GC -XX:ParallelGCThreads=2"
+
+
+def test_tune_keeps_headroom_on_small_tasks():
+    env = tune({"heap_percent": 90, "gc": "auto"}, 0.5, 1024)
+
+    # 90% of the memory would leave nothing for bzt and the JVM's off-heap memory.
+    assert env["HEAP"].startswith("-Xms256m -Xmx256m")
+    assert env["GC_ALGO"] == "-XX:+UseParallelGC -XX:ParallelGCThreads=1"
+
+
+def test_tune_with_pause_target():
+    env = tune({"heap_percent": 70, "gc": "G1", "max_gc_pause_ms": 50, "jvm_args": ["-Dfoo=bar"]}, 4, 8192)
+
+    assert env["GC_ALGO"] == "-XX:+UseG1GC -XX:ParallelGCThreads=4 -XX:MaxGCPauseMillis=50"
+    assert env["JVM_ARGS"] == "-Dfoo=bar"
+
+
+def test_apply_moves_profile_into_bzt_settings():
+    scenario = {
+        "runtime-profile": {"name": "balanced", "heap_percent": 75, "properties": {"a": "1", "b": "1"}},
+        "modules": {"jmeter": {"properties": {"b": "2"}}},
+        "settings": {"env": {"OTHER": "x"}},
+    }
+
+    env = apply(scenario, 2, 4096)
+
+    assert "runtime-profile" not in scenario
+    assert scenario["settings"]["env"] == {"OTHER": "x", **env}
+    assert scenario["modules"]["jmeter"]["properties"] == {"a": "1", "b": "2"}
+
+
+def test_apply_without_profile():
+    scenario = {"execution": []}
+
+    assert apply(scenario, 2, 4096) is None
+    assert scenario == {"execution": []}
+
+
+def test_read_task_limits_without_metadata_endpoint(monkeypatch):
+    monkeypatch.delenv("ECS_CONTAINER_METADATA_URI_V4", raising=False)
+
+    assert read_task_limits() is None
+
+
+def test_read_cgroup_memory(tmp_path):
+    unlimited, limited = tmp_path / "unlimited", tmp_path / "limited"
+    unlimited.write_text("max\n")
+    limited.write_text(str(2048 * 1024 * 1024))
+
+    assert read_cgroup_memory_mb([str(unlimited), str(limited)]) == 2048
+
+
+def test_main_rewrites_scenario(tmp_path):
+    path = tmp_path / "test.json"
+    path.write_text(json.dumps({"runtime-profile": {"name": "throughput", "heap_percent": 80, "gc": "Parallel"}}))
+
+    with patch("runtime.detect_resources", return_value=(2.0, 4096)):
+        assert main([str(path)]) == 0
+
+    scenario = json.loads(path.read_text())
+    assert scenario["settings"]["env"]["HEAP"].startswith("-Xms3276m")
@@ -0,0 +1,138 @@
+import csv
+import json
+
+from sampling import KpiSampler, format_line, main, sample_kpi_file
+
+FIELDS = ["timeStamp", "elapsed", "label", "responseCode", "success"]
+
+
+def row(index, elapsed=100, label="home", success=True):
+    return {
+        "timeStamp": str(1700000000000 + index * 10),
+        "elapsed": str(elapsed),
+        "label": label,
+        "responseCode": "200" if success else "500",
+        "success": "true" if success else "false",
+    }
+
+
+def sampled_rows(sampler):
+    return list(csv.DictReader(sampler.sample_lines()))
+
+
+def test_partial_counts_every_row():
+    sampler = KpiSampler(FIELDS, max_bytes=500, seed=1)
+    for index in range(1000):
+        sampler.add(row(index, elapsed=10 + index % 50, success=index % 100 != 0))
+    sampler.add({**row(1000), "elapsed": "not a number"})
+
+    partial = sampler.partial
+    assert (partial["rows"], partial["errors"]) == (1000, 10)
+    assert partial["elapsed_max"] == 59
+    assert sum(partial["latency_buckets"].values()) == 1000
+    assert sum(count for count, _ in partial["timeline"].values()) == 1000
+    assert partial["labels"]["home"]["rows"] == 1000
+    assert sum(partial["error_sketch"]["minutes"].values()) == 10
+    assert partial["error_sketch"]["dimensions"]["response_codes"]["counters"] == {"500": [10, 0]}
+
+
+def test_sample_stays_within_budget():
+    sampler = KpiSampler(FIELDS, max_bytes=4096, slowest_rows=5, seed=1)
+    for index in range(20000):
+        sampler.add(row(index, elapsed=index % 300))
+
+    lines = sampler.sample_lines()
+    assert sum(len(line) for line in lines) <= 4096
+    assert 1 < len(lines) < 20000
+    assert lines[0] == format_line(FIELDS, dict(zip(FIELDS, FIELDS)))
+
+
+def test_sample_keeps_errors_and_slowest_rows():
+    sampler = KpiSampler(FIELDS, max_bytes=3000, slowest_rows=3, seed=1)
+    for index in range(5000):
+        sampler.add(row(index, elapsed=50 if index not in (10, 2000, 4000) else 5000 + index, success=index % 1000 != 7))
+
+    rows = sampled_rows(sampler)
+    assert sum(r["success"] == "false" for r in rows) == 5
+    assert {"5010", "7000", "9000"} <= {r["elapsed"] for r in rows}
+    # Rows keep the order they were written in.
+    assert [int(r["timeStamp"]) for r in rows] == sorted(int(r["timeStamp"]) for r in rows)
+
+
+def test_sample_shares_budget_between_labels():
+    sampler = KpiSampler(FIELDS, max_bytes=5000, slowest_rows=0, seed=1)
+    for index in range(10000):
+        sampler.add(row(index, label="busy"))
+        if index % 1000 == 0:
+            sampler.add(row(index, label="rare"))
+
+    labels = [r["label"] for r in sampled_rows(sampler)]
+    assert labels.count("rare") == 10
+    assert labels.count("busy") > 10
+
+
+def test_sample_is_uniform_within_a_label():
+    sampler = KpiSampler(FIELDS, max_bytes=20000, slowest_rows=0, seed=3)
+    for index in range(20000):
+        sampler.add(row(index))
+
+    indexes = [(int(r["timeStamp"]) - 1700000000000) // 10 for r in sampled_rows(sampler)]
+    first_half = sum(index < 10000 for index in indexes)
+    assert abs(first_half - len(indexes) / 2) < len(indexes) * 0.1
+
+
+def test_main_writes_sample_and_partial(tmp_path):
+    kpi_path = tmp_path / "kpi.jtl"
+    kpi_path.write_text(format_line(FIELDS, dict(zip(FIELDS, FIELDS))) + "".join(
+        format_line(FIELDS, row(index, success=index != 3)) for index in range(500)
+    ))
+    sample_path, partial_path = tmp_path / "kpi-sample.csv", tmp_path / "kpi-partial.json"
+
+    assert main([str(kpi_path), "--sample", str(sample_path), "--partial", str(partial_path), "--max-bytes", "2048"]) == 0
+
+    assert json.loads(partial_path.read_text())["rows"] == 500
+    assert sample_path.stat().st_size <= 2048
+    assert any(r["success"] == "false" for r in csv.DictReader(sample_path.open()))
+
+
+def test_main_writes_only_the_partial_without_sample(tmp_path):
+    kpi_path = tmp_path / "kpi.jtl"
+    kpi_path.write_text(format_line(FIELDS, dict(zip(FIELDS, FIELDS))) + "".join(
+        format_line(FIELDS, row(index, success=index != 3)) for index in range(500)
+    ))
+    partial_path = tmp_path / "kpi-partial.json"
+
+    assert main([str(kpi_path), "--partial", str(partial_path)]) == 0
+
+    sampler = KpiSampler(FIELDS, 0)
+    for index in range(500):
+        sampler.add(row(index, success=index != 3))
+    assert json.loads(partial_path.read_text()) == json.loads(json.dumps(sampler.partial))
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["kpi-partial.json", "kpi.jtl"]
+
+
+def test_main_flags_a_saturated_task_in_the_partial(tmp_path):
+    kpi_path = tmp_path / "kpi.jtl"
+    kpi_path.write_text(format_line(FIELDS, dict(zip(FIELDS, FIELDS))) + format_line(FIELDS, row(0)))
+    telemetry_path = tmp_path / "telemetry-summary.json"
+    telemetry_path.write_text(json.dumps({"saturated": True, "saturation_reasons": ["cpu p90 97.0% >= 90.0%"]}))
+    partial_path = tmp_path / "kpi-partial.json"
+
+    assert main([str(kpi_path), "--partial", str(partial_path), "--telemetry", str(telemetry_path), "--task", "task-a"]) == 0
+    assert json.loads(partial_path.read_text())["saturated_tasks"] == [
+        {"task": "task-a", "reasons": ["cpu p90 97.0% >= 90.0%"]}
+    ]
+
+    # A task without a telemetry summary still gets its partial.
+    assert main([str(kpi_path), "--partial", str(partial_path), "--telemetry", str(tmp_path / "missing.json")]) == 0
+    assert json.loads(partial_path.read_text())["saturated_tasks"] == []
+
+
+def test_sample_kpi_file_of_an_empty_file(tmp_path):
+    kpi_path = tmp_path / "kpi.jtl"
+    kpi_path.write_text("timeStamp,elapsed,label,responseCode,success\n")
+
+    stats = sample_kpi_file(str(kpi_path), str(tmp_path / "sample.csv"), str(tmp_path / "partial.json"), 1024)
+
+    assert stats == {"rows": 0, "sampled_rows": 0, "sampled_errors": 0, "labels": 0}
+    assert (tmp_path / "sample.csv").read_text() == "timeStamp,elapsed,label,responseCode,success\n"
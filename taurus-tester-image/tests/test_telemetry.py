@@ -0,0 +1,95 @@
+import csv
+import json
+
+from telemetry import (
+    main,
+    parse_jstat_gc_seconds,
+    read_cpu_times,
+    read_memory,
+    read_network_bytes,
+    summarize,
+)
+
+
+def write(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_text(content)
+    return str(path)
+
+
+def test_read_cpu_times(tmp_path):
+    path = write(tmp_path, "stat", "cpu  100 0 50 800 50 0 0 0 0 0\ncpu0 100 0 50 800 50 0 0 0 0 0\n")
+
+    assert read_cpu_times(path) == (150, 1000)
+
+
+def test_read_memory(tmp_path):
+    path = write(tmp_path, "meminfo", "MemTotal: 4000000 kB\nMemFree: 500000 kB\nMemAvailable: 1000000 kB\n")
+
+    assert read_memory(path) == (3000000, 4000000)
+
+
+def test_read_network_bytes_skips_loopback(tmp_path):
+    path = write(
+        tmp_path,
+        "dev",
+        "Inter-|   Receive |  Transmit\n"
+        " face |bytes packets errs drop fifo frame compressed multicast|bytes packets\n"
+        "    lo: 999 1 0 0 0 0 0 0 999 1 0 0 0 0 0 0\n"
+        "  eth0: 1000 10 0 0 0 0 0 0 2000 20 0 0 0 0 0 0\n"
+        "  eth1: 500 5 0 0 0 0 0 0 100 1 0 0 0 0 0 0\n",
+    )
+
+    assert read_network_bytes(path) == (1500, 2100)
+
+
+def test_parse_jstat_gc_seconds():
+    output = (
+        "  S0     S1     E      O      M     CCS    YGC     YGCT    FGC    FGCT     CGC    CGCT     GCT\n"
+        "  0.00 100.00  45.45  12.37  97.10  92.85     12    0.210     0    0.000     2    0.004    0.214\n"
+    )
+
+    assert parse_jstat_gc_seconds(output) == 0.214
+    assert parse_jstat_gc_seconds("") is None
+
+
+def test_summarize_not_saturated():
+    rows = [{"cpu_percent": "40", "memory_percent": "50", "gc_percent": "1", "rx_bytes_per_sec": "100", "tx_bytes_per_sec": "200"}] * 10
+
+    summary = summarize(rows)
+
+    assert summary["samples"] == 10
+    assert summary["saturated"] is False
+    assert summary["saturation_reasons"] == []
+
+
+def test_summarize_flags_cpu_and_gc_saturation():
+    rows = [{"cpu_percent": "97", "memory_percent": "60", "gc_percent": "25", "rx_bytes_per_sec": "1", "tx_bytes_per_sec": "1"}] * 9
+    rows.append({"cpu_percent": "20", "memory_percent": "60", "gc_percent": "", "rx_bytes_per_sec": "1", "tx_bytes_per_sec": "1"})
+
+    summary = summarize(rows)
+
+    assert summary["saturated"] is True
+    assert len(summary["saturation_reasons"]) == 2
+    assert summary["saturation_reasons"][0].startswith("cpu p90 97.0%")
+
+
+def test_summarize_without_samples():
+    summary = summarize([])
+
+    assert summary["saturated"] is False
+    assert summary["cpu_percent"]["p90"] is None
+
+
+def test_main_summarize_writes_json(tmp_path, capsys):
+    telemetry_csv = tmp_path / "telemetry.csv"
+    with open(telemetry_csv, "w", newline="") as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames=["cpu_percent", "memory_percent", "gc_percent"])
+        writer.writeheader()
+        writer.writerow({"cpu_percent": "10", "memory_percent": "95", "gc_percent": ""})
+    output = tmp_path / "summary.json"
+
+    main(["summarize", str(telemetry_csv), "--output", str(output)])
+
+    assert json.loads(output.read_text())["saturated"] is True
+    assert "GENERATOR SATURATED" in capsys.readouterr().out
@@ -0,0 +1,273 @@
+"""Aggregates the KPI files listed in a test's manifest into a summary.
+
+Each KPI file is reduced to a mergeable partial aggregate: counters, a
+log-bucketed latency histogram (the latency sketch), a per-second timeline
+and per-label stats with their own sketch, and heavy-hitter sketches of the
+failed requests (see ``error_sketch.py``). The summary keeps the latency
+sketches so runs can be compared with each other later, and reports the most
+frequent errors of the whole fleet and the tasks whose generator was
+saturated. Tasks upload the partial of all their rows next to their KPI
+file, or instead of it when they only keep a sample of the rows; it is
+merged as it is and the task's KPI file is not parsed again, so the
+finalizer's work grows with the number of tasks rather than with the number
+of rows.
+
+Partials are cached on local disk under the object's ETag, so re-running an
+aggregation only fetches and processes the files that are new or changed
+since the last run. Files are fetched in parallel straight from the manifest,
+the results prefix is never listed.
+
+Run as a script to re-aggregate a test from a workstation, with the shared
+modules on the path::
+
+    PYTHONPATH=../../shared python aggregation.py TEST_ID --bucket BUCKET --cache-dir ~/.cache/dlt-results
+"""
+import argparse
+import csv
+import gzip
+import io
+import json
+import logging
+import math
+import os
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from error_sketch import merge_error_sketches, top_errors
+from latency_sketch import LATENCY_GAMMA, fold_row, new_label, new_partial
+
+logger = logging.getLogger()
+
+KPI_SUFFIXES = (".jtl", ".jtl.gz")
+PARTIAL_SUFFIX = "kpi-partial.json"
+# The KPI file a task uploads, compacted parts are named differently.
+TASK_KPI_NAMES = tuple(f"kpi{suffix}" for suffix in KPI_SUFFIXES)
+FETCH_MAX_WORKERS = 16
+
+PERCENTILES = (50, 90, 95, 99)
+
+# Bump when the partial aggregate format changes, older cache entries are then ignored.
+CACHE_VERSION = 4
+
+
+def get_summary_key(test_id: str) -> str:
+    return f"results/{test_id}/summary.json"
+
+
+def is_kpi_file(key: str) -> bool:
+    return key.endswith(KPI_SUFFIXES)
+
+
+def is_partial_file(key: str) -> bool:
+    return key.endswith(PARTIAL_SUFFIX)
+
+
+def get_covered_kpi_keys(keys: Iterable[str]) -> Set[str]:
+    """Returns the KPI files of the tasks that uploaded the partial of all their rows next to them."""
+    keys = list(keys)
+    directories = {key.rpartition("/")[0] for key in keys if is_partial_file(key)}
+    return {
+        key
+        for key in keys
+        if key.rpartition("/")[2] in TASK_KPI_NAMES and key.rpartition("/")[0] in directories
+    }
+
+
+def bucket_latency(bucket: int) -> float:
+    return round(LATENCY_GAMMA ** bucket, 1)
+
+
+def merge_buckets(merged: Dict[str, int], buckets: Dict[str, int]) -> None:
+    for bucket, count in buckets.items():
+        merged[bucket] = merged.get(bucket, 0) + count
+
+
+def aggregate_rows(rows: Iterable[Dict]) -> Dict:
+    """Reduces KPI rows (as parsed by csv.DictReader) to a partial aggregate."""
+    partial = new_partial()
+    for row in rows:
+        fold_row(partial, row)
+    return partial
+
+
+def merge_partials(partials: Iterable[Dict]) -> Dict:
+    merged = new_partial()
+
+    for partial in partials:
+        for counter in ("rows", "errors", "elapsed_sum"):
+            merged[counter] += partial[counter]
+        merged["elapsed_max"] = max(merged["elapsed_max"], partial["elapsed_max"])
+
+        merge_buckets(merged["latency_buckets"], partial["latency_buckets"])
+        for second, (count, errors) in partial["timeline"].items():
+            point = merged["timeline"].setdefault(second, [0, 0])
+            point[0] += count
+            point[1] += errors
+        for name, stats in partial["labels"].items():
+            label = merged["labels"].setdefault(name, new_label())
+            for counter in ("rows", "errors", "elapsed_sum"):
+                label[counter] += stats[counter]
+            merge_buckets(label["latency_buckets"], stats["latency_buckets"])
+        # Partials of tasks running an older tester image have no error sketch.
+        if "error_sketch" in partial:
+            merge_error_sketches(merged["error_sketch"], partial["error_sketch"])
+        merged["saturated_tasks"] += partial.get("saturated_tasks", [])
+
+    return merged
+
+
+def latency_percentiles(buckets: Dict[str, int]) -> Dict[str, Optional[float]]:
+    total = sum(buckets.values())
+    percentiles = {f"p{percentile}": None for percentile in PERCENTILES}
+    if total == 0:
+        return percentiles
+
+    ordered = sorted((int(bucket), count) for bucket, count in buckets.items())
+    for percentile in PERCENTILES:
+        rank, seen = math.ceil(total * percentile / 100), 0
+        for bucket, count in ordered:
+            seen += count
+            if seen >= rank:
+                percentiles[f"p{percentile}"] = bucket_latency(bucket)
+                break
+    return percentiles
+
+
+def summarize(merged: Dict) -> Dict:
+    rows = merged["rows"]
+    timeline = sorted((int(second), count, errors) for second, (count, errors) in merged["timeline"].items())
+    return {
+        "rows": rows,
+        "errors": merged["errors"],
+        "error_rate": merged["errors"] / rows if rows else 0,
+        "latency_ms": {
+            "mean": merged["elapsed_sum"] / rows if rows else None,
+            "max": merged["elapsed_max"],
+            **latency_percentiles(merged["latency_buckets"]),
+        },
+        "latency_gamma": LATENCY_GAMMA,
+        "latency_buckets": merged["latency_buckets"],
+        "timeline": [{"second": second, "requests": count, "errors": errors} for second, count, errors in timeline],
+        "labels": {
+            name: {
+                "rows": stats["rows"],
+                "errors": stats["errors"],
+                "mean_latency_ms": stats["elapsed_sum"] / stats["rows"],
+                "latency_ms": latency_percentiles(stats["latency_buckets"]),
+                "latency_buckets": stats["latency_buckets"],
+            }
+            for name, stats in sorted(merged["labels"].items())
+        },
+        "top_errors": top_errors(merged["error_sketch"]),
+        # Latencies measured by a saturated generator are partly its own, not the target's.
+        "saturated_task_count": len(merged["saturated_tasks"]),
+        "saturated_tasks": sorted(merged["saturated_tasks"], key=lambda task: task["task"]),
+    }
+
+
+class ResultCache:
+    """On-disk cache of partial aggregates keyed by the ETag of their file."""
+
+    def __init__(self, directory: str):
+        self.directory = os.path.join(directory, f"v{CACHE_VERSION}")
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, etag: str) -> str:
+        return os.path.join(self.directory, etag.strip('"') + ".json")
+
+    def get(self, etag: str) -> Optional[Dict]:
+        try:
+            with open(self._path(etag)) as cached:
+                return json.load(cached)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, etag: str, partial: Dict) -> None:
+        # Written next to the final path and renamed, a crashed run never leaves a torn entry behind.
+        descriptor, temporary_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(descriptor, "w") as cached:
+            json.dump(partial, cached)
+        os.replace(temporary_path, self._path(etag))
+
+
+def fetch_partial(s3, bucket: str, key: str) -> Dict:
+    body = s3.get_object(Bucket=bucket, Key=key)["Body"]
+    if is_partial_file(key):
+        return json.load(body)
+    if key.endswith(".gz"):
+        body = gzip.GzipFile(fileobj=body)
+    with io.TextIOWrapper(body, encoding="utf-8", newline="") as text:
+        return aggregate_rows(csv.DictReader(text))
+
+
+def aggregate_results(
+    s3, bucket: str, entries: List[Dict], cache: ResultCache, max_workers: int = FETCH_MAX_WORKERS
+) -> Tuple[Dict, Dict]:
+    """Aggregates the KPI files and partials of the manifest, returns the summary and fetch statistics."""
+    covered = get_covered_kpi_keys(entry["key"] for entry in entries)
+    kpi_entries = [
+        entry
+        for entry in entries
+        if is_partial_file(entry["key"]) or (is_kpi_file(entry["key"]) and entry["key"] not in covered)
+    ]
+    partials, missing = [], []
+
+    for entry in kpi_entries:
+        partial = cache.get(entry["etag"])
+        if partial is None:
+            missing.append(entry)
+        else:
+            partials.append(partial)
+
+    def fetch(entry):
+        partial = fetch_partial(s3, bucket, entry["key"])
+        cache.put(entry["etag"], partial)
+        return partial
+
+    if missing:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(missing))) as executor:
+            partials += executor.map(fetch, missing)
+
+    stats = {"files": len(kpi_entries), "fetched": len(missing), "cached": len(kpi_entries) - len(missing)}
+    logger.info(
+        "Aggregated %d KPI files, %d fetched and %d from cache, %d merged from their partials",
+        stats["files"],
+        stats["fetched"],
+        stats["cached"],
+        len(covered),
+    )
+    return summarize(merge_partials(partials)), stats
+
+
+def main(argv=None):
+    import boto3
+
+    from manifest import read_manifest
+
+    parser = argparse.ArgumentParser(description="Re-aggregates the results of a test.")
+    parser.add_argument("test_id")
+    parser.add_argument("--bucket", required=True)
+    parser.add_argument("--manifest-table", default="ResultsManifestTable")
+    parser.add_argument("--region")
+    parser.add_argument("--cache-dir", default=os.path.expanduser("~/.cache/dlt-results"))
+    parser.add_argument("--output", help="Writes the summary to this file instead of stdout.")
+    args = parser.parse_args(argv)
+
+    entries = read_manifest(boto3.client("dynamodb", region_name=args.region), args.manifest_table, args.test_id)
+    summary, stats = aggregate_results(
+        boto3.client("s3", region_name=args.region), args.bucket, entries, ResultCache(args.cache_dir)
+    )
+    print(f"{stats['files']} KPI files: {stats['fetched']} fetched, {stats['cached']} cached", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(summary, output, indent=2)
+    else:
+        json.dump(summary, sys.stdout, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
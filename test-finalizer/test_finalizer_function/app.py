@@ -0,0 +1,104 @@
+import os
+import json
+import logging
+from datetime import datetime, timezone
+
+import boto3
+
+from aggregation import ResultCache, aggregate_results, get_summary_key
+from compaction import compact_results, delete_objects, get_index_key
+from manifest import read_manifest, replace_manifest_entries
+from trend_store import append_to_trend
+
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+
+def lambda_handler(event, _):
+    logger.info("Lambda function invoked with event: %s", event)
+
+    TEST_AWS_REGION = os.environ.get("TEST_AWS_REGION")
+    RESULTS_BUCKET = os.environ.get("RESULTS_BUCKET")
+    TESTS_TABLE = os.environ.get("TESTS_TABLE")
+    RESULTS_MANIFEST_TABLE = os.environ.get("RESULTS_MANIFEST_TABLE")
+    AGGREGATION_CACHE_DIR = os.environ.get("AGGREGATION_CACHE_DIR", "/tmp/aggregation-cache")
+
+    test_id = event.get("test_id")
+    if test_id is None or len(test_id) == 0:
+        raise IDParameterNeededException()
+
+    s3 = boto3.client("s3", region_name=TEST_AWS_REGION)
+    ddb = boto3.client("dynamodb", region_name=TEST_AWS_REGION)
+
+    entries = read_manifest(ddb, RESULTS_MANIFEST_TABLE, test_id)
+    logger.info("Manifest of test %s lists %d artifacts", test_id, len(entries))
+
+    results_summary = None
+    summary, stats = aggregate_results(s3, RESULTS_BUCKET, entries, ResultCache(AGGREGATION_CACHE_DIR))
+    if stats["files"]:
+        results_summary = get_summary_key(test_id)
+        s3.put_object(
+            Bucket=RESULTS_BUCKET,
+            Key=results_summary,
+            Body=json.dumps(summary).encode(),
+            ContentType="application/json",
+        )
+
+    # Sweep points are runs of their test at other loads, they are kept out of its trend.
+    results_trend = None
+    if results_summary is not None and event.get("test_name"):
+        try:
+            results_trend = append_to_trend(
+                s3, RESULTS_BUCKET, event["test_name"], test_id, datetime.now(timezone.utc), summary
+            )
+        except Exception:
+            # The trend is derived from the summary, a missing row must not fail the test.
+            logger.exception("Could not append test %s to its trend", test_id)
+
+    index, compacted_entries, replaced_keys = compact_results(s3, RESULTS_BUCKET, test_id, entries)
+    results_index = None
+    if index is not None:
+        results_index = get_index_key(test_id)
+        # The manifest must not list a deleted object, the replaced objects go last.
+        replace_manifest_entries(ddb, RESULTS_MANIFEST_TABLE, test_id, replaced_keys, compacted_entries)
+        delete_objects(s3, RESULTS_BUCKET, replaced_keys)
+    logger.info("Results of test %s compacted, index: %s, summary: %s", test_id, results_index, results_summary)
+
+    # A test the SLA guard stopped keeps the results it had, but it failed.
+    status = "FAILED" if event.get("sla_breach") else "COMPLETED"
+    mark_test_entry_completed(ddb, TESTS_TABLE, test_id, results_index, results_summary, status=status)
+
+    event["results_index"] = results_index
+    event["results_summary"] = results_summary
+    event["results_trend"] = results_trend
+    return event
+
+
+def mark_test_entry_completed(
+    dynamodb, table: str, test_id: str, results_index, results_summary=None, status: str = "COMPLETED"
+):
+    values = {
+        ":running": {"BOOL": False},
+        ":status": {"S": status},
+        ":completed_at": {"S": datetime.now(timezone.utc).isoformat()},
+    }
+    update_expression = "SET running = :running, #status = :status, completed_at = :completed_at"
+    for name, value in (("results_index", results_index), ("results_summary", results_summary)):
+        if value is not None:
+            update_expression += f", {name} = :{name}"
+            values[f":{name}"] = {"S": value}
+
+    dynamodb.update_item(
+        TableName=table,
+        Key={"test_id": {"S": test_id}},
+        UpdateExpression=update_expression,
+        ExpressionAttributeNames={"#status": "status"},
+        ExpressionAttributeValues=values,
+    )
+
+
+class IDParameterNeededException(Exception):
+    def __init__(self, msg: str = "Test ID is needed to finalize a test") -> None:
+        super().__init__(msg)
+        self.msg = msg
@@ -0,0 +1,348 @@
+"""Compacts the per-task artifacts of a test into a handful of objects.
+
+Every task uploads its artifacts under ``results/{test_id}/{task_uuid}/``.
+Compaction rewrites them under ``results/{test_id}/compacted/{generation}/``:
+
+* ``artifacts.gz`` holds every log, XML report and telemetry file as an
+  independently gzipped member; ``index.json`` records the byte range of
+  each member so a single artifact can be fetched with one ranged GET.
+* ``kpi-NNNN.jtl.gz`` parts hold the KPI rows of many tasks each, with the
+  CSV header written once per part.
+* ``kpi-partial.json`` merges the partial aggregates uploaded by the tasks,
+  so the test can still be aggregated exactly from the compacted objects.
+  The KPI files of tasks that uploaded a partial are archived with the
+  other artifacts instead of being written to the KPI parts.
+
+Every compaction writes a new generation, so compacting artifacts uploaded
+after a first compaction never overwrites the objects of the earlier one.
+``results/{test_id}/compacted/index.json`` lists the objects of every
+generation still in the manifest, and the previous merged partial aggregate
+is merged into the new one.
+
+The artifacts to compact come from the test's manifest rather than a listing
+of the results prefix. The keys of the objects replaced by the compacted ones
+are returned with the compacted objects' manifest entries: the caller swaps
+the entries in the manifest first and deletes the replaced objects last, so
+the manifest never lists an object that is gone.
+"""
+import json
+import logging
+import uuid
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+from aggregation import (
+    FETCH_MAX_WORKERS,
+    PARTIAL_SUFFIX,
+    fetch_partial,
+    get_covered_kpi_keys,
+    is_partial_file,
+    merge_partials,
+)
+
+
+logger = logging.getLogger()
+
+COMPACTED_DIR = "compacted"
+ARCHIVE_NAME = "artifacts.gz"
+INDEX_NAME = "index.json"
+KPI_SUFFIX = ".jtl"
+
+READ_CHUNK_BYTES = 1024 * 1024
+# S3 multipart uploads need parts of at least 5 MiB, except for the last one.
+MULTIPART_PART_BYTES = 16 * 1024 * 1024
+KPI_PART_MAX_RAW_BYTES = 1024 * 1024 * 1024
+DELETE_OBJECTS_MAX_KEYS = 1000
+
+
+def get_results_prefix(test_id: str) -> str:
+    return f"results/{test_id}/"
+
+
+def get_compacted_prefix(test_id: str) -> str:
+    return f"{get_results_prefix(test_id)}{COMPACTED_DIR}/"
+
+
+def get_generation_prefix(test_id: str, generation: str) -> str:
+    return f"{get_compacted_prefix(test_id)}{generation}/"
+
+
+def get_index_key(test_id: str) -> str:
+    return f"{get_compacted_prefix(test_id)}{INDEX_NAME}"
+
+
+def is_raw_artifact(test_id: str, key: str) -> bool:
+    return not key.startswith(get_compacted_prefix(test_id))
+
+
+def iter_object_chunks(s3, bucket: str, key: str) -> Iterator[bytes]:
+    body = s3.get_object(Bucket=bucket, Key=key)["Body"]
+    while True:
+        chunk = body.read(READ_CHUNK_BYTES)
+        if not chunk:
+            return
+        yield chunk
+
+
+class MultipartWriter:
+    """File-like sink streaming its content to S3 as a multipart upload."""
+
+    def __init__(self, s3, bucket: str, key: str, content_type: str = "application/octet-stream"):
+        self.s3 = s3
+        self.bucket = bucket
+        self.key = key
+        self.content_type = content_type
+        self.position = 0
+        self.etag: Optional[str] = None
+        self._buffer = bytearray()
+        self._parts = []
+        self._upload_id: Optional[str] = None
+
+    def write(self, data: bytes) -> None:
+        self._buffer += data
+        self.position += len(data)
+        if len(self._buffer) >= MULTIPART_PART_BYTES:
+            self._upload_part()
+
+    def close(self) -> None:
+        if self._upload_id is None:
+            # Small enough for a single request.
+            response = self.s3.put_object(
+                Bucket=self.bucket, Key=self.key, Body=bytes(self._buffer), ContentType=self.content_type
+            )
+            self.etag = response["ETag"]
+            return
+
+        if self._buffer:
+            self._upload_part()
+        response = self.s3.complete_multipart_upload(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self._upload_id,
+            MultipartUpload={"Parts": self._parts},
+        )
+        self.etag = response["ETag"]
+
+    def abort(self) -> None:
+        if self._upload_id is not None:
+            self.s3.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self._upload_id)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *_):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def _upload_part(self) -> None:
+        if self._upload_id is None:
+            self._upload_id = self.s3.create_multipart_upload(
+                Bucket=self.bucket, Key=self.key, ContentType=self.content_type
+            )["UploadId"]
+
+        part_number = len(self._parts) + 1
+        response = self.s3.upload_part(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self._upload_id,
+            PartNumber=part_number,
+            Body=bytes(self._buffer),
+        )
+        self._parts.append({"ETag": response["ETag"], "PartNumber": part_number})
+        self._buffer.clear()
+
+
+def write_gzip_member(writer: MultipartWriter, chunks: Iterator[bytes]) -> int:
+    """Writes the chunks as one gzip member, returns the uncompressed size."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    size = 0
+    for chunk in chunks:
+        size += len(chunk)
+        writer.write(compressor.compress(chunk))
+    writer.write(compressor.flush())
+    return size
+
+
+def strip_header(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    """Drops everything up to and including the first newline."""
+    header_done = False
+    for chunk in chunks:
+        if not header_done:
+            newline = chunk.find(b"\n")
+            if newline == -1:
+                continue
+            chunk, header_done = chunk[newline + 1:], True
+        yield chunk
+
+
+def write_archive(s3, bucket: str, test_id: str, prefix: str, artifacts: List[dict]) -> Tuple[List[dict], dict]:
+    """Returns the archive's index entries and its manifest entry."""
+    results_prefix = get_results_prefix(test_id)
+    key = f"{prefix}{ARCHIVE_NAME}"
+    entries = []
+
+    with MultipartWriter(s3, bucket, key, "application/gzip") as writer:
+        for artifact in artifacts:
+            offset = writer.position
+            size = write_gzip_member(writer, iter_object_chunks(s3, bucket, artifact["key"]))
+            entries.append({
+                "name": artifact["key"][len(results_prefix):],
+                "archive": key,
+                "offset": offset,
+                "length": writer.position - offset,
+                "size": size,
+            })
+
+    return entries, {"key": key, "size": writer.position, "etag": writer.etag, "rows": 0}
+
+
+def write_kpi_parts(
+    s3, bucket: str, test_id: str, prefix: str, kpi_artifacts: List[dict]
+) -> Tuple[List[dict], List[dict]]:
+    """Returns the parts' index entries and their manifest entries."""
+    results_prefix = get_results_prefix(test_id)
+    parts: List[dict] = []
+    manifest_entries: List[dict] = []
+    batches: List[List[dict]] = []
+
+    for artifact in kpi_artifacts:
+        if not batches or sum(item["size"] for item in batches[-1]) + artifact["size"] > KPI_PART_MAX_RAW_BYTES:
+            batches.append([])
+        batches[-1].append(artifact)
+
+    for number, batch in enumerate(batches):
+        key = f"{prefix}kpi-{number:04d}{KPI_SUFFIX}.gz"
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        size = lines = 0
+
+        with MultipartWriter(s3, bucket, key, "application/gzip") as writer:
+            for index, artifact in enumerate(batch):
+                chunks = iter_object_chunks(s3, bucket, artifact["key"])
+                for chunk in chunks if index == 0 else strip_header(chunks):
+                    size += len(chunk)
+                    lines += chunk.count(b"\n")
+                    writer.write(compressor.compress(chunk))
+            writer.write(compressor.flush())
+
+        parts.append({
+            "key": key,
+            "size": size,
+            "tasks": [artifact["key"][len(results_prefix):] for artifact in batch],
+        })
+        # The header line is not a row.
+        manifest_entries.append({"key": key, "size": writer.position, "etag": writer.etag, "rows": max(lines - 1, 0)})
+
+    return parts, manifest_entries
+
+
+def write_partial(s3, bucket: str, prefix: str, partial_artifacts: List[dict]) -> dict:
+    """Merges the partial aggregates into one object, returns its manifest entry."""
+    key = f"{prefix}{PARTIAL_SUFFIX}"
+    with ThreadPoolExecutor(max_workers=min(FETCH_MAX_WORKERS, len(partial_artifacts))) as executor:
+        partials = list(executor.map(lambda artifact: fetch_partial(s3, bucket, artifact["key"]), partial_artifacts))
+
+    body = json.dumps(merge_partials(partials)).encode()
+    response = s3.put_object(Bucket=bucket, Key=key, Body=body, ContentType="application/json")
+    return {"key": key, "size": len(body), "etag": response["ETag"], "rows": 0}
+
+
+def delete_objects(s3, bucket: str, keys: List[str]) -> None:
+    for start in range(0, len(keys), DELETE_OBJECTS_MAX_KEYS):
+        batch = keys[start:start + DELETE_OBJECTS_MAX_KEYS]
+        s3.delete_objects(
+            Bucket=bucket,
+            Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True},
+        )
+
+
+def read_index(s3, bucket: str, test_id: str) -> Optional[Dict]:
+    try:
+        response = s3.get_object(Bucket=bucket, Key=get_index_key(test_id))
+    except ClientError as error:
+        if error.response["Error"]["Code"] in ("NoSuchKey", "404"):
+            return None
+        raise
+    return json.load(response["Body"])
+
+
+def compact_results(
+    s3, bucket: str, test_id: str, manifest_entries: List[dict]
+) -> Tuple[Optional[Dict], List[dict], List[str]]:
+    """Compacts the raw artifacts listed in the manifest into a new generation.
+
+    Returns the index, the manifest entries of the compacted objects and the
+    keys of the objects they replace, or None and nothing if there was
+    nothing to compact. The replaced objects are not deleted.
+    """
+    artifacts = sorted(
+        (entry for entry in manifest_entries if is_raw_artifact(test_id, entry["key"])),
+        key=lambda artifact: artifact["key"],
+    )
+    if not artifacts:
+        logger.info("No raw artifacts to compact for test %s", test_id)
+        return None, [], []
+
+    # Objects of earlier generations that are not in the manifest were left
+    # behind by an interrupted compaction, the index drops them.
+    compacted_keys = {entry["key"] for entry in manifest_entries if not is_raw_artifact(test_id, entry["key"])}
+    previous_index = read_index(s3, bucket, test_id) if compacted_keys else None
+    previous_index = previous_index or {"artifacts": [], "kpi_parts": [], "kpi_partial": None}
+
+    covered = get_covered_kpi_keys(artifact["key"] for artifact in artifacts)
+
+    def is_kpi_part_input(key: str) -> bool:
+        return key.endswith(KPI_SUFFIX) and key not in covered
+
+    kpi_artifacts = [artifact for artifact in artifacts if is_kpi_part_input(artifact["key"])]
+    partial_artifacts = [artifact for artifact in artifacts if is_partial_file(artifact["key"])]
+    other_artifacts = [
+        artifact
+        for artifact in artifacts
+        if not is_kpi_part_input(artifact["key"]) and not is_partial_file(artifact["key"])
+    ]
+    logger.info(
+        "Compacting %d KPI files, %d partial aggregates and %d other artifacts for test %s",
+        len(kpi_artifacts),
+        len(partial_artifacts),
+        len(other_artifacts),
+        test_id,
+    )
+
+    prefix = get_generation_prefix(test_id, uuid.uuid4().hex)
+    replaced_keys = [artifact["key"] for artifact in artifacts]
+    archive_entries, compacted_entries = [], []
+    if other_artifacts:
+        archive_entries, archive_manifest_entry = write_archive(s3, bucket, test_id, prefix, other_artifacts)
+        compacted_entries.append(archive_manifest_entry)
+    kpi_parts, kpi_manifest_entries = write_kpi_parts(s3, bucket, test_id, prefix, kpi_artifacts)
+    compacted_entries += kpi_manifest_entries
+
+    kpi_partial = previous_index["kpi_partial"] if previous_index["kpi_partial"] in compacted_keys else None
+    if partial_artifacts:
+        # There is one merged partial aggregate per test, the previous one is merged into the new one.
+        previous_partials = [{"key": kpi_partial}] if kpi_partial else []
+        partial_manifest_entry = write_partial(s3, bucket, prefix, previous_partials + partial_artifacts)
+        compacted_entries.append(partial_manifest_entry)
+        replaced_keys += [partial["key"] for partial in previous_partials]
+        kpi_partial = partial_manifest_entry["key"]
+
+    index = {
+        "test_id": test_id,
+        "artifacts": [
+            entry for entry in previous_index["artifacts"] if entry["archive"] in compacted_keys
+        ] + archive_entries,
+        "kpi_parts": [part for part in previous_index["kpi_parts"] if part["key"] in compacted_keys] + kpi_parts,
+        "kpi_partial": kpi_partial,
+    }
+    s3.put_object(
+        Bucket=bucket,
+        Key=get_index_key(test_id),
+        Body=json.dumps(index).encode(),
+        ContentType="application/json",
+    )
+    return index, compacted_entries, replaced_keys
@@ -0,0 +1,37 @@
+"""Marks a test FAILED when its results could not be finalized.
+
+The state machine catches the finalizer's errors once its retries are
+exhausted. Without this the test entry would stay running, and the capacity
+the test reserved would wait for the execution's status change to reach the
+scheduler, so it is handed back here right away.
+"""
+import logging
+import os
+
+import boto3
+
+from app import mark_test_entry_completed
+from capacity import release_test_reservation
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+
+def lambda_handler(event, _):
+    logger.info("Finalizing test %s failed: %s", event.get("test_id"), event.get("finalize_error"))
+
+    TEST_AWS_REGION = os.environ.get("TEST_AWS_REGION")
+    # The region the scheduler reserved the capacity in, like the API.
+    AWS_TESTS_REGION = os.environ.get("AWS_TESTS_REGION", "us-east-1")
+    TESTS_TABLE = os.environ.get("TESTS_TABLE")
+    REGION_INFRA_TABLE = os.environ.get("REGION_INFRA_TABLE")
+
+    test_id = event["test_id"]
+    ddb = boto3.client("dynamodb", region_name=TEST_AWS_REGION)
+
+    mark_test_entry_completed(ddb, TESTS_TABLE, test_id, None, status="FAILED")
+    reserved_tasks = event.get("test_task_config", {}).get("reserved_tasks")
+    event["capacity_released"] = release_test_reservation(
+        ddb, TESTS_TABLE, REGION_INFRA_TABLE, AWS_TESTS_REGION, test_id, reserved_tasks
+    )
+    return event
@@ -0,0 +1,81 @@
+"""Per-test manifest of the result artifacts in S3.
+
+Every task records the artifacts it uploads in the manifest table, keyed by
+``test_id`` and the object ``key``, together with the object's size, ETag and
+row count. Readers query the manifest instead of listing the results prefix,
+and compaction replaces the raw entries with the compacted objects.
+"""
+import logging
+import time
+from typing import Dict, List
+
+logger = logging.getLogger()
+
+BATCH_WRITE_MAX_ITEMS = 25
+BATCH_WRITE_MAX_ATTEMPTS = 5
+
+
+def read_manifest(dynamodb, table: str, test_id: str) -> List[Dict]:
+    """Returns the manifest entries of the test, ordered by key."""
+    entries = []
+    params = {
+        "TableName": table,
+        "KeyConditionExpression": "test_id = :test_id",
+        "ExpressionAttributeValues": {":test_id": {"S": test_id}},
+        "ConsistentRead": True,
+    }
+
+    while True:
+        response = dynamodb.query(**params)
+        entries += [from_item(item) for item in response.get("Items", [])]
+        if "LastEvaluatedKey" not in response:
+            return entries
+        params["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def from_item(item: Dict) -> Dict:
+    return {
+        "key": item["key"]["S"],
+        "size": int(item["size"]["N"]),
+        "etag": item["etag"]["S"].strip('"'),
+        "rows": int(item.get("rows", {"N": "0"})["N"]),
+    }
+
+
+def to_item(test_id: str, entry: Dict) -> Dict:
+    return {
+        "test_id": {"S": test_id},
+        "key": {"S": entry["key"]},
+        "size": {"N": str(entry["size"])},
+        "etag": {"S": entry["etag"].strip('"')},
+        "rows": {"N": str(entry.get("rows", 0))},
+    }
+
+
+def replace_manifest_entries(dynamodb, table: str, test_id: str, removed_keys: List[str], added_entries: List[Dict]):
+    """Adds the new entries and removes the replaced ones in batches of 25."""
+    requests = [{"PutRequest": {"Item": to_item(test_id, entry)}} for entry in added_entries]
+    requests += [
+        {"DeleteRequest": {"Key": {"test_id": {"S": test_id}, "key": {"S": key}}}}
+        for key in removed_keys
+    ]
+
+    for start in range(0, len(requests), BATCH_WRITE_MAX_ITEMS):
+        batch_write(dynamodb, table, requests[start:start + BATCH_WRITE_MAX_ITEMS])
+
+
+def batch_write(dynamodb, table: str, requests: List[Dict]):
+    for attempt in range(BATCH_WRITE_MAX_ATTEMPTS):
+        response = dynamodb.batch_write_item(RequestItems={table: requests})
+        requests = response.get("UnprocessedItems", {}).get(table, [])
+        if not requests:
+            return
+        time.sleep(0.05 * 2 ** attempt)
+
+    raise ManifestWriteException(f"{len(requests)} manifest writes were left unprocessed")
+
+
+class ManifestWriteException(Exception):
+    def __init__(self, msg: str = "Could not write the results manifest") -> None:
+        super().__init__(msg)
+        self.msg = msg
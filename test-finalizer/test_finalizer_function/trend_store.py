@@ -0,0 +1,148 @@
+"""Append-only columnar store of the results of every run of a test.
+
+Summaries hold everything about one run, but charting a label over months of
+runs would mean fetching hundreds of them. After aggregating a run the
+finalizer appends one row per run to a segment of the test's trend instead,
+partitioned by test name and by the quarter the run completed in::
+
+    trends/{test_name}/{YYYY}-Q{N}.json
+
+A segment stores its rows column by column: the run columns (test id,
+completion time, rows, errors, throughput) and, for the whole run and for
+every label, the rows, errors and latency percentiles. Label columns are
+aligned with the run columns, ``None`` where a run did not have the label.
+A quarter of nightly runs is a few hundred kilobytes at most and any window
+of up to three months spans at most two segments.
+
+Rows are only ever appended. A segment is rewritten with a conditional PUT
+on the ETag it was read with, so concurrent finalizers of the same test
+retry instead of losing each other's rows, and a run already in the segment
+is not appended twice when the finalizer is retried.
+"""
+import json
+import logging
+import random
+import time
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+from aggregation import PERCENTILES
+from run_results import get_segment_key, get_throughput
+
+logger = logging.getLogger()
+
+SEGMENT_VERSION = 1
+APPEND_MAX_ATTEMPTS = 5
+
+RUN_COLUMNS = ("test_id", "completed_at", "rows", "errors", "throughput_rps")
+LABEL_COLUMNS = ("rows", "errors") + tuple(f"p{percentile}" for percentile in PERCENTILES)
+
+# Codes of a conditional PUT that lost the race against another writer.
+CONDITIONAL_WRITE_CONFLICTS = ("PreconditionFailed", "ConditionalRequestConflict")
+
+
+def get_partition(completed_at: datetime) -> str:
+    return f"{completed_at.year}-Q{(completed_at.month - 1) // 3 + 1}"
+
+
+def new_segment(test_name: str, partition: str, latency_gamma: float) -> Dict:
+    return {
+        "version": SEGMENT_VERSION,
+        "test_name": test_name,
+        "partition": partition,
+        "latency_gamma": latency_gamma,
+        "runs": {column: [] for column in RUN_COLUMNS},
+        "overall": {column: [] for column in LABEL_COLUMNS},
+        "labels": {},
+    }
+
+
+def label_row(stats: Dict) -> Dict:
+    return {"rows": stats["rows"], "errors": stats["errors"], **stats["latency_ms"]}
+
+
+def append_run(segment: Dict, test_id: str, completed_at: datetime, summary: Dict) -> bool:
+    """Appends the run to the segment, returns False if it is already there."""
+    runs = segment["runs"]
+    if test_id in runs["test_id"]:
+        return False
+
+    length = len(runs["test_id"])
+    row = {
+        "test_id": test_id,
+        "completed_at": completed_at.isoformat(),
+        "rows": summary["rows"],
+        "errors": summary["errors"],
+        "throughput_rps": get_throughput(summary),
+    }
+    for column in RUN_COLUMNS:
+        runs[column].append(row[column])
+
+    overall = label_row(summary)
+    for column in LABEL_COLUMNS:
+        segment["overall"][column].append(overall.get(column))
+
+    labels = segment["labels"]
+    for name, stats in summary["labels"].items():
+        if name not in labels:
+            labels[name] = {column: [None] * length for column in LABEL_COLUMNS}
+        row = label_row(stats)
+        for column in LABEL_COLUMNS:
+            labels[name][column].append(row.get(column))
+    for name, columns in labels.items():
+        if name not in summary["labels"]:
+            for column in LABEL_COLUMNS:
+                columns[column].append(None)
+    return True
+
+
+def read_segment(s3, bucket: str, key: str) -> Tuple[Optional[Dict], Optional[str]]:
+    """Returns the segment and its ETag, or None and no ETag if it does not exist yet."""
+    try:
+        response = s3.get_object(Bucket=bucket, Key=key)
+    except ClientError as error:
+        if error.response["Error"]["Code"] in ("NoSuchKey", "404"):
+            return None, None
+        raise
+    return json.load(response["Body"]), response["ETag"]
+
+
+def append_to_trend(s3, bucket: str, test_name: str, test_id: str, completed_at: datetime, summary: Dict) -> str:
+    """Appends the run to its segment of the test's trend, returns the segment's key."""
+    partition = get_partition(completed_at)
+    key = get_segment_key(test_name, partition)
+
+    for attempt in range(APPEND_MAX_ATTEMPTS):
+        segment, etag = read_segment(s3, bucket, key)
+        if segment is None:
+            segment = new_segment(test_name, partition, summary["latency_gamma"])
+        if not append_run(segment, test_id, completed_at, summary):
+            logger.info("Test %s is already in trend segment %s", test_id, key)
+            return key
+
+        condition = {"IfMatch": etag} if etag else {"IfNoneMatch": "*"}
+        try:
+            s3.put_object(
+                Bucket=bucket,
+                Key=key,
+                Body=json.dumps(segment).encode(),
+                ContentType="application/json",
+                **condition,
+            )
+            return key
+        except ClientError as error:
+            if error.response["Error"]["Code"] not in CONDITIONAL_WRITE_CONFLICTS:
+                raise
+        logger.info("Trend segment %s changed while appending test %s, retrying", key, test_id)
+        # Jittered, finalizers that lost the same race do not retry in lockstep.
+        time.sleep(random.uniform(0, 0.1 * 2 ** attempt))
+
+    raise TrendWriteException(f"Could not append test {test_id} to trend segment {key}")
+
+
+class TrendWriteException(Exception):
+    def __init__(self, msg: str = "Could not append to the trend") -> None:
+        super().__init__(msg)
+        self.msg = msg
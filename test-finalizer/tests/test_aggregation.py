@@ -0,0 +1,185 @@
+import gzip
+import io
+import json
+import os
+
+import pytest
+
+from aggregation import ResultCache, aggregate_results, aggregate_rows, merge_partials, summarize
+
+KPI_HEADER = b"timeStamp,elapsed,label,responseCode,success\n"
+
+
+class CountingS3:
+    def __init__(self, objects):
+        self.objects = objects
+        self.fetched = []
+
+    def get_object(self, Bucket, Key):
+        self.fetched.append(Key)
+        return {"Body": io.BytesIO(self.objects[Key])}
+
+
+def kpi_file(rows):
+    return KPI_HEADER + b"".join(
+        f"{timestamp},{elapsed},{label},200,{'true' if ok else 'false'}\n".encode()
+        for timestamp, elapsed, label, ok in rows
+    )
+
+
+def csv_rows(rows):
+    return [
+        {"timeStamp": str(timestamp), "elapsed": str(elapsed), "label": label, "success": "true" if ok else "false"}
+        for timestamp, elapsed, label, ok in rows
+    ]
+
+
+def entry(key, etag):
+    return {"key": key, "size": 0, "etag": etag, "rows": 0}
+
+
+def test_summary_of_merged_partials():
+    first = aggregate_rows([
+        {"timeStamp": "1700000000100", "elapsed": "10", "label": "home", "success": "true"},
+        {"timeStamp": "1700000000900", "elapsed": "20", "label": "home", "success": "false"},
+    ])
+    second = aggregate_rows([
+        {"timeStamp": "1700000001000", "elapsed": "1000", "label": "login", "success": "true"},
+        {"timeStamp": "not a number", "elapsed": "5", "label": "login", "success": "true"},
+    ])
+
+    summary = summarize(merge_partials([first, second]))
+
+    assert summary["rows"] == 3
+    assert summary["errors"] == 1
+    assert summary["latency_ms"]["max"] == 1000
+    assert summary["latency_ms"]["p50"] == pytest.approx(20, rel=0.02)
+    assert summary["latency_ms"]["p99"] == pytest.approx(1000, rel=0.02)
+    assert summary["timeline"] == [
+        {"second": 1700000000, "requests": 2, "errors": 1},
+        {"second": 1700000001, "requests": 1, "errors": 0},
+    ]
+    home = summary["labels"]["home"]
+    assert (home["rows"], home["errors"], home["mean_latency_ms"]) == (2, 1, 15)
+    assert home["latency_ms"]["p99"] == pytest.approx(20, rel=0.02)
+    assert sum(home["latency_buckets"].values()) == 2
+    assert sum(summary["latency_buckets"].values()) == 3
+
+
+def test_summary_reports_saturated_tasks():
+    saturated = {"task": "task-b", "reasons": ["gc p90 12.0% >= 10.0%"]}
+    first = aggregate_rows(csv_rows([(1700000000000, 10, "home", True)]))
+    second = {**aggregate_rows(csv_rows([(1700000000000, 10, "home", True)])), "saturated_tasks": [saturated]}
+    # Partials of tasks running an older tester image do not report saturation.
+    del first["saturated_tasks"]
+
+    summary = summarize(merge_partials([first, second]))
+
+    assert summary["saturated_task_count"] == 1
+    assert summary["saturated_tasks"] == [saturated]
+
+
+def test_aggregation_only_fetches_new_or_changed_files(tmp_path):
+    s3 = CountingS3({
+        "results/123/a/kpi.jtl": kpi_file([(1700000000000, 10, "home", True)]),
+        "results/123/b/kpi.jtl": kpi_file([(1700000000000, 30, "home", False)]),
+        "results/123/a/bzt.log": b"not a kpi file",
+    })
+    cache = ResultCache(str(tmp_path))
+    entries = [
+        entry("results/123/a/kpi.jtl", '"etag-a"'),
+        entry("results/123/b/kpi.jtl", "etag-b"),
+        entry("results/123/a/bzt.log", "etag-log"),
+    ]
+
+    summary, stats = aggregate_results(s3, "bucket", entries, cache)
+    assert stats == {"files": 2, "fetched": 2, "cached": 0}
+    assert summary["rows"] == 2
+
+    s3.objects["results/123/b/kpi.jtl"] = kpi_file([(1700000000000, 30, "home", True)] * 3)
+    s3.fetched.clear()
+    entries[1] = entry("results/123/b/kpi.jtl", "etag-b2")
+
+    summary, stats = aggregate_results(s3, "bucket", entries, cache)
+    assert s3.fetched == ["results/123/b/kpi.jtl"]
+    assert stats == {"files": 2, "fetched": 1, "cached": 1}
+    assert (summary["rows"], summary["errors"]) == (4, 0)
+
+
+def test_aggregation_reads_compacted_parts(tmp_path):
+    s3 = CountingS3({"results/123/compacted/kpi-0000.jtl.gz": gzip.compress(kpi_file([(1700000000000, 10, "home", True)] * 4))})
+
+    summary, _ = aggregate_results(s3, "bucket", [entry("results/123/compacted/kpi-0000.jtl.gz", "p")], ResultCache(str(tmp_path)))
+
+    assert summary["rows"] == 4
+
+
+def test_aggregation_merges_uploaded_partials(tmp_path):
+    partial = aggregate_rows([
+        {"timeStamp": "1700000000000", "elapsed": str(elapsed), "label": "home", "success": "true"}
+        for elapsed in (10, 20, 30)
+    ])
+    s3 = CountingS3({
+        "results/123/a/kpi.jtl": kpi_file([(1700000000000, 40, "home", False)]),
+        # A task that sampled its rows uploads them next to the partial of all of them.
+        "results/123/b/kpi-partial.json": json.dumps(partial).encode(),
+        "results/123/b/kpi-sample.csv": kpi_file([(1700000000000, 30, "home", True)]),
+    })
+    entries = [
+        entry("results/123/a/kpi.jtl", "etag-a"),
+        entry("results/123/b/kpi-partial.json", "etag-b"),
+        entry("results/123/b/kpi-sample.csv", "etag-sample"),
+    ]
+
+    summary, stats = aggregate_results(s3, "bucket", entries, ResultCache(str(tmp_path)))
+
+    assert stats == {"files": 2, "fetched": 2, "cached": 0}
+    assert (summary["rows"], summary["errors"]) == (4, 1)
+    assert summary["labels"]["home"]["mean_latency_ms"] == 25
+
+
+def test_aggregation_skips_kpi_files_of_tasks_with_partials(tmp_path):
+    rows = [(1700000000000, 10, "home", True), (1700000000000, 30, "home", False)]
+    s3 = CountingS3({
+        "results/123/a/kpi.jtl": kpi_file(rows),
+        "results/123/a/kpi-partial.json": json.dumps(aggregate_rows(csv_rows(rows))).encode(),
+        "results/123/compacted/g1/kpi-0000.jtl.gz": gzip.compress(kpi_file(rows)),
+        "results/123/compacted/g1/kpi-partial.json": json.dumps(aggregate_rows(csv_rows(rows))).encode(),
+    })
+    entries = [entry(key, f"etag-{index}") for index, key in enumerate(s3.objects)]
+
+    summary, stats = aggregate_results(s3, "bucket", entries, ResultCache(str(tmp_path)))
+
+    # The task's KPI file is not parsed, the compacted part holds tasks without partials and is.
+    assert "results/123/a/kpi.jtl" not in s3.fetched
+    assert stats == {"files": 3, "fetched": 3, "cached": 0}
+    assert (summary["rows"], summary["errors"]) == (6, 3)
+
+
+def test_summary_reports_top_errors_across_files(tmp_path):
+    s3 = CountingS3({
+        "results/123/a/kpi.jtl": kpi_file([(1700000000000, 40, "home", False), (1700000001000, 40, "home", True)]),
+        "results/123/b/kpi.jtl": kpi_file([(1700000070000, 40, "login", False), (1700000071000, 40, "home", False)]),
+    })
+    entries = [entry("results/123/a/kpi.jtl", "etag-a"), entry("results/123/b/kpi.jtl", "etag-b")]
+
+    summary, _ = aggregate_results(s3, "bucket", entries, ResultCache(str(tmp_path)))
+
+    top_errors = summary["top_errors"]
+    assert top_errors["errors"] == 3
+    assert [(error["value"], error["count"]) for error in top_errors["urls"]] == [("home", 2), ("login", 1)]
+    assert top_errors["urls"][0]["per_minute"] == [
+        {"minute": 1699999980, "count": 1},
+        {"minute": 1700000040, "count": 1},
+    ]
+    assert top_errors["response_codes"][0]["value"] == "200"
+
+
+def test_cache_ignores_torn_entries(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    with open(os.path.join(cache.directory, "broken.json"), "w") as cached:
+        cached.write("{")
+
+    assert cache.get('"broken"') is None
+    cache.put('"broken"', {"rows": 1})
+    assert cache.get("broken") == {"rows": 1}
@@ -0,0 +1,160 @@
+import os
+from unittest.mock import ANY, Mock, call, patch
+
+import pytest
+from test_finalizer_function.app import IDParameterNeededException, lambda_handler
+
+ENVIRONMENT = {
+    "TEST_AWS_REGION": "us-east-1",
+    "RESULTS_BUCKET": "some bucket",
+    "TESTS_TABLE": "TestsTable",
+    "RESULTS_MANIFEST_TABLE": "ResultsManifestTable",
+}
+
+MANIFEST = [
+    {"key": "results/123/task-a/kpi.jtl", "size": 10, "etag": "a", "rows": 1},
+    {"key": "results/123/task-a/bzt.log", "size": 10, "etag": "b", "rows": 3},
+]
+
+
+@patch("test_finalizer_function.app.append_to_trend")
+@patch("test_finalizer_function.app.delete_objects")
+@patch("test_finalizer_function.app.replace_manifest_entries")
+@patch("test_finalizer_function.app.compact_results")
+@patch("test_finalizer_function.app.aggregate_results")
+@patch("test_finalizer_function.app.read_manifest")
+@patch("boto3.client")
+@patch.dict(os.environ, ENVIRONMENT)
+def test_lambda_aggregates_compacts_and_completes_test(
+    mock_boto_client: Mock,
+    mock_read_manifest: Mock,
+    mock_aggregate_results: Mock,
+    mock_compact_results: Mock,
+    mock_replace_manifest_entries: Mock,
+    mock_delete_objects: Mock,
+    mock_append_to_trend: Mock,
+):
+    mock_client = mock_boto_client.return_value
+    mock_read_manifest.return_value = MANIFEST
+    mock_aggregate_results.return_value = ({"rows": 1}, {"files": 1, "fetched": 1, "cached": 0})
+    compacted = [{"key": "results/123/compacted/g1/kpi-0000.jtl.gz", "size": 5, "etag": "c", "rows": 1}]
+    replaced = [entry["key"] for entry in MANIFEST]
+    mock_compact_results.return_value = ({"test_id": "123"}, compacted, replaced)
+    calls = Mock()
+    calls.attach_mock(mock_replace_manifest_entries, "replace_manifest_entries")
+    calls.attach_mock(mock_delete_objects, "delete_objects")
+
+    mock_append_to_trend.return_value = "trends/nightly/2026-Q4.json"
+
+    result = lambda_handler({"test_id": "123", "test_name": "nightly", "isRunning": False}, {})
+
+    mock_read_manifest.assert_called_once_with(mock_client, "ResultsManifestTable", "123")
+    assert mock_aggregate_results.call_args.args[:3] == (mock_client, "some bucket", MANIFEST)
+    mock_compact_results.assert_called_once_with(mock_client, "some bucket", "123", MANIFEST)
+    # The raw objects are deleted only once the manifest no longer lists them.
+    assert calls.mock_calls == [
+        call.replace_manifest_entries(mock_client, "ResultsManifestTable", "123", replaced, compacted),
+        call.delete_objects(mock_client, "some bucket", replaced),
+    ]
+    assert mock_client.put_object.call_args.kwargs["Key"] == "results/123/summary.json"
+    assert result["results_index"] == "results/123/compacted/index.json"
+    assert result["results_summary"] == "results/123/summary.json"
+    assert mock_append_to_trend.call_args.args[:5] == (mock_client, "some bucket", "nightly", "123", ANY)
+    assert mock_append_to_trend.call_args.args[5] == {"rows": 1}
+    assert result["results_trend"] == "trends/nightly/2026-Q4.json"
+
+    update = mock_client.update_item.call_args.kwargs
+    assert update["TableName"] == "TestsTable"
+    assert update["Key"] == {"test_id": {"S": "123"}}
+    assert update["ExpressionAttributeValues"][":running"] == {"BOOL": False}
+    assert update["ExpressionAttributeValues"][":status"] == {"S": "COMPLETED"}
+    assert update["ExpressionAttributeValues"][":results_index"] == {"S": "results/123/compacted/index.json"}
+    assert update["ExpressionAttributeValues"][":results_summary"] == {"S": "results/123/summary.json"}
+
+
+@patch("test_finalizer_function.app.replace_manifest_entries")
+@patch("test_finalizer_function.app.compact_results")
+@patch("test_finalizer_function.app.aggregate_results")
+@patch("test_finalizer_function.app.read_manifest")
+@patch("boto3.client")
+@patch.dict(os.environ, ENVIRONMENT)
+def test_lambda_completes_test_without_results(
+    mock_boto_client: Mock,
+    mock_read_manifest: Mock,
+    mock_aggregate_results: Mock,
+    mock_compact_results: Mock,
+    mock_replace_manifest_entries: Mock,
+):
+    mock_client = mock_boto_client.return_value
+    mock_read_manifest.return_value = []
+    mock_aggregate_results.return_value = ({"rows": 0}, {"files": 0, "fetched": 0, "cached": 0})
+    mock_compact_results.return_value = (None, [], [])
+
+    result = lambda_handler({"test_id": "123"}, {})
+
+    assert result["results_index"] is None
+    assert result["results_summary"] is None
+    mock_client.put_object.assert_not_called()
+    mock_replace_manifest_entries.assert_not_called()
+    values = mock_client.update_item.call_args.kwargs["ExpressionAttributeValues"]
+    assert ":results_index" not in values
+    assert ":results_summary" not in values
+
+
+@patch("test_finalizer_function.app.replace_manifest_entries")
+@patch("test_finalizer_function.app.compact_results")
+@patch("test_finalizer_function.app.aggregate_results")
+@patch("test_finalizer_function.app.read_manifest")
+@patch("boto3.client")
+@patch.dict(os.environ, ENVIRONMENT)
+def test_lambda_marks_test_failed_after_sla_breach(
+    mock_boto_client: Mock,
+    mock_read_manifest: Mock,
+    mock_aggregate_results: Mock,
+    mock_compact_results: Mock,
+    mock_replace_manifest_entries: Mock,
+):
+    mock_client = mock_boto_client.return_value
+    mock_read_manifest.return_value = []
+    mock_aggregate_results.return_value = ({"rows": 0}, {"files": 0, "fetched": 0, "cached": 0})
+    mock_compact_results.return_value = (None, [], [])
+
+    lambda_handler({"test_id": "123", "sla_breach": {"reasons": ["error rate 1.0 > 0.05"]}}, {})
+
+    values = mock_client.update_item.call_args.kwargs["ExpressionAttributeValues"]
+    assert values[":status"] == {"S": "FAILED"}
+
+
+@patch("test_finalizer_function.app.append_to_trend")
+@patch("test_finalizer_function.app.replace_manifest_entries")
+@patch("test_finalizer_function.app.compact_results")
+@patch("test_finalizer_function.app.aggregate_results")
+@patch("test_finalizer_function.app.read_manifest")
+@patch("boto3.client")
+@patch.dict(os.environ, ENVIRONMENT)
+def test_lambda_completes_test_when_trend_append_fails(
+    mock_boto_client: Mock,
+    mock_read_manifest: Mock,
+    mock_aggregate_results: Mock,
+    mock_compact_results: Mock,
+    mock_replace_manifest_entries: Mock,
+    mock_append_to_trend: Mock,
+):
+    mock_client = mock_boto_client.return_value
+    mock_read_manifest.return_value = MANIFEST
+    mock_aggregate_results.return_value = ({"rows": 1}, {"files": 1, "fetched": 1, "cached": 0})
+    mock_compact_results.return_value = (None, [], [])
+    mock_append_to_trend.side_effect = Exception("Could not append test 123 to trend segment")
+
+    result = lambda_handler({"test_id": "123", "test_name": "nightly"}, {})
+
+    assert result["results_summary"] == "results/123/summary.json"
+    assert result["results_trend"] is None
+    values = mock_client.update_item.call_args.kwargs["ExpressionAttributeValues"]
+    assert values[":status"] == {"S": "COMPLETED"}
+
+
+@patch("boto3.client")
+def test_lambda_fails_without_test_id(mock_boto_client: Mock):
+    with pytest.raises(IDParameterNeededException):
+        lambda_handler({}, {})
@@ -0,0 +1,259 @@
+import gzip
+import io
+import json
+import zlib
+
+import pytest
+from botocore.exceptions import ClientError
+
+import compaction
+from latency_sketch import new_label, new_partial
+from compaction import MultipartWriter, compact_results, delete_objects, strip_header
+
+
+class InMemoryS3:
+    def __init__(self):
+        self.objects = {}
+        self.uploads = {}
+
+    def put_object(self, Bucket, Key, Body, **_):
+        self.objects[Key] = bytes(Body)
+        return {"ETag": f'"put-{len(Body)}"'}
+
+    def get_object(self, Bucket, Key, Range=None):
+        if Key not in self.objects:
+            raise ClientError({"Error": {"Code": "NoSuchKey"}}, "GetObject")
+        body = self.objects[Key]
+        if Range:
+            start, end = Range.split("=")[1].split("-")
+            body = body[int(start):int(end) + 1]
+        return {"Body": io.BytesIO(body)}
+
+    def delete_objects(self, Bucket, Delete):
+        for item in Delete["Objects"]:
+            self.objects.pop(item["Key"], None)
+
+    def create_multipart_upload(self, Bucket, Key, **_):
+        self.uploads[Key] = []
+        return {"UploadId": Key}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        self.uploads[UploadId].append(Body)
+        return {"ETag": f"etag-{PartNumber}"}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        self.objects[Key] = b"".join(self.uploads.pop(UploadId))
+        return {"ETag": f'"multipart-{len(MultipartUpload["Parts"])}"'}
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.uploads.pop(UploadId)
+
+
+KPI_HEADER = b"timeStamp,elapsed,label,responseCode,success\n"
+
+
+def add_task(s3, test_id, task, rows=2):
+    prefix = f"results/{test_id}/{task}/"
+    s3.objects[prefix + "bzt.log"] = f"bzt log of {task}".encode()
+    s3.objects[prefix + "results.xml"] = f"<results task='{task}'/>".encode()
+    s3.objects[prefix + "kpi.jtl"] = KPI_HEADER + b"".join(
+        f"{1700000000000 + i},{10 + i},home,200,true\n".encode() for i in range(rows)
+    )
+
+
+def test_strip_header_across_chunks():
+    assert b"".join(strip_header(iter([b"time", b"Stamp,elapsed\n1,2", b"\n3,4\n"]))) == b"1,2\n3,4\n"
+
+
+def manifest_of(s3, test_id):
+    return [
+        {"key": key, "size": len(body), "etag": f"etag-{key}", "rows": 0}
+        for key, body in s3.objects.items()
+        if key.startswith(f"results/{test_id}/")
+    ]
+
+
+def test_multipart_writer_uses_single_put_for_small_objects():
+    s3 = InMemoryS3()
+
+    with MultipartWriter(s3, "bucket", "key") as writer:
+        writer.write(b"abc")
+
+    assert s3.objects["key"] == b"abc"
+    assert s3.uploads == {}
+    assert writer.etag == '"put-3"'
+
+
+def test_multipart_writer_uploads_parts(monkeypatch):
+    monkeypatch.setattr(compaction, "MULTIPART_PART_BYTES", 4)
+    s3 = InMemoryS3()
+
+    with MultipartWriter(s3, "bucket", "key") as writer:
+        writer.write(b"abcde")
+        writer.write(b"fg")
+
+    assert s3.objects["key"] == b"abcdefg"
+
+
+def test_multipart_writer_aborts_on_error(monkeypatch):
+    monkeypatch.setattr(compaction, "MULTIPART_PART_BYTES", 1)
+    s3 = InMemoryS3()
+
+    with pytest.raises(RuntimeError):
+        with MultipartWriter(s3, "bucket", "key") as writer:
+            writer.write(b"abc")
+            raise RuntimeError("stream broken")
+
+    assert "key" not in s3.objects
+    assert s3.uploads == {}
+
+
+def compact(s3, test_id, entries):
+    """Compacts like the finalizer: swaps the manifest entries, then deletes the replaced objects."""
+    index, compacted_entries, replaced_keys = compact_results(s3, "bucket", test_id, entries)
+    delete_objects(s3, "bucket", replaced_keys)
+    replaced = set(replaced_keys)
+    return index, compacted_entries, [entry for entry in entries if entry["key"] not in replaced] + compacted_entries
+
+
+def generation_of(key):
+    return key.split("/")[3]
+
+
+def test_compact_results_bundles_artifacts_and_kpis():
+    s3 = InMemoryS3()
+    for task in ("task-a", "task-b", "task-c"):
+        add_task(s3, "123", task)
+
+    index, manifest_entries, _ = compact(s3, "123", manifest_of(s3, "123"))
+
+    prefix = f"results/123/compacted/{generation_of(manifest_entries[0]['key'])}/"
+    assert set(s3.objects) == {
+        "results/123/compacted/index.json",
+        f"{prefix}artifacts.gz",
+        f"{prefix}kpi-0000.jtl.gz",
+    }
+    assert json.loads(s3.objects["results/123/compacted/index.json"]) == index
+
+    entry = next(entry for entry in index["artifacts"] if entry["name"] == "task-b/bzt.log")
+    archive = s3.objects[entry["archive"]]
+    member = archive[entry["offset"]:entry["offset"] + entry["length"]]
+    assert zlib.decompress(member, 31) == b"bzt log of task-b"
+    assert len(gzip.decompress(archive).split(b"bzt log of")) == 4
+
+    kpi = gzip.decompress(s3.objects[f"{prefix}kpi-0000.jtl.gz"])
+    assert kpi.count(KPI_HEADER) == 1
+    assert kpi.startswith(KPI_HEADER)
+    assert len(kpi.splitlines()) == 1 + 3 * 2
+    assert index["kpi_parts"][0]["tasks"] == ["task-a/kpi.jtl", "task-b/kpi.jtl", "task-c/kpi.jtl"]
+
+    assert [entry["key"] for entry in manifest_entries] == [f"{prefix}artifacts.gz", f"{prefix}kpi-0000.jtl.gz"]
+    assert manifest_entries[1]["rows"] == 3 * 2
+    assert manifest_entries[1]["size"] == len(s3.objects[f"{prefix}kpi-0000.jtl.gz"])
+    assert manifest_entries[1]["etag"].startswith('"put-')
+
+
+def test_compact_results_leaves_deleting_to_the_caller():
+    s3 = InMemoryS3()
+    add_task(s3, "123", "task-a")
+    entries = manifest_of(s3, "123")
+
+    _, _, replaced_keys = compact_results(s3, "bucket", "123", entries)
+
+    assert sorted(replaced_keys) == sorted(entry["key"] for entry in entries)
+    assert all(key in s3.objects for key in replaced_keys)
+
+
+def test_compact_results_merges_partials_of_sampled_tasks():
+    s3 = InMemoryS3()
+    add_task(s3, "123", "task-a")
+    for task, rows in (("task-b", 5), ("task-c", 7)):
+        s3.objects[f"results/123/{task}/kpi-partial.json"] = json.dumps(
+            {**new_partial(), "rows": rows, "labels": {"home": {**new_label(), "rows": rows}}}
+        ).encode()
+        s3.objects[f"results/123/{task}/kpi-sample.csv"] = KPI_HEADER + b"1700000000000,10,home,200,true\n"
+
+    index, manifest_entries, _ = compact(s3, "123", manifest_of(s3, "123"))
+
+    prefix = f"results/123/compacted/{generation_of(manifest_entries[0]['key'])}/"
+    assert index["kpi_partial"] == f"{prefix}kpi-partial.json"
+    merged = json.loads(s3.objects[index["kpi_partial"]])
+    assert (merged["rows"], merged["labels"]["home"]["rows"]) == (12, 12)
+    assert [entry["key"] for entry in manifest_entries] == [
+        f"{prefix}artifacts.gz",
+        f"{prefix}kpi-0000.jtl.gz",
+        f"{prefix}kpi-partial.json",
+    ]
+    # The samples are kept as artifacts, they are not rows of the KPI parts.
+    assert "task-b/kpi-sample.csv" in [entry["name"] for entry in index["artifacts"]]
+    assert index["kpi_parts"][0]["tasks"] == ["task-a/kpi.jtl"]
+    assert not any(key.endswith("task-b/kpi-partial.json") for key in s3.objects)
+
+
+def test_compact_results_archives_kpi_files_of_tasks_with_partials():
+    s3 = InMemoryS3()
+    add_task(s3, "123", "task-a")
+    add_task(s3, "123", "task-b")
+    s3.objects["results/123/task-b/kpi-partial.json"] = json.dumps({**new_partial(), "rows": 2}).encode()
+
+    index, _, _ = compact(s3, "123", manifest_of(s3, "123"))
+
+    assert [part["tasks"] for part in index["kpi_parts"]] == [["task-a/kpi.jtl"]]
+    assert "task-b/kpi.jtl" in [entry["name"] for entry in index["artifacts"]]
+    assert json.loads(s3.objects[index["kpi_partial"]])["rows"] == 2
+
+
+def test_compact_results_ignores_compacted_manifest_entries():
+    s3 = InMemoryS3()
+    add_task(s3, "123", "task-a")
+    entries = manifest_of(s3, "123") + [
+        {"key": "results/123/compacted/g0/kpi-0000.jtl.gz", "size": 1, "etag": "x", "rows": 0}
+    ]
+
+    index, _, replaced_keys = compact_results(s3, "bucket", "123", entries)
+
+    assert [part["tasks"] for part in index["kpi_parts"]] == [["task-a/kpi.jtl"]]
+    assert "results/123/compacted/g0/kpi-0000.jtl.gz" not in replaced_keys
+
+
+def test_compact_results_keeps_earlier_generations():
+    s3 = InMemoryS3()
+    add_task(s3, "123", "task-a")
+    s3.objects["results/123/sampled-a/kpi-partial.json"] = json.dumps({**new_partial(), "rows": 5}).encode()
+    first_index, _, entries = compact(s3, "123", manifest_of(s3, "123"))
+
+    # A late task uploads after the first compaction.
+    add_task(s3, "123", "task-b")
+    s3.objects["results/123/sampled-b/kpi-partial.json"] = json.dumps({**new_partial(), "rows": 7}).encode()
+    entries += [entry for entry in manifest_of(s3, "123") if "/task-b/" in entry["key"] or "/sampled-b/" in entry["key"]]
+    index, _, entries = compact(s3, "123", entries)
+
+    assert [part["tasks"] for part in index["kpi_parts"]] == [["task-a/kpi.jtl"], ["task-b/kpi.jtl"]]
+    assert len({generation_of(part["key"]) for part in index["kpi_parts"]}) == 2
+    for name in ("task-a/bzt.log", "task-b/bzt.log"):
+        entry = next(entry for entry in index["artifacts"] if entry["name"] == name)
+        member = s3.objects[entry["archive"]][entry["offset"]:entry["offset"] + entry["length"]]
+        assert zlib.decompress(member, 31) == f"bzt log of {name.split('/')[0]}".encode()
+
+    # The previous merged partial aggregate is merged into the new one and replaced.
+    assert json.loads(s3.objects[index["kpi_partial"]])["rows"] == 12
+    assert first_index["kpi_partial"] not in s3.objects
+    listed = {entry["key"] for entry in entries}
+    assert listed == {key for key in s3.objects if key != "results/123/compacted/index.json"}
+
+
+def test_compact_results_without_artifacts():
+    s3 = InMemoryS3()
+
+    assert compact_results(s3, "bucket", "123", []) == (None, [], [])
+    assert s3.objects == {}
+
+
+def test_delete_objects_in_batches(monkeypatch):
+    monkeypatch.setattr(compaction, "DELETE_OBJECTS_MAX_KEYS", 2)
+    s3 = InMemoryS3()
+    s3.objects = {"a": b"", "b": b"", "c": b"", "d": b""}
+
+    delete_objects(s3, "bucket", ["a", "b", "c"])
+
+    assert list(s3.objects) == ["d"]
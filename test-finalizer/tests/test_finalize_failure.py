@@ -0,0 +1,66 @@
+import os
+from unittest.mock import Mock, patch
+
+from botocore.exceptions import ClientError
+from test_finalizer_function.finalize_failure import lambda_handler
+
+ENVIRONMENT = {
+    "TEST_AWS_REGION": "us-east-1",
+    "TESTS_TABLE": "TestsTable",
+    "REGION_INFRA_TABLE": "RegionInfraTable",
+}
+
+
+def failed_event(reserved_tasks=10):
+    test_task_config = {"task_count": 10}
+    if reserved_tasks is not None:
+        test_task_config["reserved_tasks"] = reserved_tasks
+    return {
+        "test_id": "123",
+        "test_task_config": test_task_config,
+        "finalize_error": {"Error": "Lambda.ServiceException", "Cause": "Internal error"},
+    }
+
+
+@patch("boto3.client")
+@patch.dict(os.environ, ENVIRONMENT)
+def test_marks_test_failed_and_releases_its_reservation(mock_boto_client: Mock):
+    mock_client = mock_boto_client.return_value
+
+    result = lambda_handler(failed_event(), {})
+
+    assert result["capacity_released"] is True
+    failed, flag, release = [call.kwargs for call in mock_client.update_item.call_args_list]
+    assert failed["TableName"] == "TestsTable"
+    assert failed["ExpressionAttributeValues"][":status"] == {"S": "FAILED"}
+    assert failed["ExpressionAttributeValues"][":running"] == {"BOOL": False}
+    assert flag["ConditionExpression"] == "attribute_exists(test_id) AND attribute_not_exists(capacity_released)"
+    assert release["TableName"] == "RegionInfraTable"
+    assert release["Key"] == {"region": {"S": "us-east-1"}}
+    assert release["ExpressionAttributeValues"] == {":count": {"N": "10"}}
+
+
+@patch("boto3.client")
+@patch.dict(os.environ, ENVIRONMENT)
+def test_does_not_release_a_reservation_released_already(mock_boto_client: Mock):
+    mock_client = mock_boto_client.return_value
+    mock_client.update_item.side_effect = [
+        {},
+        ClientError({"Error": {"Code": "ConditionalCheckFailedException", "Message": ""}}, "UpdateItem"),
+    ]
+
+    result = lambda_handler(failed_event(), {})
+
+    assert result["capacity_released"] is False
+    assert mock_client.update_item.call_count == 2
+
+
+@patch("boto3.client")
+@patch.dict(os.environ, ENVIRONMENT)
+def test_unreserved_test_is_only_marked_failed(mock_boto_client: Mock):
+    mock_client = mock_boto_client.return_value
+
+    result = lambda_handler(failed_event(reserved_tasks=None), {})
+
+    assert result["capacity_released"] is False
+    assert mock_client.update_item.call_count == 1
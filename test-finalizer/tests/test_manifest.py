@@ -0,0 +1,62 @@
+from unittest.mock import Mock, patch
+
+import pytest
+
+from manifest import ManifestWriteException, read_manifest, replace_manifest_entries
+
+
+def item(key, etag='"abc"', rows=None):
+    item = {"test_id": {"S": "123"}, "key": {"S": key}, "size": {"N": "10"}, "etag": {"S": etag}}
+    if rows is not None:
+        item["rows"] = {"N": str(rows)}
+    return item
+
+
+def test_read_manifest_follows_pages():
+    dynamodb = Mock()
+    dynamodb.query.side_effect = [
+        {"Items": [item("results/123/a/kpi.jtl", rows=5)], "LastEvaluatedKey": {"key": {"S": "a"}}},
+        {"Items": [item("results/123/b/bzt.log")]},
+    ]
+
+    entries = read_manifest(dynamodb, "ResultsManifestTable", "123")
+
+    assert entries == [
+        {"key": "results/123/a/kpi.jtl", "size": 10, "etag": "abc", "rows": 5},
+        {"key": "results/123/b/bzt.log", "size": 10, "etag": "abc", "rows": 0},
+    ]
+    assert dynamodb.query.call_args_list[1].kwargs["ExclusiveStartKey"] == {"key": {"S": "a"}}
+
+
+def test_replace_manifest_entries_batches_writes():
+    dynamodb = Mock()
+    dynamodb.batch_write_item.return_value = {}
+    added = [{"key": "results/123/compacted/kpi-0000.jtl.gz", "size": 3, "etag": '"e"', "rows": 2}]
+
+    replace_manifest_entries(dynamodb, "ResultsManifestTable", "123", [f"results/123/t{i}/kpi.jtl" for i in range(30)], added)
+
+    batches = [call.kwargs["RequestItems"]["ResultsManifestTable"] for call in dynamodb.batch_write_item.call_args_list]
+    assert [len(batch) for batch in batches] == [25, 6]
+    assert batches[0][0]["PutRequest"]["Item"]["etag"] == {"S": "e"}
+    assert batches[1][-1]["DeleteRequest"]["Key"] == {"test_id": {"S": "123"}, "key": {"S": "results/123/t29/kpi.jtl"}}
+
+
+@patch("manifest.time.sleep")
+def test_replace_manifest_entries_retries_unprocessed_items(mock_sleep: Mock):
+    dynamodb = Mock()
+    request = {"DeleteRequest": {"Key": {"test_id": {"S": "123"}, "key": {"S": "k"}}}}
+    dynamodb.batch_write_item.side_effect = [{"UnprocessedItems": {"ResultsManifestTable": [request]}}, {}]
+
+    replace_manifest_entries(dynamodb, "ResultsManifestTable", "123", ["k"], [])
+
+    assert dynamodb.batch_write_item.call_count == 2
+    assert dynamodb.batch_write_item.call_args.kwargs["RequestItems"] == {"ResultsManifestTable": [request]}
+
+
+@patch("manifest.time.sleep")
+def test_replace_manifest_entries_gives_up(mock_sleep: Mock):
+    dynamodb = Mock()
+    dynamodb.batch_write_item.side_effect = lambda RequestItems: {"UnprocessedItems": RequestItems}
+
+    with pytest.raises(ManifestWriteException):
+        replace_manifest_entries(dynamodb, "ResultsManifestTable", "123", ["k"], [])
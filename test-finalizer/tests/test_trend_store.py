@@ -0,0 +1,93 @@
+import io
+import json
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+import pytest
+from botocore.exceptions import ClientError
+
+from trend_store import TrendWriteException, append_to_trend, get_partition
+
+COMPLETED_AT = datetime(2026, 10, 19, 2, 0, tzinfo=timezone.utc)
+
+
+class ConditionalS3:
+    """Stores objects in memory and honours the conditions of PutObject."""
+
+    def __init__(self):
+        self.objects = {}
+        self.conflicts = 0
+
+    def get_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise ClientError({"Error": {"Code": "NoSuchKey"}}, "GetObject")
+        body, etag = self.objects[Key]
+        return {"Body": io.BytesIO(body), "ETag": etag}
+
+    def put_object(self, Bucket, Key, Body, ContentType, IfMatch=None, IfNoneMatch=None):
+        current = self.objects.get(Key)
+        if self.conflicts or (IfNoneMatch == "*" and current) or (IfMatch and (not current or current[1] != IfMatch)):
+            self.conflicts = max(self.conflicts - 1, 0)
+            raise ClientError({"Error": {"Code": "PreconditionFailed"}}, "PutObject")
+        self.objects[Key] = (Body, f'"{len(self.objects)}-{len(Body)}"')
+
+    def segment(self, key):
+        return json.loads(self.objects[key][0])
+
+
+def summary(labels, rows=100, errors=1, seconds=10):
+    return {
+        "rows": rows,
+        "errors": errors,
+        "latency_ms": {"mean": 20, "max": 90, "p50": 15.0, "p90": 30.0, "p95": 40.0, "p99": 80.0},
+        "latency_gamma": 1.02,
+        "timeline": [{"second": second, "requests": rows // seconds, "errors": 0} for second in range(seconds)],
+        "labels": {
+            name: {"rows": 50, "errors": 0, "latency_ms": {"p50": p95 / 2, "p90": p95, "p95": p95, "p99": p95 * 2}}
+            for name, p95 in labels.items()
+        },
+    }
+
+
+def test_partition():
+    assert get_partition(COMPLETED_AT) == "2026-Q4"
+    assert get_partition(datetime(2026, 3, 31)) == "2026-Q1"
+
+
+def test_append_to_trend_aligns_label_columns():
+    s3 = ConditionalS3()
+
+    key = append_to_trend(s3, "bucket", "nightly", "run-1", COMPLETED_AT, summary({"/home": 40.0}))
+    append_to_trend(s3, "bucket", "nightly", "run-2", COMPLETED_AT, summary({"/checkout": 90.0}, seconds=0))
+
+    segment = s3.segment(key)
+    assert segment["runs"]["test_id"] == ["run-1", "run-2"]
+    assert segment["runs"]["throughput_rps"] == [10.0, None]
+    assert segment["overall"]["p95"] == [40.0, 40.0]
+    assert segment["labels"]["/home"]["p95"] == [40.0, None]
+    assert segment["labels"]["/checkout"]["p95"] == [None, 90.0]
+    assert segment["labels"]["/checkout"]["p99"] == [None, 180.0]
+
+
+def test_append_to_trend_skips_runs_already_appended():
+    s3 = ConditionalS3()
+    key = append_to_trend(s3, "bucket", "nightly", "run-1", COMPLETED_AT, summary({}))
+    etag = s3.objects[key][1]
+
+    assert append_to_trend(s3, "bucket", "nightly", "run-1", COMPLETED_AT, summary({})) == key
+    assert s3.objects[key][1] == etag
+
+
+@patch("trend_store.time.sleep")
+def test_append_to_trend_retries_conflicting_writes(mock_sleep):
+    s3 = ConditionalS3()
+    key = append_to_trend(s3, "bucket", "nightly", "run-1", COMPLETED_AT, summary({}))
+
+    s3.conflicts = 2
+    append_to_trend(s3, "bucket", "nightly", "run-2", COMPLETED_AT, summary({}))
+    assert s3.segment(key)["runs"]["test_id"] == ["run-1", "run-2"]
+    assert mock_sleep.call_count == 2
+
+    s3.conflicts = 10
+    with pytest.raises(TrendWriteException):
+        append_to_trend(s3, "bucket", "nightly", "run-3", COMPLETED_AT, summary({}))